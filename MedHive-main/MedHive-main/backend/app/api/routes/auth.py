@@ -3,14 +3,17 @@ from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+from jose import JWTError
 from passlib.context import CryptContext
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.core.config import settings
+from app.core.security import token_validator, user_cache
 from app.db.session import get_db
-from app.models.user import User
+from app.models.user import User, Role
 from app.schemas.user import UserCreate, UserResponse, UserLogin
 from app.schemas.token import Token, TokenPayload
 
@@ -30,15 +33,25 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 def create_access_token(subject: Any, expires_delta: timedelta = None) -> str:
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-        )
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
-    return encoded_jwt
+    return token_validator.create_token(subject, expires_delta)
+
+def _detached_copy(user: User) -> User:
+    """Copy a user and its role into detached instances that no session will expire or modify."""
+    copy = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+    make_transient_to_detached(copy)
+    role = None
+    if user.role is not None:
+        role = Role(**{column.key: getattr(user.role, column.key) for column in Role.__table__.columns})
+        make_transient_to_detached(role)
+    # Set as loaded state, not as a change, so merge(load=False) accepts it
+    set_committed_value(copy, "role", role)
+    return copy
+
+# A changed or deleted user row must not be served from the user cache
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target) -> None:
+    user_cache.invalidate(str(target.id))
 
 async def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
@@ -49,18 +62,25 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=["HS256"]
-        )
+        # Tokens seen before are served from the verified-token cache
+        payload = token_validator.verify(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
         token_data = TokenPayload(user_id=user_id)
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.id == token_data.user_id).first()
-    if user is None:
-        raise credentials_exception
+    
+    cached_user = user_cache.get(token_data.user_id)
+    if cached_user is not None:
+        # Attach a copy to this request's session without querying
+        user = db.merge(cached_user, load=False)
+    else:
+        user = db.query(User).options(joinedload(User.role)).filter(User.id == token_data.user_id).first()
+        if user is None:
+            raise credentials_exception
+        user_cache.put(token_data.user_id, _detached_copy(user))
+    
     if not user.active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
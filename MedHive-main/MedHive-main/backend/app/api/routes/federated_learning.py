@@ -1,12 +1,14 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 import requests
 import os
 import json
+import asyncio
 from datetime import datetime
 
-from app.db.session import get_db
+from app.db.session import get_db, SessionLocal
 from app.models.federated_learning import FLRound, FLParticipant
 from app.models.ml_model import MLModel
 from app.models.user import User
@@ -17,7 +19,8 @@ from app.schemas.federated_learning import (
     FLParticipantUpdate
 )
 from app.core.config import settings
-from app.api.routes.auth import get_current_user
+from app.api.routes.auth import get_current_user, oauth2_scheme
+from app.services.round_events import round_events, HEARTBEAT_INTERVAL, STREAM_DURATION
 
 router = APIRouter()
 
@@ -96,6 +99,8 @@ async def create_round(
     db.commit()
     db.refresh(new_round)
     
+    round_events.publish("round_created", new_round.id, model_id=new_round.model_id, round_number=new_round_number)
+    
     # Add participants in the background
     background_tasks.add_task(add_participants_to_round, new_round.id, db)
     
@@ -138,11 +143,52 @@ async def start_round(
     db.commit()
     db.refresh(fl_round)
     
+    # Tell the accepted participants right away instead of at their next poll
+    participant_user_ids = [
+        user_id for (user_id,) in db.query(FLParticipant.user_id).filter(
+            FLParticipant.round_id == round_id,
+            FLParticipant.status == "accepted"
+        )
+    ]
+    round_events.publish("round_started", fl_round.id, participant_user_ids, model_id=fl_round.model_id)
+    
     # Here we would trigger the actual federated learning process
     # This would normally call the federated learning server
     
     return fl_round
 
+@router.get("/events")
+async def stream_round_events(request: Request, token: str = Depends(oauth2_scheme)):
+    """Stream round events for the current user as server-sent events; resume with Last-Event-ID"""
+    # Authenticate with a session of our own: dependency sessions stay open until the stream ends
+    db = SessionLocal()
+    try:
+        user_id = (await get_current_user(db=db, token=token)).id
+    finally:
+        db.close()
+    
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_DURATION
+        cursor = request.headers.get("last-event-id")
+        
+        first = True
+        while first or loop.time() < deadline:
+            # The first wait returns at once, settling the cursor of a new subscriber
+            timeout = 0 if first else min(HEARTBEAT_INTERVAL, deadline - loop.time())
+            cursor, pending, reset = await round_events.wait(user_id, cursor, timeout)
+            
+            if first or reset:
+                # `reset` tells the subscriber it missed events and should re-read the rounds
+                yield f"id: {cursor}\nevent: {'reset' if reset else 'ready'}\ndata: {{}}\n\n"
+            for event in pending:
+                yield f"id: {round_events.stream}:{event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            if not (first or pending or reset):
+                yield ": keep-alive\n\n"
+            first = False
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 # FLParticipant endpoints
 @router.get("/participants", response_model=List[FLParticipantResponse])
 async def get_all_participants(
@@ -284,4 +330,6 @@ def add_participants_to_round(round_id: int, db: Session):
         )
         db.add(participant)
     
-    db.commit() 
\ No newline at end of file
+    db.commit()
+    
+    round_events.publish("round_invitation", round_id, [user.id for user in contributor_users], model_id=fl_round.model_id) 
\ No newline at end of file
@@ -8,6 +8,12 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api"
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    # Secrets rotated out of SECRET_KEY whose tokens are still accepted
+    PREVIOUS_SECRET_KEYS: List[str] = []
+    # Verified tokens kept in memory until they expire
+    TOKEN_CACHE_SIZE: int = 10000
+    # How long a user loaded for a request is reused (updates through the ORM invalidate it)
+    USER_CACHE_TTL_SECONDS: int = 30
     
     # CORS
     CORS_ORIGINS: List[AnyHttpUrl] = ["http://localhost:3000"]  # Frontend URL
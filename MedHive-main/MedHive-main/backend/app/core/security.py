@@ -0,0 +1,161 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+
+ALGORITHM = "HS256"
+
+
+def key_id(secret: str) -> str:
+    """Short, non-secret identifier of a signing secret, sent as the token's `kid` header."""
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()[:16]
+
+
+class TokenValidator:
+    """
+    Issues and verifies HS256 access tokens.
+    
+    Tokens are signed with the current secret and carry its key id, so
+    verification tries only that secret; tokens signed with a previous
+    secret stay valid until it is rotated out. Verified tokens are kept in a
+    bounded LRU until they expire, so a token seen before is checked with one
+    dict lookup instead of a full decode.
+    """
+    
+    def __init__(self, secret: str, previous_secrets: Optional[List[str]] = None, cache_size: int = 10000):
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], float, str]]" = OrderedDict()
+        self.rotate(secret, previous_secrets)
+    
+    def rotate(self, secret: str, previous_secrets: Optional[List[str]] = None) -> None:
+        """Sign with a new secret; tokens of `previous_secrets` are still accepted, those of any other secret are not."""
+        secrets = {key_id(secret): secret}
+        for previous in previous_secrets or []:
+            secrets.setdefault(key_id(previous), previous)
+        
+        with self._lock:
+            self.signing_kid = key_id(secret)
+            self.secret = secret
+            self._secrets = secrets
+            # Forget tokens whose secret is no longer active
+            for token in [token for token, (_, _, kid) in self._cache.items() if kid not in secrets]:
+                del self._cache[token]
+    
+    def create_token(self, subject: Any, expires_delta: Optional[timedelta] = None) -> str:
+        """Create a signed access token for a subject."""
+        expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+        claims = {"exp": expire, "sub": str(subject)}
+        return jwt.encode(claims, self.secret, algorithm=ALGORITHM, headers={"kid": self.signing_kid})
+    
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a token and return its claims.
+        
+        Raises:
+            JWTError: If the token is malformed, expired or not signed by an active secret
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached is not None:
+                claims, expires_at, _ = cached
+                if now < expires_at:
+                    self._cache.move_to_end(token)
+                    # Callers get their own copy, so changing it cannot alter the cached claims
+                    return dict(claims)
+                del self._cache[token]
+        
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is not None:
+            if kid not in self._secrets:
+                raise JWTError("Token signed with an unknown key")
+            candidates = [(kid, self._secrets[kid])]
+        else:
+            # Tokens issued before key ids were added
+            candidates = list(self._secrets.items())
+        
+        error = None
+        for candidate_kid, secret in candidates:
+            try:
+                claims = jwt.decode(token, secret, algorithms=[ALGORITHM])
+                break
+            except JWTError as e:
+                error = e
+        else:
+            raise error
+        
+        # Tokens without an expiry are verified every time
+        if "exp" in claims and self.cache_size > 0:
+            with self._lock:
+                if candidate_kid in self._secrets:
+                    self._cache[token] = (dict(claims), float(claims["exp"]), candidate_kid)
+                    self._cache.move_to_end(token)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        
+        return claims
+    
+    def clear(self) -> None:
+        """Forget all verified tokens."""
+        with self._lock:
+            self._cache.clear()
+
+
+class TTLCache:
+    """Bounded LRU whose entries also expire a fixed time after they were stored."""
+    
+    def __init__(self, ttl_seconds: float, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Any, Tuple[Any, float]]" = OrderedDict()
+    
+    def get(self, key: Any) -> Optional[Any]:
+        """Get a value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: Any, value: Any) -> None:
+        """Store a value."""
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key: Any) -> None:
+        """Drop a value, e.g. because its source row changed."""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Drop all values."""
+        with self._lock:
+            self._entries.clear()
+
+
+token_validator = TokenValidator(
+    settings.SECRET_KEY,
+    settings.PREVIOUS_SECRET_KEYS,
+    cache_size=settings.TOKEN_CACHE_SIZE
+)
+
+# user id (str) -> User loaded with its role, detached from the session that loaded it
+user_cache = TTLCache(settings.USER_CACHE_TTL_SECONDS)
@@ -0,0 +1,98 @@
+import time
+import uuid
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Iterable, Optional, Set, Tuple
+
+# Number of past events a reconnecting subscriber can catch up on
+HISTORY_SIZE = 4096
+
+# Seconds between keep-alive comments on an idle event stream
+HEARTBEAT_INTERVAL = 15.0
+
+# Seconds after which an event stream is closed and the subscriber reconnects from its cursor
+STREAM_DURATION = 300.0
+
+
+class RoundEvents:
+    """
+    Sequence-numbered feed of FL round events for the dashboard's event stream.
+    
+    Events are addressed to everyone or to a set of user IDs. The dashboard
+    has few subscribers, so every event wakes all waiting streams and each
+    picks out its own events; `publish` may be called from any thread (e.g.
+    background tasks run in the thread pool). A cursor from another process
+    or older than the history yields a `reset`, telling the subscriber to
+    re-read the rounds.
+    """
+    
+    def __init__(self, history: int = HISTORY_SIZE):
+        self.stream = uuid.uuid4().hex
+        self._events = deque(maxlen=history)  # (event, recipients), oldest first
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = set()
+    
+    def publish(self, event_type: str, round_id: int, user_ids: Optional[Iterable[Any]] = None, **fields: Any) -> int:
+        """Publish an event to `user_ids` (everyone if None) and wake the waiting streams."""
+        recipients = frozenset(user_ids) if user_ids is not None else None
+        
+        with self._lock:
+            self._seq += 1
+            event = dict(fields, seq=self._seq, type=event_type, round_id=round_id, time=time.time())
+            self._events.append((event, recipients))
+            waiters = list(self._waiters)
+        
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+        return event["seq"]
+    
+    async def wait(self, user_id: Any, cursor: Optional[str], timeout: float) -> Tuple[str, list, bool]:
+        """Get (new cursor, events for `user_id` after `cursor`, whether to reset), waiting up to `timeout` seconds for one."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        while True:
+            waiter = (loop, loop.create_future())
+            
+            # Reading the events and registering happen under one lock, so no event slips in between
+            with self._lock:
+                cursor, events, reset = self._poll(user_id, cursor)
+                remaining = deadline - loop.time()
+                if events or reset or remaining <= 0:
+                    return cursor, events, reset
+                self._waiters.add(waiter)
+            
+            try:
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    self._waiters.discard(waiter)
+    
+    def _poll(self, user_id: Any, cursor: Optional[str]) -> Tuple[str, list, bool]:
+        """Read the events for `user_id` after `cursor`; must be called with the lock held."""
+        stream, _, seq = (cursor or "").partition(":")
+        since = int(seq) if seq.isdigit() else None
+        
+        oldest = self._events[0][0]["seq"] if self._events else self._seq + 1
+        reset = since is not None and (stream != self.stream or since > self._seq or since < oldest - 1)
+        if reset or since is None:
+            since = self._seq
+        
+        events = [
+            event for event, recipients in self._events
+            if event["seq"] > since and (recipients is None or user_id in recipients)
+        ]
+        return f"{self.stream}:{self._seq}", events, reset
+
+
+def _wake(future: asyncio.Future) -> None:
+    """Resolve a subscriber's future unless it was already resolved or cancelled."""
+    if not future.done():
+        future.set_result(None)
+
+
+round_events = RoundEvents()
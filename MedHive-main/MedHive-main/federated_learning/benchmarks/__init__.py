@@ -0,0 +1,8 @@
+"""
+HachathonHub Federated Learning Benchmarks
+
+This package contains standalone benchmark scripts for the federated learning system:
+- Model aggregation memory and latency as the number of clients grows
+
+Each benchmark is runnable as a module, e.g. `python -m federated_learning.benchmarks.aggregation`.
+"""
@@ -0,0 +1,166 @@
+import os
+import time
+import json
+import logging
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional
+
+import torch
+
+from federated_learning.common.flat import save_flat
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB."""
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def make_state_dict(num_params: int, layer_size: int = 1 << 20) -> Dict[str, torch.Tensor]:
+    """
+    Build a synthetic state dict with roughly `num_params` float32 parameters.
+    
+    Args:
+        num_params: Total number of parameters
+        layer_size: Number of parameters per layer
+        
+    Returns:
+        State dict with conv-style weights and batch norm buffers
+    """
+    state_dict = {}
+    remaining = num_params
+    layer = 0
+    
+    while remaining > 0:
+        size = min(layer_size, remaining)
+        state_dict[f"layer{layer}.weight"] = torch.randn(size)
+        state_dict[f"layer{layer}.bn.running_mean"] = torch.zeros(64)
+        state_dict[f"layer{layer}.bn.running_var"] = torch.ones(64)
+        state_dict[f"layer{layer}.bn.num_batches_tracked"] = torch.tensor(0)
+        remaining -= size
+        layer += 1
+    
+    return state_dict
+
+
+def write_client_checkpoints(work_dir: str, num_clients: int, num_params: int, model_format: str = "torch") -> List[str]:
+    """Write `num_clients` synthetic client checkpoints ('torch' pickles or 'flat' model files) and return their paths."""
+    paths = []
+    for i in range(num_clients):
+        if model_format == "flat":
+            path = os.path.join(work_dir, f"client_{i}_model.flat")
+            save_flat(make_state_dict(num_params), path)
+        else:
+            path = os.path.join(work_dir, f"client_{i}_model.pt")
+            torch.save(make_state_dict(num_params), path)
+        paths.append(path)
+    return paths
+
+
+def _aggregate_isolated(work_dir: str, model_paths: List[str], strategy: str, num_workers: int) -> Dict[str, float]:
+    """Run one aggregation in a fresh process and report its time and memory."""
+    from federated_learning.server.aggregator import ModelAggregator
+    
+    os.chdir(work_dir)
+    baseline_rss = _peak_rss_mb()
+    
+    aggregator = ModelAggregator("benchmark", num_workers=num_workers)
+    weights = [float(i + 1) for i in range(len(model_paths))]
+    
+    start = time.perf_counter()
+    aggregator.aggregate_models(model_paths=model_paths, weights=weights, strategy=strategy)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "wall_time_s": elapsed,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def run_benchmark(
+    client_counts: List[int],
+    num_params: int,
+    strategy: str = "fedavg",
+    worker_counts: Optional[List[int]] = None,
+    model_format: str = "torch"
+) -> List[Dict[str, Any]]:
+    """
+    Measure aggregation wall time and peak RSS for each client count.
+    
+    Args:
+        client_counts: Numbers of clients to aggregate
+        num_params: Parameters per synthetic model
+        strategy: Aggregation strategy to benchmark
+        worker_counts: Worker process counts to sweep (only used by parallel strategies)
+        model_format: Format of the client checkpoints ('torch' or 'flat')
+        
+    Returns:
+        List of result rows
+    """
+    results = []
+    model_mb = num_params * 4 / (1024 * 1024)
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_paths = write_client_checkpoints(work_dir, max(client_counts), num_params, model_format)
+        
+        for num_clients in sorted(client_counts):
+            for num_workers in worker_counts or [1]:
+                # Each measurement runs in its own process so peak RSS is not shared between runs
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    row = pool.submit(
+                        _aggregate_isolated, work_dir, model_paths[:num_clients], strategy, num_workers
+                    ).result()
+                
+                row.update({
+                    "strategy": strategy,
+                    "format": model_format,
+                    "num_clients": num_clients,
+                    "num_workers": num_workers,
+                    "model_mb": model_mb,
+                    "rss_over_model": (row["peak_rss_mb"] - row["baseline_rss_mb"]) / model_mb
+                })
+                results.append(row)
+                logger.info(
+                    f"{strategy} ({model_format}): {num_clients} clients, {num_workers} workers, {row['wall_time_s']:.2f}s, "
+                    f"peak RSS {row['peak_rss_mb']:.0f} MB ({row['rss_over_model']:.1f}x model)"
+                )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark model aggregation memory and latency")
+    parser.add_argument("--clients", type=int, nargs="+", default=[2, 8, 32, 64], help="Client counts to benchmark")
+    parser.add_argument("--num_params", type=int, default=11_700_000, help="Parameters per model (default: ResNet-18 sized)")
+    parser.add_argument("--strategy", type=str, default="fedavg", help="Aggregation strategy")
+    parser.add_argument("--workers", type=int, nargs="+", help="Worker counts to sweep for 'fedavg_parallel'")
+    parser.add_argument("--format", type=str, default="torch", choices=["torch", "flat"], help="Client checkpoint format")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.clients, args.num_params, args.strategy, args.workers, args.format)
+    
+    print(f"{'clients':>8} {'workers':>8} {'wall (s)':>10} {'peak RSS (MB)':>14} {'RSS / model':>12}")
+    for row in results:
+        print(
+            f"{row['num_clients']:>8} {row['num_workers']:>8} {row['wall_time_s']:>10.2f} "
+            f"{row['peak_rss_mb']:>14.0f} {row['rss_over_model']:>12.1f}"
+        )
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
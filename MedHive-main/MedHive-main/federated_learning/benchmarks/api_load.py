@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from typing import Dict, List, Any, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+def _serve(work_dir: str, port: int, num_clients: int, io_threads: int, ready) -> None:
+    """Run an API server with `num_clients` registered clients invited to one started round."""
+    import uvicorn
+    from federated_learning.server.server import FederatedLearningServer
+    from federated_learning.server.api import create_app
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("FL_Server", "FL_Aggregator", "FL_Registry", "FL_RoundJournal"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    
+    server = FederatedLearningServer(
+        models_dir=os.path.join(work_dir, "models"),
+        rounds_dir=os.path.join(work_dir, "rounds"),
+        init_security=False
+    )
+    
+    for i in range(num_clients):
+        server.register_client(f"hospital_{i}", "benchmark", {"has_gpu": False})
+    
+    round_id = server.create_round(
+        model_id=1,
+        model_type="benchmark",
+        round_number=1,
+        min_clients=1,
+        max_clients=num_clients,
+        round_timeout=24 * 3600
+    )["round_id"]
+    server.select_clients_for_round(round_id)
+    server.start_round(round_id)
+    
+    config = uvicorn.Config(create_app(server, io_threads=io_threads), host="127.0.0.1", port=port,
+                            log_level="error", backlog=4096)
+    uvicorn_server = uvicorn.Server(config)
+    
+    async def serve() -> None:
+        task = asyncio.ensure_future(uvicorn_server.serve())
+        while not uvicorn_server.started:
+            await asyncio.sleep(0.05)
+        ready.set()
+        await task
+    
+    try:
+        asyncio.run(serve())
+    finally:
+        server.shutdown()
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams, so thousands of clients fit in one process."""
+    
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+    
+    async def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+        """
+        Send a request and read the JSON response.
+        
+        Returns:
+            Tuple of (HTTP status code, decoded JSON body)
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"\r\n"
+        )
+        self.writer.write(head.encode() + payload)
+        await self.writer.drain()
+        
+        header_block = await self.reader.readuntil(b"\r\n\r\n")
+        lines = header_block.decode("latin-1").split("\r\n")
+        status_code = int(lines[0].split(" ")[1])
+        
+        content_length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.lower() == "content-length":
+                content_length = int(value)
+        
+        data = await self.reader.readexactly(content_length)
+        return status_code, json.loads(data) if data else {}
+    
+    async def close(self) -> None:
+        """Close the connection."""
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+
+
+async def simulate_client(
+    client_id: str,
+    port: int,
+    duration: float,
+    poll_interval: float,
+    latencies: List[float],
+    stats: Dict[str, int]
+) -> None:
+    """
+    Poll for rounds until one shows up, join it, then poll its status until `duration` elapses.
+    
+    Args:
+        client_id: ID of the simulated client
+        port: Port of the API server
+        duration: Seconds to keep polling
+        poll_interval: Mean seconds between polls
+        latencies: Shared list of request latencies in seconds
+        stats: Shared request counters
+    """
+    rng = random.Random(client_id)
+    connection = HTTPConnection("127.0.0.1", port)
+    deadline = time.perf_counter() + duration
+    round_id = None
+    
+    # Spread the first poll so clients do not arrive in lockstep
+    await asyncio.sleep(rng.uniform(0, poll_interval))
+    
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if round_id is None:
+                status_code, data = await connection.request(
+                    "GET", f"/api/federated-learning/available-rounds?client_id={client_id}&model_type=benchmark"
+                )
+                if status_code == 200 and data["rounds"]:
+                    round_id = data["rounds"][0]["id"]
+                    latencies.append(time.perf_counter() - start)
+                    stats["requests"] += 1
+                    
+                    start = time.perf_counter()
+                    status_code, data = await connection.request(
+                        "POST", f"/api/federated-learning/rounds/{round_id}/join", {"client_id": client_id}
+                    )
+                    stats["joins"] += status_code == 200
+            else:
+                status_code, data = await connection.request(
+                    "GET", f"/api/federated-learning/rounds/{round_id}/status?client_id={client_id}"
+                )
+            
+            latencies.append(time.perf_counter() - start)
+            stats["requests"] += 1
+            stats["errors"] += status_code != 200
+            
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * poll_interval)
+    except (OSError, asyncio.IncompleteReadError) as e:
+        stats["connection_errors"] += 1
+        logger.debug(f"Client {client_id} lost its connection: {str(e)}")
+    finally:
+        await connection.close()
+
+
+async def run_load(num_clients: int, port: int, duration: float, poll_interval: float) -> Dict[str, Any]:
+    """Run `num_clients` concurrent polling clients against the server and summarize latencies."""
+    latencies = []
+    stats = {"requests": 0, "joins": 0, "errors": 0, "connection_errors": 0}
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        simulate_client(f"hospital_{i}", port, duration, poll_interval, latencies, stats)
+        for i in range(num_clients)
+    ))
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    return {
+        "num_clients": num_clients,
+        "requests": stats["requests"],
+        "joins": stats["joins"],
+        "errors": stats["errors"],
+        "connection_errors": stats["connection_errors"],
+        "requests_per_s": stats["requests"] / elapsed,
+        "p50_ms": 1000 * latencies[len(latencies) // 2] if latencies else 0.0,
+        "p99_ms": 1000 * latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    }
+
+
+def run_benchmark(client_counts: List[int], duration: float, poll_interval: float, io_threads: int) -> List[Dict[str, Any]]:
+    """Start a fresh API server process per client count and drive it with polling clients."""
+    # Each simulated client holds one socket
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+    
+    context = multiprocessing.get_context("spawn")
+    results = []
+    
+    for num_clients in client_counts:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        
+        with tempfile.TemporaryDirectory() as work_dir:
+            ready = context.Event()
+            process = context.Process(target=_serve, args=(work_dir, port, num_clients, io_threads, ready))
+            process.start()
+            
+            try:
+                if not ready.wait(timeout=120):
+                    raise RuntimeError("API server did not start")
+                row = asyncio.run(run_load(num_clients, port, duration, poll_interval))
+            finally:
+                process.terminate()
+                process.join()
+        
+        results.append(row)
+        logger.info(
+            f"{num_clients} clients: {row['requests_per_s']:.0f} requests/s, "
+            f"p50 {row['p50_ms']:.1f} ms, p99 {row['p99_ms']:.1f} ms"
+        )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Load-test the federated learning HTTP API with polling clients")
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 1000, 5000], help="Concurrent client counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds each client keeps polling")
+    parser.add_argument("--poll_interval", type=float, default=1.0, help="Mean seconds between polls per client")
+    parser.add_argument("--io_threads", type=int, default=32, help="API threads for blocking server calls")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.clients, args.duration, args.poll_interval, args.io_threads)
+    
+    print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'joins':>8} {'errors':>8}")
+    for row in results:
+        print(f"{row['num_clients']:>8} {row['requests_per_s']:>8.0f} {row['p50_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['joins']:>8} {row['errors'] + row['connection_errors']:>8}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
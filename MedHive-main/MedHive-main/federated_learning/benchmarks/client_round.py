@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import types
+import socket
+import asyncio
+import logging
+import tempfile
+import threading
+import multiprocessing
+from typing import Dict, List, Any
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import Dataset
+
+from federated_learning.common.flat import save_flat
+from federated_learning.common.model_factory import register_model
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+MODEL_TYPE = "benchmark_client_round"
+
+# Features of the synthetic samples
+NUM_FEATURES = 256
+
+# Seconds to wait for the server to aggregate the round
+ROUND_TIMEOUT = 120.0
+
+
+class CustomDataset(Dataset):
+    """Synthetic samples stored as memory-mapped arrays, as a real client dataset would be read from disk."""
+    
+    def __init__(self, data_path: str, train: bool = True):
+        self.x = np.load(os.path.join(data_path, "x.npy"), mmap_mode="r")
+        self.y = np.load(os.path.join(data_path, "y.npy"))
+    
+    def __len__(self) -> int:
+        return len(self.y)
+    
+    def __getitem__(self, index: int):
+        return torch.from_numpy(np.array(self.x[index])), int(self.y[index])
+
+
+class BenchmarkMLP(nn.Module):
+    """Two-layer classifier whose size is set by its hidden width."""
+    
+    hidden = 2048
+    
+    def __init__(self):
+        super().__init__()
+        self.layers = nn.Sequential(
+            nn.Linear(NUM_FEATURES, self.hidden), nn.ReLU(),
+            nn.Linear(self.hidden, self.hidden), nn.ReLU(),
+            nn.Linear(self.hidden, 2)
+        )
+    
+    def forward(self, x):
+        return self.layers(x)
+
+
+def _register_model_type(hidden: int) -> None:
+    """Make the synthetic model, dataset and hyperparameters loadable under MODEL_TYPE."""
+    BenchmarkMLP.hidden = hidden
+    register_model(MODEL_TYPE, BenchmarkMLP)
+    
+    # Local training imports `federated_learning.models.<type>.dataset` and `.hyperparams`
+    dataset_module = types.ModuleType(f"federated_learning.models.{MODEL_TYPE}.dataset")
+    dataset_module.CustomDataset = CustomDataset
+    hyperparams_module = types.ModuleType(f"federated_learning.models.{MODEL_TYPE}.hyperparams")
+    hyperparams_module.HYPERPARAMS = {"epochs": 1, "batch_size": 64}
+    sys.modules[dataset_module.__name__] = dataset_module
+    sys.modules[hyperparams_module.__name__] = hyperparams_module
+
+
+def _serve(work_dir: str, port: int, hidden: int, round_ids) -> None:
+    """Run an API server with one started round for client `hospital_0` and report (round ID, model bytes)."""
+    import uvicorn
+    from federated_learning.server.server import FederatedLearningServer
+    from federated_learning.server.api import create_app
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("FL_Server", "FL_Aggregator", "FL_Registry", "FL_RoundJournal", "FL_Uploads", "FL_ModelStore", "FL_Evaluation"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    
+    _register_model_type(hidden)
+    server = FederatedLearningServer(
+        models_dir=os.path.join(work_dir, "models"),
+        rounds_dir=os.path.join(work_dir, "rounds"),
+        init_security=False
+    )
+    server.register_client("hospital_0", MODEL_TYPE, {"has_gpu": False})
+    
+    round_id = server.create_round(model_id=1, model_type=MODEL_TYPE, round_number=1, min_clients=1, max_clients=1)["round_id"]
+    server.select_clients_for_round(round_id)
+    server.start_round(round_id)
+    model_bytes = os.path.getsize(server.model_store.blob_path(server.active_rounds[round_id]["global_model_digest"]))
+    
+    config = uvicorn.Config(create_app(server), host="127.0.0.1", port=port, log_level="error")
+    uvicorn_server = uvicorn.Server(config)
+    
+    async def serve() -> None:
+        task = asyncio.ensure_future(uvicorn_server.serve())
+        while not uvicorn_server.started:
+            await asyncio.sleep(0.05)
+        round_ids.put((round_id, model_bytes))
+        await task
+    
+    try:
+        asyncio.run(serve())
+    finally:
+        server.shutdown()
+
+
+class DiskUsageSampler:
+    """Samples the bytes of all files under a directory on a background thread and keeps the peak."""
+    
+    def __init__(self, root: str, interval: float = 0.002):
+        self.root = root
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _usage(self) -> int:
+        total = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+        return total
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._usage())
+            self._stop.wait(self.interval)
+    
+    def __enter__(self) -> "DiskUsageSampler":
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._usage())
+
+
+def _sequential_round(client, round_id: str) -> bool:
+    """The round as the client ran it before pipelining: every stage in turn, each handing a file to the next."""
+    from federated_learning.client.local_training import train_model
+    from federated_learning.common.signing import hash_file
+    
+    if not client.join_round(round_id):
+        return False
+    
+    global_model_path = client.download_global_model()
+    local_model_path = train_model(
+        global_model_path=global_model_path,
+        data_path=client.data_path,
+        model_type=client.model_type,
+        round_id=round_id,
+        client_id=client.client_id
+    )
+    
+    flat_path = save_flat(torch.load(local_model_path, map_location="cpu"), f"{os.path.splitext(local_model_path)[0]}.flat")
+    client.transfer.upload(
+        f"/api/federated-learning/participants/{client.participant_id}/uploads",
+        flat_path,
+        {"training_metrics": client._calculate_metrics(local_model_path), "update_format": "full"},
+        digest=hash_file(flat_path).hex()
+    )
+    return client.complete_round()
+
+
+def _wait_for_round(client, round_id: str, timeout: float = ROUND_TIMEOUT) -> str:
+    """Poll the round's status through the API until it is finished or `timeout` seconds pass."""
+    deadline = time.time() + timeout
+    
+    while True:
+        response = client.session.get(f"{client.server_url}/api/federated-learning/rounds/{round_id}/status")
+        status = response.json().get("round_status")
+        if status in ("completed", "failed") or time.time() >= deadline:
+            return status
+        time.sleep(0.1)
+
+
+def run_mode(mode: str, work_dir: str, hidden: int, num_samples: int) -> Dict[str, Any]:
+    """Run one client round against a fresh server, in the client's own working directory."""
+    from federated_learning.client.client import FederatedClient
+    
+    client_dir = os.path.join(work_dir, mode, "client")
+    data_path = os.path.join(work_dir, "data")
+    os.makedirs(client_dir)
+    
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    
+    context = multiprocessing.get_context("spawn")
+    round_ids = context.Queue()
+    process = context.Process(target=_serve, args=(os.path.join(work_dir, mode, "server"), port, hidden, round_ids))
+    process.start()
+    
+    cwd = os.getcwd()
+    try:
+        round_id, model_bytes = round_ids.get(timeout=120)
+        
+        # The client writes its model files relative to its working directory
+        os.chdir(client_dir)
+        client = FederatedClient("hospital_0", f"http://127.0.0.1:{port}", data_path, MODEL_TYPE)
+        
+        with DiskUsageSampler(client_dir) as disk:
+            start = time.perf_counter()
+            ok = client.run_round(round_id) if mode == "pipelined" else _sequential_round(client, round_id)
+            elapsed = time.perf_counter() - start
+        
+        # The round is only done once the server has aggregated the upload
+        round_status = _wait_for_round(client, round_id) if ok else None
+        client.close()
+    finally:
+        os.chdir(cwd)
+        process.terminate()
+        process.join()
+    
+    return {
+        "mode": mode,
+        "ok": ok and round_status == "completed",
+        "round_status": round_status,
+        "model_mb": model_bytes / 2 ** 20,
+        "round_s": elapsed,
+        "peak_disk_mb": disk.peak / 2 ** 20,
+        "final_disk_mb": disk._usage() / 2 ** 20
+    }
+
+
+def run_benchmark(hidden: int, num_samples: int, modes: List[str]) -> List[Dict[str, Any]]:
+    """Time one client round per mode and sample the client's disk usage throughout."""
+    _register_model_type(hidden)
+    work_dir = tempfile.mkdtemp(prefix="fl_client_round_bench_")
+    
+    data_path = os.path.join(work_dir, "data")
+    os.makedirs(data_path)
+    rng = np.random.default_rng(0)
+    np.save(os.path.join(data_path, "x.npy"), rng.standard_normal((num_samples, NUM_FEATURES), dtype=np.float32))
+    np.save(os.path.join(data_path, "y.npy"), rng.integers(0, 2, num_samples))
+    
+    results = []
+    for mode in modes:
+        row = run_mode(mode, work_dir, hidden, num_samples)
+        results.append(row)
+        logger.info(
+            f"{mode}: round {row['round_s']:.2f}s, peak disk {row['peak_disk_mb']:.1f} MB "
+            f"for a {row['model_mb']:.1f} MB model ({'ok' if row['ok'] else 'failed'})"
+        )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Client round latency and peak disk usage, sequential vs pipelined")
+    parser.add_argument("--hidden", type=int, default=2048, help="Hidden width of the model (2048 is about 17 MB)")
+    parser.add_argument("--samples", type=int, default=2048, help="Number of local training samples")
+    parser.add_argument("--modes", type=str, nargs="+", default=["sequential", "pipelined"], choices=["sequential", "pipelined"])
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.hidden, args.samples, args.modes)
+    
+    print(f"{'mode':>10} {'model MB':>9} {'round s':>8} {'peak disk MB':>13} {'left on disk MB':>16}")
+    for row in results:
+        print(f"{row['mode']:>10} {row['model_mb']:>9.1f} {row['round_s']:>8.2f} "
+              f"{row['peak_disk_mb']:>13.1f} {row['final_disk_mb']:>16.1f}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,287 @@
+import os
+import time
+import json
+import random
+import logging
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, List, Any
+
+import torch
+
+from federated_learning.server.server import FederatedLearningServer
+from federated_learning.server.round_journal import RoundJournal
+from federated_learning.common.flat import save_flat
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+class StressServer(FederatedLearningServer):
+    """Server whose aggregation is replaced by a counter so only the round state machine is exercised."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aggregation_calls = Counter()
+        self.aggregation_calls_lock = threading.Lock()
+    
+    def _aggregate_round(self, round_id, round_info, completed_clients):
+        with self.aggregation_calls_lock:
+            self.aggregation_calls[round_id] += 1
+        
+        # Give racing finish requests a window to slip in
+        time.sleep(0.05)
+        
+        aggregated_model_path = os.path.join(self.rounds_dir, round_id, "global_model", "aggregated.pt")
+        with open(aggregated_model_path, "wb") as f:
+            f.write(b"\0")
+        
+        return {"num_clients": len(completed_clients)}
+
+
+def simulate_client(
+    server: StressServer,
+    client_id: str,
+    round_ids: List[str],
+    model_path: str,
+    max_delay: float,
+    outcomes: Dict[str, Any],
+    outcomes_lock: threading.Lock
+) -> None:
+    """
+    Join and upload to every round in random order, retrying each request to provoke duplicates.
+    
+    Args:
+        server: Server under test
+        client_id: ID of the simulated client
+        round_ids: Rounds the client was invited to
+        model_path: Model file to upload
+        max_delay: Maximum simulated training time per round in seconds
+        outcomes: Shared record of accepted requests
+        outcomes_lock: Lock guarding `outcomes`
+    """
+    rng = random.Random(client_id)
+    round_ids = list(round_ids)
+    rng.shuffle(round_ids)
+    
+    ops = 0
+    for round_id in round_ids:
+        joins = sum(server.client_join_round(round_id, client_id)["status"] == "success" for _ in range(2))
+        server.get_round_status(round_id)
+        
+        time.sleep(rng.uniform(0, max_delay))
+        
+        uploads = sum(
+            server.upload_client_model(round_id, client_id, model_path, {"data_size": 10})["status"] == "success"
+            for _ in range(2)
+        )
+        ops += 5
+        
+        with outcomes_lock:
+            outcomes["joins"][(round_id, client_id)] = joins
+            outcomes["uploads"][(round_id, client_id)] = uploads
+    
+    with outcomes_lock:
+        outcomes["ops"] += ops
+
+
+def run_stress(num_clients: int, num_rounds: int, round_timeout: float, max_delay: float, racers: int) -> Dict[str, Any]:
+    """
+    Run concurrent simulated clients against several rounds and check the final state.
+    
+    Args:
+        num_clients: Number of client threads
+        num_rounds: Number of concurrently running rounds
+        round_timeout: Round timeout in seconds; short timeouts race with uploads
+        max_delay: Maximum simulated training time per round in seconds
+        racers: Number of extra threads repeatedly asking each round to finish
+    
+    Returns:
+        Result summary including any invariant violations
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        rounds_dir = os.path.join(work_dir, "rounds")
+        server = StressServer(
+            models_dir=os.path.join(work_dir, "models"),
+            rounds_dir=rounds_dir,
+            init_security=False
+        )
+        
+        try:
+            client_ids = [f"hospital_{i}" for i in range(num_clients)]
+            for client_id in client_ids:
+                server.register_client(client_id, "stress", {"has_gpu": False})
+            
+            round_ids = []
+            for round_number in range(1, num_rounds + 1):
+                round_id = server.create_round(
+                    model_id=1,
+                    model_type="stress",
+                    round_number=round_number,
+                    min_clients=1,
+                    max_clients=num_clients,
+                    round_timeout=round_timeout
+                )["round_id"]
+                server.select_clients_for_round(round_id)
+                server.start_round(round_id)
+                round_ids.append(round_id)
+            
+            model_path = os.path.join(work_dir, "upload.pt")
+            save_flat({"weight": torch.zeros(256)}, model_path)
+            
+            outcomes = {"joins": {}, "uploads": {}, "ops": 0}
+            outcomes_lock = threading.Lock()
+            
+            threads = [
+                threading.Thread(
+                    target=simulate_client,
+                    args=(server, client_id, round_ids, model_path, max_delay, outcomes, outcomes_lock)
+                )
+                for client_id in client_ids
+            ]
+            
+            # Extra threads that keep asking random rounds to finish, as a timeout would
+            stop_racing = threading.Event()
+            
+            def race_finish(seed: int) -> None:
+                rng = random.Random(seed)
+                while not stop_racing.is_set():
+                    time.sleep(rng.uniform(0, round_timeout))
+                    server._finish_round(rng.choice(round_ids))
+            
+            racer_threads = [threading.Thread(target=race_finish, args=(i,)) for i in range(racers)]
+            
+            start = time.perf_counter()
+            for thread in threads + racer_threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            
+            stop_racing.set()
+            for thread in racer_threads:
+                thread.join()
+            
+            # Finish whatever is left and wait for background tasks to settle
+            for round_id in round_ids:
+                server._finish_round(round_id)
+            deadline = time.time() + 60
+            while server.active_rounds and time.time() < deadline:
+                time.sleep(0.05)
+            
+            errors = check_invariants(server, rounds_dir, round_ids, client_ids, outcomes)
+        finally:
+            server.shutdown()
+    
+    return {
+        "num_clients": num_clients,
+        "num_rounds": num_rounds,
+        "requests": outcomes["ops"],
+        "requests_per_s": outcomes["ops"] / elapsed,
+        "elapsed_s": elapsed,
+        "errors": errors
+    }
+
+
+def check_invariants(
+    server: StressServer,
+    rounds_dir: str,
+    round_ids: List[str],
+    client_ids: List[str],
+    outcomes: Dict[str, Any]
+) -> List[str]:
+    """
+    Check that every round finished once and no accepted request was lost.
+    
+    Returns:
+        Descriptions of violated invariants
+    """
+    errors = []
+    
+    if server.active_rounds:
+        errors.append(f"{len(server.active_rounds)} rounds never finished")
+    
+    participated = Counter()
+    for round_id in round_ids:
+        round_info = server.registry.get_round(round_id)
+        completed = {
+            client_id for client_id, client_info in round_info["clients"].items()
+            if client_info["status"] == "completed"
+        }
+        
+        calls = server.aggregation_calls[round_id]
+        if calls != (1 if completed else 0):
+            errors.append(f"Round {round_id} aggregated {calls} times")
+        
+        expected_status = "completed" if completed else "failed"
+        if round_info["status"] != expected_status:
+            errors.append(f"Round {round_id} ended as {round_info['status']}, expected {expected_status}")
+        
+        for client_id in client_ids:
+            joins = outcomes["joins"].get((round_id, client_id), 0)
+            uploads = outcomes["uploads"].get((round_id, client_id), 0)
+            if joins > 1 or uploads > 1:
+                errors.append(f"Client {client_id} joined {joins} / uploaded {uploads} times to round {round_id}")
+            if (uploads == 1) != (client_id in completed):
+                errors.append(f"Upload of client {client_id} to round {round_id} lost or invented")
+            participated[client_id] += uploads
+        
+        # The persisted state must match memory
+        replayed = RoundJournal.replay(os.path.join(rounds_dir, round_id))
+        if replayed is None:
+            errors.append(f"Round {round_id} has no snapshot")
+            continue
+        journal, replayed_info = replayed
+        journal.close()
+        if replayed_info["status"] != round_info["status"] or any(
+            replayed_info["clients"][client_id]["status"] != client_info["status"]
+            for client_id, client_info in round_info["clients"].items()
+        ):
+            errors.append(f"Journal of round {round_id} does not match memory")
+    
+    for client_id in client_ids:
+        rounds_participated = server.registered_clients[client_id]["rounds_participated"]
+        if rounds_participated != participated[client_id]:
+            errors.append(f"Client {client_id} counted {rounds_participated} rounds, expected {participated[client_id]}")
+    
+    return errors
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Stress the server with concurrent simulated clients")
+    parser.add_argument("--clients", type=int, default=300, help="Number of concurrent client threads")
+    parser.add_argument("--rounds", type=int, default=8, help="Number of concurrently running rounds")
+    parser.add_argument("--round_timeout", type=float, default=2.0, help="Round timeout in seconds")
+    parser.add_argument("--max_delay", type=float, default=0.3, help="Maximum simulated training time in seconds")
+    parser.add_argument("--racers", type=int, default=4, help="Threads racing to finish rounds early")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    # Per-request logging would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("FL_Server", "FL_Aggregator", "FL_Registry", "FL_RoundJournal"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    
+    result = run_stress(args.clients, args.rounds, args.round_timeout, args.max_delay, args.racers)
+    
+    print(f"{result['requests']} requests from {result['num_clients']} clients over {result['num_rounds']} rounds "
+          f"in {result['elapsed_s']:.2f}s ({result['requests_per_s']:.0f} requests/s)")
+    for error in result["errors"]:
+        print(f"FAILED: {error}")
+    if not result["errors"]:
+        print("All invariants held")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    
+    if result["errors"]:
+        raise SystemExit(1)
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import logging
+import tempfile
+from typing import Dict, List, Any
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import Dataset
+
+from federated_learning.client.dataset_cache import DatasetCache
+from federated_learning.client.local_training import load_dataset, train_state_dict
+from federated_learning.common.model_factory import register_model, create_model
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+MODEL_TYPE = "benchmark_dataset_cache"
+
+# Leads and time steps of the synthetic recordings: 10 s of 12-lead ECG at 250 Hz
+NUM_LEADS = 12
+NUM_STEPS = 2500
+
+
+class CustomDataset(Dataset):
+    """ECG-like recordings, one CSV file per sample in a directory per class, normalized per lead on read."""
+    
+    def __init__(self, data_path: str, train: bool = True):
+        self.data_path = data_path
+        self.files = sorted(
+            os.path.join(label, name)
+            for label in os.listdir(data_path) if os.path.isdir(os.path.join(data_path, label))
+            for name in os.listdir(os.path.join(data_path, label))
+        )
+    
+    def __len__(self) -> int:
+        return len(self.files)
+    
+    def source_file(self, index: int) -> str:
+        return self.files[index]
+    
+    def __getitem__(self, index: int):
+        signal = np.loadtxt(os.path.join(self.data_path, self.files[index]), delimiter=",", dtype=np.float32)
+        signal = (signal - signal.mean(axis=1, keepdims=True)) / (signal.std(axis=1, keepdims=True) + 1e-6)
+        return torch.from_numpy(signal), int(os.path.dirname(self.files[index]))
+
+
+class BenchmarkCNN(nn.Module):
+    """Small 1D convolutional classifier over the recordings."""
+    
+    def __init__(self):
+        super().__init__()
+        self.features = nn.Sequential(
+            nn.Conv1d(NUM_LEADS, 16, kernel_size=7, stride=2), nn.ReLU(),
+            nn.Conv1d(16, 32, kernel_size=7, stride=2), nn.ReLU(),
+            nn.AdaptiveAvgPool1d(1)
+        )
+        self.classifier = nn.Linear(32, 2)
+    
+    def forward(self, x):
+        return self.classifier(self.features(x).flatten(1))
+
+
+def _register_model_type(epochs: int, batch_size: int) -> None:
+    """Make the synthetic model, dataset and hyperparameters loadable under MODEL_TYPE."""
+    register_model(MODEL_TYPE, BenchmarkCNN)
+    
+    # Local training imports `federated_learning.models.<type>.dataset` and `.hyperparams`
+    dataset_module = types.ModuleType(f"federated_learning.models.{MODEL_TYPE}.dataset")
+    dataset_module.CustomDataset = CustomDataset
+    hyperparams_module = types.ModuleType(f"federated_learning.models.{MODEL_TYPE}.hyperparams")
+    hyperparams_module.HYPERPARAMS = {"epochs": epochs, "batch_size": batch_size}
+    sys.modules[dataset_module.__name__] = dataset_module
+    sys.modules[hyperparams_module.__name__] = hyperparams_module
+
+
+def _write_recordings(data_path: str, start: int, count: int) -> None:
+    """Write `count` recordings as CSV files, numbered from `start`."""
+    rng = np.random.default_rng(start)
+    for index in range(start, start + count):
+        label = str(index % 2)
+        os.makedirs(os.path.join(data_path, label), exist_ok=True)
+        signal = rng.standard_normal((NUM_LEADS, NUM_STEPS)).astype(np.float32)
+        np.savetxt(os.path.join(data_path, label, f"recording_{index:06d}.csv"), signal, delimiter=",", fmt="%.5f")
+
+
+def run_rounds(mode: str, data_path: str, cache_dir: str, rounds: int, grow: int) -> List[Dict[str, Any]]:
+    """
+    Run `rounds` rounds of local training, loading the dataset the way `mode` does.
+    
+    Before the last round `grow` recordings are added, as when a hospital's data grows between rounds.
+    """
+    cache = DatasetCache(cache_dir) if mode == "cached" else None
+    state_dict = create_model(MODEL_TYPE).state_dict()
+    num_samples = len(CustomDataset(data_path))
+    rows = []
+    
+    for round_number in range(1, rounds + 1):
+        if round_number == rounds and grow:
+            _write_recordings(data_path, num_samples, grow)
+        
+        start = time.perf_counter()
+        dataset = load_dataset(MODEL_TYPE, data_path, cache)
+        load_s = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        state_dict, _, _ = train_state_dict(state_dict, dataset, MODEL_TYPE, device="cpu")
+        train_s = time.perf_counter() - start
+        
+        rows.append({
+            "mode": mode,
+            "round": round_number,
+            "samples": len(dataset),
+            "load_s": load_s,
+            "epoch_s": train_s,
+            "round_s": load_s + train_s
+        })
+        logger.info(f"{mode} round {round_number}: load {load_s:.2f}s, epoch {train_s:.2f}s ({len(dataset)} samples)")
+    
+    # Leave the data as the next mode expects to find it
+    if grow:
+        for index in range(num_samples, num_samples + grow):
+            os.remove(os.path.join(data_path, str(index % 2), f"recording_{index:06d}.csv"))
+    
+    return rows
+
+
+def run_benchmark(num_samples: int, rounds: int, grow: int, batch_size: int, modes: List[str]) -> List[Dict[str, Any]]:
+    """Time the rounds of local training of each mode over the same recordings."""
+    _register_model_type(epochs=1, batch_size=batch_size)
+    work_dir = tempfile.mkdtemp(prefix="fl_dataset_cache_bench_")
+    data_path = os.path.join(work_dir, "data")
+    
+    try:
+        _write_recordings(data_path, 0, num_samples)
+        
+        results = []
+        for mode in modes:
+            results.extend(run_rounds(mode, data_path, os.path.join(work_dir, "cache"), rounds, grow))
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Local training round time, decoding raw files every round vs the dataset cache")
+    parser.add_argument("--samples", type=int, default=1000, help="Number of recordings")
+    parser.add_argument("--rounds", type=int, default=4, help="Rounds of one local epoch")
+    parser.add_argument("--grow", type=int, default=50, help="Recordings added before the last round")
+    parser.add_argument("--batch_size", type=int, default=32, help="Training batch size")
+    parser.add_argument("--modes", type=str, nargs="+", default=["raw", "cached"], choices=["raw", "cached"])
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.samples, args.rounds, args.grow, args.batch_size, args.modes)
+    
+    print(f"{'mode':>7} {'round':>6} {'samples':>8} {'load s':>8} {'epoch s':>8} {'round s':>8}")
+    for row in results:
+        print(f"{row['mode']:>7} {row['round']:>6} {row['samples']:>8} "
+              f"{row['load_s']:>8.2f} {row['epoch_s']:>8.2f} {row['round_s']:>8.2f}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,180 @@
+import io
+import os
+import time
+import json
+import logging
+import tempfile
+from typing import Dict, List, Any, Optional
+
+import torch
+
+from federated_learning.benchmarks.aggregation import make_state_dict
+from federated_learning.common.delta import encode_delta, is_averaged_parameter
+from federated_learning.common.flat import load_state_dict_file
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+# (name, update format, top_k, bits)
+VARIANTS = [
+    ("full", "full", None, None),
+    ("delta", "delta", None, None),
+    ("delta_top1%", "delta", 0.01, None),
+    ("delta_int8", "delta", None, 8),
+    ("delta_top1%_int8", "delta", 0.01, 8)
+]
+
+
+def _serialized_size(obj: Any) -> int:
+    """Size in bytes of an object as written by torch.save."""
+    buffer = io.BytesIO()
+    torch.save(obj, buffer)
+    return buffer.tell()
+
+
+def make_client_models(base: Dict[str, torch.Tensor], num_clients: int, noise: float) -> List[Dict[str, torch.Tensor]]:
+    """Simulate local training as a small perturbation of the global model per client."""
+    generator = torch.Generator().manual_seed(0)
+    clients = []
+    for _ in range(num_clients):
+        clients.append({
+            key: tensor + noise * torch.randn(tensor.shape, generator=generator)
+            if is_averaged_parameter(key, tensor) else tensor.clone()
+            for key, tensor in base.items()
+        })
+    return clients
+
+
+def _relative_error(result: Dict[str, torch.Tensor], exact: Dict[str, torch.Tensor], base: Dict[str, torch.Tensor]) -> float:
+    """Error of an aggregate relative to the size of the exact averaged update."""
+    error = 0.0
+    update = 0.0
+    for key, tensor in exact.items():
+        if not is_averaged_parameter(key, tensor):
+            continue
+        error += (result[key] - tensor).pow(2).sum().item()
+        update += (tensor - base[key]).pow(2).sum().item()
+    return (error / update) ** 0.5 if update else 0.0
+
+
+def run_variant(
+    work_dir: str,
+    base_path: str,
+    clients: List[Dict[str, torch.Tensor]],
+    exact: Dict[str, torch.Tensor],
+    update_format: str,
+    top_k: Optional[float],
+    bits: Optional[int]
+) -> Dict[str, Any]:
+    """Encode every client's update in one format, aggregate them, and compare against exact FedAvg."""
+    from federated_learning.server.aggregator import ModelAggregator
+    
+    base = load_state_dict_file(base_path)
+    weights = [float(i + 1) for i in range(len(clients))]
+    
+    paths = []
+    sizes = []
+    encode_time = 0.0
+    for i, state_dict in enumerate(clients):
+        start = time.perf_counter()
+        if update_format == "delta":
+            update, _ = encode_delta(state_dict, base, top_k=top_k, bits=bits)
+        else:
+            update = state_dict
+        encode_time += time.perf_counter() - start
+        
+        path = os.path.join(work_dir, f"client_{i}_update.pt")
+        torch.save(update, path)
+        paths.append(path)
+        sizes.append(os.path.getsize(path))
+    
+    aggregator = ModelAggregator("benchmark")
+    output_path = os.path.join(work_dir, "aggregated.pt")
+    
+    start = time.perf_counter()
+    aggregator.aggregate_models(
+        model_paths=paths,
+        weights=weights,
+        strategy="fedavg",
+        output_path=output_path,
+        base_path=base_path if update_format == "delta" else None
+    )
+    aggregate_time = time.perf_counter() - start
+    
+    return {
+        "bytes_per_client": sum(sizes) / len(sizes),
+        "encode_ms_per_client": 1000 * encode_time / len(clients),
+        "aggregate_s": aggregate_time,
+        "relative_error": _relative_error(load_state_dict_file(output_path), exact, base)
+    }
+
+
+def run_benchmark(num_params: int, num_clients: int, noise: float) -> List[Dict[str, Any]]:
+    """
+    Compare bytes on the wire, encode time, aggregation time and accuracy of each update format.
+    
+    Args:
+        num_params: Number of model parameters
+        num_clients: Number of simulated clients
+        noise: Standard deviation of the simulated local update
+    
+    Returns:
+        One result row per variant
+    """
+    torch.manual_seed(0)
+    base = make_state_dict(num_params)
+    clients = make_client_models(base, num_clients, noise)
+    
+    # Exact weighted FedAvg of the full models
+    weights = [float(i + 1) for i in range(num_clients)]
+    total = sum(weights)
+    exact = {
+        key: sum(w / total * c[key] for w, c in zip(weights, clients)) if is_averaged_parameter(key, tensor) else tensor
+        for key, tensor in base.items()
+    }
+    full_size = _serialized_size(base)
+    
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        base_path = os.path.join(work_dir, "global_model.pt")
+        torch.save(base, base_path)
+        
+        for name, update_format, top_k, bits in VARIANTS:
+            row = run_variant(work_dir, base_path, clients, exact, update_format, top_k, bits)
+            row["variant"] = name
+            row["compression"] = full_size / row["bytes_per_client"]
+            results.append(row)
+            logger.info(
+                f"{name}: {row['bytes_per_client'] / 1024 / 1024:.2f} MB/client "
+                f"({row['compression']:.1f}x), error {row['relative_error']:.4f}"
+            )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark full vs delta-compressed client updates")
+    parser.add_argument("--params", type=int, default=4_000_000, help="Number of model parameters")
+    parser.add_argument("--clients", type=int, default=8, help="Number of simulated clients")
+    parser.add_argument("--noise", type=float, default=1e-3, help="Standard deviation of the simulated local update")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    logging.getLogger("FL_Aggregator").setLevel(logging.WARNING)
+    results = run_benchmark(args.params, args.clients, args.noise)
+    
+    print(f"{'variant':>18} {'MB/client':>10} {'ratio':>7} {'encode ms':>10} {'aggregate s':>12} {'rel. error':>11}")
+    for row in results:
+        print(f"{row['variant']:>18} {row['bytes_per_client'] / 1024 / 1024:>10.2f} {row['compression']:>7.1f} "
+              f"{row['encode_ms_per_client']:>10.1f} {row['aggregate_s']:>12.3f} {row['relative_error']:>11.4f}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
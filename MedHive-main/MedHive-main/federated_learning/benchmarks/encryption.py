@@ -0,0 +1,147 @@
+import os
+import time
+import base64
+import json
+import shutil
+import logging
+import tempfile
+import tracemalloc
+from typing import Dict, List, Any
+
+from cryptography.fernet import Fernet
+
+from federated_learning.common.encrypted_stream import CIPHERS, derive_stream_key, encrypt_file, decrypt_file
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+# Bytes written at a time when creating the synthetic models
+WRITE_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def _fernet_encrypt_file(cipher: Fernet, src_path: str, dst_path: str) -> None:
+    """Encrypt the way `encrypt_model` used to: the whole file as one Fernet token."""
+    with open(src_path, "rb") as f:
+        data = f.read()
+    with open(dst_path, "wb") as f:
+        f.write(cipher.encrypt(data))
+
+
+def _fernet_decrypt_file(cipher: Fernet, src_path: str, dst_path: str) -> None:
+    """Decrypt the way `decrypt_model` used to."""
+    with open(src_path, "rb") as f:
+        data = f.read()
+    with open(dst_path, "wb") as f:
+        f.write(cipher.decrypt(data))
+
+
+def _measure(func) -> Dict[str, float]:
+    """Wall time and peak Python heap allocation of `func()`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": elapsed, "peak_mb": peak / 2 ** 20}
+
+
+def run_benchmark(sizes_mb: List[int], frame_size: int) -> List[Dict[str, Any]]:
+    """
+    Compare whole-buffer Fernet against the streamed AEAD format for model files.
+    
+    Args:
+        sizes_mb: Model file sizes in MB
+        frame_size: Plaintext bytes per frame of the streamed format
+    
+    Returns:
+        One result row per size and scheme
+    """
+    fernet_key = Fernet.generate_key()
+    fernet = Fernet(fernet_key)
+    stream_key = derive_stream_key(base64.urlsafe_b64decode(fernet_key))
+    
+    schemes = {"fernet": (
+        lambda src, dst: _fernet_encrypt_file(fernet, src, dst),
+        lambda src, dst: _fernet_decrypt_file(fernet, src, dst)
+    )}
+    for cipher in CIPHERS:
+        schemes[cipher] = (
+            lambda src, dst, cipher=cipher: encrypt_file(stream_key, src, dst, cipher=cipher, frame_size=frame_size),
+            lambda src, dst: decrypt_file(stream_key, src, dst)
+        )
+    
+    results = []
+    tmp_dir = tempfile.mkdtemp(prefix="fl_encryption_")
+    try:
+        for size_mb in sizes_mb:
+            plain_path = os.path.join(tmp_dir, "model.pt")
+            with open(plain_path, "wb") as f:
+                remaining = size_mb * 2 ** 20
+                while remaining > 0:
+                    n = min(WRITE_CHUNK_SIZE, remaining)
+                    f.write(os.urandom(n))
+                    remaining -= n
+            
+            encrypted_path = os.path.join(tmp_dir, "model.pt.encrypted")
+            decrypted_path = os.path.join(tmp_dir, "model.decrypted.pt")
+            
+            for scheme, (encrypt, decrypt) in schemes.items():
+                encrypted = _measure(lambda: encrypt(plain_path, encrypted_path))
+                decrypted = _measure(lambda: decrypt(encrypted_path, decrypted_path))
+                
+                if os.path.getsize(decrypted_path) != os.path.getsize(plain_path):
+                    raise RuntimeError(f"{scheme} did not round-trip")
+                
+                row = {
+                    "size_mb": size_mb,
+                    "scheme": scheme,
+                    "encrypt_mb_per_s": size_mb / encrypted["seconds"],
+                    "decrypt_mb_per_s": size_mb / decrypted["seconds"],
+                    "encrypt_peak_mb": encrypted["peak_mb"],
+                    "decrypt_peak_mb": decrypted["peak_mb"],
+                    "overhead_pct": 100 * (os.path.getsize(encrypted_path) / os.path.getsize(plain_path) - 1)
+                }
+                results.append(row)
+                logger.info(
+                    f"{size_mb} MB {scheme}: encrypt {row['encrypt_mb_per_s']:.0f} MB/s (peak {row['encrypt_peak_mb']:.1f} MB), "
+                    f"decrypt {row['decrypt_mb_per_s']:.0f} MB/s (peak {row['decrypt_peak_mb']:.1f} MB), "
+                    f"+{row['overhead_pct']:.2f}% size"
+                )
+                
+                os.remove(encrypted_path)
+                os.remove(decrypted_path)
+            
+            os.remove(plain_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark model file encryption: whole-buffer Fernet vs streamed AEAD")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[45, 200], help="Model file sizes in MB")
+    parser.add_argument("--frame_size", type=int, default=1024 * 1024, help="Plaintext bytes per frame")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.sizes, args.frame_size)
+    
+    print(f"{'MB':>6} {'scheme':>18} {'enc MB/s':>9} {'dec MB/s':>9} {'enc peak MB':>12} {'dec peak MB':>12} {'size +%':>8}")
+    for row in results:
+        print(
+            f"{row['size_mb']:>6} {row['scheme']:>18} {row['encrypt_mb_per_s']:>9.0f} {row['decrypt_mb_per_s']:>9.0f} "
+            f"{row['encrypt_peak_mb']:>12.1f} {row['decrypt_peak_mb']:>12.1f} {row['overhead_pct']:>8.2f}"
+        )
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,182 @@
+import os
+import time
+import json
+import zlib
+import shutil
+import logging
+import tempfile
+from typing import Dict, Any, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset
+
+from federated_learning.common.flat import save_flat
+from federated_learning.common.model_factory import register_model, create_model
+from federated_learning.server.evaluation import EvaluationService
+from federated_learning.server.test_set_cache import CachedTestSet
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+MODEL_TYPE = "benchmark_evaluation"
+
+
+class CompressedImageDataset(Dataset):
+    """Test images stored as one zlib-compressed uint8 file per sample, decoded like `ToTensor` on every access."""
+    
+    def __init__(self, data_path: str, train: bool = False):
+        self.files = sorted(os.path.join(data_path, name) for name in os.listdir(data_path) if name.endswith(".z"))
+        with open(os.path.join(data_path, "shape.json"), "r") as f:
+            self.shape = tuple(json.load(f))
+    
+    def __len__(self) -> int:
+        return len(self.files)
+    
+    def __getitem__(self, index: int):
+        with open(self.files[index], "rb") as f:
+            raw = zlib.decompress(f.read())
+        label = raw[0]
+        image = np.frombuffer(raw, dtype=np.uint8, offset=1).reshape(self.shape)
+        return torch.from_numpy(image.copy()).float().div(255), label
+
+
+class BenchmarkCNN(nn.Module):
+    """Small image classifier."""
+    
+    def __init__(self):
+        super().__init__()
+        self.features = nn.Sequential(
+            nn.Conv2d(1, 16, 3, padding=1), nn.ReLU(), nn.MaxPool2d(2),
+            nn.Conv2d(16, 32, 3, padding=1), nn.ReLU(), nn.MaxPool2d(2)
+        )
+        self.classifier = nn.Linear(32, 2)
+    
+    def forward(self, x):
+        return self.classifier(self.features(x).mean(dim=(2, 3)))
+
+
+def write_test_set(data_path: str, num_samples: int, size: int) -> None:
+    """Write a synthetic grayscale test set of smooth random images."""
+    os.makedirs(data_path, exist_ok=True)
+    rng = np.random.default_rng(0)
+    
+    with open(os.path.join(data_path, "shape.json"), "w") as f:
+        json.dump([1, size, size], f)
+    
+    for i in range(num_samples):
+        coarse = rng.integers(0, 256, (1, size // 8, size // 8), dtype=np.uint8)
+        image = np.repeat(np.repeat(coarse, 8, axis=1), 8, axis=2)
+        raw = bytes([int(rng.integers(0, 2))]) + image.tobytes()
+        with open(os.path.join(data_path, f"{i:06d}.z"), "wb") as f:
+            f.write(zlib.compress(raw))
+
+
+def run_benchmark(num_samples: int, size: int, rounds: int, batch_size: Optional[int], precision: str) -> Dict[str, Any]:
+    """
+    Time evaluation of a model over several rounds with and without the test set cache.
+    
+    Args:
+        num_samples: Number of test images
+        size: Image height and width
+        rounds: Number of evaluations with the cache
+        batch_size: Samples per forward pass (default: chosen by the evaluation service)
+        precision: Inference precision of the evaluation service
+    
+    Returns:
+        Benchmark results
+    """
+    work_dir = tempfile.mkdtemp(prefix="fl_eval_bench_")
+    
+    try:
+        data_path = os.path.join(work_dir, "test")
+        write_test_set(data_path, num_samples, size)
+        
+        register_model(MODEL_TYPE, BenchmarkCNN)
+        model_path = save_flat(create_model(MODEL_TYPE).state_dict(), os.path.join(work_dir, "model.pt"))
+        dataset = CompressedImageDataset(data_path)
+        model = create_model(MODEL_TYPE).eval()
+        
+        # Uncached: decode every sample, as each round did before the cache
+        start = time.perf_counter()
+        with torch.inference_mode():
+            for inputs, _ in DataLoader(dataset, batch_size=32):
+                model(inputs)
+        uncached_s = time.perf_counter() - start
+        
+        service = EvaluationService(
+            num_workers=1, cache_dir=os.path.join(work_dir, "cache"), batch_size=batch_size, precision=precision
+        )
+        
+        start = time.perf_counter()
+        cache_path = service.cache.get(MODEL_TYPE, data_path, dataset=dataset)
+        build_s = time.perf_counter() - start
+        
+        cached_s = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            metrics = service.evaluate(MODEL_TYPE, model_path, data_path)
+            cached_s.append(time.perf_counter() - start)
+        batch_size = metrics["inference"]["batch_size"]
+        
+        # Forward passes alone over tensors already in memory
+        test_set = CachedTestSet(cache_path)
+        batches = [test_set.batch(i, min(i + batch_size, num_samples))[0] for i in range(0, num_samples, batch_size)]
+        start = time.perf_counter()
+        with torch.inference_mode():
+            for inputs in batches:
+                model(inputs)
+        forward_s = time.perf_counter() - start
+        
+        cache_bytes = sum(
+            os.path.getsize(os.path.join(cache_path, name)) for name in os.listdir(cache_path)
+        )
+        service.shutdown(wait=True)
+        
+        return {
+            "num_samples": num_samples,
+            "input_dtype": test_set.meta["inputs"]["dtype"],
+            "cache_mb": cache_bytes / 1e6,
+            "float32_mb": num_samples * size * size * 4 / 1e6,
+            "uncached_round_s": uncached_s,
+            "cache_build_s": build_s,
+            "cached_round_s": float(np.median(cached_s)),
+            "forward_only_s": forward_s,
+            "precision": metrics["inference"]["precision"],
+            "batch_size": batch_size,
+            "ms_per_batch": metrics["inference"]["ms_per_batch"],
+            "samples_per_s": metrics["inference"]["samples_per_s"],
+            "cross_check": metrics.get("cross_check")
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark server-side evaluation with the preprocessed test set cache")
+    parser.add_argument("--samples", type=int, default=2000, help="Number of test images")
+    parser.add_argument("--size", type=int, default=64, help="Image height and width")
+    parser.add_argument("--rounds", type=int, default=3, help="Number of cached evaluations")
+    parser.add_argument("--batch_size", type=int, help="Samples per forward pass (default: adaptive)")
+    parser.add_argument("--precision", type=str, default="auto", choices=["auto", "float32", "bfloat16", "int8"], help="Inference precision")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.samples, args.size, args.rounds, args.batch_size, args.precision)
+    
+    for key, value in results.items():
+        if isinstance(value, dict):
+            value = json.dumps(value)
+        print(f"{key:>18}: {value:.3f}" if isinstance(value, float) else f"{key:>18}: {value}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
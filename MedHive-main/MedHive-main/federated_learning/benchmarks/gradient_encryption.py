@@ -0,0 +1,152 @@
+import io
+import os
+import time
+import json
+import base64
+import shutil
+import logging
+import tempfile
+from typing import Dict, List, Any
+
+import torch
+from cryptography.fernet import Fernet
+
+import federated_learning.client.encryption as encryption
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+def make_gradients(num_layers: int, width: int) -> Dict[str, torch.Tensor]:
+    """Gradients of a synthetic network with a weight, bias and norm scale per layer."""
+    gradients = {}
+    for i in range(num_layers):
+        gradients[f"layers.{i}.weight"] = torch.randn(width, width)
+        gradients[f"layers.{i}.bias"] = torch.randn(width)
+        gradients[f"layers.{i}.norm.weight"] = torch.randn(width)
+    return gradients
+
+
+def _legacy_encrypt_gradients(gradients: Dict[str, torch.Tensor]) -> Dict[str, Any]:
+    """Encrypt the way `encrypt_gradients` used to: a pickle, a Fernet token read from disk and base64 per tensor."""
+    encrypted = {}
+    for name, grad in gradients.items():
+        buffer = io.BytesIO()
+        torch.save(grad, buffer)
+        with open(encryption.KEY_PATH, "rb") as f:
+            cipher = Fernet(f.read())
+        encrypted[name] = {
+            "data": base64.b64encode(cipher.encrypt(buffer.getvalue())).decode("utf-8"),
+            "metadata": {"shape": list(grad.shape), "dtype": str(grad.dtype), "device": str(grad.device)}
+        }
+    return encrypted
+
+
+def _legacy_decrypt_gradients(encrypted: Dict[str, Any]) -> Dict[str, torch.Tensor]:
+    """Decrypt the way `decrypt_gradients` used to."""
+    gradients = {}
+    for name, item in encrypted.items():
+        with open(encryption.KEY_PATH, "rb") as f:
+            cipher = Fernet(f.read())
+        gradients[name] = torch.load(io.BytesIO(cipher.decrypt(base64.b64decode(item["data"]))))
+    return gradients
+
+
+def _time(func, repeats: int):
+    """Mean wall time in seconds and the last result of `func()`."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def run_benchmark(layer_counts: List[int], width: int, repeats: int) -> List[Dict[str, Any]]:
+    """
+    Compare per-tensor Fernet gradient encryption against the packed envelope.
+    
+    Args:
+        layer_counts: Numbers of layers of the synthetic networks
+        width: Layer width; each layer has width^2 + 2 * width parameters
+        repeats: Timed repetitions per measurement
+    
+    Returns:
+        One result row per layer count
+    """
+    # Create the key file the legacy path reads
+    encryption._get_encryption_key()
+    
+    results = []
+    
+    for num_layers in layer_counts:
+        gradients = make_gradients(num_layers, width)
+        size_mb = sum(g.numel() * g.element_size() for g in gradients.values()) / 2 ** 20
+        
+        legacy_encrypt_s, legacy = _time(lambda: _legacy_encrypt_gradients(gradients), repeats)
+        legacy_decrypt_s, restored = _time(lambda: _legacy_decrypt_gradients(legacy), repeats)
+        legacy_bytes = len(json.dumps(legacy))
+        
+        packed_encrypt_s, envelope = _time(lambda: encryption.encrypt_gradients(gradients), repeats)
+        packed_decrypt_s, unpacked = _time(lambda: encryption.decrypt_gradients(envelope), repeats)
+        
+        for name, grad in gradients.items():
+            if not (torch.equal(restored[name], grad) and torch.equal(unpacked[name], grad)):
+                raise RuntimeError(f"Gradient {name} did not round-trip")
+        
+        row = {
+            "tensors": len(gradients),
+            "size_mb": size_mb,
+            "legacy_encrypt_mb_per_s": size_mb / legacy_encrypt_s,
+            "legacy_decrypt_mb_per_s": size_mb / legacy_decrypt_s,
+            "legacy_wire_mb": legacy_bytes / 2 ** 20,
+            "packed_encrypt_mb_per_s": size_mb / packed_encrypt_s,
+            "packed_decrypt_mb_per_s": size_mb / packed_decrypt_s,
+            "packed_wire_mb": len(envelope) / 2 ** 20
+        }
+        results.append(row)
+        logger.info(
+            f"{len(gradients)} tensors, {size_mb:.1f} MB: per-tensor Fernet {row['legacy_encrypt_mb_per_s']:.0f}/"
+            f"{row['legacy_decrypt_mb_per_s']:.0f} MB/s, packed {row['packed_encrypt_mb_per_s']:.0f}/"
+            f"{row['packed_decrypt_mb_per_s']:.0f} MB/s (encrypt/decrypt)"
+        )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark gradient encryption: per-tensor Fernet vs the packed envelope")
+    parser.add_argument("--layers", type=int, nargs="+", default=[50, 200], help="Numbers of layers")
+    parser.add_argument("--width", type=int, default=256, help="Layer width")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed repetitions per measurement")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    # Keep the benchmark's key away from the real one
+    key_dir = tempfile.mkdtemp(prefix="fl_gradient_encryption_")
+    encryption.KEY_PATH = os.path.join(key_dir, "encryption_key")
+    encryption.SALT_PATH = os.path.join(key_dir, "salt")
+    logging.getLogger("FL_Encryption").setLevel(logging.WARNING)
+    
+    try:
+        results = run_benchmark(args.layers, args.width, args.repeats)
+    finally:
+        shutil.rmtree(key_dir, ignore_errors=True)
+    
+    print(f"{'tensors':>8} {'MB':>7} {'before enc':>11} {'before dec':>11} {'before wire':>12} {'after enc':>10} {'after dec':>10} {'after wire':>11}")
+    for row in results:
+        print(
+            f"{row['tensors']:>8} {row['size_mb']:>7.1f} {row['legacy_encrypt_mb_per_s']:>11.0f} {row['legacy_decrypt_mb_per_s']:>11.0f} "
+            f"{row['legacy_wire_mb']:>12.1f} {row['packed_encrypt_mb_per_s']:>10.0f} {row['packed_decrypt_mb_per_s']:>10.0f} "
+            f"{row['packed_wire_mb']:>11.1f}"
+        )
+    print("(MB/s; wire sizes in MB)")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
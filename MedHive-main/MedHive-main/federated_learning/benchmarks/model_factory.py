@@ -0,0 +1,108 @@
+import time
+import json
+import logging
+from typing import Dict, List, Any
+
+import torch.nn as nn
+
+from federated_learning.common.model_factory import register_model, create_model, load_model_weights
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+def make_cnn_class(width: int, depth: int) -> type:
+    """Build a VGG-style CNN class whose parameter count grows with `width` squared times `depth`."""
+    class BenchmarkCNN(nn.Module):
+        def __init__(self):
+            super().__init__()
+            layers = [nn.Conv2d(3, width, 3, padding=1), nn.BatchNorm2d(width), nn.ReLU()]
+            for _ in range(depth - 1):
+                layers += [nn.Conv2d(width, width, 3, padding=1), nn.BatchNorm2d(width), nn.ReLU()]
+            self.features = nn.Sequential(*layers)
+            self.classifier = nn.Linear(width, 10)
+        
+        def forward(self, x):
+            return self.classifier(self.features(x).mean(dim=(2, 3)))
+    
+    return BenchmarkCNN
+
+
+def _time(func, repeats: int) -> float:
+    """Mean wall time of `func()` in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return 1000 * (time.perf_counter() - start) / repeats
+
+
+def run_benchmark(widths: List[int], depth: int, repeats: int) -> List[Dict[str, Any]]:
+    """
+    Compare building a model with weight initialization against cloning the cached meta-device template.
+    
+    Args:
+        widths: Channel widths of the synthetic CNNs
+        depth: Number of conv layers
+        repeats: Timed repetitions per measurement
+    
+    Returns:
+        One result row per width
+    """
+    results = []
+    
+    for width in widths:
+        model_type = f"benchmark_cnn_{width}"
+        model_class = make_cnn_class(width, depth)
+        register_model(model_type, model_class)
+        
+        state_dict = model_class().state_dict()
+        num_params = sum(t.numel() for t in state_dict.values())
+        
+        def fresh():
+            model = model_class()
+            model.load_state_dict(state_dict)
+        
+        # Build the template outside the timed region
+        create_model(model_type, initialize=False)
+        
+        row = {
+            "width": width,
+            "num_params": num_params,
+            "init_and_load_ms": _time(fresh, repeats),
+            "cached_load_ms": _time(lambda: load_model_weights(model_type, state_dict), repeats)
+        }
+        row["speedup"] = row["init_and_load_ms"] / row["cached_load_ms"]
+        results.append(row)
+        
+        logger.info(
+            f"{num_params / 1e6:.1f}M params: init + load {row['init_and_load_ms']:.1f} ms, "
+            f"cached template + load {row['cached_load_ms']:.1f} ms ({row['speedup']:.1f}x)"
+        )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark the cached model factory against fresh model construction")
+    parser.add_argument("--widths", type=int, nargs="+", default=[128, 256, 512], help="Channel widths of the synthetic CNN")
+    parser.add_argument("--depth", type=int, default=12, help="Number of conv layers")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per measurement")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.widths, args.depth, args.repeats)
+    
+    print(f"{'params':>10} {'init + load ms':>15} {'cached ms':>10} {'speedup':>8}")
+    for row in results:
+        print(f"{row['num_params']:>10} {row['init_and_load_ms']:>15.1f} {row['cached_load_ms']:>10.1f} {row['speedup']:>8.1f}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
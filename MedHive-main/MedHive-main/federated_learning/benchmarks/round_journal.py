@@ -0,0 +1,119 @@
+import os
+import time
+import json
+import logging
+import tempfile
+from typing import Dict, List, Any
+
+import torch
+
+from federated_learning.server.server import FederatedLearningServer
+from federated_learning.common.flat import save_flat
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+def run_round(num_clients: int, snapshot_interval: int) -> Dict[str, Any]:
+    """
+    Drive one round with `num_clients` clients and time the join and upload phases.
+    
+    Args:
+        num_clients: Number of clients invited to the round
+        snapshot_interval: Journal events between compacted snapshots
+        
+    Returns:
+        Result row with throughput of each phase
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        server = FederatedLearningServer(
+            models_dir=os.path.join(work_dir, "models"),
+            rounds_dir=os.path.join(work_dir, "rounds"),
+            init_security=False,
+            snapshot_interval=snapshot_interval
+        )
+        
+        try:
+            client_ids = [f"hospital_{i}" for i in range(num_clients)]
+            for client_id in client_ids:
+                server.register_client(client_id, "benchmark", {"has_gpu": False})
+            
+            round_id = server.create_round(
+                model_id=1,
+                model_type="benchmark",
+                round_number=1,
+                min_clients=1,
+                max_clients=num_clients,
+                aggregation_strategy="fedavg",
+                round_timeout=24 * 3600
+            )["round_id"]
+            server.select_clients_for_round(round_id)
+            server.start_round(round_id)
+            
+            # A tiny stand-in for the uploaded model so file copies do not dominate
+            model_path = os.path.join(work_dir, "upload.pt")
+            save_flat({"weight": torch.zeros(256)}, model_path)
+            
+            start = time.perf_counter()
+            for client_id in client_ids:
+                server.client_join_round(round_id, client_id)
+            join_time = time.perf_counter() - start
+            
+            # Leave the last client out so the round is not finished during the measurement
+            start = time.perf_counter()
+            for client_id in client_ids[:-1]:
+                server.upload_client_model(round_id, client_id, model_path, {"data_size": 100})
+            upload_time = time.perf_counter() - start
+        finally:
+            server.shutdown()
+    
+    uploads = max(num_clients - 1, 1)
+    return {
+        "num_clients": num_clients,
+        "join_per_s": num_clients / join_time,
+        "upload_per_s": uploads / upload_time if upload_time > 0 else float("inf"),
+        "join_time_s": join_time,
+        "upload_time_s": upload_time
+    }
+
+
+def run_benchmark(client_counts: List[int], snapshot_interval: int) -> List[Dict[str, Any]]:
+    """Run the round benchmark for each client count."""
+    results = []
+    for num_clients in client_counts:
+        row = run_round(num_clients, snapshot_interval)
+        results.append(row)
+        logger.info(
+            f"{num_clients} clients: {row['join_per_s']:.0f} joins/s, {row['upload_per_s']:.0f} uploads/s"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark join/upload throughput of the round journal")
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 1000, 10000], help="Client counts to benchmark")
+    parser.add_argument("--snapshot_interval", type=int, default=1000, help="Journal events between snapshots")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    # Per-request logging would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("FL_Server", "FL_Aggregator", "FL_RoundJournal"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    
+    results = run_benchmark(args.clients, args.snapshot_interval)
+    
+    print(f"{'clients':>8} {'joins/s':>10} {'uploads/s':>10}")
+    for row in results:
+        print(f"{row['num_clients']:>8} {row['join_per_s']:>10.0f} {row['upload_per_s']:>10.0f}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import tempfile
+import threading
+import multiprocessing
+from typing import Dict, List, Any
+
+from federated_learning.benchmarks.api_load import HTTPConnection
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+class _CountRequests:
+    """ASGI wrapper counting the HTTP requests the server receives."""
+    
+    def __init__(self, app: Any):
+        self.app = app
+        self.count = 0
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            self.count += 1
+        await self.app(scope, receive, send)
+
+
+def _serve(work_dir: str, port: int, num_clients: int, commands, replies) -> None:
+    """
+    Run an API server with `num_clients` clients invited to one round that is not started yet.
+    
+    Answers "count" on `commands` with the number of requests received so
+    far and "start" by starting the round and replying with its start time.
+    """
+    import uvicorn
+    from federated_learning.server.server import FederatedLearningServer
+    from federated_learning.server.api import create_app
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("FL_Server", "FL_Aggregator", "FL_Registry", "FL_RoundJournal", "FL_ModelStore"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    
+    server = FederatedLearningServer(
+        models_dir=os.path.join(work_dir, "models"),
+        rounds_dir=os.path.join(work_dir, "rounds"),
+        init_security=False
+    )
+    
+    for i in range(num_clients):
+        server.register_client(f"hospital_{i}", "benchmark", {"has_gpu": False})
+    
+    round_id = server.create_round(
+        model_id=1,
+        model_type="benchmark",
+        round_number=1,
+        min_clients=1,
+        max_clients=num_clients,
+        round_timeout=24 * 3600
+    )["round_id"]
+    server.select_clients_for_round(round_id)
+    
+    app = _CountRequests(create_app(server))
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error", backlog=4096)
+    uvicorn_server = uvicorn.Server(config)
+    
+    def answer_commands() -> None:
+        while True:
+            command = commands.get()
+            if command == "count":
+                replies.put(app.count)
+            elif command == "start":
+                start_time = time.time()
+                server.start_round(round_id)
+                replies.put(start_time)
+    
+    async def serve() -> None:
+        task = asyncio.ensure_future(uvicorn_server.serve())
+        while not uvicorn_server.started:
+            await asyncio.sleep(0.05)
+        threading.Thread(target=answer_commands, daemon=True).start()
+        replies.put("ready")
+        await task
+    
+    try:
+        asyncio.run(serve())
+    finally:
+        server.shutdown()
+
+
+async def _start_download(port: int, client_id: str) -> bool:
+    """Look up the client's round and fetch its chunk manifest, the first request of a model download."""
+    connection = HTTPConnection("127.0.0.1", port)
+    try:
+        _, rounds = await connection.request(
+            "GET", f"/api/federated-learning/available-rounds?client_id={client_id}&model_type=benchmark"
+        )
+        if not rounds.get("rounds"):
+            return False
+        
+        round_id = rounds["rounds"][0]["id"]
+        status_code, _ = await connection.request("GET", f"/api/federated-learning/rounds/{round_id}/model/chunks")
+        return status_code == 200
+    finally:
+        await connection.close()
+
+
+async def polling_client(client_id: str, port: int, poll_interval: float, downloads: Dict[str, float]) -> None:
+    """Check for rounds every `poll_interval` seconds, starting at a random phase, like the old client loop."""
+    await asyncio.sleep(random.uniform(0, poll_interval))
+    
+    while True:
+        try:
+            if await _start_download(port, client_id):
+                downloads[client_id] = time.time()
+                return
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        await asyncio.sleep(poll_interval)
+
+
+async def _read_events(reader: asyncio.StreamReader):
+    """Yield (event type, event ID) from a chunked server-sent event stream."""
+    buffer = ""
+    while True:
+        size = int((await reader.readline()).strip() or b"0", 16)
+        if size == 0:
+            return
+        buffer += (await reader.readexactly(size + 2))[:-2].decode()
+        
+        while "\n\n" in buffer:
+            block, buffer = buffer.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line and not line.startswith(":"))
+            yield fields.get("event"), fields.get("id")
+
+
+async def subscribed_client(client_id: str, port: int, downloads: Dict[str, float], connected: List[int]) -> None:
+    """Check for rounds once, then hold an event stream until the round starts, like the new client loop."""
+    connection = HTTPConnection("127.0.0.1", port)
+    _, rounds = await connection.request(
+        "GET", f"/api/federated-learning/available-rounds?client_id={client_id}&model_type=benchmark"
+    )
+    await connection.close()
+    cursor = rounds["events_cursor"]
+    first = True
+    
+    while True:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write((
+            f"GET /api/federated-learning/events?client_id={client_id}&model_type=benchmark HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{port}\r\n"
+            f"Last-Event-ID: {cursor}\r\n"
+            f"\r\n"
+        ).encode())
+        await writer.drain()
+        await reader.readuntil(b"\r\n\r\n")
+        if first:
+            connected[0] += 1
+            first = False
+        
+        started = False
+        async for event_type, event_id in _read_events(reader):
+            cursor = event_id or cursor
+            if event_type in ("round_started", "reset"):
+                started = True
+                break
+        writer.close()
+        
+        if started and await _start_download(port, client_id):
+            downloads[client_id] = time.time()
+            return
+
+
+async def run_mode(mode: str, num_clients: int, port: int, commands, replies, poll_interval: float, idle: float) -> Dict[str, Any]:
+    """Drive one server with polling or subscribed clients: measure idle requests/s, then start the round."""
+    downloads = {}
+    connected = [0]
+    
+    if mode == "polling":
+        tasks = [asyncio.ensure_future(polling_client(f"hospital_{i}", port, poll_interval, downloads)) for i in range(num_clients)]
+    else:
+        tasks = [asyncio.ensure_future(subscribed_client(f"hospital_{i}", port, downloads, connected)) for i in range(num_clients)]
+        while connected[0] < num_clients:
+            await asyncio.sleep(0.1)
+    
+    loop = asyncio.get_running_loop()
+    
+    async def ask(command: str) -> Any:
+        commands.put(command)
+        return await loop.run_in_executor(None, replies.get)
+    
+    # Let the connections settle, then count requests over the idle window
+    await asyncio.sleep(2.0)
+    idle_start = await ask("count")
+    await asyncio.sleep(idle)
+    idle_requests = await ask("count") - idle_start
+    
+    start_time = await ask("start")
+    deadline = time.time() + poll_interval + 30.0
+    while len(downloads) < num_clients and time.time() < deadline:
+        await asyncio.sleep(0.05)
+    
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    
+    latencies = sorted(t - start_time for t in downloads.values())
+    return {
+        "mode": mode,
+        "num_clients": num_clients,
+        "idle_requests_per_s": idle_requests / idle,
+        "downloads": len(latencies),
+        "first_download_s": latencies[0] if latencies else None,
+        "p50_download_s": latencies[len(latencies) // 2] if latencies else None,
+        "last_download_s": latencies[-1] if latencies else None
+    }
+
+
+def run_benchmark(num_clients: int, poll_interval: float, idle: float, modes: List[str]) -> List[Dict[str, Any]]:
+    """Start a fresh API server per mode and time how quickly its clients notice a started round."""
+    # Each subscribed client holds one socket
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+    
+    context = multiprocessing.get_context("spawn")
+    results = []
+    
+    for mode in modes:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        
+        with tempfile.TemporaryDirectory() as work_dir:
+            commands, replies = context.Queue(), context.Queue()
+            process = context.Process(target=_serve, args=(work_dir, port, num_clients, commands, replies))
+            process.start()
+            
+            try:
+                if replies.get(timeout=120) != "ready":
+                    raise RuntimeError("API server did not start")
+                row = asyncio.run(run_mode(mode, num_clients, port, commands, replies, poll_interval, idle))
+            finally:
+                process.terminate()
+                process.join()
+        
+        results.append(row)
+        logger.info(
+            f"{mode}: {row['idle_requests_per_s']:.2f} idle requests/s, first download after "
+            f"{row['first_download_s']:.3f}s, p50 {row['p50_download_s']:.3f}s, last {row['last_download_s']:.3f}s"
+        )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Time from start_round to client downloads, polling vs round events")
+    parser.add_argument("--clients", type=int, default=1000, help="Number of idle clients waiting for a round")
+    parser.add_argument("--poll_interval", type=float, default=60.0, help="Seconds between checks of a polling client")
+    parser.add_argument("--idle", type=float, default=60.0, help="Seconds over which idle requests/s are measured")
+    parser.add_argument("--modes", type=str, nargs="+", default=["polling", "events"], choices=["polling", "events"])
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.clients, args.poll_interval, args.idle, args.modes)
+    
+    print(f"{'mode':>8} {'idle req/s':>11} {'downloads':>10} {'first s':>8} {'p50 s':>8} {'last s':>8}")
+    for row in results:
+        print(f"{row['mode']:>8} {row['idle_requests_per_s']:>11.2f} {row['downloads']:>10} "
+              f"{row['first_download_s']:>8.3f} {row['p50_download_s']:>8.3f} {row['last_download_s']:>8.3f}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,114 @@
+import time
+import json
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any
+
+from federated_learning.server.scheduler import DeadlineScheduler
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+def run_deadlines(num_deadlines: int, horizon: float, cancel_fraction: float) -> Dict[str, Any]:
+    """
+    Schedule deadlines spread over `horizon` seconds, cancel some, and measure firing lateness.
+    
+    Args:
+        num_deadlines: Number of round deadlines to schedule
+        horizon: Seconds over which the deadlines are spread
+        cancel_fraction: Fraction of deadlines cancelled before they are due
+        
+    Returns:
+        Result row with lateness percentiles and thread usage
+    """
+    rng = random.Random(0)
+    executor = ThreadPoolExecutor(max_workers=5)
+    scheduler = DeadlineScheduler(executor)
+    
+    lateness = []
+    fired = set()
+    lock = threading.Lock()
+    done = threading.Event()
+    
+    cancelled = set(rng.sample(range(num_deadlines), int(num_deadlines * cancel_fraction)))
+    expected = num_deadlines - len(cancelled)
+    
+    def on_deadline(key: int, deadline: float) -> None:
+        late = time.time() - deadline
+        with lock:
+            lateness.append(late)
+            fired.add(key)
+            if len(fired) == expected:
+                done.set()
+    
+    threads_before = threading.active_count()
+    scheduler.start()
+    
+    start = time.time()
+    for key in range(num_deadlines):
+        deadline = start + 0.5 + rng.uniform(0, horizon)
+        scheduler.schedule(key, deadline, on_deadline, key, deadline)
+    schedule_time = time.time() - start
+    
+    for key in cancelled:
+        scheduler.cancel(key)
+    
+    threads_used = threading.active_count() - threads_before
+    done.wait(timeout=horizon + 30)
+    
+    scheduler.stop()
+    executor.shutdown(wait=True)
+    
+    lateness.sort()
+    return {
+        "num_deadlines": num_deadlines,
+        "fired": len(fired),
+        "expected": expected,
+        "wrongly_fired": len(fired & cancelled),
+        "schedule_per_s": num_deadlines / schedule_time if schedule_time > 0 else float("inf"),
+        "p50_late_ms": 1000 * lateness[len(lateness) // 2] if lateness else 0.0,
+        "p99_late_ms": 1000 * lateness[int(len(lateness) * 0.99)] if lateness else 0.0,
+        "threads_used": threads_used
+    }
+
+
+def run_benchmark(deadline_counts: List[int], horizon: float, cancel_fraction: float) -> List[Dict[str, Any]]:
+    """Run the scheduler benchmark for each deadline count."""
+    results = []
+    for num_deadlines in deadline_counts:
+        row = run_deadlines(num_deadlines, horizon, cancel_fraction)
+        results.append(row)
+        logger.info(
+            f"{num_deadlines} deadlines: p99 lateness {row['p99_late_ms']:.1f} ms, {row['threads_used']} scheduler thread(s)"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark the round deadline scheduler")
+    parser.add_argument("--deadlines", type=int, nargs="+", default=[100, 1000, 10000], help="Deadline counts to benchmark")
+    parser.add_argument("--horizon", type=float, default=5.0, help="Seconds over which deadlines are spread")
+    parser.add_argument("--cancel_fraction", type=float, default=0.5, help="Fraction of deadlines cancelled early")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.deadlines, args.horizon, args.cancel_fraction)
+    
+    print(f"{'deadlines':>10} {'fired':>8} {'p50 ms':>8} {'p99 ms':>8} {'threads':>8}")
+    for row in results:
+        print(f"{row['num_deadlines']:>10} {row['fired']:>8} {row['p50_late_ms']:>8.1f} "
+              f"{row['p99_late_ms']:>8.1f} {row['threads_used']:>8}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
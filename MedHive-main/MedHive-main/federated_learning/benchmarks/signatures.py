@@ -0,0 +1,191 @@
+import os
+import time
+import json
+import shutil
+import logging
+import tempfile
+from typing import Dict, List, Any
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+from federated_learning.common.signing import (
+    KEY_TYPES,
+    generate_private_key,
+    public_key_to_pem,
+    hash_file,
+    sign_digest,
+    sign_file,
+    verify_digest
+)
+from federated_learning.server.security import SecurityManager
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+# Bytes written at a time when creating the synthetic uploads
+WRITE_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def _write_upload(path: str, size: int) -> None:
+    """Write `size` random bytes, standing in for an encrypted client model."""
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            n = min(WRITE_CHUNK_SIZE, remaining)
+            f.write(os.urandom(n))
+            remaining -= n
+
+
+def _legacy_verify(public_key, path: str, signature: bytes) -> bool:
+    """Verify the way `SecurityManager.verify_signature` used to: PSS over the whole payload in memory."""
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        public_key.verify(
+            signature,
+            data,
+            padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+            hashes.SHA256()
+        )
+        return True
+    except Exception:
+        return False
+
+
+def _rate(func, count: int) -> float:
+    """Calls of `func` per second over `count` calls, where `func(i)` handles item i."""
+    start = time.perf_counter()
+    for i in range(count):
+        if not func(i):
+            raise RuntimeError("Verification failed")
+    return count / (time.perf_counter() - start)
+
+
+def run_benchmark(sizes_mb: List[int], files: int, workers: List[int], digest_ops: int) -> Dict[str, Any]:
+    """
+    Measure signature verifications per second of uploads of realistic sizes.
+    
+    Args:
+        sizes_mb: Upload sizes in MB
+        files: Number of uploads per size (one round's worth)
+        workers: Process counts for the pooled batch verification
+        digest_ops: Number of digest-only verifications per key type
+    
+    Returns:
+        Digest-only verification rates and one result row per upload size
+    """
+    keys = {key_type: generate_private_key(key_type) for key_type in KEY_TYPES}
+    
+    # Cost of the signature check alone, with the hashing taken out
+    digest = os.urandom(32)
+    digest_rates = {}
+    for key_type, private_key in keys.items():
+        signature = sign_digest(private_key, digest)
+        public_key = private_key.public_key()
+        digest_rates[key_type] = _rate(lambda i: verify_digest(public_key, digest, signature), digest_ops)
+        logger.info(f"{key_type}: {digest_rates[key_type]:.0f} digest verifications/s")
+    
+    rows = []
+    tmp_dir = tempfile.mkdtemp(prefix="fl_signatures_")
+    try:
+        for size_mb in sizes_mb:
+            paths = []
+            for i in range(files):
+                path = os.path.join(tmp_dir, f"upload_{i}.bin")
+                _write_upload(path, size_mb * 1024 * 1024)
+                paths.append(path)
+            
+            row = {"size_mb": size_mb, "files": files}
+            
+            # Legacy: RSA-PSS over the raw payload, read into memory
+            rsa_key = keys["rsa"]
+            with open(paths[0], "rb") as f:
+                legacy_signature = rsa_key.sign(
+                    f.read(),
+                    padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+                    hashes.SHA256()
+                )
+            row["legacy_rsa_per_s"] = _rate(
+                lambda i: _legacy_verify(rsa_key.public_key(), paths[0], legacy_signature), files
+            )
+            
+            # Streamed hash of the file, then a signature check over the digest
+            items = {}
+            for key_type, private_key in keys.items():
+                signature = sign_file(private_key, paths[0])
+                public_key = private_key.public_key()
+                row[f"streamed_{key_type}_per_s"] = _rate(
+                    lambda i: verify_digest(public_key, hash_file(paths[0]), signature), files
+                )
+                items[key_type] = [
+                    {"path": path, "signature": sign_file(private_key, path), "public_key": public_key_to_pem(public_key)}
+                    for path in paths
+                ]
+            
+            # Digest taken while the upload streamed in; only the signature is left to check
+            streamed_digest = hash_file(paths[0])
+            signature = sign_file(keys["ed25519"], paths[0])
+            row["received_digest_ed25519_per_s"] = _rate(
+                lambda i: verify_digest(keys["ed25519"].public_key(), streamed_digest, signature), files
+            )
+            
+            # Whole round re-verified from disk across worker processes
+            for num_workers in workers:
+                security = SecurityManager(verify_workers=num_workers)
+                try:
+                    # Start the pool outside the timed region
+                    security.verify_batch(items["ed25519"][:2])
+                    start = time.perf_counter()
+                    if not all(security.verify_batch(items["ed25519"])):
+                        raise RuntimeError("Verification failed")
+                    row[f"batch_{num_workers}_workers_per_s"] = files / (time.perf_counter() - start)
+                finally:
+                    security.close()
+            
+            rows.append(row)
+            logger.info(
+                f"{size_mb} MB: legacy {row['legacy_rsa_per_s']:.2f}/s, "
+                f"streamed RSA {row['streamed_rsa_per_s']:.2f}/s, streamed Ed25519 {row['streamed_ed25519_per_s']:.2f}/s, "
+                + ", ".join(f"{w} workers {row[f'batch_{w}_workers_per_s']:.2f}/s" for w in workers)
+            )
+            
+            for path in paths:
+                os.remove(path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    return {"digest_verifications_per_s": digest_rates, "uploads": rows}
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark signature verification of client uploads")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[45, 200], help="Upload sizes in MB")
+    parser.add_argument("--files", type=int, default=8, help="Uploads per size")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="Process counts for batch verification")
+    parser.add_argument("--digest-ops", type=int, default=2000, help="Digest-only verifications per key type")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.sizes, args.files, sorted(set(args.workers)), args.digest_ops)
+    
+    print(f"{'key type':>10} {'digest verifications/s':>24}")
+    for key_type, rate in results["digest_verifications_per_s"].items():
+        print(f"{key_type:>10} {rate:>24.0f}")
+    
+    columns = [key for key in results["uploads"][0] if key.endswith("_per_s")]
+    print()
+    print(f"{'MB':>6} " + " ".join(f"{column[:-6]:>22}" for column in columns))
+    for row in results["uploads"]:
+        print(f"{row['size_mb']:>6} " + " ".join(f"{row[column]:>22.2f}" for column in columns))
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,123 @@
+import os
+import time
+import json
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any
+
+import torch
+
+from federated_learning.benchmarks.aggregation import _peak_rss_mb, make_state_dict, write_client_checkpoints
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+DEFAULT_STRATEGIES = ["fedavg", "fedadam", "fedyogi", "median", "trimmed_mean", "krum"]
+
+
+def _aggregate_isolated(work_dir: str, model_paths: List[str], base_path: str, strategy: str) -> Dict[str, float]:
+    """Run one aggregation in a fresh process and report its time and memory."""
+    from federated_learning.server.aggregator import ModelAggregator
+    from federated_learning.server.strategies import get_strategy
+    
+    os.chdir(work_dir)
+    logging.getLogger("FL_Aggregator").setLevel(logging.WARNING)
+    logging.getLogger("FL_Strategies").setLevel(logging.WARNING)
+    baseline_rss = _peak_rss_mb()
+    
+    aggregator = ModelAggregator("benchmark")
+    weights = [float(i + 1) for i in range(len(model_paths))]
+    
+    start = time.perf_counter()
+    aggregator.aggregate_models(
+        model_paths=model_paths,
+        weights=weights,
+        strategy=strategy,
+        output_path=os.path.join(work_dir, "aggregated.pt"),
+        base_path=base_path if get_strategy(strategy).requires_base else None,
+        state_path=os.path.join(work_dir, f"{strategy}_state.pt")
+    )
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "wall_time_s": elapsed,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def run_benchmark(strategies: List[str], client_counts: List[int], param_counts: List[int]) -> List[Dict[str, Any]]:
+    """
+    Measure wall time and peak RSS of each strategy against client count and model size.
+    
+    Args:
+        strategies: Aggregation strategies to benchmark
+        client_counts: Numbers of clients to aggregate
+        param_counts: Parameters per synthetic model
+    
+    Returns:
+        List of result rows
+    """
+    results = []
+    
+    for num_params in param_counts:
+        model_mb = num_params * 4 / (1024 * 1024)
+        
+        with tempfile.TemporaryDirectory() as work_dir:
+            model_paths = write_client_checkpoints(work_dir, max(client_counts), num_params)
+            base_path = os.path.join(work_dir, "base.pt")
+            torch.save(make_state_dict(num_params), base_path)
+            
+            for strategy in strategies:
+                for num_clients in sorted(client_counts):
+                    # Each measurement runs in its own process so peak RSS is not shared between runs
+                    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                        row = pool.submit(
+                            _aggregate_isolated, work_dir, model_paths[:num_clients], base_path, strategy
+                        ).result()
+                    
+                    row.update({
+                        "strategy": strategy,
+                        "num_clients": num_clients,
+                        "num_params": num_params,
+                        "model_mb": model_mb,
+                        "rss_over_model": (row["peak_rss_mb"] - row["baseline_rss_mb"]) / model_mb
+                    })
+                    results.append(row)
+                    logger.info(
+                        f"{strategy}: {num_clients} clients, {model_mb:.0f} MB model, {row['wall_time_s']:.2f}s, "
+                        f"peak RSS {row['peak_rss_mb']:.0f} MB ({row['rss_over_model']:.1f}x model)"
+                    )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark aggregation strategies against client count and model size")
+    parser.add_argument("--strategies", type=str, nargs="+", default=DEFAULT_STRATEGIES, help="Strategies to benchmark")
+    parser.add_argument("--clients", type=int, nargs="+", default=[4, 16, 64], help="Client counts to benchmark")
+    parser.add_argument("--num_params", type=int, nargs="+", default=[1_000_000, 11_700_000], help="Parameters per model")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.strategies, args.clients, args.num_params)
+    
+    print(f"{'strategy':>14} {'params':>11} {'clients':>8} {'wall (s)':>10} {'peak RSS (MB)':>14} {'RSS / model':>12}")
+    for row in results:
+        print(
+            f"{row['strategy']:>14} {row['num_params']:>11} {row['num_clients']:>8} {row['wall_time_s']:>10.2f} "
+            f"{row['peak_rss_mb']:>14.0f} {row['rss_over_model']:>12.1f}"
+        )
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
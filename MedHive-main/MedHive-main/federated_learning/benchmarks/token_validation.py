@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import random
+import shutil
+import logging
+import tempfile
+from typing import Dict, List, Any
+
+import federated_learning.server.security as security
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50 and p99 of latencies in seconds, in microseconds."""
+    latencies = sorted(latencies)
+    return {
+        "p50_us": 1e6 * latencies[len(latencies) // 2],
+        "p99_us": 1e6 * latencies[int(len(latencies) * 0.99)]
+    }
+
+
+def _run_requests(manager: security.SecurityManager, tokens: List[str], num_requests: int, seed: int) -> Dict[str, float]:
+    """Verify the token of a random polling client per request, timing each verification."""
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(num_requests):
+        token = tokens[rng.randrange(len(tokens))]
+        start = time.perf_counter()
+        valid, _ = manager.verify_token(token)
+        latencies.append(time.perf_counter() - start)
+        if not valid:
+            raise RuntimeError("Token was rejected")
+    return _percentiles(latencies)
+
+
+def run_benchmark(client_counts: List[int], num_requests: int) -> List[Dict[str, Any]]:
+    """
+    Compare the per-request token check with and without the verified-token cache.
+    
+    Every client holds one token and sends it with each request, the way
+    polling clients and dashboards do. Half of the tokens are signed with a
+    secret that has since been rotated out but is still accepted.
+    
+    Args:
+        client_counts: Numbers of distinct clients (tokens)
+        num_requests: Requests per measurement
+    
+    Returns:
+        One result row per client count
+    """
+    uncached = security.SecurityManager(generate_keys=True, token_cache_size=0)
+    
+    results = []
+    for num_clients in client_counts:
+        old_tokens = [uncached.generate_token(f"client_{i}", "contributor") for i in range(num_clients // 2)]
+        uncached.rotate_jwt_secret()
+        tokens = old_tokens + [
+            uncached.generate_token(f"client_{i}", "contributor") for i in range(num_clients // 2, num_clients)
+        ]
+        
+        # Both managers read the rotated keys from disk
+        uncached = security.SecurityManager(token_cache_size=0)
+        cached = security.SecurityManager(token_cache_size=max(num_clients, 1))
+        
+        before = _run_requests(uncached, tokens, num_requests, seed=num_clients)
+        after = _run_requests(cached, tokens, num_requests, seed=num_clients)
+        
+        row = {
+            "clients": num_clients,
+            "before_p50_us": before["p50_us"],
+            "before_p99_us": before["p99_us"],
+            "after_p50_us": after["p50_us"],
+            "after_p99_us": after["p99_us"]
+        }
+        results.append(row)
+        logger.info(
+            f"{num_clients} clients: full verification p50 {row['before_p50_us']:.1f} us / p99 {row['before_p99_us']:.1f} us, "
+            f"cached p50 {row['after_p50_us']:.1f} us / p99 {row['after_p99_us']:.1f} us"
+        )
+    
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark per-request token verification with and without the verified-token cache")
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 10000], help="Numbers of distinct clients")
+    parser.add_argument("--requests", type=int, default=50000, help="Requests per measurement")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    # Keep the benchmark's keys away from the real ones
+    keys_dir = tempfile.mkdtemp(prefix="fl_token_validation_")
+    security.KEYS_DIR = keys_dir
+    for name in ["PRIVATE_KEY_PATH", "PUBLIC_KEY_PATH", "JWT_SECRET_PATH", "JWT_PREVIOUS_SECRETS_PATH", "ENCRYPTION_KEY_PATH", "SALT_PATH"]:
+        setattr(security, name, os.path.join(keys_dir, os.path.basename(getattr(security, name))))
+    logging.getLogger("FL_Security").setLevel(logging.WARNING)
+    
+    try:
+        results = run_benchmark(args.clients, args.requests)
+    finally:
+        shutil.rmtree(keys_dir, ignore_errors=True)
+    
+    print(f"{'clients':>8} {'before p50':>11} {'before p99':>11} {'after p50':>10} {'after p99':>10}")
+    for row in results:
+        print(
+            f"{row['clients']:>8} {row['before_p50_us']:>11.1f} {row['before_p99_us']:>11.1f} "
+            f"{row['after_p50_us']:>10.1f} {row['after_p99_us']:>10.1f}"
+        )
+    print("(microseconds per request)")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import logging
+import tempfile
+from typing import Dict, List, Any, Union
+
+import torch
+from torch.utils.data import DataLoader, Dataset, random_split
+
+from federated_learning.benchmarks.dataset_cache import CustomDataset, BenchmarkCNN, _write_recordings
+from federated_learning.client.dataset_cache import DatasetCache
+from federated_learning.client.local_training import (
+    train_state_dict,
+    evaluate_model,
+    get_optimizer,
+    get_loss_function
+)
+from federated_learning.client.training_runtime import available_cpus
+from federated_learning.common.model_factory import register_model, create_model, load_model_weights
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+MODEL_TYPE = "benchmark_training_runtime"
+
+
+def _register_model_type() -> None:
+    """Make the synthetic model, dataset and hyperparameters loadable under MODEL_TYPE."""
+    register_model(MODEL_TYPE, BenchmarkCNN)
+    
+    dataset_module = types.ModuleType(f"federated_learning.models.{MODEL_TYPE}.dataset")
+    dataset_module.CustomDataset = CustomDataset
+    hyperparams_module = types.ModuleType(f"federated_learning.models.{MODEL_TYPE}.hyperparams")
+    hyperparams_module.HYPERPARAMS = {}
+    sys.modules[dataset_module.__name__] = dataset_module
+    sys.modules[hyperparams_module.__name__] = hyperparams_module
+
+
+def _fixed_train(dataset: Dataset, epochs: int, batch_size: int) -> None:
+    """The training loop as it was before the runtime was tuned: four workers, a loss read per batch, validation every epoch."""
+    model = load_model_weights(MODEL_TYPE, create_model(MODEL_TYPE).state_dict())
+    train_size = int(0.8 * len(dataset))
+    train_dataset, val_dataset = random_split(
+        dataset, [train_size, len(dataset) - train_size], generator=torch.Generator().manual_seed(42)
+    )
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, num_workers=4)
+    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, num_workers=4)
+    optimizer = get_optimizer(model, MODEL_TYPE)
+    loss_fn = get_loss_function(MODEL_TYPE)
+    
+    for epoch in range(epochs):
+        model.train()
+        running_loss = 0.0
+        for batch_idx, (inputs, targets) in enumerate(train_loader):
+            optimizer.zero_grad()
+            loss = loss_fn(model(inputs), targets)
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item()
+            if batch_idx % 10 == 9:
+                running_loss = 0.0
+        evaluate_model(model, val_loader, loss_fn, torch.device("cpu"))
+
+
+def run_mode(
+    mode: str,
+    dataset: Dataset,
+    epochs: int,
+    batch_size: Union[int, str],
+    validate_every: int
+) -> Dict[str, Any]:
+    """Train for `epochs` epochs the way `mode` does and measure training samples per second, end to end."""
+    train_samples = int(0.8 * len(dataset)) * epochs
+    
+    start = time.perf_counter()
+    if mode == "fixed":
+        _fixed_train(dataset, epochs, 32 if batch_size == "auto" else batch_size)
+        per_epoch = None
+    else:
+        _, _, metrics_history = train_state_dict(
+            create_model(MODEL_TYPE).state_dict(), dataset, MODEL_TYPE,
+            epochs=epochs, batch_size=batch_size, device="cpu", validate_every=validate_every
+        )
+        per_epoch = sum(m["train_samples_per_s"] for m in metrics_history) / len(metrics_history)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "samples_per_s": train_samples / elapsed,
+        "train_loop_samples_per_s": per_epoch
+    }
+
+
+def run_benchmark(
+    num_samples: int,
+    epochs: int,
+    batch_size: Union[int, str],
+    validate_every: int,
+    sources: List[str],
+    modes: List[str]
+) -> List[Dict[str, Any]]:
+    """Train on decoded CSV recordings and on their dataset cache, with the fixed and the tuned runtime."""
+    _register_model_type()
+    work_dir = tempfile.mkdtemp(prefix="fl_training_runtime_bench_")
+    data_path = os.path.join(work_dir, "data")
+    
+    try:
+        _write_recordings(data_path, 0, num_samples)
+        
+        results = []
+        for source in sources:
+            if source == "cached":
+                dataset = DatasetCache(os.path.join(work_dir, "cache")).get(MODEL_TYPE, data_path, CustomDataset)
+            else:
+                dataset = CustomDataset(data_path)
+            
+            for mode in modes:
+                row = dict(run_mode(mode, dataset, epochs, batch_size, validate_every), source=source, cpus=available_cpus())
+                results.append(row)
+                logger.info(f"{source}/{mode}: {row['samples_per_s']:.0f} samples/s over {epochs} epochs ({row['seconds']:.2f}s)")
+        
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Training samples/s on the CPU, fixed loader settings vs the tuned training runtime")
+    parser.add_argument("--samples", type=int, default=1000, help="Number of recordings")
+    parser.add_argument("--epochs", type=int, default=3, help="Training epochs")
+    parser.add_argument("--batch_size", type=str, default="32", help="Batch size, or 'auto' to tune it")
+    parser.add_argument("--validate_every", type=int, default=1, help="Validate every this many epochs (tuned runtime only)")
+    parser.add_argument("--sources", type=str, nargs="+", default=["decoded", "cached"], choices=["decoded", "cached"])
+    parser.add_argument("--modes", type=str, nargs="+", default=["fixed", "tuned"], choices=["fixed", "tuned"])
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    batch_size = args.batch_size if args.batch_size == "auto" else int(args.batch_size)
+    
+    results = run_benchmark(args.samples, args.epochs, batch_size, args.validate_every, args.sources, args.modes)
+    
+    print(f"{'source':>8} {'mode':>6} {'CPUs':>5} {'seconds':>8} {'samples/s':>10} {'loop samples/s':>15}")
+    for row in results:
+        loop = f"{row['train_loop_samples_per_s']:.0f}" if row["train_loop_samples_per_s"] is not None else "-"
+        print(f"{row['source']:>8} {row['mode']:>6} {row['cpus']:>5} {row['seconds']:>8.2f} {row['samples_per_s']:>10.0f} {loop:>15}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,395 @@
+import os
+import json
+import time
+import socket
+import random
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from typing import Dict, List, Any, Optional
+
+import requests
+import torch
+
+from federated_learning.client.transfer import ModelTransfer
+from federated_learning.common.flat import save_flat
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Benchmark")
+
+# Bytes the proxy forwards at a time; each segment may be the one the connection drops at
+SEGMENT_SIZE = 64 * 1024
+
+# Bytes written at a time when creating the synthetic model
+WRITE_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def _serve(work_dir: str, port: int, model_mb: int, num_clients: int, round_ids) -> None:
+    """Run an API server with one started round whose global model is `model_mb` MB of random bytes; puts the round ID on `round_ids` once serving."""
+    import uvicorn
+    from federated_learning.server.server import FederatedLearningServer
+    from federated_learning.server.api import create_app
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("FL_Server", "FL_Aggregator", "FL_Registry", "FL_RoundJournal", "FL_Uploads", "FL_ModelStore"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    
+    server = FederatedLearningServer(
+        models_dir=os.path.join(work_dir, "models"),
+        rounds_dir=os.path.join(work_dir, "rounds"),
+        init_security=False
+    )
+    
+    for i in range(num_clients):
+        server.register_client(f"hospital_{i}", "benchmark", {"has_gpu": False})
+    
+    round_id = server.create_round(
+        model_id=1,
+        model_type="benchmark",
+        round_number=1,
+        min_clients=1,
+        max_clients=num_clients,
+        round_timeout=24 * 3600
+    )["round_id"]
+    server.select_clients_for_round(round_id)
+    server.start_round(round_id)
+    for i in range(num_clients):
+        server.client_join_round(round_id, f"hospital_{i}")
+    
+    # Serve a model of the requested size instead of the initial one
+    model_path = os.path.join(work_dir, "model.bin")
+    _write_random_file(model_path, model_mb)
+    server.active_rounds[round_id]["global_model_digest"] = server.model_store.put_file(model_path, "move")
+    
+    config = uvicorn.Config(create_app(server), host="127.0.0.1", port=port, log_level="error")
+    uvicorn_server = uvicorn.Server(config)
+    
+    async def serve() -> None:
+        task = asyncio.ensure_future(uvicorn_server.serve())
+        while not uvicorn_server.started:
+            await asyncio.sleep(0.05)
+        round_ids.put(round_id)
+        await task
+    
+    try:
+        asyncio.run(serve())
+    finally:
+        server.shutdown()
+
+
+def _write_random_file(path: str, size_mb: int) -> None:
+    """Write `size_mb` MB of random bytes."""
+    with open(path, "wb") as f:
+        remaining = size_mb * 2 ** 20
+        while remaining > 0:
+            n = min(WRITE_CHUNK_SIZE, remaining)
+            f.write(os.urandom(n))
+            remaining -= n
+
+
+class FaultyProxy:
+    """
+    TCP proxy that drops connections at random and caps each connection's throughput.
+    
+    Every forwarded segment of SEGMENT_SIZE bytes, in either direction, is
+    lost with probability `loss`, which aborts the connection the way a
+    dropped VPN tunnel does (TCP retransmission hides single lost packets,
+    so losses that matter to an application surface as broken
+    connections). The per-connection rate limit stands in for the
+    bandwidth-delay limit of a high-latency link.
+    """
+    
+    def __init__(self, upstream_port: int, loss: float, connection_mbps: float, seed: int = 0):
+        """
+        Initialize the proxy.
+        
+        Args:
+            upstream_port: Local port of the server
+            loss: Probability that a forwarded segment drops its connection
+            connection_mbps: Throughput limit of each connection in megabits/s (0 for none)
+            seed: Seed of the loss decisions
+        """
+        self.upstream_port = upstream_port
+        self.loss = loss
+        self.bytes_per_s = connection_mbps * 1e6 / 8
+        self.rng = random.Random(seed)
+        self.drops = 0
+        self.port = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._handlers = set()
+        self._writers = set()
+    
+    def start(self) -> int:
+        """Start proxying on a free local port in a background thread, returning the port."""
+        started = threading.Event()
+        
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+        
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.port
+    
+    def stop(self) -> None:
+        """Stop the proxy, closing the connections it still forwards."""
+        async def shutdown() -> None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.transport.abort()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+        
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Forward one client connection to the server until either side closes or the connection drops."""
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+        except OSError:
+            writer.close()
+            return
+        
+        self._handlers.add(asyncio.current_task())
+        self._writers.update((writer, upstream_writer))
+        
+        async def pump(src: asyncio.StreamReader, dst: asyncio.StreamWriter) -> bool:
+            """Forward one direction; returns True if the connection was dropped."""
+            while True:
+                data = await src.read(SEGMENT_SIZE)
+                if not data:
+                    return False
+                if self.rng.random() < self.loss:
+                    return True
+                if self.bytes_per_s:
+                    await asyncio.sleep(len(data) / self.bytes_per_s)
+                dst.write(data)
+                await dst.drain()
+        
+        tasks = [asyncio.ensure_future(pump(reader, upstream_writer)), asyncio.ensure_future(pump(upstream_reader, writer))]
+        dropped = False
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            dropped = any(not task.cancelled() and task.exception() is None and task.result() for task in done)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            
+            if dropped:
+                self.drops += 1
+            for w in (writer, upstream_writer):
+                if dropped:
+                    w.transport.abort()
+                else:
+                    w.close()
+                self._writers.discard(w)
+            self._handlers.discard(asyncio.current_task())
+
+
+def _legacy_download(url: str, dest_path: str, deadline: float) -> int:
+    """Download the way `download_global_model` used to, starting over after each failure; returns attempts."""
+    attempts = 0
+    while time.time() < deadline:
+        attempts += 1
+        try:
+            response = requests.get(url, stream=True, timeout=(10, 60))
+            with open(dest_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+            if response.status_code == 200:
+                return attempts
+        except requests.RequestException:
+            continue
+    raise TimeoutError("Download did not finish in time")
+
+
+def _legacy_upload(url: str, file_path: str, deadline: float) -> int:
+    """Upload the way `upload_local_model` used to, starting over after each failure; returns attempts."""
+    attempts = 0
+    while time.time() < deadline:
+        attempts += 1
+        try:
+            with open(file_path, "rb") as f:
+                response = requests.post(
+                    url,
+                    files={"model_file": f},
+                    data={"training_metrics": "{}", "update_format": "full"},
+                    timeout=(10, 60)
+                )
+            if response.status_code == 200:
+                return attempts
+        except requests.RequestException:
+            continue
+    raise TimeoutError("Upload did not finish in time")
+
+
+def _timed(func) -> Dict[str, Any]:
+    """Wall time of `func()` and its result, or None if it did not finish in time."""
+    start = time.perf_counter()
+    try:
+        result = func()
+    except Exception as e:
+        logger.warning(f"Transfer failed: {str(e)}")
+        return {"seconds": None, "result": None}
+    return {"seconds": time.perf_counter() - start, "result": result}
+
+
+def _file_digest(path: str) -> str:
+    """Hex SHA-256 digest of a file."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(WRITE_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def run_benchmark(
+    losses: List[float],
+    model_mb: int,
+    connection_mbps: float,
+    streams: int,
+    chunk_size: int,
+    time_limit: float
+) -> List[Dict[str, Any]]:
+    """
+    Time model downloads and uploads through the failure-injecting proxy, single-request vs chunked.
+    
+    Args:
+        losses: Per-segment connection drop probabilities
+        model_mb: Size of the transferred model in MB
+        connection_mbps: Throughput limit of each proxied connection in megabits/s
+        streams: Parallel chunk streams of the chunked transfers
+        chunk_size: Bytes per chunk of the chunked transfers
+        time_limit: Seconds after which a transfer counts as not finished
+    
+    Returns:
+        One result row per loss rate
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Two uploads per loss rate, each by its own client; one more keeps the round from finishing
+        num_clients = 2 * len(losses) + 1
+        round_ids = context.Queue()
+        process = context.Process(target=_serve, args=(os.path.join(work_dir, "server"), port, model_mb, num_clients, round_ids))
+        process.start()
+        
+        try:
+            round_id = round_ids.get(timeout=300)
+            model_path = f"/api/federated-learning/rounds/{round_id}/model"
+            
+            # The server only accepts uploads that load as a model
+            upload_path = os.path.join(work_dir, "upload.bin")
+            save_flat({"weight": torch.randn(model_mb * 2 ** 18)}, upload_path)
+            
+            for i, loss in enumerate(losses):
+                proxy = FaultyProxy(port, loss, connection_mbps, seed=i)
+                proxy_url = f"http://127.0.0.1:{proxy.start()}"
+                row = {"loss": loss}
+                
+                try:
+                    legacy_path = os.path.join(work_dir, "legacy_download.bin")
+                    chunked_path = os.path.join(work_dir, "chunked_download.bin")
+                    transfer = ModelTransfer(proxy_url, streams=streams, chunk_size=chunk_size)
+                    
+                    drops = proxy.drops
+                    legacy = _timed(lambda: _legacy_download(f"{proxy_url}{model_path}", legacy_path, time.time() + time_limit))
+                    row["legacy_download_s"] = legacy["seconds"]
+                    row["legacy_download_drops"] = proxy.drops - drops
+                    
+                    drops = proxy.drops
+                    chunked = _timed(lambda: transfer.download(model_path, chunked_path))
+                    row["chunked_download_s"] = chunked["seconds"]
+                    row["chunked_download_drops"] = proxy.drops - drops
+                    
+                    if chunked["seconds"] is not None and legacy["seconds"] is not None:
+                        if _file_digest(chunked_path) != _file_digest(legacy_path):
+                            raise RuntimeError("Chunked download does not match the model")
+                    
+                    legacy_client, chunked_client = f"hospital_{2 * i}", f"hospital_{2 * i + 1}"
+                    
+                    drops = proxy.drops
+                    legacy = _timed(lambda: _legacy_upload(
+                        f"{proxy_url}/api/federated-learning/participants/{round_id}:{legacy_client}/upload",
+                        upload_path, time.time() + time_limit
+                    ))
+                    row["legacy_upload_s"] = legacy["seconds"]
+                    row["legacy_upload_drops"] = proxy.drops - drops
+                    
+                    drops = proxy.drops
+                    chunked = _timed(lambda: transfer.upload(
+                        f"/api/federated-learning/participants/{round_id}:{chunked_client}/uploads",
+                        upload_path, {"training_metrics": {}, "update_format": "full"}
+                    ))
+                    row["chunked_upload_s"] = chunked["seconds"]
+                    row["chunked_upload_drops"] = proxy.drops - drops
+                    
+                    transfer.close()
+                finally:
+                    proxy.stop()
+                
+                results.append(row)
+                logger.info(
+                    f"loss {loss}: download {_format_seconds(row['legacy_download_s'])} -> {_format_seconds(row['chunked_download_s'])}, "
+                    f"upload {_format_seconds(row['legacy_upload_s'])} -> {_format_seconds(row['chunked_upload_s'])}"
+                )
+        finally:
+            process.terminate()
+            process.join()
+    
+    return results
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    """Seconds, or a marker for transfers that did not finish."""
+    return f"{seconds:.1f}s" if seconds is not None else "not finished"
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Time model transfers through a proxy that drops connections")
+    parser.add_argument("--loss", type=float, nargs="+", default=[0.0, 0.001, 0.005], help="Per-64KB-segment connection drop probabilities")
+    parser.add_argument("--size", type=int, default=45, help="Model size in MB")
+    parser.add_argument("--connection_mbps", type=float, default=200.0, help="Throughput limit of each connection in megabits/s (0 for none)")
+    parser.add_argument("--streams", type=int, default=4, help="Parallel streams of chunked transfers")
+    parser.add_argument("--chunk_size", type=int, default=4 * 1024 * 1024, help="Bytes per chunk of chunked transfers")
+    parser.add_argument("--time_limit", type=float, default=300.0, help="Seconds before a transfer counts as not finished")
+    parser.add_argument("--output", type=str, help="Optional path to write results as JSON")
+    
+    args = parser.parse_args()
+    
+    logging.getLogger("FL_Transfer").setLevel(logging.ERROR)
+    results = run_benchmark(args.loss, args.size, args.connection_mbps, args.streams, args.chunk_size, args.time_limit)
+    
+    print(f"{'loss':>7} {'before dl':>13} {'after dl':>13} {'before ul':>13} {'after ul':>13}")
+    for row in results:
+        print(
+            f"{row['loss']:>7} {_format_seconds(row['legacy_download_s']):>13} {_format_seconds(row['chunked_download_s']):>13} "
+            f"{_format_seconds(row['legacy_upload_s']):>13} {_format_seconds(row['chunked_upload_s']):>13}"
+        )
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
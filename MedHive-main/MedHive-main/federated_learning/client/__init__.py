@@ -5,4 +5,9 @@ This package provides client-side functionality for federated learning, includin
 - Client implementation for connecting to the federated learning server
 - Local model training on private data
 - Secure model encryption and decryption
+- Resumable, chunked and parallel model transfers
+- Round notifications pushed by the server instead of polling
+- Rounds pipelined in memory, without intermediate model files
+- Local dataset cache of preprocessed, memory-mapped samples
+- Training runtime tuned to the host CPU or GPU
 """ 
\ No newline at end of file
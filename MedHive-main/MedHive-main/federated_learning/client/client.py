@@ -1,12 +1,27 @@
+import io
 import os
 import json
-import requests
+import time
+import base64
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple, List
+from urllib.parse import urlparse
 import torch
 
-from federated_learning.client.encryption import encrypt_model, decrypt_model
-from federated_learning.client.local_training import train_model
+from federated_learning.client.dataset_cache import DatasetCache, DEFAULT_CACHE_DIR
+from federated_learning.client.local_training import train_model, train_state_dict, load_dataset, prefetch_dataset
+from federated_learning.client.transfer import ModelTransfer, DEFAULT_CHUNK_SIZE, DEFAULT_STREAMS, backoff_delay
+from federated_learning.common.delta import encode_delta
+from federated_learning.common.flat import FlatModel, load_state_dict_file
+from federated_learning.common.signing import (
+    generate_private_key,
+    load_private_key,
+    private_key_to_pem,
+    public_key_to_pem,
+    sign_digest
+)
 
 # Configure logging
 logging.basicConfig(
@@ -15,6 +30,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger("FL_Client")
 
+# Round events after which a client checks for rounds; `reset` means it may have missed some
+ROUND_WAKE_EVENTS = frozenset({"round_started", "reset"})
+
+# (connect, read) timeouts of the event stream; the server sends a keep-alive every 15 seconds
+EVENT_STREAM_TIMEOUT = (10.0, 45.0)
+
+# Jittered exponential backoff between checks for rounds while the event stream is unavailable
+IDLE_BACKOFF_BASE = 5.0
+IDLE_BACKOFF_MAX = 60.0
+
 class FederatedClient:
     def __init__(
         self, 
@@ -22,7 +47,11 @@ class FederatedClient:
         server_url: str,
         data_path: str,
         model_type: str,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        signing_key_path: Optional[str] = None,
+        transfer_streams: int = DEFAULT_STREAMS,
+        transfer_chunk_size: int = DEFAULT_CHUNK_SIZE,
+        dataset_cache_dir: Optional[str] = DEFAULT_CACHE_DIR
     ):
         """
         Initialize a federated learning client.
@@ -33,6 +62,14 @@ class FederatedClient:
             data_path: Path to local training data
             model_type: Type of model to train (e.g., 'pneumonia', 'ecg_analysis')
             api_key: Optional API key for authentication
+            signing_key_path: Optional PEM private key to sign uploads with; an Ed25519
+                key is generated there if the file does not exist. Once the client
+                registers with it, the server only accepts uploads signed with it,
+                and only a request authenticated as this client can register another key.
+            transfer_streams: Number of chunks of a model transferred in parallel
+            transfer_chunk_size: Bytes per chunk of model transfers
+            dataset_cache_dir: Directory of the preprocessed local dataset, kept between
+                rounds; None reads and decodes the raw data every round
         """
         self.client_id = client_id
         self.server_url = server_url
@@ -41,6 +78,38 @@ class FederatedClient:
         self.api_key = api_key
         self.current_round_id = None
         self.participant_id = None
+        self.update_config = {"format": "full"}
+        self.training_config = {}
+        self.global_model_path = None
+        self.global_state_dict = None
+        
+        # Cursor of the last round event seen, so a reconnecting event stream misses nothing
+        self.events_cursor = None
+        
+        # Error-feedback residual of lossy delta updates, carried across rounds
+        self.delta_residual = None
+        
+        self.signing_key = self._load_signing_key(signing_key_path) if signing_key_path else None
+        
+        # Models and tokens travel over this connection, so it should be TLS
+        url = urlparse(server_url)
+        if url.scheme != "https" and url.hostname not in ("localhost", "127.0.0.1", "::1"):
+            logger.warning(f"Server URL {server_url} is not HTTPS; models and tokens are sent unencrypted")
+        
+        # Keep-alive connections shared by all requests, and resumable chunked model transfers
+        self.transfer = ModelTransfer(
+            server_url,
+            api_key=api_key,
+            streams=transfer_streams,
+            chunk_size=transfer_chunk_size
+        )
+        self.session = self.transfer.session
+        
+        # Preprocessed samples of the local data, decoded once rather than every round
+        self.dataset_cache = DatasetCache(dataset_cache_dir) if dataset_cache_dir else None
+        
+        # Loads the dataset while the global model downloads
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FL_Prefetch")
         
         logger.info(f"Initialized client {client_id} for model type {model_type}")
     
@@ -48,7 +117,7 @@ class FederatedClient:
         """Register this client with the server."""
         try:
             headers = self._get_headers()
-            response = requests.post(
+            response = self.session.post(
                 f"{self.server_url}/api/clients/register",
                 json={
                     "client_id": self.client_id,
@@ -73,15 +142,16 @@ class FederatedClient:
         """Check for available federated learning rounds."""
         try:
             headers = self._get_headers()
-            response = requests.get(
+            response = self.session.get(
                 f"{self.server_url}/api/federated-learning/available-rounds",
-                params={"model_type": self.model_type},
+                params={"client_id": self.client_id, "model_type": self.model_type},
                 headers=headers
             )
             
             if response.status_code == 200:
                 data = response.json()
                 logger.info(f"Available rounds: {data}")
+                self.events_cursor = data.get("events_cursor", self.events_cursor)
                 return data
             else:
                 logger.error(f"Failed to get available rounds: {response.text}")
@@ -90,11 +160,63 @@ class FederatedClient:
             logger.error(f"Error checking for rounds: {str(e)}")
             return {}
     
+    def wait_for_round_events(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Wait on the server's event stream until a round this client should join starts.
+        
+        Returns:
+            The events that call for checking for rounds; an empty list if the
+            server closed the stream first (reconnect and wait again); None if
+            the stream is unavailable, in which case the caller polls instead
+        """
+        headers = self._get_headers()
+        if self.events_cursor:
+            headers["Last-Event-ID"] = self.events_cursor
+        
+        try:
+            with self.session.get(
+                f"{self.server_url}/api/federated-learning/events",
+                params={"client_id": self.client_id, "model_type": self.model_type},
+                headers=headers,
+                stream=True,
+                timeout=EVENT_STREAM_TIMEOUT
+            ) as response:
+                if response.status_code != 200:
+                    logger.warning(f"Round event stream unavailable: HTTP {response.status_code}")
+                    return None
+                
+                events = []
+                event_type, data = None, []
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        # Comments (keep-alives) start with ':' and are skipped
+                        field, _, value = line.partition(":")
+                        value = value[1:] if value.startswith(" ") else value
+                        if field == "id":
+                            self.events_cursor = value
+                        elif field == "event":
+                            event_type = value
+                        elif field == "data":
+                            data.append(value)
+                        continue
+                    
+                    # A blank line ends an event
+                    if event_type in ROUND_WAKE_EVENTS:
+                        events.append(dict(json.loads("\n".join(data)), type=event_type))
+                        logger.info(f"Round event: {events[-1]}")
+                        return events
+                    event_type, data = None, []
+                
+                return events
+        except Exception as e:
+            logger.warning(f"Round event stream failed: {str(e)}")
+            return None
+    
     def join_round(self, round_id: int) -> bool:
         """Join a specific federated learning round."""
         try:
             headers = self._get_headers()
-            response = requests.post(
+            response = self.session.post(
                 f"{self.server_url}/api/federated-learning/rounds/{round_id}/join",
                 json={"client_id": self.client_id},
                 headers=headers
@@ -104,6 +226,8 @@ class FederatedClient:
                 data = response.json()
                 self.current_round_id = round_id
                 self.participant_id = data.get("participant_id")
+                self.update_config = data.get("update_config") or {"format": "full"}
+                self.training_config = data.get("training_config") or {}
                 logger.info(f"Successfully joined round {round_id} as participant {self.participant_id}")
                 return True
             else:
@@ -120,31 +244,48 @@ class FederatedClient:
             return ""
         
         try:
-            headers = self._get_headers()
-            response = requests.get(
-                f"{self.server_url}/api/federated-learning/rounds/{self.current_round_id}/model",
-                headers=headers
+            # Fetch verified chunks in parallel; an interrupted download resumes where it stopped
+            model_path = self.transfer.download(
+                f"/api/federated-learning/rounds/{self.current_round_id}/model",
+                f"models/global_{self.current_round_id}.pt"
             )
             
-            if response.status_code == 200:
-                # Save the encrypted model
-                encrypted_model_path = f"models/encrypted_global_{self.current_round_id}.pt"
-                os.makedirs(os.path.dirname(encrypted_model_path), exist_ok=True)
-                
-                with open(encrypted_model_path, "wb") as f:
-                    f.write(response.content)
-                
-                # Decrypt the model
-                model_path = decrypt_model(encrypted_model_path)
-                logger.info(f"Successfully downloaded and decrypted global model to {model_path}")
-                return model_path
-            else:
-                logger.error(f"Failed to download global model: {response.text}")
-                return ""
+            self.global_model_path = model_path
+            self.global_state_dict = None
+            logger.info(f"Successfully downloaded global model to {model_path}")
+            return model_path
         except Exception as e:
             logger.error(f"Error downloading global model: {str(e)}")
             return ""
     
+    def download_global_state_dict(self) -> Optional[Dict[str, torch.Tensor]]:
+        """
+        Download the current global model and load it into memory.
+        
+        The download touches disk only so that an interrupted download
+        resumes; it is removed once the model is loaded.
+        """
+        if not self.current_round_id:
+            logger.error("No active round to download model for")
+            return None
+        
+        try:
+            model_path = self.transfer.download(
+                f"/api/federated-learning/rounds/{self.current_round_id}/model",
+                f"models/global_{self.current_round_id}.pt"
+            )
+            
+            state_dict = load_state_dict_file(model_path, mmap=False)
+            os.remove(model_path)
+            
+            self.global_state_dict = state_dict
+            self.global_model_path = None
+            logger.info(f"Successfully downloaded global model of round {self.current_round_id} into memory")
+            return state_dict
+        except Exception as e:
+            logger.error(f"Error downloading global model: {str(e)}")
+            return None
+    
     def train_local_model(self, global_model_path: str) -> str:
         """Train a local model using the global model as a starting point."""
         if not global_model_path:
@@ -157,7 +298,9 @@ class FederatedClient:
                 data_path=self.data_path,
                 model_type=self.model_type,
                 round_id=self.current_round_id,
-                client_id=self.client_id
+                client_id=self.client_id,
+                proximal_mu=self.training_config.get("proximal_mu", 0.0),
+                dataset_cache=self.dataset_cache
             )
             
             logger.info(f"Successfully trained local model: {local_model_path}")
@@ -166,47 +309,182 @@ class FederatedClient:
             logger.error(f"Error training local model: {str(e)}")
             return ""
     
+    def train_local_state_dict(
+        self,
+        global_state_dict: Dict[str, torch.Tensor],
+        dataset: Optional[Any] = None
+    ) -> Optional[Tuple[Dict[str, torch.Tensor], Dict[str, float]]]:
+        """
+        Train a local model in memory, starting from the global state dict.
+        
+        Args:
+            global_state_dict: State dict of the round's global model
+            dataset: Local dataset if already loaded (see `run_round`)
+        
+        Returns:
+            Tuple of (trained state dict, its validation metrics), or None on failure
+        """
+        try:
+            if dataset is None:
+                dataset = load_dataset(self.model_type, self.data_path, self.dataset_cache)
+            
+            state_dict, _, metrics_history = train_state_dict(
+                global_state_dict,
+                dataset,
+                self.model_type,
+                proximal_mu=self.training_config.get("proximal_mu", 0.0)
+            )
+            
+            # Validation metrics of the epoch the state dict comes from
+            metrics = {}
+            if metrics_history:
+                best = max(metrics_history, key=lambda m: m["f1_score"])
+                metrics = best if best["f1_score"] > 0 else metrics_history[-1]
+            
+            logger.info(f"Successfully trained local model: {metrics}")
+            return state_dict, metrics
+        except Exception as e:
+            logger.error(f"Error training local model: {str(e)}")
+            return None
+    
     def upload_local_model(self, local_model_path: str) -> bool:
         """Upload the locally trained model to the server."""
-        if not self.current_round_id or not self.participant_id:
-            logger.error("No active round or participant ID")
-            return False
-        
         if not local_model_path or not os.path.exists(local_model_path):
             logger.error(f"Local model not found at {local_model_path}")
             return False
         
         try:
-            # Encrypt the model before sending
-            encrypted_model_path = encrypt_model(local_model_path)
+            state_dict = load_state_dict_file(local_model_path, mmap=False)
+        except Exception as e:
+            logger.error(f"Error loading local model: {str(e)}")
+            return False
+        
+        # Calculate metrics on local validation data
+        return self.upload_local_state_dict(state_dict, self._calculate_metrics(local_model_path))
+    
+    def upload_local_state_dict(self, state_dict: Dict[str, torch.Tensor], metrics: Dict[str, float]) -> bool:
+        """
+        Encode, sign and upload a trained state dict, all from memory.
+        
+        The update travels over the same authenticated channel as the token,
+        so the server can check and aggregate it as received.
+        
+        Args:
+            state_dict: Trained state dict
+            metrics: Training metrics reported with the upload
+        
+        Returns:
+            Whether the server accepted the upload
+        """
+        if not self.current_round_id or not self.participant_id:
+            logger.error("No active round or participant ID")
+            return False
+        
+        try:
+            # Send only what changed when the round asks for delta updates
+            payload, update_format = self._encode_update(state_dict)
             
-            headers = self._get_headers()
-            headers.pop('Content-Type', None)  # Let requests set the correct content type for multipart
+            fields = {"training_metrics": metrics, "update_format": update_format}
             
-            # Calculate metrics on local validation data
-            metrics = self._calculate_metrics(local_model_path)
+            # Hash the bytes the server receives once, for the signature and the upload
+            digest = hashlib.sha256(payload).digest()
+            if self.signing_key is not None:
+                fields["signature"] = base64.b64encode(sign_digest(self.signing_key, digest)).decode("ascii")
             
-            with open(encrypted_model_path, "rb") as f:
-                files = {"model_file": f}
-                data = {"training_metrics": json.dumps(metrics)}
-                
-                response = requests.post(
-                    f"{self.server_url}/api/federated-learning/participants/{self.participant_id}/upload",
-                    files=files,
-                    data=data,
-                    headers=headers
-                )
+            # Send verified chunks in parallel straight from memory
+            self.transfer.upload_bytes(
+                f"/api/federated-learning/participants/{self.participant_id}/uploads",
+                payload,
+                fields,
+                digest=digest.hex()
+            )
             
-            if response.status_code == 200:
-                logger.info(f"Successfully uploaded local model for round {self.current_round_id}")
-                return True
-            else:
-                logger.error(f"Failed to upload local model: {response.text}")
-                return False
+            logger.info(f"Successfully uploaded local model for round {self.current_round_id}")
+            return True
         except Exception as e:
             logger.error(f"Error uploading local model: {str(e)}")
             return False
     
+    def run_round(self, round_id: str) -> bool:
+        """
+        Take part in a round, overlapping its stages and keeping models off disk.
+        
+        The dataset is loaded and warmed on a background thread while the
+        global model downloads; the download is loaded straight into
+        memory, training keeps its snapshots in memory, and the update is
+        encoded and uploaded from one in-memory buffer.
+        
+        Args:
+            round_id: Round to join
+        
+        Returns:
+            Whether the client joined, trained and uploaded its update
+        """
+        if not self.join_round(round_id):
+            return False
+        
+        dataset_future = self.prefetch_executor.submit(prefetch_dataset, self.model_type, self.data_path, cache=self.dataset_cache)
+        
+        global_state_dict = self.download_global_state_dict()
+        if global_state_dict is None:
+            dataset_future.cancel()
+            return False
+        
+        try:
+            dataset = dataset_future.result()
+        except Exception as e:
+            logger.error(f"Error loading dataset: {str(e)}")
+            return False
+        
+        trained = self.train_local_state_dict(global_state_dict, dataset)
+        if trained is None:
+            return False
+        
+        state_dict, metrics = trained
+        if not self.upload_local_state_dict(state_dict, metrics):
+            return False
+        
+        self.complete_round()
+        return True
+    
+    def _encode_update(self, state_dict: Dict[str, torch.Tensor]) -> Tuple[bytes, str]:
+        """
+        Serialize a trained state dict in the format the current round asked for.
+        
+        Full models are sent in the flat model format, which the server
+        memory-maps instead of unpickling; deltas are taken against the
+        round's global model.
+        
+        Args:
+            state_dict: Trained state dict
+        
+        Returns:
+            Tuple of (bytes to upload, update format)
+        """
+        if self.update_config.get("format") == "delta":
+            if self.global_state_dict is None and self.global_model_path and os.path.exists(self.global_model_path):
+                self.global_state_dict = load_state_dict_file(self.global_model_path, mmap=False)
+            
+            if self.global_state_dict is not None:
+                payload, self.delta_residual = encode_delta(
+                    state_dict,
+                    self.global_state_dict,
+                    top_k=self.update_config.get("top_k"),
+                    bits=self.update_config.get("bits"),
+                    residual=self.delta_residual
+                )
+                
+                buffer = io.BytesIO()
+                torch.save(payload, buffer)
+                
+                full_size = sum(tensor.numel() * tensor.element_size() for tensor in state_dict.values())
+                logger.info(f"Encoded delta update: {buffer.tell() / 1024:.1f} KB (full model {full_size / 1024:.1f} KB)")
+                return buffer.getbuffer(), "delta"
+            
+            logger.warning("Global model of the round is not available; uploading the full model")
+        
+        return FlatModel.from_state_dict(state_dict).to_bytes(), "full"
+    
     def complete_round(self) -> bool:
         """Mark the current round as completed for this client."""
         if not self.current_round_id or not self.participant_id:
@@ -215,7 +493,7 @@ class FederatedClient:
         
         try:
             headers = self._get_headers()
-            response = requests.put(
+            response = self.session.put(
                 f"{self.server_url}/api/federated-learning/participants/{self.participant_id}/complete",
                 headers=headers
             )
@@ -232,6 +510,11 @@ class FederatedClient:
             logger.error(f"Error completing round: {str(e)}")
             return False
     
+    def close(self) -> None:
+        """Close the client's connections to the server and stop prefetching."""
+        self.prefetch_executor.shutdown(wait=False)
+        self.transfer.close()
+    
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for API requests."""
         headers = {
@@ -255,8 +538,26 @@ class FederatedClient:
             device_info["gpu_name"] = torch.cuda.get_device_name(0)
             device_info["gpu_count"] = torch.cuda.device_count()
         
+        if self.signing_key is not None:
+            device_info["public_key"] = public_key_to_pem(self.signing_key.public_key()).decode("ascii")
+        
         return device_info
     
+    def _load_signing_key(self, path: str):
+        """Load the key uploads are signed with, generating an Ed25519 key if there is none yet."""
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return load_private_key(f.read())
+        
+        private_key = generate_private_key("ed25519")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(private_key_to_pem(private_key))
+        os.chmod(path, 0o600)
+        
+        logger.info(f"Generated signing key at {path}")
+        return private_key
+    
     def _calculate_metrics(self, model_path: str) -> Dict[str, float]:
         """Calculate model performance metrics on local validation data."""
         # This would normally load the model and evaluate it on validation data
@@ -280,6 +581,11 @@ def run_federated_client():
     parser.add_argument("--data_path", type=str, required=True, help="Path to local data")
     parser.add_argument("--model_type", type=str, required=True, help="Type of model to train")
     parser.add_argument("--api_key", type=str, help="API key for authentication")
+    parser.add_argument("--signing_key", type=str, help="Private key to sign uploads with (generated if missing)")
+    parser.add_argument("--transfer_streams", type=int, default=DEFAULT_STREAMS, help="Model chunks transferred in parallel")
+    parser.add_argument("--transfer_chunk_size", type=int, default=DEFAULT_CHUNK_SIZE, help="Bytes per chunk of model transfers")
+    parser.add_argument("--dataset_cache_dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the preprocessed local dataset")
+    parser.add_argument("--no_dataset_cache", action="store_true", help="Decode the raw local data every round")
     
     args = parser.parse_args()
     
@@ -288,7 +594,11 @@ def run_federated_client():
         server_url=args.server_url,
         data_path=args.data_path,
         model_type=args.model_type,
-        api_key=args.api_key
+        api_key=args.api_key,
+        signing_key_path=args.signing_key,
+        transfer_streams=args.transfer_streams,
+        transfer_chunk_size=args.transfer_chunk_size,
+        dataset_cache_dir=None if args.no_dataset_cache else args.dataset_cache_dir
     )
     
     # Register with the server
@@ -297,57 +607,51 @@ def run_federated_client():
         return
     
     # Main client loop
+    check = True   # whether to ask the server for rounds, rather than wait for an event first
+    failures = 0   # consecutive failures, for the backoff before the next attempt
     while True:
         try:
             # Check for available rounds
-            rounds = client.check_for_rounds()
+            rounds = client.check_for_rounds() if check else {}
             
             if not rounds or "rounds" not in rounds or not rounds["rounds"]:
-                logger.info("No rounds currently available. Sleeping...")
-                import time
-                time.sleep(60)  # Check again in 1 minute
+                # Wait for the server to announce a round rather than polling for one
+                logger.info("No rounds currently available. Waiting for round events...")
+                events = client.wait_for_round_events()
+                
+                if events is None:
+                    # No event stream (e.g. an older server): fall back to polling with backoff
+                    failures += 1
+                    time.sleep(backoff_delay(failures - 1, IDLE_BACKOFF_BASE, IDLE_BACKOFF_MAX))
+                    check = True
+                else:
+                    failures = 0
+                    check = bool(events)
                 continue
             
-            # Join the first available round
+            # Join the first available round, then download, train and upload as one pipeline
             round_id = rounds["rounds"][0]["id"]
-            if not client.join_round(round_id):
-                logger.error(f"Failed to join round {round_id}. Trying again later.")
-                time.sleep(30)
+            if not client.run_round(round_id):
+                logger.error(f"Failed to take part in round {round_id}. Trying again later.")
+                failures += 1
+                time.sleep(backoff_delay(failures - 1, IDLE_BACKOFF_BASE, IDLE_BACKOFF_MAX))
                 continue
             
-            # Download the global model
-            global_model_path = client.download_global_model()
-            if not global_model_path:
-                logger.error("Failed to download global model. Aborting round.")
-                time.sleep(30)
-                continue
-            
-            # Train the local model
-            local_model_path = client.train_local_model(global_model_path)
-            if not local_model_path:
-                logger.error("Failed to train local model. Aborting round.")
-                time.sleep(30)
-                continue
-            
-            # Upload the local model
-            if not client.upload_local_model(local_model_path):
-                logger.error("Failed to upload local model. Aborting round.")
-                time.sleep(30)
-                continue
-            
-            # Complete the round
-            client.complete_round()
             logger.info(f"Successfully completed federated learning round {round_id}")
+            failures = 0
             
-            # Sleep before checking for new rounds
-            time.sleep(60)
-            
+            # Another round may already be waiting; otherwise the next check waits for events
+            check = True
+        
         except KeyboardInterrupt:
             logger.info("Interrupted by user. Shutting down client.")
+            client.close()
             break
         except Exception as e:
             logger.error(f"Unexpected error in client main loop: {str(e)}")
-            time.sleep(60)
+            failures += 1
+            time.sleep(backoff_delay(failures - 1, IDLE_BACKOFF_BASE, IDLE_BACKOFF_MAX))
+            check = True
 
 if __name__ == "__main__":
     run_federated_client()
@@ -0,0 +1,472 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import inspect
+import logging
+import threading
+from typing import Dict, List, Tuple, Any, Optional
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, Subset
+
+from federated_learning.common.signing import hash_file
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_DatasetCache")
+
+# Marker identifying the layout of a cache directory
+CACHE_FORMAT = "medhive-trainset/1"
+
+DEFAULT_CACHE_DIR = os.path.join("data", "cache", "train")
+
+# Shapes and dtypes of the samples, the shards and where every cached sample is stored
+CATALOG_FILENAME = "catalog.json"
+
+# Relative path -> [size, mtime_ns, sha256] of the data files hashed last time
+INDEX_FILENAME = "index.json"
+
+SHARDS_DIRNAME = "shards"
+
+# One `<content hash>.npy` per cached version of the data: (shard, row) of every sample, in dataset order
+MANIFESTS_DIRNAME = "manifests"
+
+# Samples decoded per batch while shards are written
+BUILD_BATCH_SIZE = 64
+
+# Upper bound on the bytes of one shard
+SHARD_BYTES = 256 * 1024 * 1024
+
+
+def file_hashes(path: str, index_path: Optional[str] = None) -> Dict[str, str]:
+    """
+    Hash every file of a data directory.
+    
+    With an index, files whose size and modification time match the index are
+    not read again, so checking unchanged data costs one `stat` per file.
+    
+    Args:
+        path: Directory (or single file) holding the data
+        index_path: Optional JSON file remembering the hash of every file, updated in place
+    
+    Returns:
+        Relative path -> hex SHA-256 of the file's content
+    """
+    if os.path.isfile(path):
+        files = {os.path.basename(path): path}
+    else:
+        files = {
+            os.path.relpath(os.path.join(root, name), path): os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+        }
+    
+    index = {}
+    if index_path is not None and os.path.exists(index_path):
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except ValueError:
+            index = {}
+    
+    updated = {}
+    for relative in sorted(files):
+        stat = os.stat(files[relative])
+        known = index.get(relative)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            file_hash = known[2]
+        else:
+            file_hash = hash_file(files[relative]).hex()
+        updated[relative] = [stat.st_size, stat.st_mtime_ns, file_hash]
+    
+    if index_path is not None and updated != index:
+        _write_json(index_path, updated)
+    
+    return {relative: entry[2] for relative, entry in updated.items()}
+
+
+def preprocessing_fingerprint(dataset_class: type) -> str:
+    """
+    Identify the code that turns data files into samples.
+    
+    Changing the dataset class's source file changes the fingerprint, so
+    samples decoded by an earlier version are not reused.
+    
+    Args:
+        dataset_class: The model type's `CustomDataset`
+    
+    Returns:
+        Hex digest over the class's name and the content of its source file
+    """
+    digest = hashlib.sha256(f"{dataset_class.__module__}.{dataset_class.__qualname__}".encode("utf-8"))
+    try:
+        digest.update(hash_file(inspect.getsourcefile(dataset_class)))
+    except (TypeError, OSError):
+        # Classes without a source file are identified by their name only
+        pass
+    return digest.hexdigest()
+
+
+def _write_json(path: str, data: Any) -> None:
+    """Write a JSON file atomically."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _shard_paths(path: str, shard: int) -> Tuple[str, str]:
+    """Paths of the inputs and targets arrays of a shard."""
+    shards_dir = os.path.join(path, SHARDS_DIRNAME)
+    return os.path.join(shards_dir, f"{shard}.inputs.npy"), os.path.join(shards_dir, f"{shard}.targets.npy")
+
+
+class CachedDataset(Dataset):
+    """
+    A preprocessed training set stored as sharded, memory-mapped arrays.
+    
+    Samples are stored exactly as the dataset produced them, so reading one is
+    a slice of a memory map rather than a decode. `__getitems__` gathers a
+    whole batch with one indexing operation per shard, which `DataLoader`
+    uses instead of fetching samples one by one. Shards are opened lazily in
+    each process, so the dataset pickles cheaply into `DataLoader` workers,
+    which then share the same page cache.
+    """
+    
+    def __init__(self, path: str, digest: str):
+        """
+        Open one cached version of a dataset written by `DatasetCache`.
+        
+        Args:
+            path: Cache directory of the data path
+            digest: Content hash of the version to open
+        """
+        self.path = path
+        self.digest = digest
+        
+        with open(os.path.join(path, CATALOG_FILENAME), "r") as f:
+            catalog = json.load(f)
+        
+        if catalog.get("format") != CACHE_FORMAT:
+            raise ValueError(f"Unsupported dataset cache format in {path}: {catalog.get('format')}")
+        
+        self.input_dtype = np.dtype(catalog["inputs"]["dtype"])
+        self.input_shape = tuple(catalog["inputs"]["shape"])
+        self.target_dtype = np.dtype(catalog["targets"]["dtype"])
+        self.target_shape = tuple(catalog["targets"]["shape"])
+        
+        # (shard, row) of every sample
+        self.locations = np.load(os.path.join(path, MANIFESTS_DIRNAME, f"{digest}.npy"))
+        self._shards: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Memory maps are reopened in the receiving process rather than pickled
+        state = dict(self.__dict__)
+        state["_shards"] = None
+        return state
+    
+    def _shard(self, shard: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the memory-mapped (inputs, targets) of a shard."""
+        if self._shards is None:
+            self._shards = {}
+        
+        arrays = self._shards.get(shard)
+        if arrays is None:
+            inputs_path, targets_path = _shard_paths(self.path, shard)
+            arrays = (np.load(inputs_path, mmap_mode="r"), np.load(targets_path, mmap_mode="r"))
+            self._shards[shard] = arrays
+        return arrays
+    
+    def __len__(self) -> int:
+        return len(self.locations)
+    
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        shard, row = self.locations[index]
+        inputs, targets = self._shard(int(shard))
+        return torch.from_numpy(np.array(inputs[row])), torch.from_numpy(np.array(targets[row]))
+    
+    def __getitems__(self, indices: List[int]) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+        """
+        Get a batch of samples, gathered from the shards in one operation per shard.
+        
+        Args:
+            indices: Samples of the batch
+        
+        Returns:
+            The samples, as views into one inputs and one targets tensor
+        """
+        locations = self.locations[np.asarray(indices, dtype=np.int64)]
+        shards = np.unique(locations[:, 0])
+        
+        if len(shards) == 1:
+            shard_inputs, shard_targets = self._shard(int(shards[0]))
+            inputs = shard_inputs[locations[:, 1]]
+            targets = shard_targets[locations[:, 1]]
+        else:
+            inputs = np.empty((len(locations),) + self.input_shape, dtype=self.input_dtype)
+            targets = np.empty((len(locations),) + self.target_shape, dtype=self.target_dtype)
+            for shard in shards:
+                mask = locations[:, 0] == shard
+                shard_inputs, shard_targets = self._shard(int(shard))
+                inputs[mask] = shard_inputs[locations[mask, 1]]
+                targets[mask] = shard_targets[locations[mask, 1]]
+        
+        return list(zip(torch.from_numpy(inputs).unbind(0), torch.from_numpy(targets).unbind(0)))
+
+
+class DatasetCache:
+    """
+    Preprocesses a client's training data once and keeps it on disk between rounds.
+    
+    A hospital's data rarely changes between rounds, so after the first round
+    training reads samples from memory-mapped shards instead of decoding the
+    raw files again. Every version of the data is identified by the content
+    hash of its files (and of the dataset's code); hashes of unchanged files
+    are reused from an index, so checking the cache costs one `stat` per file.
+    
+    Invalidation is incremental for datasets that tell which file each sample
+    comes from, through a `source_file(index)` method: samples are cached
+    under their file's path and content hash, so adding, changing or removing
+    files only decodes the samples of those files, while a change to any other
+    file (e.g. a labels CSV) decodes everything. Datasets without the method
+    are decoded in full whenever a file changes. Datasets whose samples are
+    random (e.g. augmented) set `cacheable = False` and are not cached.
+    """
+    
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        Initialize the dataset cache.
+        
+        Args:
+            cache_dir: Directory holding one subdirectory per model type and data path
+        """
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+    
+    def get(self, model_type: str, data_path: str, dataset_class: type) -> CachedDataset:
+        """
+        Get the cached version of a dataset, decoding whatever is missing or stale.
+        
+        Args:
+            model_type: Type of model
+            data_path: Path to the data
+            dataset_class: The model type's `CustomDataset`, instantiated with `data_path` if samples must be decoded
+        
+        Returns:
+            The cached dataset, with the samples in the dataset's order
+        """
+        source_key = hashlib.sha256(os.path.abspath(data_path).encode("utf-8")).hexdigest()[:16]
+        path = os.path.join(self.cache_dir, model_type, source_key)
+        fingerprint = preprocessing_fingerprint(dataset_class)
+        
+        with self._lock:
+            hashes = file_hashes(data_path, os.path.join(path, INDEX_FILENAME))
+            
+            digest = hashlib.sha256(fingerprint.encode("utf-8"))
+            for relative, file_hash in hashes.items():
+                digest.update(f"{relative}\0{file_hash}\n".encode("utf-8"))
+            digest = digest.hexdigest()
+            
+            if os.path.exists(os.path.join(path, MANIFESTS_DIRNAME, f"{digest}.npy")):
+                return CachedDataset(path, digest)
+            
+            dataset = dataset_class(data_path)
+            if len(dataset) == 0:
+                raise ValueError(f"Dataset at {data_path} is empty")
+            
+            catalog = self._load_catalog(path, model_type, data_path, fingerprint)
+            keys = self._sample_keys(dataset, data_path, hashes, digest)
+            
+            missing = [index for index, key in enumerate(keys) if key not in catalog["samples"]]
+            logger.info(
+                f"Updating dataset cache for {model_type}: decoding {len(missing)} of {len(keys)} samples"
+            )
+            if missing:
+                self._write_shards(path, dataset, missing, keys, catalog)
+                _write_json(os.path.join(path, CATALOG_FILENAME), catalog)
+            
+            self._write_manifest(path, digest, [catalog["samples"][key] for key in keys])
+            self._prune(path, digest, set(keys), catalog)
+        
+        return CachedDataset(path, digest)
+    
+    def _load_catalog(self, path: str, model_type: str, data_path: str, fingerprint: str) -> Dict[str, Any]:
+        """Read the catalog of a cache directory, starting over if it was written by other code."""
+        catalog_path = os.path.join(path, CATALOG_FILENAME)
+        
+        if os.path.exists(catalog_path):
+            try:
+                with open(catalog_path, "r") as f:
+                    catalog = json.load(f)
+                if catalog.get("format") == CACHE_FORMAT and catalog.get("fingerprint") == fingerprint:
+                    return catalog
+            except ValueError:
+                pass
+            
+            logger.info(f"Dataset code or cache format changed; discarding cached samples in {path}")
+            for name in (SHARDS_DIRNAME, MANIFESTS_DIRNAME):
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        
+        return {
+            "format": CACHE_FORMAT,
+            "fingerprint": fingerprint,
+            "model_type": model_type,
+            "source": os.path.abspath(data_path),
+            "inputs": None,
+            "targets": None,
+            "next_shard": 0,
+            "shards": {},   # shard -> number of samples
+            "samples": {}   # sample key -> [shard, row]
+        }
+    
+    def _sample_keys(self, dataset: Dataset, data_path: str, hashes: Dict[str, str], digest: str) -> List[str]:
+        """
+        Key every sample by what its content depends on.
+        
+        Args:
+            dataset: Dataset being cached
+            data_path: Path to the data
+            hashes: Content hash of every data file
+            digest: Content hash of the whole data
+        
+        Returns:
+            One key per sample; samples of unchanged files keep their key across versions
+        """
+        num_samples = len(dataset)
+        source_file = getattr(dataset, "source_file", None)
+        if not callable(source_file):
+            return [f"{digest}:{index}" for index in range(num_samples)]
+        
+        root = os.path.dirname(os.path.abspath(data_path)) if os.path.isfile(data_path) else os.path.abspath(data_path)
+        sources = [os.path.relpath(os.path.abspath(os.path.join(root, source_file(index))), root) for index in range(num_samples)]
+        
+        # Files no sample comes from (labels, metadata) may affect every sample
+        shared = hashlib.sha256()
+        for relative in sorted(set(hashes) - set(sources)):
+            shared.update(f"{relative}\0{hashes[relative]}\n".encode("utf-8"))
+        shared = shared.hexdigest()
+        
+        keys = []
+        occurrences: Dict[str, int] = {}
+        for index, relative in enumerate(sources):
+            if relative not in hashes:
+                # A sample from outside the data path cannot be tracked by file
+                keys.append(f"{digest}:{index}")
+                continue
+            
+            occurrence = occurrences.get(relative, 0)
+            occurrences[relative] = occurrence + 1
+            keys.append(hashlib.sha256(f"{shared}\0{relative}\0{hashes[relative]}\0{occurrence}".encode("utf-8")).hexdigest())
+        
+        return keys
+    
+    def _write_shards(
+        self,
+        path: str,
+        dataset: Dataset,
+        indices: List[int],
+        keys: List[str],
+        catalog: Dict[str, Any]
+    ) -> None:
+        """Decode the samples at `indices` into new shards and record them in the catalog."""
+        os.makedirs(os.path.join(path, SHARDS_DIRNAME), exist_ok=True)
+        loader = DataLoader(Subset(dataset, indices), batch_size=BUILD_BATCH_SIZE, shuffle=False)
+        
+        shard = None
+        position = 0
+        
+        def finish_shard() -> None:
+            for array, tmp_path, final_path in zip(shard["arrays"], shard["tmp_paths"], shard["paths"]):
+                array.flush()
+                os.replace(tmp_path, final_path)
+            catalog["shards"][str(shard["id"])] = shard["rows"]
+        
+        for batch_inputs, batch_targets in loader:
+            batch_inputs = torch.as_tensor(batch_inputs).numpy()
+            batch_targets = torch.as_tensor(batch_targets).numpy()
+            
+            inputs_meta = {"dtype": str(batch_inputs.dtype), "shape": list(batch_inputs.shape[1:])}
+            targets_meta = {"dtype": str(batch_targets.dtype), "shape": list(batch_targets.shape[1:])}
+            if catalog["inputs"] is None:
+                catalog["inputs"], catalog["targets"] = inputs_meta, targets_meta
+            elif (catalog["inputs"], catalog["targets"]) != (inputs_meta, targets_meta):
+                raise ValueError(
+                    f"Samples of {inputs_meta} / {targets_meta} do not match the cached "
+                    f"{catalog['inputs']} / {catalog['targets']}"
+                )
+            
+            start = 0
+            while start < len(batch_inputs):
+                if shard is None or shard["rows"] == len(shard["arrays"][0]):
+                    if shard is not None:
+                        finish_shard()
+                    sample_bytes = batch_inputs[0].nbytes + batch_targets[0].nbytes
+                    rows = min(len(indices) - position, max(1, SHARD_BYTES // max(1, sample_bytes)))
+                    shard_id = catalog["next_shard"]
+                    catalog["next_shard"] += 1
+                    paths = _shard_paths(path, shard_id)
+                    tmp_paths = [f"{p}.{uuid.uuid4().hex}.tmp" for p in paths]
+                    shard = {
+                        "id": shard_id,
+                        "rows": 0,
+                        "paths": paths,
+                        "tmp_paths": tmp_paths,
+                        "arrays": [
+                            np.lib.format.open_memmap(tmp_paths[0], mode="w+", dtype=batch_inputs.dtype, shape=(rows,) + batch_inputs.shape[1:]),
+                            np.lib.format.open_memmap(tmp_paths[1], mode="w+", dtype=batch_targets.dtype, shape=(rows,) + batch_targets.shape[1:])
+                        ]
+                    }
+                
+                count = min(len(batch_inputs) - start, len(shard["arrays"][0]) - shard["rows"])
+                row = shard["rows"]
+                shard["arrays"][0][row:row + count] = batch_inputs[start:start + count]
+                shard["arrays"][1][row:row + count] = batch_targets[start:start + count]
+                
+                for offset in range(count):
+                    catalog["samples"][keys[indices[position + offset]]] = [shard["id"], row + offset]
+                
+                shard["rows"] += count
+                position += count
+                start += count
+        
+        if shard is not None:
+            finish_shard()
+    
+    def _write_manifest(self, path: str, digest: str, locations: List[List[int]]) -> None:
+        """Write the (shard, row) of every sample of a version of the data, atomically."""
+        manifests_dir = os.path.join(path, MANIFESTS_DIRNAME)
+        os.makedirs(manifests_dir, exist_ok=True)
+        
+        tmp_path = os.path.join(manifests_dir, f"{digest}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(locations, dtype=np.int64).reshape(-1, 2))
+        os.replace(tmp_path, os.path.join(manifests_dir, f"{digest}.npy"))
+    
+    def _prune(self, path: str, digest: str, keys: set, catalog: Dict[str, Any]) -> None:
+        """Drop other versions of the data, then the samples and shards only they used."""
+        manifests_dir = os.path.join(path, MANIFESTS_DIRNAME)
+        for name in os.listdir(manifests_dir):
+            if name != f"{digest}.npy":
+                os.remove(os.path.join(manifests_dir, name))
+        
+        samples = {key: location for key, location in catalog["samples"].items() if key in keys}
+        live = {str(location[0]) for location in samples.values()}
+        dead = set(catalog["shards"]) - live
+        
+        if len(samples) != len(catalog["samples"]) or dead:
+            catalog["samples"] = samples
+            catalog["shards"] = {shard: rows for shard, rows in catalog["shards"].items() if shard in live}
+            _write_json(os.path.join(path, CATALOG_FILENAME), catalog)
+        
+        # Remove shards no longer in the catalog, including leftovers of interrupted builds
+        shards_dir = os.path.join(path, SHARDS_DIRNAME)
+        for name in os.listdir(shards_dir) if os.path.isdir(shards_dir) else []:
+            if name.endswith(".tmp") or name.split(".", 1)[0] not in catalog["shards"]:
+                os.remove(os.path.join(shards_dir, name))
@@ -1,13 +1,27 @@
 import os
 import io
 import logging
-from typing import Dict, Tuple, Any, Union
+import functools
+from typing import Dict, Tuple, Any, Union, Iterable
 import torch
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
 
+from federated_learning.common.encrypted_stream import (
+    HEADER_SIZE,
+    derive_stream_key,
+    is_encrypted_stream,
+    encrypt_bytes,
+    decrypt_bytes,
+    encrypt_file,
+    decrypt_file,
+    decrypt_file_to_buffer,
+    decrypt_chunks
+)
+from federated_learning.common.flat import pack_tensors, unpack_tensors
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -19,6 +33,9 @@ logger = logging.getLogger("FL_Encryption")
 KEY_PATH = os.path.expanduser("~/.federated_learning/encryption_key")
 SALT_PATH = os.path.expanduser("~/.federated_learning/salt")
 
+# Key file path -> key, so the key file is read once per process
+_key_cache: Dict[str, bytes] = {}
+
 def _ensure_key_directory():
     """Ensure the directory for encryption keys exists."""
     key_dir = os.path.dirname(KEY_PATH)
@@ -55,6 +72,10 @@ def _generate_key(password: str = None) -> bytes:
 
 def _get_encryption_key() -> bytes:
     """Get the encryption key, creating it if it doesn't exist."""
+    key = _key_cache.get(KEY_PATH)
+    if key is not None:
+        return key
+    
     if os.path.exists(KEY_PATH):
         with open(KEY_PATH, "rb") as f:
             key = f.read()
@@ -65,40 +86,53 @@ def _get_encryption_key() -> bytes:
             f.write(key)
         os.chmod(KEY_PATH, 0o600)  # Secure permissions
     
+    _key_cache[KEY_PATH] = key
     return key
 
+@functools.lru_cache(maxsize=8)
+def _cipher_for_key(key: bytes) -> Fernet:
+    """Fernet cipher of a key."""
+    return Fernet(key)
+
+@functools.lru_cache(maxsize=8)
+def _stream_key_for_key(key: bytes) -> bytes:
+    """Stream key derived from a key."""
+    return derive_stream_key(base64.urlsafe_b64decode(key))
+
 def _get_cipher() -> Fernet:
     """Get the encryption cipher."""
-    key = _get_encryption_key()
-    return Fernet(key)
+    return _cipher_for_key(_get_encryption_key())
+
+def _get_stream_key() -> bytes:
+    """Get the key of encrypted model streams, derived from the encryption key."""
+    return _stream_key_for_key(_get_encryption_key())
+
+def clear_key_cache() -> None:
+    """Forget cached key material, e.g. after the key file was replaced."""
+    _key_cache.clear()
+    _cipher_for_key.cache_clear()
+    _stream_key_for_key.cache_clear()
 
-def encrypt_model(model_path: str) -> str:
+def encrypt_model(model_path: str, cipher: str = "aes-256-gcm") -> str:
     """
-    Encrypt a PyTorch model file.
+    Encrypt a model file.
+    
+    The file is encrypted byte for byte, so any model format (flat model
+    files, PyTorch checkpoints, delta payloads) round-trips unchanged. It is
+    streamed through authenticated encryption one frame at a time (see
+    federated_learning.common.encrypted_stream), so memory use does not
+    grow with the model size.
     
     Args:
-        model_path: Path to the PyTorch model file (.pt or .pth)
-        
+        model_path: Path to the model file
+        cipher: 'aes-256-gcm' or 'chacha20-poly1305' (faster without AES hardware support)
+    
     Returns:
         Path to the encrypted model file
     """
     try:
-        # Load the model
-        model_data = torch.load(model_path)
-        
-        # Serialize the model to a byte buffer
-        buffer = io.BytesIO()
-        torch.save(model_data, buffer)
-        model_bytes = buffer.getvalue()
-        
-        # Encrypt the serialized model
-        cipher = _get_cipher()
-        encrypted_data = cipher.encrypt(model_bytes)
-        
-        # Save the encrypted model
         encrypted_path = f"{model_path}.encrypted"
-        with open(encrypted_path, "wb") as f:
-            f.write(encrypted_data)
+        encrypt_file(_get_stream_key(), model_path, encrypted_path, cipher=cipher)
         
         logger.info(f"Model encrypted and saved to {encrypted_path}")
         return encrypted_path
@@ -108,30 +142,34 @@ def encrypt_model(model_path: str) -> str:
 
 def decrypt_model(encrypted_path: str) -> str:
     """
-    Decrypt an encrypted PyTorch model file.
+    Decrypt an encrypted model file.
+    
+    Files written by earlier versions as a single Fernet token are still
+    decrypted, in memory.
     
     Args:
         encrypted_path: Path to the encrypted model file
-        
+    
     Returns:
         Path to the decrypted model file
     """
     try:
-        # Read the encrypted data
-        with open(encrypted_path, "rb") as f:
-            encrypted_data = f.read()
-        
-        # Decrypt the data
-        cipher = _get_cipher()
-        decrypted_data = cipher.decrypt(encrypted_data)
+        decrypted_path = encrypted_path.replace(".encrypted", "")
         
-        # Load the model from the decrypted data
-        buffer = io.BytesIO(decrypted_data)
-        model_data = torch.load(buffer)
+        with open(encrypted_path, "rb") as f:
+            prefix = f.read(HEADER_SIZE)
         
-        # Save the decrypted model
-        decrypted_path = encrypted_path.replace(".encrypted", "")
-        torch.save(model_data, decrypted_path)
+        if is_encrypted_stream(prefix):
+            # Decrypting in place goes through a temporary file
+            output_path = decrypted_path if decrypted_path != encrypted_path else f"{encrypted_path}.tmp"
+            decrypt_file(_get_stream_key(), encrypted_path, output_path)
+            if output_path != decrypted_path:
+                os.replace(output_path, decrypted_path)
+        else:
+            with open(encrypted_path, "rb") as f:
+                decrypted_data = _get_cipher().decrypt(f.read())
+            with open(decrypted_path, "wb") as f:
+                f.write(decrypted_data)
         
         logger.info(f"Model decrypted and saved to {decrypted_path}")
         return decrypted_path
@@ -139,13 +177,80 @@ def decrypt_model(encrypted_path: str) -> str:
         logger.error(f"Error decrypting model: {str(e)}")
         return ""
 
+def encrypt_model_bytes(data: bytes, cipher: str = "aes-256-gcm") -> bytearray:
+    """
+    Encrypt a serialized model held in memory, e.g. to upload it without writing it to disk.
+    
+    The result is the same format `encrypt_model` writes.
+    
+    Args:
+        data: Contents of the model file
+        cipher: 'aes-256-gcm' or 'chacha20-poly1305'
+    
+    Returns:
+        Encrypted model
+    """
+    return encrypt_bytes(_get_stream_key(), data, cipher)
+
+def decrypt_model_to_memory(encrypted_path: str) -> bytearray:
+    """
+    Decrypt an encrypted model file straight into memory, without a decrypted copy on disk.
+    
+    Files written by earlier versions as a single Fernet token are still
+    decrypted.
+    
+    Args:
+        encrypted_path: Path to the encrypted model file
+    
+    Returns:
+        Contents of the decrypted model file
+    
+    Raises:
+        ValueError: If the file is truncated, tampered with or not encrypted with this client's key
+    """
+    with open(encrypted_path, "rb") as f:
+        prefix = f.read(HEADER_SIZE)
+    
+    if is_encrypted_stream(prefix):
+        return decrypt_file_to_buffer(_get_stream_key(), encrypted_path)
+    
+    with open(encrypted_path, "rb") as f:
+        try:
+            return bytearray(_get_cipher().decrypt(f.read()))
+        except InvalidToken:
+            raise ValueError(f"{encrypted_path} is not a valid encrypted model")
+
+def decrypt_model_stream(chunks: Iterable[bytes], output_path: str) -> str:
+    """
+    Decrypt an encrypted model as it is received (e.g. from an HTTP response) straight into a file.
+    
+    Args:
+        chunks: The encrypted model, in order
+        output_path: Path to write the decrypted model to
+    
+    Returns:
+        Path to the decrypted model file, or "" if the stream was truncated or tampered with
+    """
+    try:
+        with open(output_path, "wb") as f:
+            for data in decrypt_chunks(_get_stream_key(), chunks):
+                f.write(data)
+        
+        logger.info(f"Model decrypted and saved to {output_path}")
+        return output_path
+    except Exception as e:
+        logger.error(f"Error decrypting model: {str(e)}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return ""
+
 def encrypt_tensor(tensor: torch.Tensor) -> Tuple[bytes, Dict[str, Any]]:
     """
     Encrypt a PyTorch tensor.
     
     Args:
         tensor: The tensor to encrypt
-        
+    
     Returns:
         Tuple containing the encrypted data and metadata
     """
@@ -178,7 +283,7 @@ def decrypt_tensor(encrypted_data: bytes, metadata: Dict[str, Any]) -> Union[tor
     Args:
         encrypted_data: The encrypted tensor data
         metadata: Metadata about the tensor
-        
+    
     Returns:
         The decrypted tensor, or None if decryption failed
     """
@@ -196,40 +301,44 @@ def decrypt_tensor(encrypted_data: bytes, metadata: Dict[str, Any]) -> Union[tor
         logger.error(f"Error decrypting tensor: {str(e)}")
         return None
 
-def encrypt_gradients(gradients: Dict[str, torch.Tensor]) -> Dict[str, Any]:
+def encrypt_gradients(gradients: Dict[str, torch.Tensor], cipher: str = "aes-256-gcm") -> bytearray:
     """
-    Encrypt model gradients (dictionary of tensors).
+    Encrypt model gradients (dictionary of tensors) as one packed envelope.
+    
+    All tensors are copied into one buffer with a layout header (see
+    `pack_tensors`), keeping their dtypes, and the buffer is encrypted once
+    in the encrypted stream format. The result is raw bytes, to be sent as
+    a binary body rather than inside JSON.
     
     Args:
         gradients: Dictionary mapping parameter names to gradients
-        
+        cipher: 'aes-256-gcm' or 'chacha20-poly1305'
+    
     Returns:
-        Dictionary with encrypted gradients and metadata
+        Encrypted envelope
     """
-    encrypted_gradients = {}
+    packed = pack_tensors({name: grad for name, grad in gradients.items() if grad is not None})
+    envelope = encrypt_bytes(_get_stream_key(), packed, cipher)
     
-    for name, grad in gradients.items():
-        if grad is not None:
-            encrypted_data, metadata = encrypt_tensor(grad)
-            if encrypted_data is not None:
-                encrypted_gradients[name] = {
-                    "data": base64.b64encode(encrypted_data).decode('utf-8'),
-                    "metadata": metadata
-                }
-    
-    logger.info(f"Encrypted {len(encrypted_gradients)} gradient tensors")
-    return encrypted_gradients
+    logger.info(f"Encrypted {len(gradients)} gradient tensors into {len(envelope)} bytes")
+    return envelope
 
-def decrypt_gradients(encrypted_gradients: Dict[str, Any]) -> Dict[str, torch.Tensor]:
+def decrypt_gradients(encrypted_gradients: Union[bytes, Dict[str, Any]]) -> Dict[str, torch.Tensor]:
     """
     Decrypt model gradients.
     
     Args:
-        encrypted_gradients: Dictionary with encrypted gradients and metadata
-        
+        encrypted_gradients: Envelope from `encrypt_gradients`, or the per-tensor
+            dictionary produced by earlier versions
+    
     Returns:
         Dictionary mapping parameter names to decrypted gradients
     """
+    if not isinstance(encrypted_gradients, dict):
+        gradients = unpack_tensors(decrypt_bytes(_get_stream_key(), encrypted_gradients))
+        logger.info(f"Decrypted {len(gradients)} gradient tensors")
+        return gradients
+    
     gradients = {}
     
     for name, encrypted_item in encrypted_gradients.items():
@@ -8,6 +8,12 @@ import numpy as np
 from typing import Dict, Any, Optional, List, Tuple
 import importlib
 import json
+import time
+
+from federated_learning.client.dataset_cache import DatasetCache
+from federated_learning.client.training_runtime import tune_runtime, make_loader
+from federated_learning.common.flat import load_state_dict_file
+from federated_learning.common.model_factory import create_model, load_model_weights
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +22,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger("FL_Training")
 
+# Training batches between loss log lines; the loss is only read back from the device at these points
+LOG_INTERVAL = 10
+
 def load_model(model_type: str, model_path: str) -> nn.Module:
     """
     Load a model of the specified type from the given path.
@@ -28,19 +37,13 @@ def load_model(model_type: str, model_path: str) -> nn.Module:
         PyTorch model loaded with weights
     """
     try:
-        # Import the model module dynamically
-        module_path = f"federated_learning.models.{model_type}.model"
-        model_module = importlib.import_module(module_path)
-        
-        # Get the model class and create an instance
-        model_class = getattr(model_module, "Model")
-        model = model_class()
-        
-        # Load weights if the model path exists
+        # Load weights if the model path exists; the model is then cloned from a cached
+        # template without running its weight initialization
         if os.path.exists(model_path):
-            model.load_state_dict(torch.load(model_path))
+            model = load_model_weights(model_type, load_state_dict_file(model_path, mmap=False))
             logger.info(f"Loaded model weights from {model_path}")
         else:
+            model = create_model(model_type)
             logger.warning(f"Model path {model_path} not found, using default initialization")
         
         return model
@@ -48,13 +51,14 @@ def load_model(model_type: str, model_path: str) -> nn.Module:
         logger.error(f"Error loading model: {str(e)}")
         raise
 
-def load_dataset(model_type: str, data_path: str) -> Dataset:
+def load_dataset(model_type: str, data_path: str, cache: Optional[DatasetCache] = None) -> Dataset:
     """
     Load a dataset for the specified model type from the given path.
     
     Args:
         model_type: Type of model (e.g., 'pneumonia', 'ecg_analysis')
         data_path: Path to the dataset
+        cache: Optional cache of preprocessed samples to read the dataset from
     
     Returns:
         PyTorch Dataset
@@ -66,6 +70,13 @@ def load_dataset(model_type: str, data_path: str) -> Dataset:
         
         # Get the dataset class and create an instance
         dataset_class = getattr(dataset_module, "CustomDataset")
+        
+        if cache is not None and getattr(dataset_class, "cacheable", True):
+            try:
+                return cache.get(model_type, data_path, dataset_class)
+            except Exception as e:
+                logger.warning(f"Dataset cache unavailable ({str(e)}), reading {data_path} directly")
+        
         dataset = dataset_class(data_path)
         
         return dataset
@@ -177,33 +188,39 @@ def evaluate_model(model: nn.Module, dataloader: DataLoader, loss_fn: nn.Module,
             # Forward pass
             outputs = model(inputs)
             
-            # Calculate loss
+            # Calculate loss; sums stay on the device until the end
             loss = loss_fn(outputs, targets)
-            total_loss += loss.item() * inputs.size(0)
+            total_loss += loss.detach() * inputs.size(0)
             
             # Calculate accuracy and confusion matrix values
             if targets.dim() == 1:  # Multi-class classification
                 _, predicted = torch.max(outputs, 1)
-                total_correct += (predicted == targets).sum().item()
+                total_correct += (predicted == targets).sum()
                 
                 # For simplicity, we only calculate binary metrics for binary classification or first class in multi-class
                 binary_targets = (targets == 1).float()
                 binary_preds = (predicted == 1).float()
             else:  # Binary classification
                 predicted = (outputs >= 0.5).float()
-                total_correct += (predicted == targets).sum().item()
+                total_correct += (predicted == targets).sum()
                 
                 binary_targets = targets
                 binary_preds = predicted
             
             # Update confusion matrix values
-            true_positives += ((binary_preds == 1) & (binary_targets == 1)).sum().item()
-            true_negatives += ((binary_preds == 0) & (binary_targets == 0)).sum().item()
-            false_positives += ((binary_preds == 1) & (binary_targets == 0)).sum().item()
-            false_negatives += ((binary_preds == 0) & (binary_targets == 1)).sum().item()
+            true_positives += ((binary_preds == 1) & (binary_targets == 1)).sum()
+            true_negatives += ((binary_preds == 0) & (binary_targets == 0)).sum()
+            false_positives += ((binary_preds == 1) & (binary_targets == 0)).sum()
+            false_negatives += ((binary_preds == 0) & (binary_targets == 1)).sum()
             
             total_samples += targets.size(0)
     
+    # One read back from the device for the whole evaluation
+    total_loss = float(total_loss)
+    total_correct, true_positives, true_negatives, false_positives, false_negatives = (
+        int(count) for count in (total_correct, true_positives, true_negatives, false_positives, false_negatives)
+    )
+    
     # Calculate metrics
     avg_loss = total_loss / total_samples
     accuracy = total_correct / total_samples
@@ -224,31 +241,68 @@ def evaluate_model(model: nn.Module, dataloader: DataLoader, loss_fn: nn.Module,
     
     return metrics
 
-def train_model(
-    global_model_path: str,
+def prefetch_dataset(
+    model_type: str,
     data_path: str,
+    warm_samples: int = 256,
+    cache: Optional[DatasetCache] = None
+) -> Dataset:
+    """
+    Load a dataset and read its first samples.
+    
+    Meant to run on a background thread while the global model downloads,
+    so that index files are parsed, lazily opened files are open and the OS
+    cache is warm by the time training starts.
+    
+    Args:
+        model_type: Type of model (e.g., 'pneumonia', 'ecg_analysis')
+        data_path: Path to the dataset
+        warm_samples: Number of leading samples to read
+        cache: Optional cache of preprocessed samples, updated here if the data changed
+    
+    Returns:
+        PyTorch Dataset
+    """
+    dataset = load_dataset(model_type, data_path, cache)
+    
+    for index in range(min(warm_samples, len(dataset))):
+        dataset[index]
+    
+    logger.info(f"Prefetched dataset of {len(dataset)} samples from {data_path}")
+    return dataset
+
+def train_state_dict(
+    global_state_dict: Dict[str, torch.Tensor],
+    dataset: Dataset,
     model_type: str,
-    round_id: int,
-    client_id: str,
     epochs: Optional[int] = None,
     batch_size: Optional[int] = None,
-    device: Optional[str] = None
-) -> str:
+    device: Optional[str] = None,
+    proximal_mu: float = 0.0,
+    validate_every: Optional[int] = None
+) -> Tuple[Dict[str, torch.Tensor], Dict[str, torch.Tensor], List[Dict[str, float]]]:
     """
-    Train a model locally.
+    Train a model locally, entirely in memory.
+    
+    Loader workers, compute threads and, unless set, the batch size are
+    chosen for the host by profiling the first batches (see `tune_runtime`).
     
     Args:
-        global_model_path: Path to the global model to start from
-        data_path: Path to local data
+        global_state_dict: State dict of the global model to start from
+        dataset: Local dataset, split 80/20 into training and validation data
         model_type: Type of model to train
-        round_id: Current federated learning round ID
-        client_id: Client ID
         epochs: Number of training epochs (if None, will use model-specific default)
-        batch_size: Batch size for training (if None, will use model-specific default)
+        batch_size: Batch size for training (if None, will use the model-specific default;
+            a default of "auto", or none at all, is tuned for the host)
         device: Device to train on (if None, will use GPU if available)
+        proximal_mu: Weight of the FedProx proximal term (mu / 2) * ||w - w_global||^2; 0 disables it
+        validate_every: Validate every this many epochs, and always after the last one
+            (if None, will use the model-specific `validate_every`, else 1)
     
     Returns:
-        Path to the trained model
+        Tuple of (state dict of the validated epoch with the best validation F1 score, state dict
+        after the last epoch, validation metrics of every validated epoch, with its 'epoch' and the
+        'train_samples_per_s' since the previous validation); state dicts are on the CPU
     """
     # Set device
     if device is None:
@@ -258,18 +312,18 @@ def train_model(
     
     logger.info(f"Training on {device}")
     
-    # Load model
-    model = load_model(model_type, global_model_path).to(device)
+    # Load model; it is cloned from a cached template without running its weight initialization
+    model = load_model_weights(model_type, global_state_dict).to(device)
     
-    # Load dataset
-    full_dataset = load_dataset(model_type, data_path)
+    # Keep the global weights for the FedProx proximal term
+    global_params = [p.detach().clone() for p in model.parameters()] if proximal_mu > 0 else None
     
     # Split dataset into train and validation
-    train_size = int(0.8 * len(full_dataset))
-    val_size = len(full_dataset) - train_size
+    train_size = int(0.8 * len(dataset))
+    val_size = len(dataset) - train_size
     
     train_dataset, val_dataset = random_split(
-        full_dataset, [train_size, val_size],
+        dataset, [train_size, val_size],
         generator=torch.Generator().manual_seed(42)  # For reproducibility
     )
     
@@ -283,44 +337,84 @@ def train_model(
             epochs = hyperparams.get("epochs", 5)
         
         if batch_size is None:
-            batch_size = hyperparams.get("batch_size", 32)
+            batch_size = hyperparams.get("batch_size")
+        
+        if validate_every is None:
+            validate_every = hyperparams.get("validate_every", 1)
     except Exception as e:
         logger.warning(f"Error loading hyperparameters: {str(e)}, using defaults")
         if epochs is None:
             epochs = 5
-        if batch_size is None:
-            batch_size = 32
-    
-    # Create data loaders
-    train_loader = DataLoader(
-        train_dataset,
-        batch_size=batch_size,
-        shuffle=True,
-        num_workers=4,
-        pin_memory=True if device.type == "cuda" else False
-    )
     
-    val_loader = DataLoader(
-        val_dataset,
-        batch_size=batch_size,
-        shuffle=False,
-        num_workers=4,
-        pin_memory=True if device.type == "cuda" else False
-    )
+    validate_every = max(1, validate_every or 1)
     
     # Get optimizer and loss function
     optimizer = get_optimizer(model, model_type)
     loss_fn = get_loss_function(model_type)
     
-    # Training loop
-    logger.info(f"Starting training for {epochs} epochs")
+    # The thread count is the process's; it is restored after training
+    num_threads = torch.get_num_threads()
+    
+    try:
+        # Choose loader workers, threads and batch size for this host
+        runtime = tune_runtime(
+            model, loss_fn, train_dataset, device,
+            batch_size=None if batch_size in (None, "auto") else batch_size,
+            epochs=epochs
+        )
+        torch.set_num_threads(runtime["num_threads"])
+        
+        # Create data loaders
+        train_loader = make_loader(train_dataset, runtime, device, shuffle=True)
+        val_loader = make_loader(val_dataset, runtime, device, shuffle=False)
+        
+        # Training loop
+        logger.info(f"Starting training for {epochs} epochs")
+        
+        best_state_dict, metrics_history = _train_epochs(
+            model, optimizer, loss_fn, train_loader, val_loader, device, epochs, validate_every, global_params, proximal_mu
+        )
+    finally:
+        torch.set_num_threads(num_threads)
     
+    final_state_dict = {key: value.detach().cpu() for key, value in model.state_dict().items()}
+    
+    # Without any improvement on the validation set the final model is the best one
+    return best_state_dict if best_state_dict is not None else final_state_dict, final_state_dict, metrics_history
+
+def _train_epochs(
+    model: nn.Module,
+    optimizer: optim.Optimizer,
+    loss_fn: nn.Module,
+    train_loader: DataLoader,
+    val_loader: DataLoader,
+    device: torch.device,
+    epochs: int,
+    validate_every: int,
+    global_params: Optional[List[torch.Tensor]],
+    proximal_mu: float
+) -> Tuple[Optional[Dict[str, torch.Tensor]], List[Dict[str, float]]]:
+    """
+    Run the training loop of `train_state_dict`.
+    
+    Returns:
+        Tuple of (CPU snapshot of the best validated model or None, validation metrics of every validated epoch)
+    """
     metrics_history = []
     best_val_metric = 0.0
+    best_state_dict = None
+    
+    # Training samples and seconds since the last validation
+    trained_samples = 0
+    train_seconds = 0.0
     
     for epoch in range(epochs):
         model.train()
-        running_loss = 0.0
+        epoch_start = time.perf_counter()
+        epoch_samples = 0
+        
+        # Summed on the device, so steps do not wait for the device to report the loss
+        running_loss = torch.zeros((), device=device)
         
         for batch_idx, batch in enumerate(train_loader):
             inputs, targets = batch
@@ -338,45 +432,108 @@ def train_model(
             # Compute loss
             loss = loss_fn(outputs, targets)
             
+            if global_params is not None:
+                proximal = sum((p - g).pow(2).sum() for p, g in zip(model.parameters(), global_params))
+                loss = loss + proximal_mu / 2 * proximal
+            
             # Backward pass and optimize
             loss.backward()
             optimizer.step()
             
             # Update statistics
-            running_loss += loss.item()
+            running_loss += loss.detach()
+            epoch_samples += inputs.size(0)
             
-            if batch_idx % 10 == 9:  # Log every 10 batches
-                logger.info(f"Epoch {epoch+1}/{epochs}, Batch {batch_idx+1}, Loss: {running_loss / 10:.4f}")
-                running_loss = 0.0
+            if batch_idx % LOG_INTERVAL == LOG_INTERVAL - 1:
+                logger.info(f"Epoch {epoch+1}/{epochs}, Batch {batch_idx+1}, Loss: {running_loss.item() / LOG_INTERVAL:.4f}")
+                running_loss.zero_()
+        
+        epoch_seconds = time.perf_counter() - epoch_start
+        trained_samples += epoch_samples
+        train_seconds += epoch_seconds
+        logger.info(f"Epoch {epoch+1}/{epochs}, {epoch_samples / epoch_seconds if epoch_seconds > 0 else 0:.0f} samples/s")
+        
+        if (epoch + 1) % validate_every != 0 and epoch + 1 < epochs:
+            continue
         
         # Evaluate on validation set
         val_metrics = evaluate_model(model, val_loader, loss_fn, device)
+        val_metrics["epoch"] = epoch + 1
+        val_metrics["train_samples_per_s"] = trained_samples / train_seconds if train_seconds > 0 else 0
         metrics_history.append(val_metrics)
+        trained_samples = 0
+        train_seconds = 0.0
         
         logger.info(f"Epoch {epoch+1}/{epochs}, Validation: {val_metrics}")
         
-        # Save best model (based on F1 score for simplicity)
+        # Keep the best model (based on F1 score for simplicity) as a snapshot in memory
         if val_metrics["f1_score"] > best_val_metric:
             best_val_metric = val_metrics["f1_score"]
-            
-            # Save the best model
-            best_model_dir = os.path.join("models", "local", model_type, f"round_{round_id}")
-            os.makedirs(best_model_dir, exist_ok=True)
-            
-            best_model_path = os.path.join(best_model_dir, f"client_{client_id}_best.pt")
-            torch.save(model.state_dict(), best_model_path)
-            logger.info(f"Saved best model to {best_model_path}")
+            best_state_dict = {key: value.detach().to("cpu", copy=True) for key, value in model.state_dict().items()}
     
-    # Save the final model
-    final_model_dir = os.path.join("models", "local", model_type, f"round_{round_id}")
-    os.makedirs(final_model_dir, exist_ok=True)
+    return best_state_dict, metrics_history
+
+def train_model(
+    global_model_path: str,
+    data_path: str,
+    model_type: str,
+    round_id: int,
+    client_id: str,
+    epochs: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    device: Optional[str] = None,
+    proximal_mu: float = 0.0,
+    dataset_cache: Optional[DatasetCache] = None
+) -> str:
+    """
+    Train a model locally from a model file and save the results.
+    
+    Args:
+        global_model_path: Path to the global model to start from
+        data_path: Path to local data
+        model_type: Type of model to train
+        round_id: Current federated learning round ID
+        client_id: Client ID
+        epochs: Number of training epochs (if None, will use model-specific default)
+        batch_size: Batch size for training (if None, will use model-specific default)
+        device: Device to train on (if None, will use GPU if available)
+        proximal_mu: Weight of the FedProx proximal term (mu / 2) * ||w - w_global||^2; 0 disables it
+        dataset_cache: Optional cache of preprocessed samples to read the local data from
     
-    final_model_path = os.path.join(final_model_dir, f"client_{client_id}_final.pt")
-    torch.save(model.state_dict(), final_model_path)
+    Returns:
+        Path to the trained model
+    """
+    if os.path.exists(global_model_path):
+        global_state_dict = load_state_dict_file(global_model_path, mmap=False)
+    else:
+        logger.warning(f"Model path {global_model_path} not found, using default initialization")
+        global_state_dict = create_model(model_type).state_dict()
+    
+    best_state_dict, final_state_dict, metrics_history = train_state_dict(
+        global_state_dict,
+        load_dataset(model_type, data_path, dataset_cache),
+        model_type,
+        epochs=epochs,
+        batch_size=batch_size,
+        device=device,
+        proximal_mu=proximal_mu
+    )
+    
+    model_dir = os.path.join("models", "local", model_type, f"round_{round_id}")
+    os.makedirs(model_dir, exist_ok=True)
+    
+    # Save the best model
+    best_model_path = os.path.join(model_dir, f"client_{client_id}_best.pt")
+    torch.save(best_state_dict, best_model_path)
+    logger.info(f"Saved best model to {best_model_path}")
+    
+    # Save the final model
+    final_model_path = os.path.join(model_dir, f"client_{client_id}_final.pt")
+    torch.save(final_state_dict, final_model_path)
     logger.info(f"Saved final model to {final_model_path}")
     
     # Save training metrics
-    metrics_path = os.path.join(final_model_dir, f"client_{client_id}_metrics.json")
+    metrics_path = os.path.join(model_dir, f"client_{client_id}_metrics.json")
     with open(metrics_path, "w") as f:
         json.dump(metrics_history, f, indent=2)
     
@@ -0,0 +1,222 @@
+import os
+import math
+import time
+import logging
+from typing import Dict, Any, Optional
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_TrainingRuntime")
+
+# Batch size used when neither the caller nor the hyperparameters choose one
+DEFAULT_BATCH_SIZE = 32
+
+# Batch sizes tried when the batch size is tuned
+BATCH_SIZE_CANDIDATES = (16, 32, 64, 128)
+
+# A tuned batch size must be this much faster per sample than the default to replace it
+MIN_SPEEDUP = 1.1
+
+# Other batch sizes are only tried while profiling them costs at most this fraction of the training's sample passes
+PROFILE_FRACTION = 0.05
+
+# Batches fetched to measure the cost of loading data
+PROFILE_BATCHES = 2
+
+# Timed training steps per candidate batch size, after one warm-up step
+PROFILE_STEPS = 2
+
+# Loading stays in the training process when it costs less than this fraction of the compute
+LOADER_OVERHEAD = 0.1
+
+# Batches each loader worker prepares ahead
+PREFETCH_FACTOR = 4
+
+
+def available_cpus() -> int:
+    """Number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def _time_steps(model: nn.Module, loss_fn: nn.Module, inputs: torch.Tensor, targets: torch.Tensor, steps: int) -> float:
+    """Seconds per forward and backward pass over one batch, after a warm-up pass."""
+    elapsed = 0.0
+    for step in range(steps + 1):
+        start = time.perf_counter()
+        loss = loss_fn(model(inputs), targets)
+        loss.backward()
+        # Reading the loss waits for the device to finish the step
+        loss.item()
+        if step > 0:
+            elapsed += time.perf_counter() - start
+        model.zero_grad(set_to_none=True)
+    return elapsed / steps
+
+
+def tune_runtime(
+    model: nn.Module,
+    loss_fn: nn.Module,
+    dataset: Dataset,
+    device: torch.device,
+    batch_size: Optional[int] = None,
+    epochs: int = 1
+) -> Dict[str, Any]:
+    """
+    Choose the loader workers, compute threads and batch size for training on this host.
+    
+    Fetches a few batches in this process to measure what loading a sample
+    costs, then times forward and backward passes to measure what computing
+    it costs. Loading stays in the training process when it is cheap next
+    to the compute (e.g. a cached dataset) or when there is a single CPU;
+    otherwise enough workers are started to keep up with the compute, and
+    the remaining CPUs go to the compute threads. The model's weights and
+    buffers are restored afterwards, so profiling does not train the model.
+    
+    Args:
+        model: Model to train, on `device`
+        loss_fn: Loss function
+        dataset: Training data
+        device: Device to train on
+        batch_size: Batch size to keep; None to pick the fastest of `BATCH_SIZE_CANDIDATES`
+            that fit the profiling budget (see `PROFILE_FRACTION`)
+        epochs: Epochs the model will be trained for, which set the profiling budget
+    
+    Returns:
+        Runtime with the 'batch_size', 'num_workers', 'num_threads', the measured
+        'load_s_per_sample' and 'compute_s_per_sample', and the 'batch_sizes' profiled
+    """
+    cpus = available_cpus()
+    
+    # Nothing to profile; the round trains no batches
+    if len(dataset) == 0:
+        return {
+            "batch_size": batch_size or DEFAULT_BATCH_SIZE,
+            "num_workers": 0,
+            "num_threads": cpus,
+            "load_s_per_sample": 0.0,
+            "compute_s_per_sample": 0.0,
+            "batch_sizes": []
+        }
+    
+    tune_batch_size = batch_size is None
+    default = min(DEFAULT_BATCH_SIZE if tune_batch_size else batch_size, len(dataset))
+    
+    # The default is always profiled; the other sizes, nearest first, while the budget lasts
+    candidates = [default]
+    if tune_batch_size:
+        budget = PROFILE_FRACTION * len(dataset) * epochs - (PROFILE_STEPS + 1) * default
+        for size in sorted(BATCH_SIZE_CANDIDATES, key=lambda size: abs(size - default)):
+            cost = (PROFILE_STEPS + 1) * size
+            if size != default and size <= len(dataset) and cost <= budget:
+                candidates.append(size)
+                budget -= cost
+    
+    # Measure loading on batches of the default size, with the compute threads the host has
+    torch.set_num_threads(cpus)
+    loader = DataLoader(
+        dataset,
+        batch_size=default,
+        shuffle=True,
+        num_workers=0,
+        generator=torch.Generator().manual_seed(0)
+    )
+    
+    # Datasets may draw random numbers (e.g. augmentations); leave the random state to training
+    batches = []
+    with torch.random.fork_rng(devices=[device] if device.type == "cuda" else []):
+        start = time.perf_counter()
+        for inputs, targets in loader:
+            batches.append((inputs, targets))
+            if len(batches) == PROFILE_BATCHES:
+                break
+    load_s_per_sample = (time.perf_counter() - start) / sum(len(inputs) for inputs, _ in batches)
+    
+    inputs = torch.cat([inputs for inputs, _ in batches]).to(device)
+    targets = torch.cat([targets for _, targets in batches]).to(device)
+    
+    # Profiling must not change the model: keep the weights, buffers (e.g. batch norm statistics) and mode,
+    # and the random state dropout draws from
+    saved_state = {key: value.detach().clone() for key, value in model.state_dict().items()}
+    was_training = model.training
+    model.train()
+    
+    compute_s_per_sample: Dict[int, float] = {}
+    try:
+        with torch.random.fork_rng(devices=[device] if device.type == "cuda" else []):
+            for size in candidates:
+                # Repeat the profiled samples up to the candidate size
+                repeats = math.ceil(size / len(inputs))
+                batch_inputs = inputs.repeat((repeats,) + (1,) * (inputs.dim() - 1))[:size]
+                batch_targets = targets.repeat((repeats,) + (1,) * (targets.dim() - 1))[:size]
+                compute_s_per_sample[size] = _time_steps(model, loss_fn, batch_inputs, batch_targets, PROFILE_STEPS) / size
+    finally:
+        model.load_state_dict(saved_state)
+        model.zero_grad(set_to_none=True)
+        model.train(was_training)
+    
+    # Stay with the default unless another size is clearly faster, since the batch size also changes the optimization
+    chosen = min(compute_s_per_sample, key=compute_s_per_sample.get)
+    if compute_s_per_sample[chosen] * MIN_SPEEDUP > compute_s_per_sample[default]:
+        chosen = default
+    compute = compute_s_per_sample[chosen]
+    
+    if cpus == 1 or load_s_per_sample <= LOADER_OVERHEAD * compute:
+        num_workers = 0
+    else:
+        # Workers needed to load samples as fast as the compute consumes them, leaving a CPU to compute
+        num_workers = max(1, min(cpus - 1, math.ceil(load_s_per_sample / compute)))
+    
+    runtime = {
+        "batch_size": chosen,
+        "num_workers": num_workers,
+        "num_threads": max(1, cpus - num_workers),
+        "load_s_per_sample": load_s_per_sample,
+        "compute_s_per_sample": compute,
+        "batch_sizes": candidates
+    }
+    
+    logger.info(
+        f"Training runtime for {cpus} CPU(s): batch size {runtime['batch_size']}, "
+        f"{runtime['num_workers']} loader worker(s), {runtime['num_threads']} compute thread(s) "
+        f"(load {load_s_per_sample * 1e3:.2f} ms/sample, compute {compute * 1e3:.2f} ms/sample)"
+    )
+    return runtime
+
+
+def make_loader(dataset: Dataset, runtime: Dict[str, Any], device: torch.device, shuffle: bool) -> DataLoader:
+    """
+    Create a data loader configured by a runtime from `tune_runtime`.
+    
+    Workers, if any, are kept alive across epochs and prepare batches ahead.
+    
+    Args:
+        dataset: Data to load
+        runtime: Runtime with the 'batch_size' and 'num_workers'
+        device: Device the batches go to
+        shuffle: Whether to reshuffle every epoch
+    
+    Returns:
+        PyTorch DataLoader
+    """
+    workers = runtime["num_workers"]
+    options: Dict[str, Any] = {"persistent_workers": True, "prefetch_factor": PREFETCH_FACTOR} if workers > 0 else {}
+    
+    # A random sampler refuses an empty dataset; there is nothing to shuffle anyway
+    return DataLoader(
+        dataset,
+        batch_size=runtime["batch_size"],
+        shuffle=shuffle and len(dataset) > 0,
+        num_workers=workers,
+        pin_memory=device.type == "cuda",
+        **options
+    )
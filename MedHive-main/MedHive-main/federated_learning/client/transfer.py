@@ -0,0 +1,446 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Dict, Any, Optional, Callable, List, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from federated_learning.common.signing import hash_file
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Transfer")
+
+# Bytes per chunk of a model transfer; each chunk is fetched or sent, verified and retried on its own
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Chunks transferred in parallel, each over its own pooled keep-alive connection
+DEFAULT_STREAMS = 4
+
+# Attempts per request after the first, with jittered exponential backoff in between
+DEFAULT_RETRIES = 8
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# (connect, read) timeouts in seconds; finishing an upload hashes and stores the whole model
+DEFAULT_TIMEOUT = (10.0, 60.0)
+COMPLETE_TIMEOUT = (10.0, 600.0)
+
+# Responses worth retrying; other errors are final
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class TransferError(Exception):
+    """A model transfer failed and retrying it will not help."""
+
+
+class _RetryableError(TransferError):
+    """A request failed in a way that may succeed when repeated."""
+
+
+class ModelTransfer:
+    """
+    Resumable, chunked and parallel model transfers over pooled connections.
+    
+    Downloads fetch the global model's per-chunk SHA-256 digests first, then
+    request the chunks as HTTP ranges over several keep-alive connections and
+    write each one at its offset once it matches its digest. Uploads open a
+    server-side session and send chunks the same way, each with its digest.
+    A chunk that fails is retried alone, with jittered exponential backoff,
+    and progress is kept next to the file, so a transfer interrupted by a
+    dropped connection (or a restarted client) resumes instead of starting
+    over.
+    
+    All requests share one `requests.Session`, which `FederatedClient` also
+    uses for its other calls.
+    """
+    
+    def __init__(
+        self,
+        server_url: str,
+        api_key: Optional[str] = None,
+        streams: int = DEFAULT_STREAMS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_retries: int = DEFAULT_RETRIES,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT
+    ):
+        """
+        Initialize the transfer client.
+        
+        Args:
+            server_url: URL of the federated learning server
+            api_key: Optional API key sent as a bearer token
+            streams: Number of chunks transferred in parallel
+            chunk_size: Requested bytes per chunk (the server may clamp it)
+            max_retries: Retries of each request before the transfer fails
+            timeout: (connect, read) timeouts in seconds of each request
+        """
+        self.server_url = server_url.rstrip("/")
+        self.streams = max(1, streams)
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        
+        # One connection per stream plus one for control requests, kept alive between calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.streams + 1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+    
+    def download(self, path: str, dest_path: str) -> str:
+        """
+        Download a model in verified chunks, resuming a previous partial download of it.
+        
+        The server must serve HTTP ranges of `path` and the chunk digests at `path`/chunks.
+        
+        Args:
+            path: URL path of the model
+            dest_path: Where to write the model
+        
+        Returns:
+            dest_path
+        
+        Raises:
+            TransferError: If the download failed
+        """
+        url = f"{self.server_url}{path}"
+        manifest = self._retry(
+            f"Fetching chunk digests of {path}",
+            lambda: self._json(self.session.get(f"{url}/chunks", params={"chunk_size": self.chunk_size}, timeout=self.timeout))
+        )
+        size, chunk_size, chunks = manifest["size"], manifest["chunk_size"], manifest["chunks"]
+        
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        part_path = f"{dest_path}.part"
+        state_path = f"{dest_path}.part.json"
+        
+        if size == 0:
+            open(dest_path, "wb").close()
+            return dest_path
+        
+        state = {"size": size, "chunk_size": chunk_size, "chunks": chunks}
+        done = self._load_done(state_path, state)
+        if not done or not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+            done = set()
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+        
+        missing = [i for i in range(len(chunks)) if i not in done]
+        if done:
+            logger.info(f"Resuming download of {path}: {len(done)} of {len(chunks)} chunks already present")
+        
+        state_lock = threading.Lock()
+        fd = os.open(part_path, os.O_WRONLY)
+        
+        def fetch(index: int) -> None:
+            start = index * chunk_size
+            end = min(start + chunk_size, size) - 1
+            
+            def attempt() -> bytes:
+                response = self.session.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=self.timeout)
+                with response:
+                    if response.status_code != 206:
+                        self._json(response)
+                        raise _RetryableError(f"Expected a partial response, got {response.status_code}")
+                    data = response.content
+                if len(data) != end - start + 1 or hashlib.sha256(data).hexdigest() != chunks[index]:
+                    raise _RetryableError(f"Chunk {index} does not match its digest")
+                return data
+            
+            data = self._retry(f"Downloading chunk {index} of {path}", attempt)
+            _pwrite_all(fd, data, start)
+            
+            with state_lock:
+                done.add(index)
+                self._save_done(state_path, state, done)
+        
+        try:
+            self._run_parallel(fetch, missing)
+        finally:
+            os.close(fd)
+        
+        os.replace(part_path, dest_path)
+        _remove_if_exists(state_path)
+        return dest_path
+    
+    def upload(self, path: str, file_path: str, fields: Dict[str, Any], digest: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Upload a file in verified chunks, resuming a previous partial upload of it.
+        
+        Args:
+            path: URL path that opens an upload session
+            file_path: File to upload
+            fields: Other fields of the upload (training metrics, update format, signature)
+            digest: Hex SHA-256 digest of the file if the caller already computed it
+        
+        Returns:
+            Result of the finished upload
+        
+        Raises:
+            TransferError: If the upload failed or the server rejected it
+        """
+        size = os.path.getsize(file_path)
+        digest = digest or hash_file(file_path).hex()
+        
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            return self._upload(
+                path,
+                file_path,
+                size,
+                digest,
+                fields,
+                lambda offset, length: os.pread(fd, length, offset),
+                state_path=f"{file_path}.upload.json"
+            )
+        finally:
+            os.close(fd)
+    
+    def upload_bytes(self, path: str, data: bytes, fields: Dict[str, Any], digest: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Upload an in-memory buffer in verified chunks, without writing it to disk.
+        
+        Failed chunks are retried like those of `upload`, but no progress is
+        kept on disk, so an upload interrupted by a client restart starts over.
+        
+        Args:
+            path: URL path that opens an upload session
+            data: Bytes to upload
+            fields: Other fields of the upload (training metrics, update format, signature)
+            digest: Hex SHA-256 digest of `data` if the caller already computed it
+        
+        Returns:
+            Result of the finished upload
+        
+        Raises:
+            TransferError: If the upload failed or the server rejected it
+        """
+        view = memoryview(data).cast("B")
+        digest = digest or hashlib.sha256(view).hexdigest()
+        
+        return self._upload(
+            path,
+            f"{len(view)} bytes",
+            len(view),
+            digest,
+            fields,
+            lambda offset, length: bytes(view[offset:offset + length])
+        )
+    
+    def _upload(
+        self,
+        path: str,
+        description: str,
+        size: int,
+        digest: str,
+        fields: Dict[str, Any],
+        read: Callable[[int, int], bytes],
+        state_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Upload `size` bytes, read with `read(offset, length)`, in verified chunks.
+        
+        Args:
+            path: URL path that opens an upload session
+            description: What is uploaded, for messages
+            size: Number of bytes
+            digest: Hex SHA-256 digest of the bytes
+            fields: Other fields of the upload
+            read: Reads `length` bytes at `offset`; called from several threads
+            state_path: File recording the session, to resume it after a restart; None to not record it
+        
+        Returns:
+            Result of the finished upload
+        """
+        status = self._resume_upload(state_path, size, digest) if state_path else None
+        if status is None:
+            status = self._retry(
+                f"Opening upload of {description}",
+                lambda: self._json(self.session.post(
+                    f"{self.server_url}{path}",
+                    json=dict(fields, size=size, sha256=digest, chunk_size=self.chunk_size),
+                    timeout=self.timeout
+                ))
+            )
+            if state_path:
+                with open(state_path, "w") as f:
+                    json.dump({"upload_id": status["upload_id"], "size": size, "digest": digest}, f)
+        elif "result" in status:
+            # Finished before the client saw the response
+            _remove_if_exists(state_path)
+            return status["result"]
+        
+        upload_url = f"{self.server_url}/api/federated-learning/uploads/{status['upload_id']}"
+        chunk_size = status["chunk_size"]
+        received = set(status["received"])
+        missing = [i for i in range(status["num_chunks"]) if i not in received]
+        if received:
+            logger.info(f"Resuming upload of {description}: {len(received)} of {status['num_chunks']} chunks already sent")
+        
+        def send(index: int) -> None:
+            offset = index * chunk_size
+            data = read(offset, min(chunk_size, size - offset))
+            headers = {"Content-Type": "application/octet-stream", "X-Chunk-SHA256": hashlib.sha256(data).hexdigest()}
+            
+            # A chunk rejected for its digest was damaged on the way; send it again
+            self._retry(
+                f"Uploading chunk {index} of {description}",
+                lambda: self._json(
+                    self.session.put(f"{upload_url}/chunks/{index}", data=data, headers=headers, timeout=self.timeout),
+                    retry_statuses=RETRY_STATUSES | {400}
+                )
+            )
+        
+        self._run_parallel(send, missing)
+        
+        # 409: an earlier attempt whose response was lost is still being finished
+        try:
+            result = self._retry(
+                f"Finishing upload of {description}",
+                lambda: self._json(
+                    self.session.post(f"{upload_url}/complete", timeout=COMPLETE_TIMEOUT),
+                    retry_statuses=RETRY_STATUSES | {409}
+                )
+            )
+        except _RetryableError:
+            raise
+        except TransferError:
+            # The server decided on the upload; resuming it would get the same answer
+            if state_path:
+                _remove_if_exists(state_path)
+            raise
+        
+        if state_path:
+            _remove_if_exists(state_path)
+        return result
+    
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+    
+    def _resume_upload(self, state_path: str, size: int, digest: str) -> Optional[Dict[str, Any]]:
+        """Get the server's status of an earlier upload of the same file, or None to start a new one."""
+        try:
+            with open(state_path, "r") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        
+        if state.get("size") != size or state.get("digest") != digest:
+            return None
+        
+        try:
+            return self._retry(
+                "Checking the earlier upload",
+                lambda: self._json(self.session.get(
+                    f"{self.server_url}/api/federated-learning/uploads/{state['upload_id']}", timeout=self.timeout
+                ))
+            )
+        except TransferError as e:
+            logger.info(f"Starting a new upload: {str(e)}")
+            return None
+    
+    def _run_parallel(self, func: Callable[[int], None], indices: List[int]) -> None:
+        """Run `func` for every chunk index on up to `streams` threads, stopping at the first failure."""
+        if not indices:
+            return
+        
+        with ThreadPoolExecutor(max_workers=min(self.streams, len(indices)), thread_name_prefix="FL_Transfer") as pool:
+            futures = [pool.submit(func, index) for index in indices]
+            finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            
+            for future in finished:
+                if future.exception() is not None:
+                    for pending in futures:
+                        pending.cancel()
+                    raise future.exception()
+    
+    def _retry(self, description: str, func: Callable[[], Any]) -> Any:
+        """Call `func`, retrying connection failures and retryable responses with jittered exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func()
+            except (requests.RequestException, _RetryableError) as e:
+                if attempt == self.max_retries:
+                    raise _RetryableError(f"{description} failed after {attempt + 1} attempts: {str(e)}") from e
+                
+                delay = backoff_delay(attempt)
+                logger.warning(f"{description} failed ({str(e)}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    @staticmethod
+    def _json(response: requests.Response, retry_statuses: frozenset = RETRY_STATUSES) -> Dict[str, Any]:
+        """
+        Decode a JSON response.
+        
+        Raises:
+            _RetryableError: For statuses in `retry_statuses`
+            TransferError: For other error responses
+        """
+        if response.status_code in retry_statuses:
+            raise _RetryableError(f"Server responded {response.status_code}: {response.text[:200]}")
+        if response.status_code >= 400:
+            raise TransferError(f"Server responded {response.status_code}: {response.text[:200]}")
+        return response.json()
+    
+    @staticmethod
+    def _load_done(state_path: str, state: Dict[str, Any]) -> Set[int]:
+        """Chunks of a partial download that were already written, if it was of the same file."""
+        try:
+            with open(state_path, "r") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return set()
+        
+        if any(saved.get(key) != value for key, value in state.items()):
+            return set()
+        return set(saved.get("done", []))
+    
+    @staticmethod
+    def _save_done(state_path: str, state: Dict[str, Any], done: Set[int]) -> None:
+        """Record the chunks of a partial download written so far."""
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dict(state, done=sorted(done)), f)
+        os.replace(tmp_path, state_path)
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """
+    Delay before retry number `attempt` (from 0): exponential up to `cap`, jittered so clients spread out.
+    
+    Args:
+        attempt: Number of failed attempts so far, minus one
+        base: Delay after the first failure, before jitter
+        cap: Maximum delay, before jitter
+    
+    Returns:
+        Delay in seconds, between half and all of min(cap, base * 2 ** attempt)
+    """
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    """Write all of `data` at `offset`."""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def _remove_if_exists(path: str) -> None:
+    """Remove a file if it exists."""
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,10 @@
+"""
+HachathonHub Federated Learning Common Module
+
+This package provides functionality shared by the client and the server, including:
+- Compressed model update formats
+- Flat, memory-mappable parameter buffers
+- Cached model construction
+- Signing and verification of content by its streamed SHA-256 digest
+- Authenticated encryption of files and streams in constant memory
+"""
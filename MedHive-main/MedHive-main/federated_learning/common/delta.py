@@ -0,0 +1,202 @@
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+import torch
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Delta")
+
+# Marker identifying a serialized delta update
+DELTA_FORMAT = "medhive-delta/1"
+
+# Largest magnitude of an 8-bit quantized value
+INT8_MAX = 127
+
+
+def is_averaged_parameter(key: str, tensor: torch.Tensor) -> bool:
+    """Check whether a state dict entry takes part in weighted averaging."""
+    # Skip batch normalization statistics and integer buffers
+    if 'running_mean' in key or 'running_var' in key or 'num_batches_tracked' in key:
+        return False
+    return tensor.is_floating_point()
+
+
+def is_delta(update: Any) -> bool:
+    """Check whether a loaded update is a delta payload rather than a full state dict."""
+    return isinstance(update, dict) and update.get("format") == DELTA_FORMAT
+
+
+def encode_delta(
+    state_dict: Dict[str, torch.Tensor],
+    base_state_dict: Dict[str, torch.Tensor],
+    top_k: Optional[float] = None,
+    bits: Optional[int] = None,
+    residual: Optional[Dict[str, torch.Tensor]] = None
+) -> Tuple[Dict[str, Any], Dict[str, torch.Tensor]]:
+    """
+    Encode a trained model as a compressed delta against the global model it started from.
+    
+    Averaged parameters are sent as `state_dict - base_state_dict`. Optionally only
+    the `top_k` fraction of entries with the largest magnitude is kept per tensor,
+    and the kept values are quantized to 8 bits with a per-tensor scale. What
+    compression drops is returned as a residual; passing it to the next call
+    (error feedback) adds it back so no update is lost over rounds. Entries that
+    are not averaged, such as batch norm statistics, are sent in full.
+    
+    Args:
+        state_dict: Locally trained state dict
+        base_state_dict: Global state dict training started from
+        top_k: Fraction (0, 1] of entries to keep per tensor (default: all)
+        bits: 8 to quantize values to int8 (default: float32 values)
+        residual: Residual returned by the previous call, if any
+    
+    Returns:
+        Tuple of (delta payload, residual for the next call)
+    """
+    if top_k is not None and not 0 < top_k <= 1:
+        raise ValueError(f"top_k must be in (0, 1], got {top_k}")
+    if bits not in (None, 8):
+        raise ValueError(f"Only 8-bit quantization is supported, got {bits}")
+    
+    tensors = {}
+    passthrough = {}
+    new_residual = {}
+    
+    for key, tensor in state_dict.items():
+        if not is_averaged_parameter(key, tensor):
+            passthrough[key] = tensor
+            continue
+        
+        delta = (tensor.to(torch.float32) - base_state_dict[key].to(torch.float32)).flatten()
+        if residual is not None and key in residual:
+            delta += residual[key].flatten()
+        
+        indices = None
+        values = delta
+        if top_k is not None and top_k < 1:
+            k = max(1, int(delta.numel() * top_k))
+            indices = torch.topk(delta.abs(), k, sorted=False).indices
+            values = delta[indices]
+            
+            # 32-bit indices halve the index overhead for all realistic tensor sizes
+            if delta.numel() < 2 ** 31:
+                indices = indices.to(torch.int32)
+        
+        scale = None
+        if bits == 8:
+            max_abs = values.abs().max().item() if values.numel() else 0.0
+            scale = max_abs / INT8_MAX if max_abs > 0 else 1.0
+            values = torch.round(values / scale).clamp_(-INT8_MAX, INT8_MAX).to(torch.int8)
+        
+        entry = {
+            "shape": list(tensor.shape),
+            "dtype": str(tensor.dtype).replace("torch.", ""),
+            "values": values.contiguous(),
+            "scale": scale,
+            "indices": indices
+        }
+        tensors[key] = entry
+        
+        # Keep what was not transmitted for the next round
+        sent = torch.zeros_like(delta)
+        add_delta_(sent, entry)
+        new_residual[key] = (delta - sent).view(tensor.shape)
+    
+    payload = {
+        "format": DELTA_FORMAT,
+        "tensors": tensors,
+        "passthrough": passthrough
+    }
+    return payload, new_residual
+
+
+def add_delta_(accumulator: torch.Tensor, entry: Dict[str, Any], alpha: float = 1.0) -> torch.Tensor:
+    """
+    Add `alpha` times one encoded tensor delta to a float32 accumulator in place.
+    
+    Sparse entries are scattered with `index_add_`, so the delta is never expanded
+    to a dense tensor.
+    
+    Args:
+        accumulator: Float32 tensor with the shape (or number of elements) of the parameter
+        entry: Encoded tensor from a delta payload
+        alpha: Weight of the delta
+    
+    Returns:
+        The accumulator
+    """
+    values = entry["values"].to(torch.float32)
+    
+    scale = alpha if entry["scale"] is None else alpha * entry["scale"]
+    if scale != 1.0:
+        values = values * scale
+    
+    flat = accumulator.view(-1)
+    if entry["indices"] is None:
+        flat.add_(values)
+    else:
+        flat.index_add_(0, entry["indices"].to(torch.int64), values)
+    
+    return accumulator
+
+
+def add_delta_range_(
+    out: torch.Tensor,
+    entry: Dict[str, Any],
+    start: int,
+    end: int,
+    alpha: float = 1.0
+) -> torch.Tensor:
+    """
+    Add the flat elements `[start, end)` of one encoded tensor delta to `out` in place.
+    
+    Used to read a delta piece by piece, e.g. when aggregating in chunks.
+    
+    Args:
+        out: Float32 tensor with `end - start` elements
+        entry: Encoded tensor from a delta payload
+        start: First flat element of the range
+        end: End (exclusive) of the range
+        alpha: Weight of the delta
+    
+    Returns:
+        `out`
+    """
+    scale = alpha if entry["scale"] is None else alpha * entry["scale"]
+    
+    if entry["indices"] is None:
+        out.add_(entry["values"][start:end].to(torch.float32), alpha=scale)
+        return out
+    
+    indices = entry["indices"].to(torch.int64)
+    mask = (indices >= start) & (indices < end)
+    out.index_add_(0, indices[mask] - start, entry["values"][mask].to(torch.float32) * scale)
+    return out
+
+
+def apply_delta(base_state_dict: Dict[str, torch.Tensor], payload: Dict[str, Any]) -> Dict[str, torch.Tensor]:
+    """
+    Reconstruct a full state dict from a delta payload and its base.
+    
+    Args:
+        base_state_dict: Global state dict the delta was encoded against
+        payload: Delta payload
+    
+    Returns:
+        Reconstructed state dict, in the key order of the base
+    """
+    state_dict = {}
+    for key, base_tensor in base_state_dict.items():
+        if key in payload["tensors"]:
+            entry = payload["tensors"][key]
+            accumulator = base_tensor.to(torch.float32).clone()
+            add_delta_(accumulator, entry)
+            state_dict[key] = accumulator.to(getattr(torch, entry["dtype"]))
+        else:
+            state_dict[key] = payload["passthrough"].get(key, base_tensor)
+    
+    return state_dict
@@ -0,0 +1,528 @@
+import os
+import struct
+import logging
+from typing import BinaryIO, Iterable, Iterator
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_EncryptedStream")
+
+# Encrypted stream layout:
+#   header: magic, version, cipher id, frame size, nonce prefix (little-endian, 17 bytes)
+#   frames: AEAD ciphertext + 16-byte tag of `frame size` plaintext bytes each; the last frame
+#           is shorter (possibly empty) and sealed with the final flag set in its nonce
+# Each frame's nonce is the nonce prefix, the frame index (big-endian) and the final flag, and
+# the header is authenticated with every frame, so frames cannot be reordered, dropped,
+# truncated or moved between streams without decryption failing.
+MAGIC = b"MHAE"
+VERSION = 1
+HEADER_FORMAT = "<4sBBI7s"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+TAG_SIZE = 16
+
+# Cipher name -> (id stored in the header, AEAD class)
+CIPHERS = {
+    "aes-256-gcm": (1, AESGCM),
+    "chacha20-poly1305": (2, ChaCha20Poly1305)
+}
+_CIPHERS_BY_ID = {cipher_id: (name, aead) for name, (cipher_id, aead) in CIPHERS.items()}
+
+# Plaintext bytes per frame; memory use is a few frames regardless of the stream size
+FRAME_SIZE = 1024 * 1024
+MIN_FRAME_SIZE = 4 * 1024
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+MAX_FRAMES = 2 ** 32
+
+
+def derive_stream_key(key_material: bytes) -> bytes:
+    """
+    Derive the 256-bit key of encrypted streams from existing key material.
+    
+    Lets a Fernet key (or any other secret) also key encrypted streams
+    without using the same bytes for two algorithms.
+    
+    Args:
+        key_material: Secret key material (e.g. a decoded Fernet key)
+    
+    Returns:
+        32-byte stream key
+    """
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"medhive-encrypted-stream/1"
+    ).derive(key_material)
+
+
+def is_encrypted_stream(prefix: bytes) -> bool:
+    """Check whether data starts with an encrypted stream header."""
+    return prefix[:len(MAGIC)] == MAGIC
+
+
+def _nonce(prefix: bytes, index: int, final: bool) -> bytes:
+    """Nonce of a frame."""
+    if index >= MAX_FRAMES:
+        raise ValueError("Encrypted stream has too many frames")
+    return prefix + struct.pack(">IB", index, 1 if final else 0)
+
+
+def _read_full(src: BinaryIO, size: int) -> bytes:
+    """Read `size` bytes, fewer only at the end of the stream (sockets may return short reads)."""
+    data = src.read(size)
+    if len(data) == size or not data:
+        return data
+    
+    parts = [data]
+    remaining = size - len(data)
+    while remaining > 0:
+        part = src.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b"".join(parts)
+
+
+class StreamEncryptor:
+    """
+    Encrypt a stream incrementally, e.g. while sending it.
+    
+    Feed plaintext with `update` in chunks of any size and call `finalize`
+    once; concatenated, the returned pieces form the encrypted stream.
+    """
+    
+    def __init__(self, key: bytes, cipher: str = "aes-256-gcm", frame_size: int = FRAME_SIZE):
+        """
+        Initialize the encryptor.
+        
+        Args:
+            key: 32-byte stream key (see `derive_stream_key`)
+            cipher: 'aes-256-gcm' or 'chacha20-poly1305'
+            frame_size: Plaintext bytes per frame
+        """
+        if cipher not in CIPHERS:
+            raise ValueError(f"Unknown cipher {cipher}, expected one of {', '.join(CIPHERS)}")
+        if not MIN_FRAME_SIZE <= frame_size <= MAX_FRAME_SIZE:
+            raise ValueError(f"Frame size must be between {MIN_FRAME_SIZE} and {MAX_FRAME_SIZE} bytes")
+        
+        cipher_id, aead = CIPHERS[cipher]
+        self.frame_size = frame_size
+        self._aead = aead(key)
+        self._nonce_prefix = os.urandom(7)
+        self._header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, cipher_id, frame_size, self._nonce_prefix)
+        self._index = 0
+        self._buffer = bytearray()
+        self._header_sent = False
+        self._finalized = False
+    
+    def _seal(self, data: bytes, final: bool) -> bytes:
+        """Encrypt the next frame."""
+        frame = self._aead.encrypt(_nonce(self._nonce_prefix, self._index, final), data, self._header)
+        self._index += 1
+        return frame
+    
+    def _take_header(self) -> bytes:
+        """The header if it has not been returned yet."""
+        if self._header_sent:
+            return b""
+        self._header_sent = True
+        return self._header
+    
+    def update(self, data: bytes) -> bytes:
+        """
+        Encrypt more plaintext.
+        
+        Args:
+            data: Next plaintext chunk
+        
+        Returns:
+            Encrypted bytes ready to send (possibly empty)
+        """
+        if self._finalized:
+            raise ValueError("Encryptor already finalized")
+        
+        out = [self._take_header()]
+        
+        # Full frames are never final; the final frame is always shorter than a full one
+        if not self._buffer and len(data) >= self.frame_size:
+            view = memoryview(data)
+            offset = 0
+            while len(view) - offset >= self.frame_size:
+                out.append(self._seal(view[offset:offset + self.frame_size], final=False))
+                offset += self.frame_size
+            self._buffer += view[offset:]
+        else:
+            self._buffer += data
+            while len(self._buffer) >= self.frame_size:
+                out.append(self._seal(self._buffer[:self.frame_size], final=False))
+                del self._buffer[:self.frame_size]
+        
+        return b"".join(out)
+    
+    def finalize(self) -> bytes:
+        """
+        Encrypt the final frame.
+        
+        Returns:
+            The last encrypted bytes of the stream
+        """
+        if self._finalized:
+            raise ValueError("Encryptor already finalized")
+        
+        self._finalized = True
+        out = self._take_header() + self._seal(self._buffer, final=True)
+        self._buffer = bytearray()
+        return out
+
+
+class StreamDecryptor:
+    """
+    Decrypt a stream incrementally, e.g. while receiving it.
+    
+    Every returned piece of plaintext has been authenticated, but only a
+    successful `finalize` proves that the stream was not truncated.
+    """
+    
+    def __init__(self, key: bytes):
+        """
+        Initialize the decryptor.
+        
+        Args:
+            key: 32-byte stream key (see `derive_stream_key`)
+        """
+        self._key = key
+        self._aead = None
+        self._header = None
+        self._nonce_prefix = None
+        self.frame_size = None
+        self.cipher = None
+        self._index = 0
+        self._buffer = bytearray()
+        self._finalized = False
+    
+    def _parse_header(self, header: bytes) -> None:
+        """Read the stream parameters from its header."""
+        magic, version, cipher_id, frame_size, nonce_prefix = struct.unpack(HEADER_FORMAT, header)
+        
+        if magic != MAGIC:
+            raise ValueError("Not an encrypted stream")
+        if version != VERSION:
+            raise ValueError(f"Unsupported encrypted stream version {version}")
+        if cipher_id not in _CIPHERS_BY_ID:
+            raise ValueError(f"Unknown cipher id {cipher_id}")
+        if not MIN_FRAME_SIZE <= frame_size <= MAX_FRAME_SIZE:
+            raise ValueError(f"Invalid frame size {frame_size}")
+        
+        self.cipher, aead = _CIPHERS_BY_ID[cipher_id]
+        self._aead = aead(self._key)
+        self._header = bytes(header)
+        self._nonce_prefix = nonce_prefix
+        self.frame_size = frame_size
+    
+    def _open(self, frame: bytes, final: bool) -> bytes:
+        """Decrypt and authenticate the next frame."""
+        try:
+            data = self._aead.decrypt(_nonce(self._nonce_prefix, self._index, final), frame, self._header)
+        except InvalidTag:
+            raise ValueError(f"Encrypted stream failed authentication at frame {self._index}")
+        self._index += 1
+        return data
+    
+    def update(self, data: bytes) -> bytes:
+        """
+        Decrypt more of the stream.
+        
+        Args:
+            data: Next chunk of the encrypted stream
+        
+        Returns:
+            Authenticated plaintext (possibly empty)
+        """
+        if self._finalized:
+            raise ValueError("Decryptor already finalized")
+        
+        self._buffer += data
+        
+        if self._header is None:
+            if len(self._buffer) < HEADER_SIZE:
+                return b""
+            self._parse_header(self._buffer[:HEADER_SIZE])
+            del self._buffer[:HEADER_SIZE]
+        
+        # A full-size frame is never the final one, so it can be opened as soon as it is complete
+        out = []
+        full = self.frame_size + TAG_SIZE
+        while len(self._buffer) >= full:
+            out.append(self._open(self._buffer[:full], final=False))
+            del self._buffer[:full]
+        
+        return b"".join(out)
+    
+    def finalize(self) -> bytes:
+        """
+        Decrypt the final frame, proving that the stream is complete.
+        
+        Returns:
+            The last plaintext of the stream
+        """
+        if self._finalized:
+            raise ValueError("Decryptor already finalized")
+        
+        self._finalized = True
+        if self._header is None:
+            raise ValueError("Encrypted stream is truncated")
+        if len(self._buffer) < TAG_SIZE:
+            raise ValueError("Encrypted stream is truncated")
+        
+        out = self._open(self._buffer, final=True)
+        self._buffer = bytearray()
+        return out
+
+
+def encrypt_bytes(key: bytes, data: bytes, cipher: str = "aes-256-gcm", frame_size: int = FRAME_SIZE) -> bytearray:
+    """
+    Encrypt an in-memory buffer into the encrypted stream format.
+    
+    The output is allocated once and filled frame by frame, so peak memory
+    is the plaintext, the ciphertext and one frame.
+    
+    Args:
+        key: 32-byte stream key
+        data: Plaintext (any bytes-like object)
+        cipher: 'aes-256-gcm' or 'chacha20-poly1305'
+        frame_size: Plaintext bytes per frame
+    
+    Returns:
+        The encrypted stream
+    """
+    encryptor = StreamEncryptor(key, cipher, frame_size)
+    view = memoryview(data).cast("B")
+    full_frames = len(view) // frame_size
+    
+    out = bytearray(HEADER_SIZE + full_frames * (frame_size + TAG_SIZE) + len(view) - full_frames * frame_size + TAG_SIZE)
+    out[:HEADER_SIZE] = encryptor._take_header()
+    
+    position = HEADER_SIZE
+    for index in range(full_frames):
+        frame = encryptor._seal(view[index * frame_size:(index + 1) * frame_size], final=False)
+        out[position:position + len(frame)] = frame
+        position += len(frame)
+    
+    out[position:] = encryptor._seal(view[full_frames * frame_size:], final=True)
+    encryptor._finalized = True
+    return out
+
+
+def decrypt_bytes(key: bytes, data: bytes) -> bytearray:
+    """
+    Decrypt an in-memory encrypted stream.
+    
+    Args:
+        key: 32-byte stream key
+        data: The complete encrypted stream
+    
+    Returns:
+        Plaintext, in a writable buffer allocated once
+    """
+    view = memoryview(data).cast("B")
+    if len(view) < HEADER_SIZE:
+        raise ValueError("Encrypted stream is truncated")
+    
+    decryptor = StreamDecryptor(key)
+    decryptor._parse_header(view[:HEADER_SIZE])
+    
+    full = decryptor.frame_size + TAG_SIZE
+    full_frames, last = divmod(len(view) - HEADER_SIZE, full)
+    if last < TAG_SIZE:
+        raise ValueError("Encrypted stream is truncated")
+    
+    out = bytearray(full_frames * decryptor.frame_size + last - TAG_SIZE)
+    position = HEADER_SIZE
+    for index in range(full_frames):
+        out[index * decryptor.frame_size:(index + 1) * decryptor.frame_size] = decryptor._open(view[position:position + full], final=False)
+        position += full
+    
+    out[full_frames * decryptor.frame_size:] = decryptor._open(view[position:], final=True)
+    decryptor._finalized = True
+    return out
+
+
+def encrypt_stream(
+    key: bytes,
+    src: BinaryIO,
+    dst: BinaryIO,
+    cipher: str = "aes-256-gcm",
+    frame_size: int = FRAME_SIZE
+) -> int:
+    """
+    Encrypt everything read from `src` into `dst`, one frame at a time.
+    
+    Args:
+        key: 32-byte stream key
+        src: Readable binary stream of plaintext
+        dst: Writable binary stream
+        cipher: 'aes-256-gcm' or 'chacha20-poly1305'
+        frame_size: Plaintext bytes per frame
+    
+    Returns:
+        Number of plaintext bytes encrypted
+    """
+    encryptor = StreamEncryptor(key, cipher, frame_size)
+    total = 0
+    
+    while True:
+        chunk = _read_full(src, frame_size)
+        total += len(chunk)
+        if len(chunk) < frame_size:
+            dst.write(encryptor.update(chunk))
+            dst.write(encryptor.finalize())
+            return total
+        dst.write(encryptor.update(chunk))
+
+
+def decrypt_chunks(key: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Decrypt an encrypted stream arriving in chunks of any size (e.g. from a socket).
+    
+    Args:
+        key: 32-byte stream key
+        chunks: The encrypted stream, in order
+    
+    Yields:
+        Authenticated plaintext; the iteration raises ValueError if the stream is truncated or tampered with
+    """
+    decryptor = StreamDecryptor(key)
+    for chunk in chunks:
+        data = decryptor.update(chunk)
+        if data:
+            yield data
+    data = decryptor.finalize()
+    if data:
+        yield data
+
+
+def decrypt_stream(key: bytes, src: BinaryIO, dst: BinaryIO) -> int:
+    """
+    Decrypt an encrypted stream read from `src` into `dst`, one frame at a time.
+    
+    Args:
+        key: 32-byte stream key
+        src: Readable binary stream positioned at the header
+        dst: Writable binary stream
+    
+    Returns:
+        Number of plaintext bytes written
+    """
+    decryptor = StreamDecryptor(key)
+    decryptor.update(_read_full(src, HEADER_SIZE))
+    if decryptor.frame_size is None:
+        raise ValueError("Encrypted stream is truncated")
+    
+    full = decryptor.frame_size + TAG_SIZE
+    total = 0
+    while True:
+        frame = _read_full(src, full)
+        if len(frame) < full:
+            data = decryptor.update(frame) + decryptor.finalize()
+            dst.write(data)
+            total += len(data)
+            break
+        data = decryptor.update(frame)
+        dst.write(data)
+        total += len(data)
+    
+    if src.read(1):
+        raise ValueError("Unexpected data after the end of the encrypted stream")
+    
+    return total
+
+
+def encrypt_file(key: bytes, src_path: str, dst_path: str, cipher: str = "aes-256-gcm", frame_size: int = FRAME_SIZE) -> int:
+    """
+    Encrypt a file into another file in constant memory.
+    
+    Args:
+        key: 32-byte stream key
+        src_path: Plaintext file
+        dst_path: Encrypted file to write
+        cipher: 'aes-256-gcm' or 'chacha20-poly1305'
+        frame_size: Plaintext bytes per frame
+    
+    Returns:
+        Number of plaintext bytes encrypted
+    """
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        return encrypt_stream(key, src, dst, cipher, frame_size)
+
+
+def decrypt_file(key: bytes, src_path: str, dst_path: str) -> int:
+    """
+    Decrypt a file into another file in constant memory.
+    
+    The output is removed again if the stream turns out to be truncated or
+    tampered with.
+    
+    Args:
+        key: 32-byte stream key
+        src_path: Encrypted file
+        dst_path: Plaintext file to write
+    
+    Returns:
+        Number of plaintext bytes written
+    """
+    try:
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            return decrypt_stream(key, src, dst)
+    except Exception:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        raise
+
+
+def decrypt_file_to_buffer(key: bytes, src_path: str) -> bytearray:
+    """
+    Decrypt a file straight into memory, e.g. to load the model it holds without a plaintext copy on disk.
+    
+    The output is allocated once from the file size and filled frame by
+    frame, so peak memory is the plaintext and one frame.
+    
+    Args:
+        key: 32-byte stream key
+        src_path: Encrypted file
+    
+    Returns:
+        Plaintext, in a writable buffer
+    """
+    size = os.path.getsize(src_path)
+    
+    with open(src_path, "rb") as src:
+        header = _read_full(src, HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError("Encrypted stream is truncated")
+        
+        decryptor = StreamDecryptor(key)
+        decryptor._parse_header(header)
+        
+        full = decryptor.frame_size + TAG_SIZE
+        full_frames, last = divmod(size - HEADER_SIZE, full)
+        if last < TAG_SIZE:
+            raise ValueError("Encrypted stream is truncated")
+        
+        out = bytearray(full_frames * decryptor.frame_size + last - TAG_SIZE)
+        for index in range(full_frames):
+            out[index * decryptor.frame_size:(index + 1) * decryptor.frame_size] = decryptor._open(_read_full(src, full), final=False)
+        
+        out[full_frames * decryptor.frame_size:] = decryptor._open(_read_full(src, last), final=True)
+        decryptor._finalized = True
+    
+    return out
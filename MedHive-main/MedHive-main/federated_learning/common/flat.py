@@ -0,0 +1,484 @@
+import io
+import os
+import json
+import uuid
+import struct
+import logging
+from typing import Dict, List, Any
+
+import numpy as np
+import torch
+
+from federated_learning.common.delta import is_averaged_parameter
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Flat")
+
+# First bytes of a flat model file
+FLAT_MAGIC = b"MHFLAT01"
+
+# Marker identifying the header layout
+FLAT_FORMAT = "medhive-flat/1"
+
+# Data sections start at multiples of this many bytes, so the buffer can be mapped and vectorized
+ALIGNMENT = 64
+
+# Chunk size when writing the buffer
+WRITE_CHUNK_BYTES = 16 * 1024 * 1024
+
+# First bytes and header layout marker of packed tensors (see `pack_tensors`)
+PACK_MAGIC = b"MHPACK01"
+PACK_FORMAT = "medhive-pack/1"
+
+# Floating-point dtypes that float32 represents exactly; others (float64) are kept as extras
+BUFFER_DTYPES = (torch.float32, torch.float16, torch.bfloat16)
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the next multiple of ALIGNMENT."""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class FlatModel:
+    """
+    Model parameters as one contiguous float32 buffer plus a layout table.
+    
+    Every floating-point entry of a state dict lives in `buffer` at a fixed
+    element offset. Entries that take part in weighted averaging come first,
+    so `averaged` is a single contiguous slice and aggregation, deltas or
+    noise are one in-place op over it instead of a loop over keys.
+    Non-floating entries (e.g. `num_batches_tracked`) and float64 entries,
+    which float32 cannot hold exactly, are kept aside as `extras`.
+    
+    On disk the buffer is stored raw after a small JSON header, so `load`
+    memory-maps it without unpickling anything; pages are only read when
+    touched, and writes go to private copy-on-write pages.
+    """
+    
+    def __init__(
+        self,
+        entries: List[Dict[str, Any]],
+        buffer: torch.Tensor,
+        extras: Dict[str, torch.Tensor],
+        averaged_numel: int
+    ):
+        """
+        Initialize a flat model. Use `from_state_dict` or `load` to create one.
+        
+        Args:
+            entries: Layout table in state dict order; each has 'name', 'shape', 'dtype' and,
+                for buffer entries, the element 'offset' into the buffer
+            buffer: 1-D float32 tensor holding the float32, float16 and bfloat16 entries
+            extras: Entries kept outside the buffer, by name
+            averaged_numel: Number of leading buffer elements that are averaged parameters
+        """
+        self.entries = entries
+        self.buffer = buffer
+        self.extras = extras
+        self.averaged_numel = averaged_numel
+    
+    @classmethod
+    def from_state_dict(cls, state_dict: Dict[str, torch.Tensor]) -> "FlatModel":
+        """
+        Pack a state dict into a flat model.
+        
+        Args:
+            state_dict: State dict to pack
+        
+        Returns:
+            Flat model holding a copy of the state dict
+        """
+        in_buffer = [key for key, tensor in state_dict.items() if tensor.dtype in BUFFER_DTYPES]
+        averaged = [key for key in in_buffer if is_averaged_parameter(key, state_dict[key])]
+        others = [key for key in in_buffer if not is_averaged_parameter(key, state_dict[key])]
+        
+        offsets = {}
+        numel = 0
+        for key in averaged + others:
+            offsets[key] = numel
+            numel += state_dict[key].numel()
+        averaged_numel = sum(state_dict[key].numel() for key in averaged)
+        
+        buffer = torch.empty(numel, dtype=torch.float32)
+        entries = []
+        extras = {}
+        
+        for key, tensor in state_dict.items():
+            entry = {
+                "name": key,
+                "shape": list(tensor.shape),
+                "dtype": str(tensor.dtype).replace("torch.", "")
+            }
+            if key in offsets:
+                entry["offset"] = offsets[key]
+                buffer[offsets[key]:offsets[key] + tensor.numel()] = tensor.detach().reshape(-1)
+            else:
+                extras[key] = tensor.detach().clone()
+            entries.append(entry)
+        
+        return cls(entries, buffer, extras, averaged_numel)
+    
+    @property
+    def averaged(self) -> torch.Tensor:
+        """View of the averaged parameters as one contiguous float32 vector."""
+        return self.buffer[:self.averaged_numel]
+    
+    @property
+    def averaged_layout(self) -> List[tuple]:
+        """(name, number of elements) of the averaged parameters, in buffer order."""
+        layout = [
+            (entry["name"], entry["offset"], int(np.prod(entry["shape"], dtype=np.int64)))
+            for entry in self.entries
+            if "offset" in entry and entry["offset"] < self.averaged_numel
+        ]
+        return [(name, numel) for name, _, numel in sorted(layout, key=lambda item: item[1])]
+    
+    def covers_averaged(self) -> bool:
+        """Check whether every averaged parameter is in `averaged` (none was kept as an extra)."""
+        return not any(is_averaged_parameter(name, tensor) for name, tensor in self.extras.items())
+    
+    def same_layout(self, other: "FlatModel") -> bool:
+        """Check whether two flat models have the same entries at the same offsets."""
+        return self.entries == other.entries and self.averaged_numel == other.averaged_numel
+    
+    def to_state_dict(self) -> Dict[str, torch.Tensor]:
+        """
+        Unpack into a state dict.
+        
+        Float32 entries are views into the buffer (no copy); entries of other
+        floating-point dtypes are cast back to their original dtype.
+        
+        Returns:
+            State dict in the original key order
+        """
+        state_dict = {}
+        for entry in self.entries:
+            name = entry["name"]
+            if name in self.extras:
+                state_dict[name] = self.extras[name]
+                continue
+            
+            numel = int(np.prod(entry["shape"], dtype=np.int64))
+            tensor = self.buffer[entry["offset"]:entry["offset"] + numel].view(entry["shape"])
+            dtype = getattr(torch, entry["dtype"])
+            state_dict[name] = tensor if dtype == torch.float32 else tensor.to(dtype)
+        
+        return state_dict
+    
+    def with_buffer(self, buffer: torch.Tensor) -> "FlatModel":
+        """Create a flat model with the same layout and extras but another buffer."""
+        if buffer.shape != self.buffer.shape:
+            raise ValueError(f"Buffer has {buffer.numel()} elements, layout needs {self.buffer.numel()}")
+        return FlatModel(self.entries, buffer, self.extras, self.averaged_numel)
+    
+    def _serialized_layout(self):
+        """Header, buffer offset, extras offset, extras (name, offset, raw bytes) and total size of the file format."""
+        extras = []
+        extras_offset = 0
+        for name, tensor in self.extras.items():
+            raw = tensor.contiguous().reshape(-1).view(torch.uint8).numpy().tobytes()
+            extras.append((name, extras_offset, raw))
+            extras_offset = _align(extras_offset + len(raw))
+        
+        header = json.dumps({
+            "format": FLAT_FORMAT,
+            "buffer_dtype": "float32",
+            "numel": self.buffer.numel(),
+            "averaged_numel": self.averaged_numel,
+            "entries": self.entries,
+            "extras": {name: {"offset": offset, "nbytes": len(raw)} for name, offset, raw in extras}
+        }).encode("utf-8")
+        
+        data_offset = _align(len(FLAT_MAGIC) + 8 + len(header))
+        extras_start = _align(data_offset + self.buffer.numel() * 4)
+        total = extras_start + extras[-1][1] + len(extras[-1][2]) if extras else data_offset + self.buffer.numel() * 4
+        return header, data_offset, extras_start, extras, total
+    
+    def save(self, path: str) -> str:
+        """
+        Write the flat model atomically.
+        
+        Args:
+            path: Destination file
+        
+        Returns:
+            The destination path
+        """
+        header, data_offset, extras_start, extras, _ = self._serialized_layout()
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        
+        with open(tmp_path, "wb") as f:
+            f.write(FLAT_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(b"\0" * (data_offset - f.tell()))
+            
+            # Write the buffer straight from its memory, a slice at a time
+            data = memoryview(self.buffer.contiguous().numpy()).cast("B")
+            for start in range(0, len(data), WRITE_CHUNK_BYTES):
+                f.write(data[start:start + WRITE_CHUNK_BYTES])
+            
+            for name, offset, raw in extras:
+                f.write(b"\0" * (extras_start + offset - f.tell()))
+                f.write(raw)
+        
+        os.replace(tmp_path, path)
+        return path
+    
+    def to_bytes(self) -> bytearray:
+        """
+        Serialize the flat model in its file format without touching disk.
+        
+        Returns:
+            The bytes `save` would write, in a buffer allocated once
+        """
+        header, data_offset, extras_start, extras, total = self._serialized_layout()
+        
+        out = bytearray(total)
+        out[:len(FLAT_MAGIC)] = FLAT_MAGIC
+        out[len(FLAT_MAGIC):len(FLAT_MAGIC) + 8] = struct.pack("<Q", len(header))
+        out[len(FLAT_MAGIC) + 8:len(FLAT_MAGIC) + 8 + len(header)] = header
+        
+        nbytes = self.buffer.numel() * 4
+        out[data_offset:data_offset + nbytes] = memoryview(self.buffer.contiguous().numpy()).cast("B")
+        
+        for name, offset, raw in extras:
+            out[extras_start + offset:extras_start + offset + len(raw)] = raw
+        
+        return out
+    
+    @classmethod
+    def from_bytes(cls, data: bytearray) -> "FlatModel":
+        """
+        Open a flat model held in memory, e.g. decrypted from a download.
+        
+        Args:
+            data: Bytes written by `save` or `to_bytes`; a writable buffer (e.g. bytearray) avoids a copy
+        
+        Returns:
+            Flat model whose buffer and extras are views into `data`
+        """
+        if not isinstance(data, bytearray):
+            data = bytearray(data)
+        
+        if data[:len(FLAT_MAGIC)] != FLAT_MAGIC:
+            raise ValueError("Not a flat model")
+        header_length = struct.unpack("<Q", data[len(FLAT_MAGIC):len(FLAT_MAGIC) + 8])[0]
+        header = json.loads(data[len(FLAT_MAGIC) + 8:len(FLAT_MAGIC) + 8 + header_length].decode("utf-8"))
+        
+        if header.get("format") != FLAT_FORMAT:
+            raise ValueError(f"Unsupported flat model format: {header.get('format')}")
+        
+        numel = header["numel"]
+        data_offset = _align(len(FLAT_MAGIC) + 8 + header_length)
+        extras_start = _align(data_offset + numel * 4)
+        if data_offset + numel * 4 > len(data):
+            raise ValueError("Flat model buffer extends past the end of the data")
+        
+        if numel == 0:
+            buffer = torch.empty(0, dtype=torch.float32)
+        else:
+            buffer = torch.frombuffer(data, dtype=torch.float32, count=numel, offset=data_offset)
+        
+        entries = {entry["name"]: entry for entry in header["entries"]}
+        extras = {}
+        for name, location in header["extras"].items():
+            entry = entries[name]
+            if location["nbytes"] == 0:
+                raw = torch.empty(0, dtype=torch.uint8)
+            else:
+                raw = torch.frombuffer(data, dtype=torch.uint8, count=location["nbytes"], offset=extras_start + location["offset"])
+            extras[name] = raw.view(getattr(torch, entry["dtype"])).reshape(entry["shape"])
+        
+        return cls(header["entries"], buffer, extras, header["averaged_numel"])
+    
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "FlatModel":
+        """
+        Open a flat model file.
+        
+        Args:
+            path: File written by `save`
+            mmap: Map the buffer copy-on-write instead of reading it into memory
+        
+        Returns:
+            Flat model; with `mmap`, its buffer is backed by the file and may be modified
+            in memory without changing the file
+        """
+        with open(path, "rb") as f:
+            if f.read(len(FLAT_MAGIC)) != FLAT_MAGIC:
+                raise ValueError(f"{path} is not a flat model file")
+            header_length = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_length).decode("utf-8"))
+            
+            if header.get("format") != FLAT_FORMAT:
+                raise ValueError(f"Unsupported flat model format in {path}: {header.get('format')}")
+            
+            numel = header["numel"]
+            data_offset = _align(len(FLAT_MAGIC) + 8 + header_length)
+            extras_start = _align(data_offset + numel * 4)
+            
+            if numel == 0:
+                buffer = torch.empty(0, dtype=torch.float32)
+            elif mmap:
+                buffer = torch.from_numpy(np.memmap(path, dtype=np.float32, mode="c", offset=data_offset, shape=(numel,)))
+            else:
+                f.seek(data_offset)
+                buffer = torch.from_numpy(np.frombuffer(bytearray(f.read(numel * 4)), dtype=np.float32))
+            
+            entries = {entry["name"]: entry for entry in header["entries"]}
+            extras = {}
+            for name, location in header["extras"].items():
+                f.seek(extras_start + location["offset"])
+                raw = torch.frombuffer(bytearray(f.read(location["nbytes"])), dtype=torch.uint8)
+                entry = entries[name]
+                extras[name] = raw.view(getattr(torch, entry["dtype"])).reshape(entry["shape"])
+        
+        return cls(header["entries"], buffer, extras, header["averaged_numel"])
+
+
+def is_flat_file(path: str) -> bool:
+    """Check whether a file is a flat model file."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(FLAT_MAGIC)) == FLAT_MAGIC
+    except OSError:
+        return False
+
+
+def pack_tensors(tensors: Dict[str, torch.Tensor]) -> bytearray:
+    """
+    Pack named tensors of any dtype into one buffer with a layout header.
+    
+    Unlike the flat model format, every tensor keeps its exact dtype, which
+    suits gradients and other tensors that are only moved, not averaged.
+    The data of each tensor is copied once, into a 64-byte aligned slot.
+    
+    Args:
+        tensors: Tensors to pack, by name
+    
+    Returns:
+        Packed bytes
+    """
+    entries = []
+    offset = 0
+    for name, tensor in tensors.items():
+        nbytes = tensor.numel() * tensor.element_size()
+        entries.append({
+            "name": name,
+            "shape": list(tensor.shape),
+            "dtype": str(tensor.dtype).replace("torch.", ""),
+            "offset": offset,
+            "nbytes": nbytes
+        })
+        offset = _align(offset + nbytes)
+    
+    header = json.dumps({"format": PACK_FORMAT, "entries": entries}).encode("utf-8")
+    data_offset = _align(len(PACK_MAGIC) + 8 + len(header))
+    
+    packed = bytearray(data_offset + offset)
+    packed[:len(PACK_MAGIC)] = PACK_MAGIC
+    packed[len(PACK_MAGIC):len(PACK_MAGIC) + 8] = struct.pack("<Q", len(header))
+    packed[len(PACK_MAGIC) + 8:len(PACK_MAGIC) + 8 + len(header)] = header
+    
+    for entry, tensor in zip(entries, tensors.values()):
+        if entry["nbytes"] == 0:
+            continue
+        slot = torch.frombuffer(packed, dtype=torch.uint8, count=entry["nbytes"], offset=data_offset + entry["offset"])
+        slot.copy_(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8))
+    
+    return packed
+
+
+def unpack_tensors(packed: bytearray) -> Dict[str, torch.Tensor]:
+    """
+    Unpack tensors packed by `pack_tensors`.
+    
+    Args:
+        packed: Packed bytes; a writable buffer (e.g. bytearray) avoids a copy
+    
+    Returns:
+        Tensors by name, as views into `packed`
+    """
+    if not isinstance(packed, bytearray):
+        packed = bytearray(packed)
+    
+    if packed[:len(PACK_MAGIC)] != PACK_MAGIC:
+        raise ValueError("Not a packed tensor buffer")
+    header_length = struct.unpack("<Q", packed[len(PACK_MAGIC):len(PACK_MAGIC) + 8])[0]
+    header = json.loads(packed[len(PACK_MAGIC) + 8:len(PACK_MAGIC) + 8 + header_length].decode("utf-8"))
+    
+    if header.get("format") != PACK_FORMAT:
+        raise ValueError(f"Unsupported packed tensor format: {header.get('format')}")
+    
+    data_offset = _align(len(PACK_MAGIC) + 8 + header_length)
+    tensors = {}
+    for entry in header["entries"]:
+        dtype = getattr(torch, entry["dtype"])
+        if entry["nbytes"] == 0:
+            tensors[entry["name"]] = torch.empty(entry["shape"], dtype=dtype)
+            continue
+        if data_offset + entry["offset"] + entry["nbytes"] > len(packed):
+            raise ValueError(f"Packed tensor {entry['name']} extends past the end of the buffer")
+        raw = torch.frombuffer(packed, dtype=torch.uint8, count=entry["nbytes"], offset=data_offset + entry["offset"])
+        tensors[entry["name"]] = raw.view(dtype).reshape(entry["shape"])
+    
+    return tensors
+
+
+def save_flat(state_dict: Dict[str, torch.Tensor], path: str) -> str:
+    """
+    Save a state dict as a flat model file.
+    
+    Args:
+        state_dict: State dict to save
+        path: Destination file
+    
+    Returns:
+        The destination path
+    """
+    return FlatModel.from_state_dict(state_dict).save(path)
+
+
+def load_state_dict_bytes(data: bytearray) -> Any:
+    """
+    Load a model held in memory in either the flat format or as a PyTorch checkpoint.
+    
+    Args:
+        data: Contents of a model file; flat models are viewed in place if it is writable
+    
+    Returns:
+        State dict (or any other object stored in a PyTorch checkpoint, such as a delta payload)
+    """
+    if data[:len(FLAT_MAGIC)] == FLAT_MAGIC:
+        return FlatModel.from_bytes(data).to_state_dict()
+    return torch.load(io.BytesIO(data), map_location="cpu")
+
+
+def load_state_dict_file(path: str, mmap: bool = True) -> Any:
+    """
+    Load a model file in either the flat format or as a PyTorch checkpoint.
+    
+    Args:
+        path: Model file
+        mmap: Memory-map the file where the format allows it
+    
+    Returns:
+        State dict (or any other object stored in a PyTorch checkpoint, such as a delta payload)
+    """
+    if is_flat_file(path):
+        return FlatModel.load(path, mmap=mmap).to_state_dict()
+    
+    if mmap:
+        try:
+            return torch.load(path, map_location="cpu", mmap=True)
+        except (TypeError, RuntimeError):
+            # Older PyTorch releases and legacy (non-zip) checkpoints cannot be memory-mapped
+            pass
+    return torch.load(path, map_location="cpu")
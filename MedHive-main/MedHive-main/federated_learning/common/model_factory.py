@@ -0,0 +1,159 @@
+import copy
+import logging
+import importlib
+import threading
+from typing import Dict, Optional, Tuple, Type, Union
+
+import torch
+import torch.nn as nn
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_ModelFactory")
+
+# model_type -> model class, resolved once per process
+_model_classes: Dict[str, Type[nn.Module]] = {}
+
+# model_type -> (template on the meta device, values of its non-persistent buffers)
+_templates: Dict[str, Tuple[nn.Module, Dict[str, torch.Tensor]]] = {}
+
+_lock = threading.Lock()
+
+
+def register_model(model_type: str, model_class: Type[nn.Module]) -> None:
+    """
+    Register a model class for a model type, e.g. one defined outside `federated_learning.models`.
+    
+    Args:
+        model_type: Type of model
+        model_class: Class whose no-argument constructor builds the model
+    """
+    with _lock:
+        _model_classes[model_type] = model_class
+        _templates.pop(model_type, None)
+
+
+def get_model_class(model_type: str) -> Type[nn.Module]:
+    """
+    Resolve the model class of a model type, importing `federated_learning.models.<model_type>.model` once.
+    
+    Args:
+        model_type: Type of model (e.g., 'pneumonia', 'ecg_analysis')
+    
+    Returns:
+        The `Model` class of the model type
+    """
+    model_class = _model_classes.get(model_type)
+    if model_class is not None:
+        return model_class
+    
+    with _lock:
+        if model_type not in _model_classes:
+            module_path = f"federated_learning.models.{model_type}.model"
+            model_module = importlib.import_module(module_path)
+            _model_classes[model_type] = getattr(model_module, "Model")
+        return _model_classes[model_type]
+
+
+def _get_template(model_type: str) -> Tuple[nn.Module, Dict[str, torch.Tensor]]:
+    """Get the meta-device template of a model type, building it on first use."""
+    template = _templates.get(model_type)
+    if template is not None:
+        return template
+    
+    model_class = get_model_class(model_type)
+    
+    with _lock:
+        if model_type in _templates:
+            return _templates[model_type]
+        
+        initialized = None
+        try:
+            # Parameters created under the meta device have a shape but no storage, so init is skipped
+            with torch.device("meta"):
+                meta_model = model_class()
+        except Exception as e:
+            logger.warning(f"Cannot build {model_type} on the meta device ({str(e)}), building it once on the CPU")
+            initialized = model_class()
+            meta_model = copy.deepcopy(initialized).to("meta")
+        
+        # Buffers that are not in the state dict are never loaded, so keep their initial values
+        persistent = set(meta_model.state_dict().keys())
+        non_persistent = [name for name, _ in meta_model.named_buffers() if name not in persistent]
+        
+        buffers = {}
+        if non_persistent:
+            if initialized is None:
+                initialized = model_class()
+            buffers = {name: initialized.get_buffer(name).detach().clone() for name in non_persistent}
+        
+        _templates[model_type] = (meta_model, buffers)
+        logger.info(f"Cached model template for {model_type}")
+        return _templates[model_type]
+
+
+def create_model(
+    model_type: str,
+    initialize: bool = True,
+    device: Optional[Union[str, torch.device]] = None
+) -> nn.Module:
+    """
+    Create a model of a type.
+    
+    With `initialize=False` the model is cloned from a cached template on the
+    meta device and only gets uninitialized storage, skipping the weight
+    initialization entirely. Use it only when every entry of the state dict
+    is overwritten right after, e.g. with `load_state_dict`.
+    
+    Args:
+        model_type: Type of model
+        initialize: Run the model's own weight initialization
+        device: Device of the model (default: CPU)
+    
+    Returns:
+        The model
+    """
+    if initialize:
+        model = get_model_class(model_type)()
+        return model.to(device) if device is not None else model
+    
+    template, buffers = _get_template(model_type)
+    model = copy.deepcopy(template).to_empty(device=device or "cpu")
+    
+    for name, value in buffers.items():
+        model.get_buffer(name).copy_(value)
+    
+    return model
+
+
+def load_model_weights(
+    model_type: str,
+    state_dict: Dict[str, torch.Tensor],
+    device: Optional[Union[str, torch.device]] = None
+) -> nn.Module:
+    """
+    Create a model of a type with the given weights, skipping weight initialization.
+    
+    Args:
+        model_type: Type of model
+        state_dict: Complete state dict of the model
+        device: Device of the model (default: CPU)
+    
+    Returns:
+        The model
+    """
+    model = create_model(model_type, initialize=False, device=device)
+    
+    # Strict loading guarantees no uninitialized entry is left
+    model.load_state_dict(state_dict)
+    return model
+
+
+def clear_model_cache() -> None:
+    """Forget all resolved model classes and templates, e.g. after model code changed."""
+    with _lock:
+        _model_classes.clear()
+        _templates.clear()
@@ -0,0 +1,195 @@
+import hashlib
+import logging
+from typing import Iterable, Union
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa, utils
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+    Encoding,
+    PublicFormat,
+    PrivateFormat,
+    NoEncryption
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Signing")
+
+# Supported signing key types
+KEY_TYPES = ("rsa", "ed25519")
+
+# Bytes read at a time when hashing files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Ed25519 signs the digest itself; the prefix keeps these signatures from being valid for anything else
+ED25519_CONTEXT = b"medhive-sha256:"
+
+PrivateKey = Union[rsa.RSAPrivateKey, ed25519.Ed25519PrivateKey]
+PublicKey = Union[rsa.RSAPublicKey, ed25519.Ed25519PublicKey]
+
+
+def new_hasher():
+    """Create the incremental hash used for signed content (SHA-256)."""
+    return hashlib.sha256()
+
+
+def hash_chunks(chunks: Iterable[bytes]) -> bytes:
+    """
+    Hash content arriving in chunks.
+    
+    Args:
+        chunks: Content, in order
+    
+    Returns:
+        SHA-256 digest
+    """
+    hasher = new_hasher()
+    for chunk in chunks:
+        hasher.update(chunk)
+    return hasher.digest()
+
+
+def hash_file(path: str) -> bytes:
+    """
+    Hash a file without reading it into memory at once.
+    
+    Args:
+        path: File to hash
+    
+    Returns:
+        SHA-256 digest
+    """
+    with open(path, "rb") as f:
+        return hash_chunks(iter(lambda: f.read(HASH_CHUNK_SIZE), b""))
+
+
+def generate_private_key(key_type: str = "rsa") -> PrivateKey:
+    """
+    Generate a signing key.
+    
+    Args:
+        key_type: 'rsa' (RSA-2048, PSS) or 'ed25519'
+    
+    Returns:
+        Private key
+    """
+    if key_type == "rsa":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if key_type == "ed25519":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unknown key type {key_type}, expected one of {', '.join(KEY_TYPES)}")
+
+
+def key_type_of(key: Union[PrivateKey, PublicKey]) -> str:
+    """Get the key type ('rsa' or 'ed25519') of a key."""
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "rsa"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "ed25519"
+    raise ValueError(f"Unsupported key: {type(key).__name__}")
+
+
+def private_key_to_pem(private_key: PrivateKey) -> bytes:
+    """Serialize a private key as unencrypted PKCS#8 PEM."""
+    return private_key.private_bytes(
+        encoding=Encoding.PEM,
+        format=PrivateFormat.PKCS8,
+        encryption_algorithm=NoEncryption()
+    )
+
+
+def public_key_to_pem(public_key: PublicKey) -> bytes:
+    """Serialize a public key as SubjectPublicKeyInfo PEM."""
+    return public_key.public_bytes(
+        encoding=Encoding.PEM,
+        format=PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def load_private_key(pem: bytes) -> PrivateKey:
+    """Load a PEM private key of a supported type."""
+    key = load_pem_private_key(pem, password=None)
+    key_type_of(key)
+    return key
+
+
+def load_public_key(pem: Union[bytes, str]) -> PublicKey:
+    """Load a PEM public key of a supported type."""
+    key = load_pem_public_key(pem.encode("utf-8") if isinstance(pem, str) else pem)
+    key_type_of(key)
+    return key
+
+
+def sign_digest(private_key: PrivateKey, digest: bytes) -> bytes:
+    """
+    Sign a SHA-256 digest.
+    
+    RSA keys sign it as a prehashed PSS signature, which is the same
+    signature as over the content the digest was taken from. Ed25519 keys
+    sign the digest with a fixed context prefix.
+    
+    Args:
+        private_key: Signing key
+        digest: SHA-256 digest of the content
+    
+    Returns:
+        Signature bytes
+    """
+    if len(digest) != 32:
+        raise ValueError(f"Expected a 32-byte SHA-256 digest, got {len(digest)} bytes")
+    
+    if key_type_of(private_key) == "rsa":
+        return private_key.sign(
+            digest,
+            padding.PSS(
+                mgf=padding.MGF1(hashes.SHA256()),
+                salt_length=padding.PSS.MAX_LENGTH
+            ),
+            utils.Prehashed(hashes.SHA256())
+        )
+    
+    return private_key.sign(ED25519_CONTEXT + digest)
+
+
+def verify_digest(public_key: PublicKey, digest: bytes, signature: bytes) -> bool:
+    """
+    Verify a signature made by `sign_digest`.
+    
+    Args:
+        public_key: Public key of the signer
+        digest: SHA-256 digest of the content
+        signature: Signature to verify
+    
+    Returns:
+        True if the signature is valid
+    """
+    if len(digest) != 32:
+        return False
+    
+    try:
+        if key_type_of(public_key) == "rsa":
+            public_key.verify(
+                signature,
+                digest,
+                padding.PSS(
+                    mgf=padding.MGF1(hashes.SHA256()),
+                    salt_length=padding.PSS.MAX_LENGTH
+                ),
+                utils.Prehashed(hashes.SHA256())
+            )
+        else:
+            public_key.verify(signature, ED25519_CONTEXT + digest)
+        return True
+    except (InvalidSignature, ValueError):
+        return False
+
+
+def sign_file(private_key: PrivateKey, path: str) -> bytes:
+    """Sign a file by its streamed SHA-256 digest."""
+    return sign_digest(private_key, hash_file(path))
@@ -1,11 +1,21 @@
 import os
+import uuid
 import logging
+import threading
 import torch
 import json
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
+from federated_learning.common.delta import is_averaged_parameter, is_delta, add_delta_, add_delta_range_
+from federated_learning.common.flat import FlatModel, is_flat_file, load_state_dict_file, save_flat
+from federated_learning.common.model_factory import create_model
+from federated_learning.server.strategies import AggregationStrategy, get_strategy
+from federated_learning.server.evaluation import EvaluationService
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,37 +23,198 @@ logging.basicConfig(
 )
 logger = logging.getLogger("FL_Aggregator")
 
+# Upper bound on the stacked [num_clients, chunk] buffer of kernel strategies
+KERNEL_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _load_checkpoint(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Load a client state dict onto the CPU, memory-mapping it when supported.
+    
+    Args:
+        path: Path to the checkpoint (flat model file or PyTorch checkpoint)
+        
+    Returns:
+        State dict whose tensors are backed by the file where possible
+    """
+    return load_state_dict_file(path, mmap=True)
+
+
+def _load_flat_vector(path: str, layout: List[Tuple[str, int]]) -> Optional[torch.Tensor]:
+    """
+    Map the averaged parameters of a flat model file as one vector, if its layout matches.
+    
+    Args:
+        path: Model file
+        layout: (key, number of elements) of each averaged parameter, in the expected order
+        
+    Returns:
+        Memory-mapped float32 vector, or None if the file is not flat or is laid out differently
+    """
+    if not is_flat_file(path):
+        return None
+    
+    flat = FlatModel.load(path)
+    if not flat.covers_averaged() or flat.averaged_layout != layout:
+        return None
+    return flat.averaged
+
+
+def _save_atomic(state_dict: Dict[str, torch.Tensor], path: str) -> None:
+    """Save a state dict to a temporary file and rename it over `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    torch.save(state_dict, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _init_shard_worker() -> None:
+    """Keep each aggregation worker single-threaded so workers do not oversubscribe cores."""
+    torch.set_num_threads(1)
+
+
+def _reduce_shard(model_paths: List[str], weights: List[float], keys: List[str]) -> Dict[str, torch.Tensor]:
+    """
+    Reduce one shard of parameters over all client checkpoints.
+    
+    Runs in a worker process. Checkpoints are memory-mapped where possible,
+    so each worker only pages in the tensors belonging to its own shard.
+    
+    Args:
+        model_paths: List of paths to client models
+        weights: Normalized weights for each model
+        keys: State dict keys in this shard
+        
+    Returns:
+        Aggregated tensors for the keys in the shard
+    """
+    accumulator: Dict[str, torch.Tensor] = {}
+    shard: Dict[str, torch.Tensor] = {}
+    dtypes: Dict[str, torch.dtype] = {}
+    
+    for i, (path, weight) in enumerate(zip(model_paths, weights)):
+        state_dict = _load_checkpoint(path)
+        
+        missing = [key for key in keys if key not in state_dict]
+        if missing:
+            raise ValueError(f"Model at {path} is missing parameters: {missing[:5]}")
+        
+        for key in keys:
+            tensor = state_dict[key]
+            if i == 0:
+                dtypes[key] = tensor.dtype
+                if is_averaged_parameter(key, tensor):
+                    accumulator[key] = tensor.to(torch.float32).mul(weight)
+                else:
+                    shard[key] = tensor.clone()
+            elif key in accumulator:
+                accumulator[key].add_(tensor.to(torch.float32), alpha=weight)
+        
+        del state_dict
+    
+    for key, running_sum in accumulator.items():
+        shard[key] = running_sum.to(dtypes[key])
+    
+    return shard
+
+
+def _flat_chunks(layout: List[Tuple[str, int]], chunk_numel: int) -> List[List[Tuple[str, int, int]]]:
+    """
+    Split the concatenation of a model's averaged parameters into contiguous chunks.
+    
+    Args:
+        layout: (key, number of elements) of each averaged parameter, in flat order
+        chunk_numel: Maximum number of elements per chunk
+        
+    Returns:
+        List of chunks, each a list of (key, start, end) element ranges within one parameter
+    """
+    chunks = []
+    current = []
+    room = chunk_numel
+    
+    for key, numel in layout:
+        start = 0
+        while start < numel:
+            end = min(numel, start + room)
+            current.append((key, start, end))
+            room -= end - start
+            start = end
+            
+            if room == 0:
+                chunks.append(current)
+                current = []
+                room = chunk_numel
+    
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _shard_keys(sizes: Dict[str, int], num_shards: int) -> List[List[str]]:
+    """
+    Split state dict keys into shards of roughly equal parameter count.
+    
+    Args:
+        sizes: Number of elements for each key
+        num_shards: Number of shards to produce
+        
+    Returns:
+        List of key lists, one per non-empty shard
+    """
+    shards: List[List[str]] = [[] for _ in range(num_shards)]
+    loads = [0] * num_shards
+    
+    # Greedy bin packing: place the largest tensors first on the lightest shard
+    for key in sorted(sizes, key=sizes.get, reverse=True):
+        target = loads.index(min(loads))
+        shards[target].append(key)
+        loads[target] += sizes[key]
+    
+    return [shard for shard in shards if shard]
+
+
 class ModelAggregator:
     """
     Aggregates models from multiple clients to create a federated global model.
     Implements various aggregation strategies like Federated Averaging (FedAvg).
     """
     
-    def __init__(self, model_type: str):
+    def __init__(
+        self,
+        model_type: str,
+        num_workers: Optional[int] = None,
+        evaluator: Optional[EvaluationService] = None
+    ):
         """
         Initialize the model aggregator.
         
         Args:
             model_type: Type of model being aggregated (e.g., 'pneumonia', 'ecg_analysis')
+            num_workers: Number of worker processes for parallel aggregation (default: CPU count)
+            evaluator: Evaluation service for the basic evaluation (default: evaluate in-process)
         """
         self.model_type = model_type
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.evaluator = evaluator
         logger.info(f"Initialized model aggregator for {model_type}")
     
-    def load_empty_model(self) -> torch.nn.Module:
+    def load_empty_model(self, initialize: bool = True) -> torch.nn.Module:
         """
         Load an empty model of the specified type.
         
+        The model class is resolved once per process (see federated_learning.common.model_factory).
+        
+        Args:
+            initialize: Run the model's weight initialization; pass False when every weight is
+                loaded right after, to clone a cached template without initializing it
+        
         Returns:
-            PyTorch model with default initialization
+            PyTorch model with default (or, without `initialize`, uninitialized) weights
         """
         try:
-            # Import the model module dynamically
-            module_path = f"federated_learning.models.{self.model_type}.model"
-            model_module = importlib.import_module(module_path)
-            
-            # Get the model class and create an instance
-            model_class = getattr(model_module, "Model")
-            model = model_class()
+            model = create_model(self.model_type, initialize=initialize)
             
             logger.info(f"Created empty model for {self.model_type}")
             return model
@@ -55,7 +226,11 @@ class ModelAggregator:
         self, 
         model_paths: List[str], 
         weights: Optional[List[float]] = None,
-        strategy: str = "fedavg"
+        strategy: str = "fedavg",
+        output_path: Optional[str] = None,
+        base_path: Optional[str] = None,
+        strategy_params: Optional[Dict[str, Any]] = None,
+        state_path: Optional[str] = None
     ) -> str:
         """
         Aggregate models using the specified strategy.
@@ -63,83 +238,513 @@ class ModelAggregator:
         Args:
             model_paths: List of paths to client models
             weights: Optional weights for each model (e.g., based on dataset size)
-            strategy: Aggregation strategy ('fedavg', 'weighted_avg', etc.)
+            strategy: Name of a registered aggregation strategy (see federated_learning.server.strategies).
+                Weighted means ('fedavg', 'fedprox') are streamed one client at a time; 'fedavg_parallel'
+                shards the reduction over worker processes; 'fedavg_online' is normally folded in as
+                uploads arrive (see IncrementalAggregator) and here falls back to streaming FedAvg.
+                Robust strategies and server optimizers run as kernels over stacked client chunks.
+            output_path: Where to save the aggregated model (default: models/global/<model_type>/aggregated.pt)
+            base_path: Global model the clients started from. When given, client files may be
+                delta updates (see federated_learning.common.delta) and are aggregated as deltas.
+                Required by server optimizers ('fedadam', 'fedyogi').
+            strategy_params: Parameters of the strategy, e.g. {"trim_ratio": 0.2}
+            state_path: Where strategies with state between rounds keep it
+                (default: models/global/<model_type>/<strategy>_state.pt)
             
         Returns:
             Path to the aggregated model
+            
+        Raises:
+            ValueError: If the strategy is unknown or cannot run with the given inputs
         """
         if not model_paths:
             raise ValueError("No models provided for aggregation")
         
-        if strategy.lower() == "fedavg":
-            return self._federated_averaging(model_paths, weights)
-        else:
-            logger.warning(f"Unknown aggregation strategy: {strategy}, using FedAvg")
-            return self._federated_averaging(model_paths, weights)
+        aggregation_strategy = get_strategy(strategy, **(strategy_params or {}))
+        
+        if not aggregation_strategy.streaming:
+            if state_path is None:
+                state_path = os.path.join("models", "global", self.model_type, f"{aggregation_strategy.name}_state.pt")
+            return self._kernel_aggregation(
+                aggregation_strategy, model_paths, weights, base_path, output_path, state_path
+            )
+        
+        if base_path is not None:
+            return self._delta_federated_averaging(model_paths, weights, base_path, output_path)
+        
+        if strategy.lower() == "fedavg_parallel":
+            return self._parallel_federated_averaging(model_paths, weights, output_path)
+        return self._federated_averaging(model_paths, weights, output_path)
     
-    def _federated_averaging(self, model_paths: List[str], weights: Optional[List[float]] = None) -> str:
+    def _federated_averaging(
+        self,
+        model_paths: List[str],
+        weights: Optional[List[float]] = None,
+        output_path: Optional[str] = None
+    ) -> str:
         """
         Implement Federated Averaging (FedAvg) algorithm.
         
+        Client checkpoints are streamed: each one is loaded (memory-mapped when
+        the checkpoint format allows it), folded into a single float32 running
+        sum and released before the next one is opened, so peak memory stays at
+        roughly two models regardless of the number of clients.
+        
         Args:
             model_paths: List of paths to client models
             weights: Optional weights for each model
+            output_path: Where to save the aggregated model
+            
+        Returns:
+            Path to the aggregated model
+        """
+        try:
+            weights = self._normalize_weights(weights, len(model_paths))
+            
+            # Flat models sharing one layout reduce to one in-place axpy per client
+            if all(is_flat_file(path) for path in model_paths):
+                flat = self._flat_weighted_sum(model_paths, weights)
+                if flat is not None:
+                    aggregated_path = self._save_aggregated(flat, output_path)
+                    logger.info(f"Successfully aggregated {len(model_paths)} flat models using FedAvg")
+                    return aggregated_path
+            
+            accumulator: Dict[str, torch.Tensor] = {}
+            passthrough: Dict[str, torch.Tensor] = {}
+            dtypes: Dict[str, torch.dtype] = {}
+            
+            for i, (path, weight) in enumerate(zip(model_paths, weights)):
+                state_dict = _load_checkpoint(path)
+                
+                if i == 0:
+                    # The first client defines the layout and provides the
+                    # entries that are not averaged (e.g. batch norm statistics)
+                    for key, tensor in state_dict.items():
+                        dtypes[key] = tensor.dtype
+                        if is_averaged_parameter(key, tensor):
+                            accumulator[key] = tensor.to(torch.float32).mul(weight)
+                        else:
+                            passthrough[key] = tensor.clone()
+                else:
+                    if state_dict.keys() != dtypes.keys():
+                        raise ValueError(f"Model at {path} does not match the parameter layout of {model_paths[0]}")
+                    
+                    for key, running_sum in accumulator.items():
+                        running_sum.add_(state_dict[key].to(torch.float32), alpha=weight)
+                
+                # Release the client checkpoint before loading the next one
+                del state_dict
+            
+            # Cast averaged parameters back to their original dtypes, keeping key order
+            global_state_dict = {}
+            for key, dtype in dtypes.items():
+                if key in accumulator:
+                    global_state_dict[key] = accumulator.pop(key).to(dtype)
+                else:
+                    global_state_dict[key] = passthrough[key]
+            
+            # Save the aggregated model
+            aggregated_path = self._save_aggregated(global_state_dict, output_path)
+            
+            logger.info(f"Successfully aggregated {len(model_paths)} models using FedAvg")
+            return aggregated_path
+            
+        except Exception as e:
+            logger.error(f"Error during FedAvg aggregation: {str(e)}")
+            raise
+    
+    def _flat_weighted_sum(self, model_paths: List[str], weights: List[float]) -> Optional[FlatModel]:
+        """
+        Weighted sum of the averaged parameters of flat model files.
+        
+        Args:
+            model_paths: Paths to flat model files
+            weights: Normalized weights for each model
+            
+        Returns:
+            Aggregated flat model, or None if the files cannot be summed as flat vectors
+        """
+        first = FlatModel.load(model_paths[0])
+        if not first.covers_averaged():
+            return None
+        
+        # The first client provides the entries that are not averaged, as in streaming FedAvg
+        result = first.buffer.clone()
+        result[:first.averaged_numel].mul_(weights[0])
+        averaged = result[:first.averaged_numel]
+        
+        for path, weight in zip(model_paths[1:], weights[1:]):
+            flat = FlatModel.load(path)
+            if not flat.same_layout(first):
+                raise ValueError(f"Model at {path} does not match the parameter layout of {model_paths[0]}")
+            averaged.add_(flat.averaged, alpha=weight)
+            
+            # Unmap the client before opening the next one
+            del flat
+        
+        return first.with_buffer(result)
+    
+    def _delta_federated_averaging(
+        self,
+        update_paths: List[str],
+        weights: Optional[List[float]],
+        base_path: str,
+        output_path: Optional[str] = None
+    ) -> str:
+        """
+        Implement FedAvg over client updates expressed relative to the round's base model.
+        
+        The weighted mean of the deltas is accumulated directly from the encoded
+        (possibly sparse and quantized) payloads and added to the base once, so
+        no client model is ever reconstructed. Full checkpoints are accepted too
+        and contribute their difference to the base.
+        
+        Args:
+            update_paths: List of paths to client updates (delta payloads or full state dicts)
+            weights: Optional weights for each update
+            base_path: Path to the global model the clients started from
+            output_path: Where to save the aggregated model
             
         Returns:
             Path to the aggregated model
         """
         try:
-            # Load all client models
-            client_models = []
-            for path in model_paths:
-                # Create a new model instance
-                model = self.load_empty_model()
+            weights = self._normalize_weights(weights, len(update_paths))
+            base = _load_checkpoint(base_path)
+            
+            accumulator = {
+                key: torch.zeros(tensor.shape, dtype=torch.float32)
+                for key, tensor in base.items() if is_averaged_parameter(key, tensor)
+            }
+            passthrough = None
+            
+            for update_path, weight in zip(update_paths, weights):
+                update = _load_checkpoint(update_path)
                 
-                # Load the state dict from the client model
-                model.load_state_dict(torch.load(path))
-                client_models.append(model)
-            
-            # Get the state dict of the first model as reference
-            global_state_dict = client_models[0].state_dict()
-            
-            # If weights are not provided, use equal weighting
-            if weights is None:
-                weights = [1.0 / len(client_models)] * len(client_models)
-            else:
-                # Normalize weights to sum to 1
-                weights = [w / sum(weights) for w in weights]
-            
-            # For each parameter in the model
-            for key in global_state_dict.keys():
-                # Skip batch normalization parameters
-                if 'running_mean' in key or 'running_var' in key or 'num_batches_tracked' in key:
-                    continue
+                if is_delta(update):
+                    if update["tensors"].keys() != accumulator.keys():
+                        raise ValueError(f"Delta update {update_path} does not match the parameter layout of the base model")
+                    for key, entry in update["tensors"].items():
+                        add_delta_(accumulator[key], entry, alpha=weight)
+                    client_passthrough = update["passthrough"]
+                else:
+                    for key, running_sum in accumulator.items():
+                        running_sum.add_(update[key].to(torch.float32) - base[key].to(torch.float32), alpha=weight)
+                    client_passthrough = {key: update[key] for key in base if key not in accumulator}
                 
-                # Initialize parameter with weighted value from first model
-                global_state_dict[key] = client_models[0].state_dict()[key] * weights[0]
+                # Non-averaged entries are taken from the first client, as in FedAvg
+                if passthrough is None:
+                    passthrough = {key: tensor.clone() for key, tensor in client_passthrough.items()}
                 
-                # Add weighted parameters from other models
-                for i in range(1, len(client_models)):
-                    global_state_dict[key] += client_models[i].state_dict()[key] * weights[i]
+                del update
             
-            # Create a new model and load the aggregated state dict
-            global_model = self.load_empty_model()
-            global_model.load_state_dict(global_state_dict)
+            global_state_dict = {}
+            for key, tensor in base.items():
+                if key in accumulator:
+                    global_state_dict[key] = accumulator.pop(key).add_(tensor.to(torch.float32)).to(tensor.dtype)
+                else:
+                    global_state_dict[key] = passthrough.get(key, tensor)
             
             # Save the aggregated model
-            aggregated_dir = os.path.join("models", "global", self.model_type)
-            os.makedirs(aggregated_dir, exist_ok=True)
+            aggregated_path = self._save_aggregated(global_state_dict, output_path)
+            
+            logger.info(f"Successfully aggregated {len(update_paths)} client updates as deltas using FedAvg")
+            return aggregated_path
+            
+        except Exception as e:
+            logger.error(f"Error during delta FedAvg aggregation: {str(e)}")
+            raise
+    
+    def _kernel_aggregation(
+        self,
+        strategy: AggregationStrategy,
+        model_paths: List[str],
+        weights: Optional[List[float]],
+        base_path: Optional[str],
+        output_path: Optional[str],
+        state_path: str
+    ) -> str:
+        """
+        Run a strategy kernel over the stacked, flattened client parameters.
+        
+        The averaged parameters of every client are viewed as one flat vector
+        and processed in chunks: each chunk is gathered into a `[num_clients,
+        chunk]` float32 buffer (checkpoints stay memory-mapped, so only that
+        slice is paged in) and reduced by the strategy in one vectorized call.
+        Strategies comparing whole clients first get pairwise distances,
+        accumulated as a Gram matrix over all chunks. Peak memory is about one
+        buffer plus the output model, regardless of model size.
+        
+        Args:
+            strategy: Strategy to run
+            model_paths: List of paths to client models or delta updates
+            weights: Optional weights for each model
+            base_path: Global model the clients started from, if known
+            output_path: Where to save the aggregated model
+            state_path: Where the strategy's state between rounds is kept
             
-            aggregated_path = os.path.join(aggregated_dir, "aggregated.pt")
-            torch.save(global_model.state_dict(), aggregated_path)
+        Returns:
+            Path to the aggregated model
+        """
+        try:
+            if strategy.requires_base and base_path is None:
+                raise ValueError(f"Aggregation strategy {strategy.name} needs the round's global model")
+            
+            num_clients = len(model_paths)
+            weights = torch.tensor(self._normalize_weights(weights, num_clients), dtype=torch.float32)
+            
+            updates = [_load_checkpoint(path) for path in model_paths]
+            base = _load_checkpoint(base_path) if base_path is not None else None
+            
+            if base is None and any(is_delta(update) for update in updates):
+                raise ValueError("Delta updates cannot be aggregated without the round's global model")
+            
+            # The base (or first client) defines the layout of the flat parameter vector
+            reference = base if base is not None else updates[0]
+            layout = [
+                (key, tensor.numel()) for key, tensor in reference.items()
+                if is_averaged_parameter(key, tensor)
+            ]
+            for path, update in zip(model_paths, updates):
+                keys = update["tensors"].keys() if is_delta(update) else update.keys()
+                missing = [key for key, _ in layout if key not in keys]
+                if missing:
+                    raise ValueError(f"Model at {path} is missing parameters: {missing[:5]}")
+            
+            numel = sum(size for _, size in layout)
+            chunk_numel = max(1, min(numel, KERNEL_CHUNK_BYTES // (4 * num_clients)))
+            chunks = _flat_chunks(layout, chunk_numel)
+            buffer = torch.empty(num_clients, chunk_numel, dtype=torch.float32)
+            
+            # Flat files with the same layout are read as one contiguous slice per chunk
+            vectors = [_load_flat_vector(path, layout) for path in model_paths]
+            base_vector = _load_flat_vector(base_path, layout) if base_path is not None else None
+            
+            def read_base(chunk: List[Tuple[str, int, int]], chunk_start: int, width: int) -> torch.Tensor:
+                """Read one chunk of the base as a float32 vector."""
+                if base_vector is not None:
+                    return base_vector[chunk_start:chunk_start + width]
+                return torch.cat([base[key].reshape(-1)[start:end].to(torch.float32) for key, start, end in chunk])
+            
+            def gather(chunk: List[Tuple[str, int, int]], chunk_start: int) -> torch.Tensor:
+                """Fill the buffer with one chunk of every client, relative to the base if known."""
+                width = sum(end - start for _, start, end in chunk)
+                stacked = buffer[:, :width]
+                
+                for row, update, vector in zip(stacked, updates, vectors):
+                    if vector is not None:
+                        row.copy_(vector[chunk_start:chunk_start + width])
+                        if base is not None:
+                            row.sub_(read_base(chunk, chunk_start, width))
+                        continue
+                    
+                    offset = 0
+                    for key, start, end in chunk:
+                        piece = row[offset:offset + end - start]
+                        if is_delta(update):
+                            piece.zero_()
+                            add_delta_range_(piece, update["tensors"][key], start, end)
+                        else:
+                            piece.copy_(update[key].reshape(-1)[start:end])
+                            if base is not None:
+                                piece.sub_(base[key].reshape(-1)[start:end])
+                        offset += end - start
+                
+                return stacked
+            
+            chunk_starts = [0]
+            for chunk in chunks[:-1]:
+                chunk_starts.append(chunk_starts[-1] + sum(end - start for _, start, end in chunk))
+            
+            if strategy.needs_distances:
+                # ||x_i - x_j||^2 = G_ii + G_jj - 2 G_ij, with the Gram matrix summed over chunks
+                gram = torch.zeros(num_clients, num_clients, dtype=torch.float64)
+                for chunk, chunk_start in zip(chunks, chunk_starts):
+                    stacked = gather(chunk, chunk_start)
+                    gram += (stacked @ stacked.T).to(torch.float64)
+                
+                norms = gram.diagonal()
+                distances = (norms[:, None] + norms[None, :] - 2 * gram).clamp_(min=0)
+                weights = strategy.select(distances.to(torch.float32), weights)
+            
+            state = self._load_strategy_state(strategy, state_path, layout, numel)
+            
+            # The aggregate is built as one flat vector in layout order
+            output = torch.empty(numel, dtype=torch.float32)
+            for chunk, chunk_start in zip(chunks, chunk_starts):
+                aggregate = strategy.reduce(gather(chunk, chunk_start), weights)
+                width = aggregate.numel()
+                
+                base_chunk = read_base(chunk, chunk_start, width) if base is not None else None
+                state_chunk = {name: tensor[chunk_start:chunk_start + width] for name, tensor in state.items()}
+                output[chunk_start:chunk_start + width] = strategy.apply(aggregate, base_chunk, state_chunk)
             
-            logger.info(f"Successfully aggregated {len(client_models)} models using FedAvg")
+            del buffer
+            
+            offsets = {}
+            offset = 0
+            for key, size in layout:
+                offsets[key] = (offset, size)
+                offset += size
+            
+            if state:
+                _save_atomic({"layout": layout, **state}, state_path)
+            
+            # Entries that are not averaged are taken from the first client, as in FedAvg
+            first = updates[0]
+            passthrough = first["passthrough"] if is_delta(first) else first
+            
+            global_state_dict = {}
+            for key, tensor in reference.items():
+                if key in offsets:
+                    start, size = offsets[key]
+                    global_state_dict[key] = output[start:start + size].view(tensor.shape).to(tensor.dtype)
+                else:
+                    global_state_dict[key] = passthrough.get(key, tensor).clone()
+            
+            del updates
+            
+            # Save the aggregated model
+            aggregated_path = self._save_aggregated(global_state_dict, output_path)
+            
+            logger.info(f"Successfully aggregated {num_clients} models using {strategy.name} in {len(chunks)} chunks")
             return aggregated_path
             
         except Exception as e:
-            logger.error(f"Error during FedAvg aggregation: {str(e)}")
+            logger.error(f"Error during {strategy.name} aggregation: {str(e)}")
             raise
     
+    def _load_strategy_state(
+        self,
+        strategy: AggregationStrategy,
+        state_path: str,
+        layout: List[Tuple[str, int]],
+        numel: int
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Load a strategy's state from the previous round, or start fresh if there is none or the model changed.
+        
+        Args:
+            strategy: Strategy whose state to load
+            state_path: Where the state is kept
+            layout: (key, number of elements) of each averaged parameter
+            numel: Total number of averaged parameters
+            
+        Returns:
+            Flat state tensors by name (empty for stateless strategies)
+        """
+        state = strategy.init_state(numel)
+        if not state or not os.path.exists(state_path):
+            return state
+        
+        saved = torch.load(state_path, map_location="cpu")
+        if [tuple(entry) for entry in saved.pop("layout")] != layout:
+            logger.warning(f"Model layout changed since {state_path} was saved, resetting {strategy.name} state")
+            return state
+        
+        return {name: saved[name] for name in state}
+    
+    def _parallel_federated_averaging(
+        self,
+        model_paths: List[str],
+        weights: Optional[List[float]] = None,
+        output_path: Optional[str] = None
+    ) -> str:
+        """
+        Implement FedAvg with checkpoint loading and reduction spread over worker processes.
+        
+        The parameter dict is split by key into one shard per worker. Each worker
+        deserializes every client checkpoint, reduces only the tensors of its own
+        shard, and the shards are stitched back together into the aggregated model.
+        
+        Args:
+            model_paths: List of paths to client models
+            weights: Optional weights for each model
+            output_path: Where to save the aggregated model
+            
+        Returns:
+            Path to the aggregated model
+        """
+        try:
+            weights = self._normalize_weights(weights, len(model_paths))
+            
+            # Use the first checkpoint to determine the layout and shard sizes
+            reference = _load_checkpoint(model_paths[0])
+            key_order = list(reference.keys())
+            sizes = {key: max(tensor.numel(), 1) for key, tensor in reference.items()}
+            del reference
+            
+            shards = _shard_keys(sizes, min(self.num_workers, len(sizes)))
+            
+            global_state_dict = {}
+            with ProcessPoolExecutor(
+                max_workers=len(shards),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_shard_worker
+            ) as pool:
+                futures = [pool.submit(_reduce_shard, model_paths, weights, keys) for keys in shards]
+                for future in futures:
+                    global_state_dict.update(future.result())
+            
+            # Restore the original key order
+            global_state_dict = {key: global_state_dict[key] for key in key_order}
+            
+            # Save the aggregated model
+            aggregated_path = self._save_aggregated(global_state_dict, output_path)
+            
+            logger.info(f"Successfully aggregated {len(model_paths)} models using parallel FedAvg with {len(shards)} workers")
+            return aggregated_path
+            
+        except Exception as e:
+            logger.error(f"Error during parallel FedAvg aggregation: {str(e)}")
+            raise
+    
+    def _save_aggregated(self, model: Union[Dict[str, torch.Tensor], FlatModel], output_path: Optional[str] = None) -> str:
+        """
+        Save an aggregated model atomically in the flat model format.
+        
+        The file is written next to its destination and renamed into place, so
+        an existing file at that path is replaced rather than overwritten in
+        place and may safely be hard-linked elsewhere.
+        
+        Args:
+            model: Aggregated state dict or flat model
+            output_path: Destination (default: models/global/<model_type>/aggregated.pt)
+            
+        Returns:
+            Path to the aggregated model
+        """
+        if output_path is None:
+            output_path = os.path.join("models", "global", self.model_type, "aggregated.pt")
+        
+        if isinstance(model, FlatModel):
+            return model.save(output_path)
+        return save_flat(model, output_path)
+    
+    def _normalize_weights(self, weights: Optional[List[float]], num_models: int) -> List[float]:
+        """
+        Normalize client weights so that they sum to 1.
+        
+        Args:
+            weights: Optional weights for each model
+            num_models: Number of models being aggregated
+            
+        Returns:
+            List of normalized weights
+        """
+        # If weights are not provided, use equal weighting
+        if weights is None:
+            return [1.0 / num_models] * num_models
+        
+        if len(weights) != num_models:
+            raise ValueError(f"Expected {num_models} weights, got {len(weights)}")
+        
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("Aggregation weights must sum to a positive value")
+        
+        return [w / total for w in weights]
+    
     def evaluate_aggregated_model(
         self, 
         model_path: str, 
@@ -186,6 +791,9 @@ class ModelAggregator:
         """
         Perform a basic evaluation of the model.
         
+        The test set is decoded once into the evaluator's cache and evaluated in
+        shards, with loss and confusion matrix accumulated as tensors.
+        
         Args:
             model_path: Path to the model
             test_data_path: Path to test data
@@ -194,122 +802,8 @@ class ModelAggregator:
             Dictionary with evaluation metrics
         """
         try:
-            # Import necessary modules
-            from torch.utils.data import DataLoader
-            import torch.nn as nn
-            
-            device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
-            
-            # Load model
-            model = self.load_empty_model()
-            model.load_state_dict(torch.load(model_path))
-            model = model.to(device)
-            model.eval()
-            
-            # Load dataset
-            try:
-                module_path = f"federated_learning.models.{self.model_type}.dataset"
-                dataset_module = importlib.import_module(module_path)
-                dataset_class = getattr(dataset_module, "CustomDataset")
-                test_dataset = dataset_class(test_data_path, train=False)
-            except Exception as e:
-                logger.error(f"Error loading test dataset: {str(e)}")
-                return {"error": "Failed to load test dataset"}
-            
-            # Create data loader
-            test_loader = DataLoader(
-                test_dataset,
-                batch_size=32,
-                shuffle=False,
-                num_workers=4,
-                pin_memory=True if device.type == "cuda" else False
-            )
-            
-            # Get loss function
-            try:
-                module_path = f"federated_learning.models.{self.model_type}.hyperparams"
-                hyperparam_module = importlib.import_module(module_path)
-                hyperparams = getattr(hyperparam_module, "HYPERPARAMS")
-                loss_type = hyperparams.get("loss_function", "cross_entropy").lower()
-                
-                if loss_type == "cross_entropy":
-                    loss_fn = nn.CrossEntropyLoss()
-                elif loss_type == "bce":
-                    loss_fn = nn.BCELoss()
-                elif loss_type == "bce_with_logits":
-                    loss_fn = nn.BCEWithLogitsLoss()
-                elif loss_type == "mse":
-                    loss_fn = nn.MSELoss()
-                else:
-                    loss_fn = nn.CrossEntropyLoss()
-            except Exception:
-                loss_fn = nn.CrossEntropyLoss()
-            
-            # Evaluation
-            total_loss = 0.0
-            total_correct = 0
-            total_samples = 0
-            
-            true_positives = 0
-            true_negatives = 0
-            false_positives = 0
-            false_negatives = 0
-            
-            with torch.no_grad():
-                for batch in test_loader:
-                    inputs, targets = batch
-                    
-                    # Move data to device
-                    inputs = inputs.to(device)
-                    targets = targets.to(device)
-                    
-                    # Forward pass
-                    outputs = model(inputs)
-                    
-                    # Calculate loss
-                    loss = loss_fn(outputs, targets)
-                    total_loss += loss.item() * inputs.size(0)
-                    
-                    # Calculate accuracy and confusion matrix values
-                    if targets.dim() == 1:  # Multi-class classification
-                        _, predicted = torch.max(outputs, 1)
-                        total_correct += (predicted == targets).sum().item()
-                        
-                        # For simplicity, we only calculate binary metrics for binary classification or first class in multi-class
-                        binary_targets = (targets == 1).float()
-                        binary_preds = (predicted == 1).float()
-                    else:  # Binary classification
-                        predicted = (outputs >= 0.5).float()
-                        total_correct += (predicted == targets).sum().item()
-                        
-                        binary_targets = targets
-                        binary_preds = predicted
-                    
-                    # Update confusion matrix values
-                    true_positives += ((binary_preds == 1) & (binary_targets == 1)).sum().item()
-                    true_negatives += ((binary_preds == 0) & (binary_targets == 0)).sum().item()
-                    false_positives += ((binary_preds == 1) & (binary_targets == 0)).sum().item()
-                    false_negatives += ((binary_preds == 0) & (binary_targets == 1)).sum().item()
-                    
-                    total_samples += targets.size(0)
-            
-            # Calculate metrics
-            avg_loss = total_loss / total_samples
-            accuracy = total_correct / total_samples
-            
-            # Avoid division by zero
-            precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-            recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-            
-            f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
-            
-            metrics = {
-                "loss": avg_loss,
-                "accuracy": accuracy,
-                "precision": precision,
-                "recall": recall,
-                "f1_score": f1
-            }
+            evaluator = self.evaluator or EvaluationService(num_workers=1)
+            metrics = evaluator.evaluate(self.model_type, model_path, test_data_path)
             
             # Save metrics to file
             metrics_dir = os.path.join("models", "global", self.model_type)
@@ -327,6 +821,188 @@ class ModelAggregator:
             return {"error": str(e)}
 
 
+
+class IncrementalAggregator:
+    """
+    Folds client models into a running weighted sum as they are uploaded.
+    
+    The running sum is kept in float32 together with the total weight seen so
+    far, and is persisted after every fold so a server restart in the middle
+    of a round does not lose the contributions already folded in. Finishing
+    the round only requires normalizing the sum and saving it.
+    
+    With a `base_path`, uploads are folded as deltas against that base model:
+    delta payloads are added without being expanded to full models, and the
+    normalized sum is added to the base when the round is finalized.
+    
+    The aggregator does not lock itself; callers hold `lock` around `add`,
+    `save` and `finalize`, so folds of one round run one at a time without
+    blocking anything else.
+    """
+    
+    def __init__(self, state_path: str, base_path: Optional[str] = None):
+        """
+        Initialize the incremental aggregator, resuming from `state_path` if it exists.
+        
+        Args:
+            state_path: Path where the running aggregate is persisted
+            base_path: Global model the clients started from, to fold uploads as deltas
+        """
+        self.state_path = state_path
+        self.base_path = base_path
+        self._base: Optional[Dict[str, torch.Tensor]] = None
+        self.sums: Dict[str, torch.Tensor] = {}
+        self.passthrough: Dict[str, torch.Tensor] = {}
+        self.dtypes: Dict[str, torch.dtype] = {}
+        self.total_weight = 0.0
+        self.folded_clients: List[str] = []
+        self.finalized = False
+        self.lock = threading.Lock()
+        
+        if os.path.exists(state_path):
+            self._load()
+    
+    def add(self, client_id: str, model_path: str, weight: float = 1.0) -> bool:
+        """
+        Fold a client model into the running sum.
+        
+        Args:
+            client_id: ID of the client that produced the model
+            model_path: Path to the client model
+            weight: Aggregation weight of the client (e.g., its training data size)
+            
+        Returns:
+            True if the model was folded in, False if the client was already included
+        """
+        if client_id in self.folded_clients:
+            logger.info(f"Client {client_id} already folded into the running aggregate")
+            return False
+        
+        if weight <= 0:
+            raise ValueError(f"Aggregation weight for client {client_id} must be positive")
+        
+        state_dict = _load_checkpoint(model_path)
+        
+        if self.base_path is not None:
+            self._add_delta(client_id, state_dict, weight)
+        elif is_delta(state_dict):
+            raise ValueError(f"Delta update from client {client_id} needs a base model to be folded")
+        elif not self.dtypes:
+            # The first client defines the layout and the non-averaged entries
+            for key, tensor in state_dict.items():
+                self.dtypes[key] = tensor.dtype
+                if is_averaged_parameter(key, tensor):
+                    self.sums[key] = tensor.to(torch.float32).mul(weight)
+                else:
+                    self.passthrough[key] = tensor.clone()
+        else:
+            if state_dict.keys() != self.dtypes.keys():
+                raise ValueError(f"Model from client {client_id} does not match the parameter layout of the round")
+            
+            for key, running_sum in self.sums.items():
+                running_sum.add_(state_dict[key].to(torch.float32), alpha=weight)
+        
+        del state_dict
+        
+        self.total_weight += weight
+        self.folded_clients.append(client_id)
+        
+        logger.info(f"Folded model from client {client_id} into running aggregate ({len(self.folded_clients)} clients)")
+        return True
+    
+    def _add_delta(self, client_id: str, update: Dict[str, Any], weight: float) -> None:
+        """Fold an update into the running sum of deltas against the base model."""
+        base = self._get_base()
+        
+        if not self.dtypes:
+            # The base defines the layout
+            for key, tensor in base.items():
+                self.dtypes[key] = tensor.dtype
+                if is_averaged_parameter(key, tensor):
+                    self.sums[key] = torch.zeros(tensor.shape, dtype=torch.float32)
+        
+        if is_delta(update):
+            if update["tensors"].keys() != self.sums.keys():
+                raise ValueError(f"Delta update from client {client_id} does not match the parameter layout of the round")
+            for key, entry in update["tensors"].items():
+                add_delta_(self.sums[key], entry, alpha=weight)
+            client_passthrough = update["passthrough"]
+        else:
+            for key, running_sum in self.sums.items():
+                running_sum.add_(update[key].to(torch.float32) - base[key].to(torch.float32), alpha=weight)
+            client_passthrough = {key: update[key] for key in base if key not in self.sums}
+        
+        # Non-averaged entries are taken from the first client
+        if not self.passthrough:
+            self.passthrough = {key: tensor.clone() for key, tensor in client_passthrough.items()}
+    
+    def _get_base(self) -> Dict[str, torch.Tensor]:
+        """Load the base model on first use."""
+        if self._base is None:
+            self._base = _load_checkpoint(self.base_path)
+        return self._base
+    
+    def save(self) -> None:
+        """Persist the running aggregate atomically."""
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        
+        tmp_path = f"{self.state_path}.tmp"
+        torch.save({
+            "sums": self.sums,
+            "passthrough": self.passthrough,
+            "dtypes": {key: str(dtype).replace("torch.", "") for key, dtype in self.dtypes.items()},
+            "total_weight": self.total_weight,
+            "folded_clients": self.folded_clients
+        }, tmp_path)
+        os.replace(tmp_path, self.state_path)
+    
+    def finalize(self, output_path: str) -> str:
+        """
+        Normalize the running sum and save the aggregated model.
+        
+        Args:
+            output_path: Path for the aggregated model
+            
+        Returns:
+            Path to the aggregated model
+        """
+        if not self.folded_clients:
+            raise ValueError("No client models have been folded into the running aggregate")
+        
+        global_state_dict = {}
+        if self.base_path is not None:
+            for key, tensor in self._get_base().items():
+                if key in self.sums:
+                    mean_delta = self.sums[key].div(self.total_weight)
+                    global_state_dict[key] = mean_delta.add_(tensor.to(torch.float32)).to(tensor.dtype)
+                else:
+                    global_state_dict[key] = self.passthrough.get(key, tensor)
+        else:
+            for key, dtype in self.dtypes.items():
+                if key in self.sums:
+                    global_state_dict[key] = self.sums[key].div(self.total_weight).to(dtype)
+                else:
+                    global_state_dict[key] = self.passthrough[key]
+        
+        save_flat(global_state_dict, output_path)
+        self.finalized = True
+        
+        logger.info(f"Finalized running aggregate of {len(self.folded_clients)} clients to {output_path}")
+        return output_path
+    
+    def _load(self) -> None:
+        """Load a previously persisted running aggregate."""
+        state = torch.load(self.state_path, map_location="cpu")
+        
+        self.sums = state["sums"]
+        self.passthrough = state["passthrough"]
+        self.dtypes = {key: getattr(torch, name) for key, name in state["dtypes"].items()}
+        self.total_weight = state["total_weight"]
+        self.folded_clients = list(state["folded_clients"])
+        
+        logger.info(f"Resumed running aggregate with {len(self.folded_clients)} clients from {self.state_path}")
+
+
 if __name__ == "__main__":
     # Test the aggregator
     import argparse
@@ -336,11 +1012,12 @@ if __name__ == "__main__":
     parser.add_argument("--model_paths", type=str, nargs="+", required=True, help="Paths to client models")
     parser.add_argument("--weights", type=float, nargs="+", help="Weights for each model")
     parser.add_argument("--strategy", type=str, default="fedavg", help="Aggregation strategy")
+    parser.add_argument("--workers", type=int, help="Worker processes for parallel aggregation")
     parser.add_argument("--test_data", type=str, help="Path to test data for evaluation")
     
     args = parser.parse_args()
     
-    aggregator = ModelAggregator(args.model_type)
+    aggregator = ModelAggregator(args.model_type, num_workers=args.workers)
     
     # Aggregate models
     aggregated_path = aggregator.aggregate_models(
@@ -0,0 +1,661 @@
+import os
+import json
+import base64
+import binascii
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from fastapi import FastAPI, File, Form, UploadFile, Body, Request, Depends, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+from federated_learning.common.signing import new_hasher
+from federated_learning.server.server import FederatedLearningServer
+from federated_learning.server.uploads import DEFAULT_CHUNK_SIZE, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE
+from federated_learning.server.round_events import format_cursor, parse_cursor
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_API")
+
+# Size of the chunks uploaded models are streamed to disk in
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Size of the chunks model downloads are read from disk in
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Number of (model, chunk size) digest lists kept for chunked downloads
+CHUNK_DIGEST_CACHE_SIZE = 64
+
+# Seconds between keep-alive comments on an idle event stream
+EVENT_HEARTBEAT_INTERVAL = 15.0
+
+# Seconds after which an event stream is closed and the client reconnects from its cursor
+EVENT_STREAM_DURATION = 300.0
+
+# Milliseconds a client waits before reconnecting a dropped event stream
+EVENT_RETRY_MS = 5000
+
+# Token role that may read every round and every client's state
+ADMIN_ROLE = "admin"
+
+
+def create_app(server: FederatedLearningServer, io_threads: int = 32) -> FastAPI:
+    """
+    Create the HTTP front end for a federated learning server.
+    
+    Routes mirror the paths used by `FederatedClient`. Every call into the
+    server runs on a thread pool, because handlers take round locks and write
+    journal entries and model files; the event loop itself only parses
+    requests and streams bodies, so it stays free for thousands of polling
+    clients.
+    
+    Unless the server runs without security, every request must carry a
+    bearer token issued by the server's security manager, and a client may
+    only act as the client ID in the token's subject. Round state and models
+    are only served to the round's clients; tokens with the admin role see
+    every round and every client.
+    
+    Args:
+        server: Server whose state the API exposes
+        io_threads: Number of threads for blocking server calls and disk I/O
+    
+    Returns:
+        FastAPI application
+    """
+    app = FastAPI(title="MedHive Federated Learning Server")
+    io_executor = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="FL_API")
+    
+    # (blob digest, chunk size) -> hex SHA-256 digests of the blob's chunks, oldest first
+    chunk_digest_cache: Dict[Tuple[str, int], List[str]] = {}
+    
+    async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on the I/O thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+    
+    @app.on_event("shutdown")
+    def shutdown_executor() -> None:
+        io_executor.shutdown(wait=False)
+    
+    @app.exception_handler(HTTPException)
+    async def http_error(request: Request, exc: HTTPException) -> JSONResponse:
+        """Report rejected requests in the same shape as server errors."""
+        return JSONResponse({"status": "error", "message": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+    
+    async def authenticate(request: Request) -> Optional[Dict[str, Any]]:
+        """
+        Verify the request's bearer token.
+        
+        Returns:
+            Claims of the token, with the client ID as `sub`, or None if the server runs without security
+        """
+        if server.security is None:
+            return None
+        
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(status_code=401, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+        
+        # Verified tokens are cached, so only a token's first request pays for the signature check
+        valid, payload = server.security.verify_token(token.strip())
+        if not valid or not isinstance(payload.get("sub"), str):
+            raise HTTPException(
+                status_code=401,
+                detail=payload.get("error", "Token has no subject"),
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        
+        return payload
+    
+    @app.post("/api/clients/register")
+    async def register_client(payload: Dict[str, Any] = Body(...), claims: Optional[Dict[str, Any]] = Depends(authenticate)):
+        """Register a client."""
+        client_id, model_type = payload.get("client_id"), payload.get("model_type")
+        device_info = payload.get("device_info", {})
+        if (
+            not isinstance(client_id, str) or not isinstance(model_type, str) or not isinstance(device_info, dict)
+            or not isinstance(device_info.get("public_key", ""), str)
+        ):
+            return _respond({"status": "error", "message": "client_id and model_type are required, device_info must be an object"})
+        _check_client(claims, client_id)
+        
+        result = await run_blocking(
+            server.register_client, client_id, model_type, device_info, authenticated=claims is not None
+        )
+        return _respond(result)
+    
+    @app.get("/api/federated-learning/available-rounds")
+    async def get_available_rounds(
+        client_id: str,
+        model_type: Optional[str] = None,
+        claims: Optional[Dict[str, Any]] = Depends(authenticate)
+    ):
+        """List the rounds a client is invited to and has not joined yet."""
+        _check_client(claims, client_id)
+        
+        # Taken before the query, so a client subscribing from it misses no event the result does not reflect
+        events_cursor = server.round_events.cursor()
+        result = await run_blocking(server.get_available_rounds, client_id, model_type)
+        
+        # FederatedClient reads `rounds[i]["id"]`
+        result["rounds"] = [dict(r, id=r["round_id"]) for r in result["available_rounds"]]
+        result["events_cursor"] = events_cursor
+        return _respond(result)
+    
+    @app.get("/api/federated-learning/events")
+    async def round_events(
+        request: Request,
+        client_id: str,
+        model_type: Optional[str] = None,
+        claims: Optional[Dict[str, Any]] = Depends(authenticate)
+    ):
+        """
+        Stream the round events for a client as server-sent events.
+        
+        Each event's `id` is its cursor; a client that reconnects with the
+        last one in `Last-Event-ID` (or `since`) receives the events it missed.
+        """
+        _check_client(claims, client_id)
+        stream, since = parse_cursor(request.headers.get("last-event-id") or request.query_params.get("since"))
+        
+        async def events():
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + EVENT_STREAM_DURATION
+            cursor_stream, cursor_seq = stream, since
+            
+            yield f"retry: {EVENT_RETRY_MS}\n\n"
+            
+            first = True
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                
+                result = await server.round_events.wait(
+                    client_id,
+                    cursor_seq,
+                    cursor_stream,
+                    model_type,
+                    timeout=0 if first else min(EVENT_HEARTBEAT_INTERVAL, remaining)
+                )
+                cursor_stream, cursor_seq = result["stream"], result["cursor"]
+                cursor = format_cursor(cursor_stream, cursor_seq)
+                
+                if first or result["reset"]:
+                    # Hand new subscribers a cursor; `reset` tells the client to check for rounds from scratch
+                    yield _server_sent_event("reset" if result["reset"] else "ready", {"cursor": cursor}, cursor)
+                    first = False
+                
+                for event in result["events"]:
+                    yield _server_sent_event(event["type"], event, format_cursor(cursor_stream, event["seq"]))
+                
+                if not result["events"] and not result["reset"]:
+                    yield ": keep-alive\n\n"
+                
+                if server.round_events.closed:
+                    break
+        
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return StreamingResponse(events(), headers=headers, media_type="text/event-stream")
+    
+    @app.post("/api/federated-learning/rounds/{round_id}/join")
+    async def client_join_round(
+        round_id: str,
+        payload: Dict[str, Any] = Body(...),
+        claims: Optional[Dict[str, Any]] = Depends(authenticate)
+    ):
+        """Join a round."""
+        client_id = payload.get("client_id")
+        if not isinstance(client_id, str):
+            return _respond({"status": "error", "message": "client_id is required"})
+        _check_client(claims, client_id)
+        
+        result = await run_blocking(server.client_join_round, round_id, client_id)
+        
+        if result["status"] == "success":
+            result["participant_id"] = _participant_id(round_id, client_id)
+        return _respond(result)
+    
+    @app.get("/api/federated-learning/rounds/{round_id}/status")
+    async def get_round_status(
+        round_id: str,
+        client_id: Optional[str] = None,
+        claims: Optional[Dict[str, Any]] = Depends(authenticate)
+    ):
+        """Get the status of a round, optionally summarizing only one client; clients only see themselves."""
+        if claims is not None and not _is_admin(claims):
+            if client_id is not None:
+                _check_client(claims, client_id)
+            check_round_member(claims, round_id)
+            client_id = claims["sub"]
+        return _respond(await run_blocking(server.get_round_status, round_id, client_id))
+    
+    async def serve_blob(request: Request, digest: Optional[str], fallback_path: str) -> Response:
+        """Serve a model blob, honoring conditional and range requests."""
+        path = server.model_store.blob_path(digest) if digest else fallback_path
+        
+        try:
+            size = (await run_blocking(os.stat, path)).st_size
+        except FileNotFoundError:
+            return _respond({"status": "error", "message": "Model file not found"})
+        
+        return _blob_response(request, path, size, digest, run_blocking)
+    
+    @app.get("/api/federated-learning/rounds/{round_id}/model")
+    async def download_round_model(round_id: str, request: Request, claims: Optional[Dict[str, Any]] = Depends(authenticate)):
+        """Download the global model a round starts from."""
+        check_round_member(claims, round_id)
+        round_info = server.registry.get_round(round_id)
+        
+        if round_info is None:
+            return _respond({"status": "error", "message": f"Round {round_id} not found"})
+        
+        model_path = os.path.join(server.rounds_dir, round_id, "global_model", "model.pt")
+        return await serve_blob(request, round_info.get("global_model_digest"), model_path)
+    
+    @app.get("/api/federated-learning/rounds/{round_id}/model/chunks")
+    async def get_round_model_chunks(
+        round_id: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        claims: Optional[Dict[str, Any]] = Depends(authenticate)
+    ):
+        """Get the size, digest and per-chunk SHA-256 digests of a round's global model, for chunked downloads."""
+        check_round_member(claims, round_id)
+        round_info = server.registry.get_round(round_id)
+        
+        if round_info is None:
+            return _respond({"status": "error", "message": f"Round {round_id} not found"})
+        
+        digest = round_info.get("global_model_digest")
+        path = server.model_store.blob_path(digest) if digest else os.path.join(
+            server.rounds_dir, round_id, "global_model", "model.pt"
+        )
+        chunk_size = min(max(chunk_size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+        
+        try:
+            size = (await run_blocking(os.stat, path)).st_size
+        except FileNotFoundError:
+            return _respond({"status": "error", "message": "Model file not found"})
+        
+        # Blobs never change, so their chunk digests are computed once per chunk size
+        if digest:
+            chunks = chunk_digest_cache.get((digest, chunk_size))
+            if chunks is None:
+                chunks = await run_blocking(server.model_store.chunk_digests, path, chunk_size)
+                chunk_digest_cache[(digest, chunk_size)] = chunks
+                while len(chunk_digest_cache) > CHUNK_DIGEST_CACHE_SIZE:
+                    chunk_digest_cache.pop(next(iter(chunk_digest_cache)))
+        else:
+            chunks = await run_blocking(server.model_store.chunk_digests, path, chunk_size)
+        
+        return _respond({
+            "status": "success",
+            "size": size,
+            "digest": digest,
+            "chunk_size": chunk_size,
+            "chunks": chunks
+        })
+    
+    @app.post("/api/federated-learning/participants/{participant_id}/uploads")
+    async def create_upload(
+        participant_id: str,
+        payload: Dict[str, Any] = Body(...),
+        claims: Optional[Dict[str, Any]] = Depends(authenticate)
+    ):
+        """
+        Open a resumable chunked upload of a trained client model.
+        
+        The payload carries the file's `size` and hex `sha256` digest, an
+        optional `chunk_size`, and the fields of the single-request upload
+        (`training_metrics`, `update_format`, base64 `signature`).
+        """
+        round_id, client_id = _parse_participant_id(participant_id)
+        _check_client(claims, client_id)
+        
+        if server.registry.get_round(round_id) is None:
+            return _respond({"status": "error", "message": f"Round {round_id} not found"})
+        
+        signature = payload.get("signature")
+        try:
+            if signature:
+                base64.b64decode(signature, validate=True)
+        except (binascii.Error, ValueError):
+            return _respond({"status": "error", "message": "Signature is not valid base64"})
+        
+        try:
+            size = int(payload["size"])
+            digest = str(payload["sha256"]).lower()
+        except (KeyError, TypeError, ValueError):
+            return _respond({"status": "error", "message": "Upload size and sha256 are required"})
+        
+        result = await run_blocking(
+            server.upload_sessions.create, round_id, client_id, size, digest,
+            chunk_size=payload.get("chunk_size"),
+            metadata={
+                "training_metrics": payload.get("training_metrics") or {},
+                "update_format": payload.get("update_format", "full"),
+                "signature": signature
+            }
+        )
+        return _respond(result)
+    
+    @app.get("/api/federated-learning/uploads/{upload_id}")
+    async def get_upload(upload_id: str, claims: Optional[Dict[str, Any]] = Depends(authenticate)):
+        """Get the chunks of an upload received so far."""
+        _check_upload_owner(claims, upload_id)
+        return _respond(await run_blocking(server.upload_sessions.status, upload_id))
+    
+    @app.put("/api/federated-learning/uploads/{upload_id}/chunks/{index}")
+    async def upload_chunk(upload_id: str, index: int, request: Request, claims: Optional[Dict[str, Any]] = Depends(authenticate)):
+        """Upload one chunk as the raw request body, with its hex SHA-256 digest in the X-Chunk-SHA256 header."""
+        _check_upload_owner(claims, upload_id)
+        
+        try:
+            data = await request.body()
+        except ClientDisconnect:
+            # The client resends the chunk on a new connection
+            return Response(status_code=400)
+        
+        result = await run_blocking(
+            server.upload_sessions.write_chunk, upload_id, index, data, request.headers.get("x-chunk-sha256")
+        )
+        return _respond(result)
+    
+    @app.post("/api/federated-learning/uploads/{upload_id}/complete")
+    async def complete_upload(upload_id: str, claims: Optional[Dict[str, Any]] = Depends(authenticate)):
+        """Reassemble a chunked upload and hand it to the server like a single-request upload."""
+        _check_upload_owner(claims, upload_id)
+        
+        finished = await run_blocking(server.upload_sessions.finish, upload_id)
+        
+        # Another request is finishing it; the client asks again for the outcome
+        if finished.get("in_progress"):
+            return JSONResponse(finished, status_code=409)
+        
+        # Finished before; the client did not see the response
+        if finished["status"] != "success" or "result" in finished:
+            return _respond(finished.get("result", finished))
+        
+        metadata = finished["metadata"]
+        signature = metadata.get("signature")
+        
+        try:
+            result = await run_blocking(
+                server.upload_client_model, finished["round_id"], finished["client_id"], finished["path"],
+                metadata["training_metrics"], move=True, update_format=metadata["update_format"],
+                content_digest=finished["digest"], signature=base64.b64decode(signature) if signature else None
+            )
+        except BaseException:
+            # Let the client retry the completion
+            server.upload_sessions.release(upload_id)
+            raise
+        await run_blocking(server.upload_sessions.record_result, upload_id, result)
+        
+        return _respond(result)
+    
+    @app.post("/api/federated-learning/participants/{participant_id}/upload")
+    async def upload_client_model(
+        participant_id: str,
+        model_file: UploadFile = File(...),
+        training_metrics: str = Form("{}"),
+        update_format: str = Form("full"),
+        signature: Optional[str] = Form(None),
+        claims: Optional[Dict[str, Any]] = Depends(authenticate)
+    ):
+        """Upload a trained client model, optionally with a base64 signature over its SHA-256 digest."""
+        round_id, client_id = _parse_participant_id(participant_id)
+        _check_client(claims, client_id)
+        
+        try:
+            metrics = json.loads(training_metrics)
+        except ValueError:
+            metrics = None
+        if not isinstance(metrics, dict):
+            await model_file.close()
+            return _respond({"status": "error", "message": "training_metrics must be a JSON object"})
+        
+        try:
+            signature_bytes = base64.b64decode(signature, validate=True) if signature else None
+        except (binascii.Error, ValueError):
+            return _respond({"status": "error", "message": "Signature is not valid base64"})
+        
+        # Stream the body to disk chunk by chunk, hashing it on the way so that neither
+        # the signature check nor the model store has to read the file again
+        hasher = new_hasher()
+        tmp_path = server.model_store.tmp_path(".pt")
+        try:
+            size = 0
+            with await run_blocking(open, tmp_path, "wb") as f:
+                while True:
+                    chunk = await model_file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > server.upload_sessions.max_size:
+                        return _respond({
+                            "status": "error",
+                            "message": f"Upload exceeds the limit of {server.upload_sessions.max_size} bytes"
+                        })
+                    await run_blocking(_write_and_hash, f, hasher, chunk)
+            
+            result = await run_blocking(
+                server.upload_client_model, round_id, client_id, tmp_path, metrics,
+                move=True, update_format=update_format,
+                content_digest=hasher.hexdigest(), signature=signature_bytes
+            )
+        finally:
+            await model_file.close()
+            await run_blocking(_remove_if_exists, tmp_path)
+        
+        return _respond(result)
+    
+    @app.put("/api/federated-learning/participants/{participant_id}/complete")
+    async def complete_round(participant_id: str, claims: Optional[Dict[str, Any]] = Depends(authenticate)):
+        """Confirm that a participant finished its round; completion itself happens on upload."""
+        round_id, client_id = _parse_participant_id(participant_id)
+        _check_client(claims, client_id)
+        result = await run_blocking(server.get_round_status, round_id, client_id)
+        
+        if result["status"] != "success":
+            return _respond(result)
+        
+        client_summary = result["client_summary"].get(client_id)
+        if client_summary is None or client_summary["status"] != "completed":
+            return _respond({
+                "status": "error",
+                "message": f"Client {client_id} has not uploaded a model for round {round_id}"
+            })
+        
+        return _respond({"status": "success", "round_id": round_id, "client_id": client_id})
+    
+    @app.get("/api/federated-learning/global-model/{model_type}")
+    async def get_global_model(
+        request: Request,
+        model_type: str,
+        version: str = "latest",
+        download: bool = False,
+        claims: Optional[Dict[str, Any]] = Depends(authenticate)
+    ):
+        """Get information about, or download, the latest global model for a model type."""
+        result = await run_blocking(server.get_global_model, model_type, version)
+        
+        if download and result["status"] == "success":
+            round_info = server.registry.get_round(result["round_id"])
+            return await serve_blob(request, round_info.get("aggregated_model_digest"), result["global_model_path"])
+        return _respond(result)
+    
+    def _check_upload_owner(claims: Optional[Dict[str, Any]], upload_id: str) -> None:
+        """Reject requests for an upload opened by another client; unknown uploads are reported by the handler."""
+        owner = server.upload_sessions.owner(upload_id)
+        if owner is not None:
+            _check_client(claims, owner)
+    
+    def check_round_member(claims: Optional[Dict[str, Any]], round_id: str) -> None:
+        """Reject requests about a round the caller was not invited to; unknown rounds are reported by the handler."""
+        if claims is None or _is_admin(claims):
+            return
+        
+        round_info = server.registry.get_round(round_id)
+        if round_info is not None and claims["sub"] not in round_info["clients"]:
+            raise HTTPException(status_code=403, detail=f"Client {claims['sub']} is not part of round {round_id}")
+    
+    return app
+
+
+def _check_client(claims: Optional[Dict[str, Any]], client_id: str) -> None:
+    """
+    Reject a request acting as a client other than the one its token was issued to.
+    
+    Args:
+        claims: Claims of the request's token, or None if the server runs without security
+        client_id: Client ID the request acts as
+    
+    Raises:
+        HTTPException: 403 if the client ID is not the token's subject
+    """
+    if claims is not None and client_id != claims["sub"]:
+        raise HTTPException(status_code=403, detail=f"Token does not authorize client {client_id}")
+
+
+def _is_admin(claims: Dict[str, Any]) -> bool:
+    """Whether a token was issued to an administrator rather than a client."""
+    return claims.get("role") == ADMIN_ROLE
+
+
+def _server_sent_event(event_type: str, data: Dict[str, Any], event_id: str) -> str:
+    """Format one server-sent event."""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def _participant_id(round_id: str, client_id: str) -> str:
+    """Build the participant ID handed to a client after it joins a round."""
+    return f"{round_id}:{client_id}"
+
+
+def _parse_participant_id(participant_id: str) -> Tuple[str, str]:
+    """Split a participant ID into (round_id, client_id)."""
+    round_id, _, client_id = participant_id.partition(":")
+    return round_id, client_id
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range` header.
+    
+    Args:
+        range_header: Value of the header, e.g. "bytes=0-1023" or "bytes=-512"
+        size: Size of the file
+    
+    Returns:
+        Inclusive (start, end) byte range, or None to serve the whole file
+    
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    if start_text:
+        start = int(start_text)
+        end = min(int(end_text), size - 1) if end_text else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(end_text), 0)
+        end = size - 1
+    
+    if start > end or start >= size:
+        raise ValueError(f"Unsatisfiable range {range_header} for {size} bytes")
+    
+    return start, end
+
+
+def _blob_response(request: Request, path: str, size: int, etag: Optional[str], run_blocking: Callable) -> Response:
+    """
+    Build a streaming response for a model file with range and ETag support.
+    
+    Blobs are immutable, so their digest is a strong ETag and a client that
+    already has the model gets a 304 without any body. Reads use positional
+    I/O on the thread pool, so concurrent downloads share one open file.
+    
+    Args:
+        request: Incoming request
+        path: File to serve
+        size: Size of the file
+        etag: Content digest of the file, if known
+        run_blocking: Coroutine function running blocking calls off the event loop
+    
+    Returns:
+        200, 206, 304 or 416 response
+    """
+    headers = {"Accept-Ranges": "bytes"}
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+        headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+    
+    try:
+        byte_range = _parse_range(request.headers.get("range"), size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+    
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    
+    async def stream():
+        fd = await run_blocking(os.open, path, os.O_RDONLY)
+        try:
+            offset = start
+            while offset <= end:
+                chunk = await run_blocking(os.pread, fd, min(DOWNLOAD_CHUNK_SIZE, end - offset + 1), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                yield chunk
+        finally:
+            os.close(fd)
+    
+    return StreamingResponse(stream(), status_code=status_code, headers=headers, media_type="application/octet-stream")
+
+
+def _write_and_hash(f, hasher, chunk: bytes) -> None:
+    """Write a chunk of an upload and add it to the upload's running hash."""
+    f.write(chunk)
+    hasher.update(chunk)
+
+
+def _remove_if_exists(path: str) -> None:
+    """Remove a file if it still exists."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _respond(result: Dict[str, Any]) -> JSONResponse:
+    """
+    Turn a server result into an HTTP response.
+    
+    Args:
+        result: Result dict with a `status` of "success" or "error"
+    
+    Returns:
+        JSON response, 404 for unknown resources and 400 for other errors
+    """
+    if result.get("status") == "error":
+        status_code = 404 if "not found" in result.get("message", "") else 400
+        return JSONResponse(result, status_code=status_code)
+    
+    return JSONResponse(result)
@@ -0,0 +1,66 @@
+import threading
+import zlib
+from typing import Dict, Any, Iterable
+
+# Valid client status transitions within a round
+CLIENT_TRANSITIONS = {
+    "invited": ("joined", "timed_out"),
+    "joined": ("completed", "timed_out"),
+}
+
+
+class LockStripes:
+    """
+    Fixed pool of re-entrant locks that keys are hashed onto.
+    
+    Each round is guarded by the stripe its ID hashes to, so operations on
+    the same round are serialized while unrelated rounds almost always land
+    on different stripes and proceed in parallel. The pool never grows, so
+    no bookkeeping is needed when rounds are created or archived.
+    """
+    
+    def __init__(self, num_stripes: int = 64):
+        """
+        Initialize the lock stripes.
+        
+        Args:
+            num_stripes: Number of locks in the pool
+        """
+        self.num_stripes = num_stripes
+        self._locks = [threading.RLock() for _ in range(num_stripes)]
+    
+    def lock_for(self, key: str) -> threading.RLock:
+        """
+        Get the lock guarding a key.
+        
+        Args:
+            key: Key to look up (e.g., a round ID)
+        
+        Returns:
+            Re-entrant lock for the key's stripe
+        """
+        # crc32 is stable across processes, unlike the salted built-in hash of str
+        return self._locks[zlib.crc32(key.encode()) % self.num_stripes]
+
+
+def transition_client(client_info: Dict[str, Any], expected: Iterable[str], new_status: str) -> bool:
+    """
+    Move a client to a new status if it is currently in one of the expected statuses.
+    
+    Must be called with the round's lock held, which makes the check and the
+    update a single atomic step.
+    
+    Args:
+        client_info: Client status within the round
+        expected: Statuses the client may currently be in
+        new_status: Status to move to
+    
+    Returns:
+        True if the transition was applied
+    """
+    current = client_info["status"]
+    if current not in expected or new_status not in CLIENT_TRANSITIONS.get(current, ()):
+        return False
+    
+    client_info["status"] = new_status
+    return True
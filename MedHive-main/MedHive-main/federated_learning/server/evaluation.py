@@ -0,0 +1,617 @@
+import os
+import time
+import logging
+import warnings
+import importlib
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+from federated_learning.common.flat import load_state_dict_file
+from federated_learning.common.model_factory import load_model_weights
+from federated_learning.server.test_set_cache import TestSetCache, CachedTestSet
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Evaluation")
+
+# Test sets are only split across processes when every shard gets at least this many samples
+MIN_SHARD_SAMPLES = 256
+
+# Inference precisions; "auto" picks the fastest one whose predictions agree with float32
+PRECISIONS = ("auto", "float32", "bfloat16", "int8")
+
+# Fraction of the available memory the batches of all evaluation workers may take
+MEMORY_FRACTION = 0.25
+
+# Bounds of the adaptive batch size
+MIN_BATCH_SIZE = 8
+MAX_BATCH_SIZE = 1024
+
+# On the CPU, batches whose activations exceed this spill out of the caches and run slower per sample
+CPU_BATCH_BYTES = 64 * 1024 * 1024
+
+# Module types replaced by int8 dynamic quantization
+QUANTIZED_MODULES = {nn.Linear, nn.LSTM, nn.GRU}
+
+
+def get_loss_function(model_type: str) -> nn.Module:
+    """
+    Get the loss function configured in a model type's hyperparameters.
+    
+    Args:
+        model_type: Type of model
+    
+    Returns:
+        PyTorch loss function (cross entropy if none is configured)
+    """
+    try:
+        module_path = f"federated_learning.models.{model_type}.hyperparams"
+        hyperparam_module = importlib.import_module(module_path)
+        hyperparams = getattr(hyperparam_module, "HYPERPARAMS")
+        loss_type = hyperparams.get("loss_function", "cross_entropy").lower()
+        
+        if loss_type == "bce":
+            return nn.BCELoss()
+        elif loss_type == "bce_with_logits":
+            return nn.BCEWithLogitsLoss()
+        elif loss_type == "mse":
+            return nn.MSELoss()
+        return nn.CrossEntropyLoss()
+    except Exception:
+        return nn.CrossEntropyLoss()
+
+
+def available_memory(device: torch.device) -> int:
+    """
+    Get the memory available for evaluation batches.
+    
+    Args:
+        device: Device the model runs on
+    
+    Returns:
+        Free bytes on the GPU, or available system memory for the CPU
+    """
+    if device.type == "cuda":
+        return torch.cuda.mem_get_info(device)[0]
+    
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        # Assume a modest machine when the platform cannot tell
+        return 1024 ** 3
+
+
+def estimate_sample_bytes(model: nn.Module, sample: torch.Tensor) -> int:
+    """
+    Estimate the memory one sample takes during a forward pass.
+    
+    Sums the input and the outputs of every leaf module for a batch of one.
+    Inference frees most activations as it goes, so this is an upper bound.
+    
+    Args:
+        model: Model in eval mode
+        sample: Batch holding one sample
+    
+    Returns:
+        Bytes per sample
+    """
+    total = [sample.numel() * sample.element_size()]
+    
+    def record(module, inputs, output):
+        if isinstance(output, torch.Tensor):
+            total[0] += output.numel() * output.element_size()
+    
+    handles = [module.register_forward_hook(record) for module in model.modules() if not list(module.children())]
+    try:
+        with torch.inference_mode():
+            model(sample)
+    finally:
+        for handle in handles:
+            handle.remove()
+    
+    return total[0]
+
+
+def _predicted_labels(outputs: torch.Tensor, targets: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, int]:
+    """
+    Turn model outputs and targets into flat label tensors.
+    
+    Args:
+        outputs: Model outputs of a batch
+        targets: Targets of the batch
+    
+    Returns:
+        Tuple of (predicted labels, true labels, number of classes)
+    """
+    if targets.dim() == 1:  # Multi-class classification
+        return outputs.argmax(dim=1), targets.long(), outputs.shape[1]
+    
+    # Binary classification (one or more independent outputs per sample)
+    return (outputs >= 0.5).long().reshape(-1), targets.long().reshape(-1), 2
+
+
+def _init_evaluation_worker(num_threads: int) -> None:
+    """Split the cores between evaluation workers so they do not oversubscribe them."""
+    torch.set_num_threads(num_threads)
+
+
+def prepare_model(model_type: str, model_path: str, device: torch.device, precision: str = "float32") -> nn.Module:
+    """
+    Load a model for inference in a precision.
+    
+    Args:
+        model_type: Type of model
+        model_path: Path to the model
+        device: Device to run on
+        precision: "float32", "bfloat16" (autocast at run time) or "int8" (dynamic quantization, CPU only)
+    
+    Returns:
+        Model in eval mode
+    """
+    # The weights are overwritten, so build the model from the cached template
+    model = load_model_weights(model_type, load_state_dict_file(model_path), device=device)
+    model.eval()
+    
+    if precision == "int8":
+        with warnings.catch_warnings():
+            # Eager dynamic quantization is deprecated upstream but still the lightest CPU int8 path
+            warnings.simplefilter("ignore")
+            model = torch.ao.quantization.quantize_dynamic(model, QUANTIZED_MODULES, dtype=torch.qint8)
+    
+    return model
+
+
+def _autocast(device: torch.device, precision: str):
+    """Context running the forward pass in the precision."""
+    if precision == "bfloat16":
+        return torch.autocast(device.type, dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def run_batches(
+    model: nn.Module,
+    loss_fn: nn.Module,
+    test_set: CachedTestSet,
+    start: int,
+    end: int,
+    batch_size: int,
+    device: torch.device,
+    precision: str = "float32",
+    keep_predictions: bool = False
+) -> Dict[str, Any]:
+    """
+    Run a model over a range of a cached test set.
+    
+    Loss and the confusion matrix are accumulated as tensors on the device;
+    nothing is copied to the host until the range is done.
+    
+    Args:
+        model: Model from `prepare_model`
+        loss_fn: Loss function
+        test_set: Cached test set
+        start: First sample
+        end: One past the last sample
+        batch_size: Samples per forward pass
+        device: Device the model runs on
+        precision: Precision the model was prepared for
+        keep_predictions: Also return the predicted labels
+    
+    Returns:
+        Dictionary with the 'confusion' matrix (true x predicted counts), summed 'loss',
+        'num_samples', 'num_batches', 'forward_s' and, if requested, 'predictions'
+    """
+    total_loss = torch.zeros((), dtype=torch.float64, device=device)
+    confusion = None
+    predictions = []
+    num_batches = 0
+    forward_s = 0.0
+    
+    with torch.inference_mode():
+        for batch_start in range(start, end, batch_size):
+            inputs, targets = test_set.batch(batch_start, min(batch_start + batch_size, end))
+            inputs = inputs.to(device, non_blocking=True)
+            targets = targets.to(device, non_blocking=True)
+            
+            forward_start = time.perf_counter()
+            with _autocast(device, precision):
+                outputs = model(inputs)
+            outputs = outputs.float()
+            if device.type == "cuda":
+                # Kernels run asynchronously; wait for them so the batch time is real
+                torch.cuda.synchronize(device)
+            forward_s += time.perf_counter() - forward_start
+            num_batches += 1
+            
+            total_loss += loss_fn(outputs, targets).double() * inputs.shape[0]
+            
+            predicted, actual, num_classes = _predicted_labels(outputs, targets)
+            counts = torch.bincount(actual * num_classes + predicted, minlength=num_classes * num_classes)
+            confusion = counts if confusion is None else confusion + counts
+            
+            if keep_predictions:
+                predictions.append(predicted)
+    
+    result = {
+        "confusion": confusion.view(num_classes, num_classes).cpu(),
+        "loss": total_loss.item(),
+        "num_samples": end - start,
+        "num_batches": num_batches,
+        "forward_s": forward_s
+    }
+    if keep_predictions:
+        result["predictions"] = torch.cat(predictions).cpu()
+    return result
+
+
+def evaluate_shard(
+    model_type: str,
+    model_path: str,
+    cache_path: str,
+    start: int,
+    end: int,
+    batch_size: int,
+    precision: str = "float32"
+) -> Dict[str, Any]:
+    """
+    Run a model over one contiguous range of a cached test set.
+    
+    Args:
+        model_type: Type of model
+        model_path: Path to the model
+        cache_path: Cache directory of the test set
+        start: First sample of the shard
+        end: One past the last sample of the shard
+        batch_size: Samples per forward pass
+        precision: Inference precision (see `prepare_model`)
+    
+    Returns:
+        Output of `run_batches` for the shard
+    """
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    
+    model = prepare_model(model_type, model_path, device, precision)
+    test_set = CachedTestSet(cache_path)
+    
+    return run_batches(model, get_loss_function(model_type), test_set, start, end, batch_size, device, precision)
+
+
+def compute_metrics(confusion: torch.Tensor, total_loss: float, num_samples: int) -> Dict[str, Any]:
+    """
+    Compute evaluation metrics from a confusion matrix.
+    
+    Precision, recall and F1 are reported for class 1 as the positive class.
+    
+    Args:
+        confusion: `[num_classes, num_classes]` counts, true class by predicted class
+        total_loss: Loss summed over all samples
+        num_samples: Number of samples
+    
+    Returns:
+        Dictionary with evaluation metrics
+    """
+    confusion = confusion.double()
+    total = confusion.sum().item()
+    
+    true_positives = confusion[1, 1].item()
+    false_positives = confusion[:, 1].sum().item() - true_positives
+    false_negatives = confusion[1, :].sum().item() - true_positives
+    
+    # Avoid division by zero
+    precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
+    recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0
+    
+    return {
+        "loss": total_loss / num_samples,
+        "accuracy": confusion.trace().item() / total if total > 0 else 0,
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1,
+        "num_samples": num_samples,
+        "confusion_matrix": confusion.long().tolist()
+    }
+
+
+class EvaluationService:
+    """
+    Evaluates models on the server's test sets off the round-finishing path.
+    
+    Test sets are decoded once into a `TestSetCache`. An evaluation splits the
+    cached samples into contiguous shards, runs each shard in a worker process
+    of a pool kept between rounds, and sums the shards' confusion matrices and
+    losses. Test sets too small to fill a shard are evaluated in-process.
+    
+    The batch size is derived from the available memory and the model's
+    per-sample footprint unless one is given. With precision "auto" a
+    calibration slice is run in float32, bfloat16 and int8 (dynamic
+    quantization) on the first evaluation of a model type and every
+    `recalibrate_every` evaluations after; the fastest precision whose
+    predictions agree with float32 closely enough is used for the whole test
+    set. Evaluations in a reduced precision report a cross-check of its
+    metrics against float32 on the calibration slice.
+    
+    `submit` queues work on a single dispatcher thread, so callers get a
+    future and evaluations run one at a time without blocking them.
+    """
+    
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        cache_dir: str = os.path.join("data", "cache", "test"),
+        batch_size: Optional[int] = None,
+        cache_precision: str = "auto",
+        precision: str = "auto",
+        calibration_samples: int = 256,
+        min_agreement: float = 0.99,
+        recalibrate_every: int = 10
+    ):
+        """
+        Initialize the evaluation service.
+        
+        Args:
+            num_workers: Number of evaluation processes (default: CPU count; 1 evaluates in-process)
+            cache_dir: Directory of the decoded test set cache
+            batch_size: Samples per forward pass (default: derived from available memory)
+            cache_precision: Storage precision of cached test inputs ("auto" or "lossless", see `TestSetCache`)
+            precision: Inference precision, one of PRECISIONS
+            calibration_samples: Samples evaluated in every candidate precision before choosing one
+            min_agreement: Fraction of calibration predictions a reduced precision must share with float32
+            recalibrate_every: Number of evaluations of a model type that reuse its chosen precision
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision}, expected one of {', '.join(PRECISIONS)}")
+        
+        self.num_workers = max(1, num_workers or os.cpu_count() or 1)
+        self.batch_size = batch_size
+        self.precision = precision
+        self.calibration_samples = calibration_samples
+        self.min_agreement = min_agreement
+        self.recalibrate_every = recalibrate_every
+        self.cache = TestSetCache(cache_dir, precision=cache_precision)
+        
+        # model_type -> (chosen precision, evaluations left before recalibrating)
+        self._chosen_precisions: Dict[str, Tuple[str, int]] = {}
+        
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FL_Evaluation")
+    
+    def evaluate(self, model_type: str, model_path: str, test_data_path: str) -> Dict[str, Any]:
+        """
+        Evaluate a model on a test set.
+        
+        Args:
+            model_type: Type of model
+            model_path: Path to the model
+            test_data_path: Path to test data
+        
+        Returns:
+            Dictionary with evaluation metrics, the 'inference' settings and throughput,
+            and for reduced precisions the 'cross_check' against float32
+        """
+        cache_path = self.cache.get(model_type, test_data_path)
+        test_set = CachedTestSet(cache_path)
+        num_samples = len(test_set)
+        device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+        
+        model = prepare_model(model_type, model_path, device)
+        batch_size = self.batch_size or self._adaptive_batch_size(model, test_set, device)
+        precision, cross_check = self._select_precision(model_type, model_path, model, test_set, batch_size, device)
+        del model
+        
+        shards = self._shard_bounds(num_samples, batch_size)
+        
+        start = time.perf_counter()
+        if len(shards) == 1:
+            results = [evaluate_shard(model_type, model_path, cache_path, 0, num_samples, batch_size, precision)]
+        else:
+            pool = self._get_pool()
+            futures = [
+                pool.submit(evaluate_shard, model_type, model_path, cache_path, shard_start, shard_end, batch_size, precision)
+                for shard_start, shard_end in shards
+            ]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+        
+        confusion = torch.stack([result["confusion"] for result in results]).sum(dim=0)
+        total_loss = sum(result["loss"] for result in results)
+        num_batches = sum(result["num_batches"] for result in results)
+        forward_s = sum(result["forward_s"] for result in results)
+        
+        metrics = compute_metrics(confusion, total_loss, num_samples)
+        metrics["inference"] = {
+            "precision": precision,
+            "batch_size": batch_size,
+            "shards": len(shards),
+            "num_batches": num_batches,
+            "ms_per_batch": 1000 * forward_s / num_batches,
+            "forward_samples_per_s": num_samples / forward_s if forward_s > 0 else 0,
+            "samples_per_s": num_samples / elapsed if elapsed > 0 else 0
+        }
+        if cross_check is not None:
+            metrics["cross_check"] = cross_check
+        
+        logger.info(
+            f"Evaluated {model_type} model on {num_samples} samples in {len(shards)} shards "
+            f"({precision}, batch size {batch_size}, {metrics['inference']['samples_per_s']:.0f} samples/s)"
+        )
+        return metrics
+    
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """
+        Queue an evaluation to run in the background.
+        
+        Args:
+            func: Callable running the evaluation, e.g. `ModelAggregator.evaluate_aggregated_model`
+            *args: Positional arguments for `func`
+            **kwargs: Keyword arguments for `func`
+        
+        Returns:
+            Future resolving to the result of `func`
+        """
+        return self._dispatcher.submit(func, *args, **kwargs)
+    
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Stop the dispatcher thread and the worker processes.
+        
+        Args:
+            wait: Whether to wait for queued evaluations to finish
+        """
+        self._dispatcher.shutdown(wait=wait)
+        
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+    
+    def _adaptive_batch_size(self, model: nn.Module, test_set: CachedTestSet, device: torch.device) -> int:
+        """Pick the batch size whose batches in all workers fit in MEMORY_FRACTION of the available memory."""
+        sample = test_set.batch(0, 1)[0].to(device)
+        sample_bytes = estimate_sample_bytes(model, sample)
+        
+        num_workers = 1 if device.type == "cuda" else self.num_workers
+        budget = available_memory(device) * MEMORY_FRACTION / num_workers
+        
+        batch_size = int(budget // max(sample_bytes, 1))
+        if device.type == "cpu":
+            batch_size = min(batch_size, CPU_BATCH_BYTES // max(sample_bytes, 1))
+        return max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, batch_size, len(test_set)))
+    
+    def _select_precision(
+        self,
+        model_type: str,
+        model_path: str,
+        model: nn.Module,
+        test_set: CachedTestSet,
+        batch_size: int,
+        device: torch.device
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Choose the inference precision, calibrating on a slice of the test set when due.
+        
+        Returns:
+            Tuple of (precision, cross-check against float32 or None if float32 is used)
+        """
+        if self.precision == "float32":
+            return "float32", None
+        
+        # A test set no larger than the calibration slice costs as much to run in float32 as to calibrate
+        calibration_end = min(len(test_set), self.calibration_samples)
+        if calibration_end == len(test_set):
+            return "float32", None
+        
+        chosen, remaining = self._chosen_precisions.get(model_type, (None, 0))
+        if remaining > 0:
+            candidates = [] if chosen == "float32" else [chosen]
+        elif self.precision == "auto":
+            candidates = ["bfloat16", "int8"]
+        else:
+            candidates = [self.precision]
+        
+        if device.type == "cuda" and "int8" in candidates:
+            # Dynamic quantization only has CPU kernels
+            candidates.remove("int8")
+        
+        if not candidates:
+            self._chosen_precisions[model_type] = ("float32", remaining - 1 if remaining > 0 else self.recalibrate_every)
+            return "float32", None
+        
+        loss_fn = get_loss_function(model_type)
+        
+        def calibrate(candidate_model: nn.Module, precision: str) -> Dict[str, Any]:
+            # Warm up once so one-time kernel setup is not timed
+            run_batches(candidate_model, loss_fn, test_set, 0, min(batch_size, calibration_end), batch_size, device, precision)
+            result = run_batches(
+                candidate_model, loss_fn, test_set, 0, calibration_end, batch_size, device, precision, keep_predictions=True
+            )
+            metrics = compute_metrics(result["confusion"], result["loss"], calibration_end)
+            return {
+                "accuracy": metrics["accuracy"],
+                "loss": metrics["loss"],
+                "f1_score": metrics["f1_score"],
+                "samples_per_s": calibration_end / result["forward_s"] if result["forward_s"] > 0 else 0,
+                "predictions": result["predictions"]
+            }
+        
+        reference = calibrate(model, "float32")
+        report = {"samples": calibration_end, "float32": reference}
+        
+        selected = "float32"
+        for precision in candidates:
+            try:
+                candidate_model = model if precision == "bfloat16" else prepare_model(model_type, model_path, device, precision)
+                result = calibrate(candidate_model, precision)
+            except Exception as e:
+                logger.warning(f"Cannot evaluate {model_type} in {precision}: {str(e)}")
+                continue
+            
+            result["agreement"] = (result["predictions"] == reference["predictions"]).double().mean().item()
+            result["accuracy_delta"] = result["accuracy"] - reference["accuracy"]
+            report[precision] = result
+            
+            if result["agreement"] < self.min_agreement:
+                logger.warning(
+                    f"{precision} predictions of {model_type} agree with float32 on only "
+                    f"{100 * result['agreement']:.1f}% of samples, not using it"
+                )
+                continue
+            
+            # A calibration picks the fastest precision; a forced or previously chosen one only has to agree
+            if self.precision != "auto" or remaining > 0 or result["samples_per_s"] > report[selected]["samples_per_s"]:
+                selected = precision
+        
+        for result in report.values():
+            if isinstance(result, dict):
+                result.pop("predictions", None)
+        report["selected"] = selected
+        
+        if remaining == 0:
+            self._chosen_precisions[model_type] = (selected, self.recalibrate_every)
+        elif selected == chosen:
+            self._chosen_precisions[model_type] = (selected, remaining - 1)
+        else:
+            # The chosen precision stopped agreeing with float32; calibrate again next time
+            self._chosen_precisions[model_type] = ("float32", 0)
+        
+        return selected, report
+    
+    def _shard_bounds(self, num_samples: int, batch_size: int) -> List[Tuple[int, int]]:
+        """Split the samples into contiguous shards, one per worker; small test sets get one shard."""
+        # Worker processes sharing one GPU would only contend for it
+        num_workers = 1 if torch.cuda.is_available() else self.num_workers
+        
+        # Starting a worker costs more than evaluating a shard below MIN_SHARD_SAMPLES or a single batch
+        num_shards = max(1, min(num_workers, num_samples // max(MIN_SHARD_SAMPLES, batch_size)))
+        
+        bounds = [num_samples * i // num_shards for i in range(num_shards + 1)]
+        return list(zip(bounds[:-1], bounds[1:]))
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Get the worker pool, starting it on first use."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_evaluation_worker,
+                    initargs=(max(1, (os.cpu_count() or 1) // self.num_workers),)
+                )
+            return self._pool
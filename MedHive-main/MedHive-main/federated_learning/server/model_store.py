@@ -0,0 +1,342 @@
+import os
+import time
+import uuid
+import errno
+import shutil
+import hashlib
+import logging
+from typing import Iterable, List, Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_ModelStore")
+
+# Size of the chunks files are hashed and copied in
+CHUNK_SIZE = 1024 * 1024
+
+# ioctl request number of Linux FICLONE (copy-on-write clone of a whole file)
+FICLONE = 0x40049409
+
+
+def _reflink(src_path: str, dst_path: str) -> bool:
+    """
+    Clone a file with copy-on-write where the filesystem supports it (btrfs, XFS, ...).
+    
+    Args:
+        src_path: File to clone
+        dst_path: Path of the clone; must not exist yet
+    
+    Returns:
+        True if the clone was created
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    
+    try:
+        with open(src_path, "rb") as src, open(dst_path, "xb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        return False
+
+
+class ModelStore:
+    """
+    Content-addressed store for model files.
+    
+    Each file is stored once as an immutable blob named by the SHA-256 of its
+    contents. Rounds reference blobs by digest and get their model files as
+    hard links (or copy-on-write clones) of the blob instead of copies, so
+    the same global model shared by consecutive rounds occupies disk once.
+    Blobs that no round references are removed by `gc`.
+    
+    The store must live on the same filesystem as the round directories for
+    hard links to work; otherwise it falls back to reflinks, then copies.
+    """
+    
+    def __init__(self, root: str):
+        """
+        Initialize the model store.
+        
+        Args:
+            root: Directory of the store
+        """
+        self.root = root
+        self.blobs_dir = os.path.join(root, "sha256")
+        self.tmp_dir = os.path.join(root, "tmp")
+        
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+    
+    def blob_path(self, digest: str) -> str:
+        """
+        Get the path of a blob.
+        
+        Args:
+            digest: Hex SHA-256 digest of the blob
+        
+        Returns:
+            Path of the blob
+        """
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+    
+    def has(self, digest: str) -> bool:
+        """Check whether a blob is in the store."""
+        return os.path.exists(self.blob_path(digest))
+    
+    def tmp_path(self, suffix: str = "") -> str:
+        """
+        Get a fresh path in the store's scratch directory, for files that are then `put` with mode "move".
+        
+        Args:
+            suffix: Optional file name suffix
+        
+        Returns:
+            Unused path on the store's filesystem
+        """
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}{suffix}")
+    
+    def put_file(self, path: str, mode: str = "copy", digest: Optional[str] = None) -> str:
+        """
+        Add a file to the store.
+        
+        Args:
+            path: File to add
+            mode: How the file's contents get into the store:
+                'copy' - clone or copy it; the source may change later
+                'link' - hard link it; the source must never be modified in place
+                    (it may be replaced or deleted)
+                'move' - take ownership of it; the source path is gone afterwards
+            digest: Hex SHA-256 digest of the file if the caller already hashed it
+                while writing it (ignored for 'copy', which hashes the bytes it copies)
+        
+        Returns:
+            Hex SHA-256 digest of the file
+        """
+        if mode not in ("copy", "link", "move"):
+            raise ValueError(f"Unknown put mode: {mode}")
+        
+        if mode == "copy":
+            # Clone first so the hash is taken from the bytes that end up in the store
+            tmp_path = self.tmp_path()
+            if _reflink(path, tmp_path):
+                digest = self.hash_file(tmp_path)
+            else:
+                digest = self._copy_and_hash(path, tmp_path)
+            self._commit(tmp_path, digest)
+            return digest
+        
+        if digest is None:
+            digest = self.hash_file(path)
+        blob_path = self.blob_path(digest)
+        
+        if os.path.exists(blob_path):
+            if mode == "move":
+                os.remove(path)
+            self._touch(blob_path)
+            return digest
+        
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if mode == "move":
+            try:
+                os.replace(path, blob_path)
+                self._seal(blob_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # Different filesystem; fall back to copying
+                tmp_path = self.tmp_path()
+                shutil.copyfile(path, tmp_path)
+                self._commit(tmp_path, digest)
+                os.remove(path)
+        else:
+            tmp_path = self.tmp_path()
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                if not _reflink(path, tmp_path):
+                    shutil.copyfile(path, tmp_path)
+            self._commit(tmp_path, digest)
+        
+        return digest
+    
+    def put_bytes(self, data: bytes) -> str:
+        """
+        Add in-memory contents to the store.
+        
+        Args:
+            data: File contents
+        
+        Returns:
+            Hex SHA-256 digest of the contents
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self.has(digest):
+            self._touch(self.blob_path(digest))
+            return digest
+        
+        tmp_path = self.tmp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self._commit(tmp_path, digest)
+        return digest
+    
+    def link(self, digest: str, dest_path: str) -> str:
+        """
+        Make a blob appear at `dest_path` without copying it where possible.
+        
+        The destination is replaced atomically. It shares storage with the
+        blob, so it must be treated as read-only.
+        
+        Args:
+            digest: Hex SHA-256 digest of the blob
+            dest_path: Path where the file should appear
+        
+        Returns:
+            The destination path
+        """
+        blob_path = self.blob_path(digest)
+        if not os.path.exists(blob_path):
+            raise FileNotFoundError(f"Blob {digest} not found in model store")
+        
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        
+        try:
+            os.link(blob_path, tmp_path)
+        except OSError:
+            if not _reflink(blob_path, tmp_path):
+                shutil.copyfile(blob_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+        
+        return dest_path
+    
+    def gc(self, referenced: Iterable[str], min_age: float = 3600.0) -> int:
+        """
+        Remove blobs that are not referenced.
+        
+        Blobs and scratch files younger than `min_age` are kept, since a
+        model that was just added may not be recorded in a round yet.
+        
+        Args:
+            referenced: Digests that must be kept
+            min_age: Minimum age in seconds of a blob before it can be removed
+        
+        Returns:
+            Number of removed blobs
+        """
+        referenced = set(referenced)
+        cutoff = time.time() - min_age
+        removed = 0
+        freed = 0
+        
+        for prefix in os.listdir(self.blobs_dir):
+            prefix_dir = os.path.join(self.blobs_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                if digest in referenced:
+                    continue
+                
+                blob_path = os.path.join(prefix_dir, digest)
+                try:
+                    stat = os.stat(blob_path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    os.remove(blob_path)
+                except FileNotFoundError:
+                    continue
+                
+                removed += 1
+                freed += stat.st_size
+        
+        # Leftovers of interrupted puts
+        for name in os.listdir(self.tmp_dir):
+            tmp_path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.stat(tmp_path).st_mtime <= cutoff:
+                    os.remove(tmp_path)
+            except FileNotFoundError:
+                continue
+        
+        if removed:
+            logger.info(f"Removed {removed} unreferenced model blobs ({freed / 1024 / 1024:.1f} MB)")
+        return removed
+    
+    @staticmethod
+    def hash_file(path: str) -> str:
+        """
+        Compute the SHA-256 digest of a file, reading it in chunks.
+        
+        Args:
+            path: File to hash
+        
+        Returns:
+            Hex digest
+        """
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+    
+    @staticmethod
+    def chunk_digests(path: str, chunk_size: int) -> List[str]:
+        """
+        Compute the SHA-256 digest of every `chunk_size` bytes of a file.
+        
+        Args:
+            path: File to hash
+            chunk_size: Bytes per chunk; the last chunk may be shorter
+        
+        Returns:
+            Hex digests in file order
+        """
+        digests = []
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digests.append(hashlib.sha256(chunk).hexdigest())
+        return digests or [hashlib.sha256(b"").hexdigest()]
+    
+    def _copy_and_hash(self, src_path: str, dst_path: str) -> str:
+        """Copy a file while hashing it in the same pass."""
+        sha256 = hashlib.sha256()
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                sha256.update(chunk)
+                dst.write(chunk)
+        return sha256.hexdigest()
+    
+    def _commit(self, tmp_path: str, digest: str) -> None:
+        """Move a fully written scratch file into place as a blob, or drop it if the blob exists."""
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            os.remove(tmp_path)
+            self._touch(blob_path)
+            return
+        
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(tmp_path, blob_path)
+        self._seal(blob_path)
+    
+    @classmethod
+    def _seal(cls, blob_path: str) -> None:
+        """Make a blob read-only and refresh its age."""
+        try:
+            os.chmod(blob_path, 0o444)
+        except OSError as e:
+            logger.warning(f"Could not seal blob {blob_path}: {str(e)}")
+        cls._touch(blob_path)
+    
+    @staticmethod
+    def _touch(blob_path: str) -> None:
+        """Refresh a blob's age so `gc` gives a new reference to it a grace period."""
+        try:
+            os.utime(blob_path)
+        except OSError:
+            pass
@@ -0,0 +1,208 @@
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Registry")
+
+# Round statuses after which a round is moved out of the hot set
+FINAL_ROUND_STATUSES = ("completed", "failed")
+
+
+class RoundRegistry:
+    """
+    In-memory registry of clients and rounds with secondary indexes.
+    
+    Rounds that are still being worked on live in the hot `rounds` dict;
+    completed and failed rounds are archived so request handlers never scan
+    them. Lookups by model type, (model_id, round_number), client invitation
+    and latest completed round are served from indexes kept up to date on
+    every registration and status change. All methods are thread-safe.
+    """
+    
+    def __init__(self):
+        """Initialize an empty registry."""
+        self.lock = threading.RLock()
+        
+        self.clients: Dict[str, Dict[str, Any]] = {}          # client_id -> client info
+        self.rounds: Dict[str, Dict[str, Any]] = {}           # round_id -> round info (hot)
+        self.archived_rounds: Dict[str, Dict[str, Any]] = {}  # round_id -> round info (finished)
+        
+        # Secondary indexes
+        self._eligible_clients: Dict[str, Dict[str, None]] = {}    # model_type -> active client IDs (insertion ordered)
+        self._rounds_by_number: Dict[Tuple[Any, int], str] = {}    # (model_id, round_number) -> round_id
+        self._invited_rounds: Dict[str, Dict[str, None]] = {}      # client_id -> hot round IDs the client is part of
+        self._latest_completed: Dict[str, Tuple[int, str]] = {}    # model_type -> (round_number, round_id)
+    
+    def register_client(self, client_id: str, client_info: Dict[str, Any]) -> None:
+        """
+        Add or replace a client and update the eligibility index.
+        
+        Args:
+            client_id: Unique identifier for the client
+            client_info: Client information including `model_type` and `status`
+        """
+        with self.lock:
+            previous = self.clients.get(client_id)
+            if previous is not None:
+                self._eligible_clients.get(previous["model_type"], {}).pop(client_id, None)
+            
+            self.clients[client_id] = client_info
+            if client_info["status"] == "active":
+                self._eligible_clients.setdefault(client_info["model_type"], {})[client_id] = None
+    
+    def eligible_clients(self, model_type: str) -> List[str]:
+        """
+        Get the active clients interested in a model type.
+        
+        Args:
+            model_type: Type of model
+        
+        Returns:
+            List of client IDs in registration order
+        """
+        with self.lock:
+            return list(self._eligible_clients.get(model_type, {}))
+    
+    def add_round(self, round_info: Dict[str, Any]) -> None:
+        """
+        Add a round and index it, archiving it right away if it is already finished.
+        
+        Args:
+            round_info: Round information
+        """
+        with self.lock:
+            round_id = round_info["id"]
+            self.rounds[round_id] = round_info
+            self._rounds_by_number[(round_info["model_id"], round_info["round_number"])] = round_id
+            
+            for client_id in round_info["clients"]:
+                self._invited_rounds.setdefault(client_id, {})[round_id] = None
+            
+            if round_info["status"] in FINAL_ROUND_STATUSES:
+                self.update_round_status(round_id)
+    
+    def add_round_clients(self, round_id: str, client_ids: List[str]) -> None:
+        """
+        Index clients that were invited to a round.
+        
+        Args:
+            round_id: ID of the round
+            client_ids: IDs of the invited clients
+        """
+        with self.lock:
+            for client_id in client_ids:
+                self._invited_rounds.setdefault(client_id, {})[round_id] = None
+    
+    def get_round(self, round_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a round by ID, whether it is hot or archived.
+        
+        Args:
+            round_id: ID of the round
+        
+        Returns:
+            Round information, or None if the round is unknown
+        """
+        with self.lock:
+            round_info = self.rounds.get(round_id)
+            if round_info is None:
+                round_info = self.archived_rounds.get(round_id)
+            return round_info
+    
+    def find_round(self, model_id: Any, round_number: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the round with a given number for a model.
+        
+        Args:
+            model_id: ID of the model
+            round_number: Round number
+        
+        Returns:
+            Round information, or None if no such round exists
+        """
+        with self.lock:
+            round_id = self._rounds_by_number.get((model_id, round_number))
+            return self.get_round(round_id) if round_id else None
+    
+    def invited_rounds(self, client_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the hot rounds a client takes part in.
+        
+        Args:
+            client_id: ID of the client
+        
+        Returns:
+            List of round information
+        """
+        with self.lock:
+            return [self.rounds[round_id] for round_id in self._invited_rounds.get(client_id, {})]
+    
+    def latest_completed_round(self, model_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the completed round with the highest round number for a model type.
+        
+        Args:
+            model_type: Type of model
+        
+        Returns:
+            Round information, or None if no round has completed
+        """
+        with self.lock:
+            latest = self._latest_completed.get(model_type)
+            return self.get_round(latest[1]) if latest else None
+    
+    def update_round_status(self, round_id: str) -> None:
+        """
+        Refresh the indexes after a round's status changed, archiving finished rounds.
+        
+        Args:
+            round_id: ID of the round
+        """
+        with self.lock:
+            round_info = self.rounds.get(round_id)
+            if round_info is None:
+                return
+            
+            status = round_info["status"]
+            
+            if status == "completed":
+                model_type = round_info["model_type"]
+                latest = self._latest_completed.get(model_type)
+                if latest is None or round_info["round_number"] > latest[0]:
+                    self._latest_completed[model_type] = (round_info["round_number"], round_id)
+            
+            if status in FINAL_ROUND_STATUSES:
+                del self.rounds[round_id]
+                self.archived_rounds[round_id] = round_info
+                
+                for client_id in round_info["clients"]:
+                    invited = self._invited_rounds.get(client_id)
+                    if invited is not None:
+                        invited.pop(round_id, None)
+                        if not invited:
+                            del self._invited_rounds[client_id]
+                
+                logger.info(f"Archived round {round_id} with status {status}")
+    
+    def touch_client(self, client_id: str, participated: bool = False) -> None:
+        """
+        Update a client's last activity and optionally count a completed round.
+        
+        Args:
+            client_id: ID of the client
+            participated: Whether the client just completed a round
+        """
+        with self.lock:
+            client_info = self.clients.get(client_id)
+            if client_info is None:
+                return
+            
+            client_info["last_active"] = time.time()
+            if participated:
+                client_info["rounds_participated"] += 1
@@ -0,0 +1,226 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Iterable, Set, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_RoundEvents")
+
+# Number of past events a reconnecting client can catch up on
+DEFAULT_HISTORY = 4096
+
+
+class RoundEvents:
+    """
+    Sequence-numbered feed of round events that clients subscribe to.
+    
+    The server publishes an event when a round is created, when clients are
+    invited to it and when it starts. Each event gets the next sequence
+    number and is kept in a bounded history, addressed either to everyone
+    or to a set of clients. A subscriber asks for the events after the last
+    sequence number it saw and, if there are none, waits as an asyncio
+    future rather than a thread until an event for it is published, so
+    thousands of idle clients cost no threads and no requests.
+    
+    Events are hints: clients still read round state through the regular
+    endpoints. If a client's cursor is from another server process (the
+    `stream` differs) or older than the history, it is told to `reset`,
+    i.e. to check for rounds once from scratch.
+    """
+    
+    def __init__(self, history: int = DEFAULT_HISTORY):
+        """
+        Initialize the event feed.
+        
+        Args:
+            history: Number of past events kept for clients catching up
+        """
+        self.stream = uuid.uuid4().hex
+        self._events = deque(maxlen=history)  # event dicts, oldest first
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.closed = False
+        
+        # client_id -> waiting subscribers, as (event loop, future) pairs
+        self._waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+    
+    def publish(
+        self,
+        event_type: str,
+        round_id: str,
+        clients: Optional[Iterable[str]] = None,
+        **fields: Any
+    ) -> int:
+        """
+        Publish an event and wake the subscribers it is addressed to. Safe to call from any thread.
+        
+        Args:
+            event_type: Type of the event, e.g. "round_created"
+            round_id: Round the event is about
+            clients: Clients the event is addressed to; None for every client
+            **fields: Additional JSON-serializable fields of the event
+        
+        Returns:
+            Sequence number of the event
+        """
+        recipients = frozenset(clients) if clients is not None else None
+        
+        with self._lock:
+            self._seq += 1
+            event = dict(fields, seq=self._seq, type=event_type, round_id=round_id, time=time.time())
+            self._events.append((event, recipients))
+            
+            if recipients is None:
+                waiters = [w for ws in self._waiters.values() for w in ws]
+            else:
+                waiters = [w for client_id in recipients for w in self._waiters.get(client_id, ())]
+        
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+        
+        return event["seq"]
+    
+    def poll(
+        self,
+        client_id: str,
+        since: int = 0,
+        stream: Optional[str] = None,
+        model_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get the events for a client after a cursor, without waiting.
+        
+        Args:
+            client_id: Subscribing client
+            since: Sequence number of the last event the client saw
+            stream: Stream the cursor belongs to; None for a new subscriber
+            model_type: Only return events about rounds of this model type
+        
+        Returns:
+            Dict with the `events`, the new `cursor`, the `stream` and whether to `reset`
+        """
+        with self._lock:
+            oldest = self._events[0][0]["seq"] if self._events else self._seq + 1
+            reset = stream is not None and (stream != self.stream or since > self._seq or since < oldest - 1)
+            if reset or stream is None:
+                # The client checks for rounds from scratch; older events are of no use to it
+                since = self._seq
+            
+            events = [
+                event for event, recipients in self._events
+                if event["seq"] > since
+                and (recipients is None or client_id in recipients)
+                and (model_type is None or event.get("model_type") in (None, model_type))
+            ]
+            
+            return {"stream": self.stream, "cursor": self._seq, "events": events, "reset": reset}
+    
+    async def wait(
+        self,
+        client_id: str,
+        since: int = 0,
+        stream: Optional[str] = None,
+        model_type: Optional[str] = None,
+        timeout: float = 30.0
+    ) -> Dict[str, Any]:
+        """
+        Get the events for a client after a cursor, waiting up to `timeout` seconds for one.
+        
+        Args:
+            client_id: Subscribing client
+            since: Sequence number of the last event the client saw
+            stream: Stream the cursor belongs to; None for a new subscriber
+            model_type: Only return events about rounds of this model type
+            timeout: Maximum seconds to wait
+        
+        Returns:
+            Same as `poll`; no events if the wait timed out
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        while True:
+            future = loop.create_future()
+            waiter = (loop, future)
+            
+            # Register before polling, so an event published in between still wakes us
+            with self._lock:
+                self._waiters.setdefault(client_id, set()).add(waiter)
+            
+            try:
+                result = self.poll(client_id, since, stream, model_type)
+                remaining = deadline - loop.time()
+                if result["events"] or result["reset"] or remaining <= 0 or self.closed:
+                    return result
+                
+                # Later polls continue from the cursor this one settled on
+                since, stream = result["cursor"], result["stream"]
+                
+                try:
+                    await asyncio.wait_for(future, remaining)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                with self._lock:
+                    waiters = self._waiters.get(client_id)
+                    if waiters is not None:
+                        waiters.discard(waiter)
+                        if not waiters:
+                            del self._waiters[client_id]
+    
+    def cursor(self) -> str:
+        """Cursor of the latest event, in the form used as the ID of server-sent events."""
+        with self._lock:
+            return format_cursor(self.stream, self._seq)
+    
+    def subscribers(self) -> int:
+        """Number of subscribers currently waiting for events."""
+        with self._lock:
+            return sum(len(waiters) for waiters in self._waiters.values())
+    
+    def close(self) -> None:
+        """Wake every waiting subscriber, e.g. when the server shuts down."""
+        with self._lock:
+            self.closed = True
+            waiters = [w for ws in self._waiters.values() for w in ws]
+        
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The subscriber's event loop is already closed
+                pass
+
+
+def format_cursor(stream: str, seq: int) -> str:
+    """Build an event cursor, e.g. for the `id` field of a server-sent event."""
+    return f"{stream}:{seq}"
+
+
+def parse_cursor(cursor: Optional[str]) -> Tuple[Optional[str], int]:
+    """
+    Split an event cursor into (stream, seq).
+    
+    Args:
+        cursor: Cursor from `format_cursor`, or None
+    
+    Returns:
+        (None, 0) for a missing or malformed cursor, i.e. a new subscriber
+    """
+    stream, _, seq = (cursor or "").partition(":")
+    if not stream or not seq.isdigit():
+        return None, 0
+    return stream, int(seq)
+
+
+def _wake(future: asyncio.Future) -> None:
+    """Resolve a waiter's future unless it was already resolved or cancelled."""
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,170 @@
+import os
+import json
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_RoundJournal")
+
+JOURNAL_FILENAME = "journal.log"
+SNAPSHOT_FILENAME = "round_info.json"
+
+
+class RoundJournal:
+    """
+    Append-only event journal for a single federated learning round.
+    
+    Every state change of a round is appended as one JSON line instead of
+    rewriting the whole `round_info.json`. Every `snapshot_interval` events the
+    journal is compacted into a snapshot of the full round info and truncated.
+    Replaying the snapshot followed by the journal restores the round state.
+    """
+    
+    def __init__(self, round_dir: str, snapshot_interval: int = 1000, fsync: bool = False):
+        """
+        Initialize the round journal.
+        
+        Args:
+            round_dir: Directory of the round
+            snapshot_interval: Number of events after which the journal is compacted
+            fsync: Whether to fsync the journal after every event
+        """
+        self.round_dir = round_dir
+        self.journal_path = os.path.join(round_dir, JOURNAL_FILENAME)
+        self.snapshot_path = os.path.join(round_dir, SNAPSHOT_FILENAME)
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.events_since_snapshot = 0
+        self._file = None
+    
+    def record(
+        self,
+        round_info: Dict[str, Any],
+        round_fields: Optional[Dict[str, Any]] = None,
+        clients: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> None:
+        """
+        Append an event describing fields that changed in the round.
+        
+        Args:
+            round_info: Current round information (used when a snapshot is due)
+            round_fields: Top-level round fields that changed
+            clients: Changed fields per client, keyed by client ID
+        """
+        with self.lock:
+            self.seq += 1
+            event = {"seq": self.seq}
+            if round_fields:
+                event["round"] = round_fields
+            if clients:
+                event["clients"] = clients
+            
+            if self._file is None:
+                self._file = open(self.journal_path, "a")
+            
+            self._file.write(json.dumps(event) + "\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            
+            self.events_since_snapshot += 1
+            if self.events_since_snapshot >= self.snapshot_interval:
+                self._write_snapshot(round_info)
+    
+    def snapshot(self, round_info: Dict[str, Any]) -> None:
+        """
+        Write a compacted snapshot of the round and truncate the journal.
+        
+        Args:
+            round_info: Current round information
+        """
+        with self.lock:
+            self._write_snapshot(round_info)
+    
+    def close(self) -> None:
+        """Close the journal file."""
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def _write_snapshot(self, round_info: Dict[str, Any]) -> None:
+        """Write the snapshot atomically, then drop the events it covers. Caller holds the lock."""
+        snapshot = dict(round_info)
+        snapshot["journal_seq"] = self.seq
+        
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        
+        # Events up to `seq` are in the snapshot; replay skips them even if
+        # we crash before the journal is truncated
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, "w")
+        self.events_since_snapshot = 0
+    
+    @classmethod
+    def replay(cls, round_dir: str, **kwargs) -> Optional[Tuple["RoundJournal", Dict[str, Any]]]:
+        """
+        Restore a round from its snapshot and journal.
+        
+        Args:
+            round_dir: Directory of the round
+            **kwargs: Extra arguments for the returned journal
+        
+        Returns:
+            Tuple of (journal positioned after the last event, round information),
+            or None if the round has no snapshot
+        """
+        journal = cls(round_dir, **kwargs)
+        
+        if not os.path.exists(journal.snapshot_path):
+            return None
+        
+        with open(journal.snapshot_path, "r") as f:
+            round_info = json.load(f)
+        
+        journal.seq = round_info.pop("journal_seq", 0)
+        
+        if os.path.exists(journal.journal_path):
+            valid_bytes = 0
+            with open(journal.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated journal entry")
+                        event = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write carries no committed state
+                        logger.warning(f"Discarding incomplete journal entry in {journal.journal_path}")
+                        break
+                    
+                    valid_bytes += len(line)
+                    if event["seq"] <= journal.seq:
+                        continue
+                    
+                    round_info.update(event.get("round", {}))
+                    for client_id, fields in event.get("clients", {}).items():
+                        round_info["clients"].setdefault(client_id, {}).update(fields)
+                    
+                    journal.seq = event["seq"]
+                    journal.events_since_snapshot += 1
+            
+            # Drop a torn tail so new events are not appended onto a partial line
+            if valid_bytes < os.path.getsize(journal.journal_path):
+                with open(journal.journal_path, "r+b") as f:
+                    f.truncate(valid_bytes)
+        
+        return journal, round_info
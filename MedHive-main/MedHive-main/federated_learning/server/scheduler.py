@@ -0,0 +1,153 @@
+import time
+import heapq
+import logging
+import threading
+import itertools
+from concurrent.futures import Executor
+from typing import Dict, List, Any, Callable, Optional, Tuple, Hashable
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Scheduler")
+
+
+class DeadlineScheduler:
+    """
+    Single-threaded scheduler for keyed deadlines.
+    
+    All deadlines live in one min-heap ordered by due time. The scheduler
+    thread sleeps until the earliest deadline is due (or a new, earlier one is
+    added), so any number of pending deadlines costs one thread. Due callbacks
+    are handed to an executor so a slow callback never delays other deadlines.
+    
+    Each key has at most one pending deadline. Cancelling or rescheduling a
+    key only drops it from the key map; its stale heap entry is skipped when
+    it reaches the top.
+    """
+    
+    def __init__(self, executor: Optional[Executor] = None, name: str = "FL_Scheduler"):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            executor: Executor to run due callbacks on (default: run on the scheduler thread)
+            name: Name of the scheduler thread
+        """
+        self.executor = executor
+        self.name = name
+        
+        self._heap: List[Tuple[float, int, Hashable]] = []            # (deadline, seq, key)
+        self._entries: Dict[Hashable, Tuple[int, Callable, tuple]] = {}  # key -> (seq, callback, args)
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+    
+    def start(self) -> None:
+        """Start the scheduler thread."""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Stop the scheduler thread. Pending deadlines are dropped.
+        
+        Args:
+            timeout: Seconds to wait for the thread to exit
+        """
+        with self._condition:
+            self._stopped = True
+            self._heap.clear()
+            self._entries.clear()
+            self._condition.notify()
+            thread, self._thread = self._thread, None
+        
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+    
+    def schedule(self, key: Hashable, deadline: float, callback: Callable, *args: Any) -> None:
+        """
+        Schedule `callback(*args)` to run at `deadline`, replacing any pending deadline for `key`.
+        
+        Args:
+            key: Identifier of the deadline (e.g., a round ID)
+            deadline: Due time as a `time.time()` timestamp
+            callback: Function to call when the deadline is due
+            *args: Arguments for the callback
+        """
+        with self._condition:
+            seq = next(self._counter)
+            self._entries[key] = (seq, callback, args)
+            heapq.heappush(self._heap, (deadline, seq, key))
+            
+            # Only wake the thread if this deadline is now the earliest
+            if self._heap[0][1] == seq:
+                self._condition.notify()
+    
+    def cancel(self, key: Hashable) -> bool:
+        """
+        Cancel the pending deadline for a key.
+        
+        Args:
+            key: Identifier of the deadline
+        
+        Returns:
+            True if a pending deadline was cancelled
+        """
+        with self._condition:
+            return self._entries.pop(key, None) is not None
+    
+    def pending(self) -> int:
+        """Get the number of pending deadlines."""
+        with self._condition:
+            return len(self._entries)
+    
+    def _run(self) -> None:
+        """Scheduler loop: wait for the earliest deadline and dispatch it."""
+        while True:
+            with self._condition:
+                due = self._pop_due()
+                while due is None and not self._stopped:
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._condition.wait(timeout)
+                    due = self._pop_due()
+                
+                if self._stopped:
+                    return
+            
+            key, callback, args = due
+            try:
+                if self.executor is not None:
+                    self.executor.submit(callback, *args)
+                else:
+                    callback(*args)
+            except Exception as e:
+                logger.error(f"Error dispatching deadline {key}: {str(e)}")
+    
+    def _pop_due(self) -> Optional[Tuple[Hashable, Callable, tuple]]:
+        """Pop the earliest live deadline if it is due. Caller holds the condition."""
+        now = time.time()
+        while self._heap:
+            deadline, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            
+            # Drop entries that were cancelled or superseded by a reschedule
+            if entry is None or entry[0] != seq:
+                heapq.heappop(self._heap)
+                continue
+            
+            if deadline > now:
+                return None
+            
+            heapq.heappop(self._heap)
+            del self._entries[key]
+            return key, entry[1], entry[2]
+        
+        return None
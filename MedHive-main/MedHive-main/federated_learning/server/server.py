@@ -2,17 +2,28 @@ import os
 import logging
 import json
 import time
+import base64
 from typing import Dict, List, Any, Optional, Tuple, Union
 import threading
 import queue
 import uuid
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import shutil
 import torch
 
 from federated_learning.server.security import SecurityManager
-from federated_learning.server.aggregator import ModelAggregator
+from federated_learning.server.aggregator import ModelAggregator, IncrementalAggregator
+from federated_learning.server.round_journal import RoundJournal
+from federated_learning.server.registry import RoundRegistry
+from federated_learning.server.concurrency import LockStripes, transition_client
+from federated_learning.server.scheduler import DeadlineScheduler
+from federated_learning.server.model_store import ModelStore
+from federated_learning.server.uploads import UploadSessions, MAX_UPLOAD_SIZE
+from federated_learning.server.round_events import RoundEvents
+from federated_learning.server.strategies import AggregationStrategy, get_strategy
+from federated_learning.server.evaluation import EvaluationService
+from federated_learning.common.flat import save_flat, load_state_dict_file
+from federated_learning.common.delta import is_delta
 
 # Configure logging
 logging.basicConfig(
@@ -32,7 +43,14 @@ class FederatedLearningServer:
         models_dir: str = "models",
         rounds_dir: str = "rounds",
         init_security: bool = True,
-        worker_threads: int = 5
+        worker_threads: int = 5,
+        aggregation_workers: Optional[int] = None,
+        snapshot_interval: int = 1000,
+        lock_stripes: int = 64,
+        evaluation_workers: Optional[int] = None,
+        evaluation_precision: str = "auto",
+        reverify_uploads: bool = False,
+        max_upload_size: int = MAX_UPLOAD_SIZE
     ):
         """
         Initialize the federated learning server.
@@ -42,10 +60,21 @@ class FederatedLearningServer:
             rounds_dir: Directory for storing round information
             init_security: Whether to initialize security
             worker_threads: Number of worker threads for handling requests
+            aggregation_workers: Number of processes for the 'fedavg_parallel' strategy (default: CPU count)
+            snapshot_interval: Number of journaled round events between compacted snapshots
+            lock_stripes: Number of locks that per-round state is striped across
+            evaluation_workers: Number of processes evaluating aggregated models (default: CPU count)
+            evaluation_precision: Inference precision of evaluations ("auto", "float32", "bfloat16" or "int8")
+            reverify_uploads: Whether to check the stored files of signed uploads against their
+                signatures again before aggregating a round
+            max_upload_size: Largest client model file accepted, in bytes
         """
         self.models_dir = models_dir
         self.rounds_dir = rounds_dir
         self.worker_threads = worker_threads
+        self.aggregation_workers = aggregation_workers
+        self.snapshot_interval = snapshot_interval
+        self.reverify_uploads = reverify_uploads
         
         # Initialize directories
         os.makedirs(self.models_dir, exist_ok=True)
@@ -62,9 +91,21 @@ class FederatedLearningServer:
             logger.warning("Security not initialized. Running in insecure mode.")
         
         # Data structures for tracking clients and rounds
-        self.registered_clients = {}  # client_id -> client info
-        self.active_rounds = {}       # round_id -> round info
-        self.client_rounds = {}       # client_id -> [round_id, ...]
+        self.registry = RoundRegistry()
+        self.registered_clients = self.registry.clients  # client_id -> client info
+        self.active_rounds = self.registry.rounds        # round_id -> round info (unfinished rounds only)
+        self.round_locks = LockStripes(lock_stripes)  # round_id -> lock guarding the round's state
+        self.online_aggregators = {}  # round_id -> running aggregate for 'fedavg_online' rounds
+        self.round_journals = {}      # round_id -> append-only event journal
+        
+        # Content-addressed model files; on the rounds filesystem so round files can be hard links
+        self.model_store = ModelStore(os.path.join(self.rounds_dir, ".blobs"))
+        
+        # Resumable chunked uploads; on the same filesystem so finished uploads move into the store
+        self.upload_sessions = UploadSessions(os.path.join(self.rounds_dir, ".uploads"), max_size=max_upload_size)
+        
+        # Round created/invitation/started events pushed to subscribed clients
+        self.round_events = RoundEvents()
         
         # Thread synchronization
         self.request_queue = queue.Queue()
@@ -79,35 +120,73 @@ class FederatedLearningServer:
             worker.start()
             self.workers.append(worker)
         
+        # Single thread owning all round deadlines; due timeouts run on the executor
+        self.scheduler = DeadlineScheduler(self.executor)
+        self.scheduler.start()
+        
+        # Aggregated models are evaluated in the background, after their round is completed
+        self.evaluator = EvaluationService(num_workers=evaluation_workers, precision=evaluation_precision)
+        
+        # Restore rounds persisted by a previous run
+        self._recover_rounds()
+        
         logger.info("Federated Learning Server initialized")
     
-    def register_client(self, client_id: str, model_type: str, device_info: Dict[str, Any]) -> Dict[str, Any]:
+    def register_client(
+        self,
+        client_id: str,
+        model_type: str,
+        device_info: Dict[str, Any],
+        authenticated: bool = False
+    ) -> Dict[str, Any]:
         """
         Register a new client with the server.
         
+        A public key, once registered, stays with the client: re-registering
+        without one keeps it, and only a request authenticated as the client
+        may replace it with a different key.
+        
         Args:
             client_id: Unique identifier for the client
             model_type: Type of model the client is interested in
-            device_info: Information about the client's device
-            
+            device_info: Information about the client's device, optionally with the
+                PEM `public_key` its uploads are signed with
+            authenticated: Whether the request was authenticated as `client_id`
+        
         Returns:
             Registration result
         """
-        if client_id in self.registered_clients:
-            logger.info(f"Client {client_id} already registered, updating information")
-        else:
-            logger.info(f"Registering new client: {client_id}")
-        
-        # Store client information
-        self.registered_clients[client_id] = {
-            "id": client_id,
-            "model_type": model_type,
-            "device_info": device_info,
-            "registered_at": time.time(),
-            "last_active": time.time(),
-            "rounds_participated": 0,
-            "status": "active"
-        }
+        # Checking the stored key and replacing the client must not interleave with another registration
+        with self.registry.lock:
+            previous = self.registered_clients.get(client_id)
+            registered_key = (previous or {}).get("device_info", {}).get("public_key")
+            
+            if registered_key is not None:
+                public_key = device_info.get("public_key")
+                if public_key is None:
+                    device_info = dict(device_info, public_key=registered_key)
+                elif public_key.strip() != registered_key.strip() and not authenticated:
+                    logger.error(f"Rejected a new public key for client {client_id} from an unauthenticated request")
+                    return {
+                        "status": "error",
+                        "message": f"Client {client_id} already registered a different public key"
+                    }
+            
+            if previous is not None:
+                logger.info(f"Client {client_id} already registered, updating information")
+            else:
+                logger.info(f"Registering new client: {client_id}")
+            
+            # Store client information
+            self.registry.register_client(client_id, {
+                "id": client_id,
+                "model_type": model_type,
+                "device_info": device_info,
+                "registered_at": time.time(),
+                "last_active": time.time(),
+                "rounds_participated": 0,
+                "status": "active"
+            })
         
         return {
             "status": "success",
@@ -136,14 +215,25 @@ class FederatedLearningServer:
             round_number: Round number
             min_clients: Minimum number of clients required
             max_clients: Maximum number of clients to include
-            aggregation_strategy: Strategy for aggregating models
+            aggregation_strategy: Strategy for aggregating models (see federated_learning.server.strategies)
             client_selection_strategy: Strategy for selecting clients
             round_timeout: Timeout for the round in seconds
-            hyperparameters: Additional hyperparameters for the round
-            
+            hyperparameters: Additional hyperparameters for the round; `aggregation_params` holds
+                the parameters of the aggregation strategy
+        
         Returns:
             Round creation result
         """
+        # Reject unknown strategies now rather than when the round is aggregated
+        try:
+            get_strategy(aggregation_strategy, **(hyperparameters or {}).get("aggregation_params", {}))
+        except ValueError as e:
+            logger.error(f"Cannot create round: {str(e)}")
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+        
         # Generate a unique round ID
         round_id = str(uuid.uuid4())
         
@@ -175,15 +265,18 @@ class FederatedLearningServer:
         os.makedirs(os.path.join(round_dir, "client_models"), exist_ok=True)
         os.makedirs(os.path.join(round_dir, "global_model"), exist_ok=True)
         
-        # Save round information
-        with open(os.path.join(round_dir, "round_info.json"), "w") as f:
-            json.dump(round_info, f, indent=2)
+        # Save round information as the initial snapshot of the round journal
+        journal = RoundJournal(round_dir, snapshot_interval=self.snapshot_interval)
+        journal.snapshot(round_info)
         
         # Store round in active rounds
-        self.active_rounds[round_id] = round_info
+        self.round_journals[round_id] = journal
+        self.registry.add_round(round_info)
         
         logger.info(f"Created new round: {round_id} for model {model_id}, round number {round_number}")
         
+        self.round_events.publish("round_created", round_id, model_type=model_type, round_number=round_number)
+        
         return {
             "status": "success",
             "round_id": round_id,
@@ -196,83 +289,84 @@ class FederatedLearningServer:
         
         Args:
             round_id: ID of the round
-            
+        
         Returns:
             List of selected client IDs
         """
-        if round_id not in self.active_rounds:
-            logger.error(f"Round {round_id} not found")
-            return []
-        
-        round_info = self.active_rounds[round_id]
-        model_type = round_info["model_type"]
-        max_clients = round_info["max_clients"]
-        selection_strategy = round_info["client_selection_strategy"]
-        
-        # Filter eligible clients (those interested in this model type)
-        eligible_clients = [
-            client_id for client_id, client_info in self.registered_clients.items()
-            if client_info["model_type"] == model_type and client_info["status"] == "active"
-        ]
+        round_info = self.active_rounds.get(round_id)
         
-        if not eligible_clients:
-            logger.warning(f"No eligible clients found for round {round_id}")
+        if round_info is None:
+            logger.error(f"Round {round_id} not found")
             return []
         
-        selected_clients = []
-        
-        # Select clients based on the specified strategy
-        if selection_strategy == "random":
-            import random
-            # Randomly select up to max_clients
-            selected_clients = random.sample(eligible_clients, min(max_clients, len(eligible_clients)))
-        
-        elif selection_strategy == "resource_based":
-            # Select based on device resources (prefer more powerful devices)
-            # Sort clients by CPU/GPU power
-            sorted_clients = sorted(
-                eligible_clients,
-                key=lambda client_id: self._calculate_client_score(self.registered_clients[client_id]),
-                reverse=True  # Higher score first
-            )
-            selected_clients = sorted_clients[:max_clients]
-        
-        elif selection_strategy == "participation_based":
-            # Prefer clients that have participated less frequently
-            sorted_clients = sorted(
-                eligible_clients,
-                key=lambda client_id: self.registered_clients[client_id]["rounds_participated"]
-            )
-            selected_clients = sorted_clients[:max_clients]
-        
-        else:
-            logger.warning(f"Unknown client selection strategy: {selection_strategy}, using random selection")
-            import random
-            selected_clients = random.sample(eligible_clients, min(max_clients, len(eligible_clients)))
-        
-        # Update round info with selected clients
-        for client_id in selected_clients:
-            round_info["clients"][client_id] = {
-                "status": "invited",
-                "invited_at": time.time(),
-                "joined_at": None,
-                "completed_at": None,
-                "model_path": None,
-                "training_metrics": None
-            }
+        with self._get_round_lock(round_id):
+            model_type = round_info["model_type"]
+            max_clients = round_info["max_clients"]
+            selection_strategy = round_info["client_selection_strategy"]
             
-            # Update client-round mapping
-            if client_id not in self.client_rounds:
-                self.client_rounds[client_id] = []
-            self.client_rounds[client_id].append(round_id)
-        
-        # Save updated round info
-        round_dir = os.path.join(self.rounds_dir, round_id)
-        with open(os.path.join(round_dir, "round_info.json"), "w") as f:
-            json.dump(round_info, f, indent=2)
+            # Eligible clients (active and interested in this model type) come from the registry index
+            eligible_clients = self.registry.eligible_clients(model_type)
+            
+            if not eligible_clients:
+                logger.warning(f"No eligible clients found for round {round_id}")
+                return []
+            
+            selected_clients = []
+            
+            # Select clients based on the specified strategy
+            if selection_strategy == "random":
+                import random
+                # Randomly select up to max_clients
+                selected_clients = random.sample(eligible_clients, min(max_clients, len(eligible_clients)))
+            
+            elif selection_strategy == "resource_based":
+                # Select based on device resources (prefer more powerful devices)
+                # Sort clients by CPU/GPU power
+                sorted_clients = sorted(
+                    eligible_clients,
+                    key=lambda client_id: self._calculate_client_score(self.registered_clients[client_id]),
+                    reverse=True  # Higher score first
+                )
+                selected_clients = sorted_clients[:max_clients]
+            
+            elif selection_strategy == "participation_based":
+                # Prefer clients that have participated less frequently
+                sorted_clients = sorted(
+                    eligible_clients,
+                    key=lambda client_id: self.registered_clients[client_id]["rounds_participated"]
+                )
+                selected_clients = sorted_clients[:max_clients]
+            
+            else:
+                logger.warning(f"Unknown client selection strategy: {selection_strategy}, using random selection")
+                import random
+                selected_clients = random.sample(eligible_clients, min(max_clients, len(eligible_clients)))
+            
+            # Update round info with selected clients
+            for client_id in selected_clients:
+                round_info["clients"][client_id] = {
+                    "status": "invited",
+                    "invited_at": time.time(),
+                    "joined_at": None,
+                    "completed_at": None,
+                    "model_path": None,
+                    "training_metrics": None
+                }
+            
+            # Index the invitations by client; archiving drops them with the round
+            self.registry.add_round_clients(round_id, selected_clients)
+            
+            # Record the invitations
+            self.round_journals[round_id].record(
+                round_info,
+                clients={client_id: round_info["clients"][client_id] for client_id in selected_clients}
+            )
         
         logger.info(f"Selected {len(selected_clients)} clients for round {round_id}: {selected_clients}")
         
+        if selected_clients:
+            self.round_events.publish("round_invitation", round_id, clients=selected_clients, model_type=model_type)
+        
         return selected_clients
     
     def start_round(self, round_id: str) -> Dict[str, Any]:
@@ -281,50 +375,64 @@ class FederatedLearningServer:
         
         Args:
             round_id: ID of the round
-            
+        
         Returns:
             Round start result
         """
-        if round_id not in self.active_rounds:
+        round_info = self.active_rounds.get(round_id)
+        
+        if round_info is None:
             logger.error(f"Round {round_id} not found")
             return {
                 "status": "error",
                 "message": f"Round {round_id} not found"
             }
         
-        round_info = self.active_rounds[round_id]
-        
-        if round_info["status"] != "created":
-            logger.error(f"Round {round_id} is already in progress or completed")
-            return {
-                "status": "error",
-                "message": f"Round {round_id} is already in progress or completed"
-            }
-        
-        # Check if we have enough clients
-        if len(round_info["clients"]) < round_info["min_clients"]:
-            logger.error(f"Not enough clients for round {round_id}. Need at least {round_info['min_clients']}")
-            return {
-                "status": "error",
-                "message": f"Not enough clients for round {round_id}. Need at least {round_info['min_clients']}"
-            }
-        
-        # Update round status
-        round_info["status"] = "in_progress"
-        round_info["start_time"] = time.time()
-        
-        # Save global model for this round
-        self._prepare_global_model(round_id)
-        
-        # Save updated round info
-        round_dir = os.path.join(self.rounds_dir, round_id)
-        with open(os.path.join(round_dir, "round_info.json"), "w") as f:
-            json.dump(round_info, f, indent=2)
+        with self._get_round_lock(round_id):
+            if round_info["status"] != "created":
+                logger.error(f"Round {round_id} is already in progress or completed")
+                return {
+                    "status": "error",
+                    "message": f"Round {round_id} is already in progress or completed"
+                }
+            
+            # Check if we have enough clients
+            if len(round_info["clients"]) < round_info["min_clients"]:
+                logger.error(f"Not enough clients for round {round_id}. Need at least {round_info['min_clients']}")
+                return {
+                    "status": "error",
+                    "message": f"Not enough clients for round {round_id}. Need at least {round_info['min_clients']}"
+                }
+            
+            # Save global model for this round before clients can join
+            self._prepare_global_model(round_id)
+            
+            # Update round status
+            round_info["status"] = "in_progress"
+            round_info["start_time"] = time.time()
+            
+            # Record the round start
+            self.round_journals[round_id].record(
+                round_info,
+                round_fields={
+                    "status": round_info["status"],
+                    "start_time": round_info["start_time"],
+                    "global_model_digest": round_info["global_model_digest"]
+                }
+            )
         
         logger.info(f"Started round {round_id}")
         
-        # Submit task to check for round timeout
-        self.executor.submit(self._monitor_round_timeout, round_id)
+        # Tell the round's clients to join now rather than at their next poll
+        self.round_events.publish(
+            "round_started",
+            round_id,
+            clients=list(round_info["clients"]),
+            model_type=round_info["model_type"]
+        )
+        
+        # Schedule the round timeout
+        self._schedule_round_timeout(round_id)
         
         return {
             "status": "success",
@@ -338,138 +446,210 @@ class FederatedLearningServer:
         Args:
             round_id: ID of the round
             client_id: ID of the client
-            
+        
         Returns:
             Join result
         """
-        if round_id not in self.active_rounds:
+        round_info = self.active_rounds.get(round_id)
+        
+        if round_info is None:
             logger.error(f"Round {round_id} not found")
             return {
                 "status": "error",
                 "message": f"Round {round_id} not found"
             }
         
-        round_info = self.active_rounds[round_id]
-        
-        if round_info["status"] != "in_progress":
-            logger.error(f"Round {round_id} is not in progress")
-            return {
-                "status": "error",
-                "message": f"Round {round_id} is not in progress"
-            }
-        
-        if client_id not in round_info["clients"]:
-            logger.error(f"Client {client_id} not invited to round {round_id}")
-            return {
-                "status": "error",
-                "message": f"Client {client_id} not invited to round {round_id}"
-            }
-        
-        client_info = round_info["clients"][client_id]
-        
-        if client_info["status"] != "invited":
-            logger.error(f"Client {client_id} already joined or completed round {round_id}")
-            return {
-                "status": "error",
-                "message": f"Client {client_id} already joined or completed round {round_id}"
-            }
-        
-        # Update client status
-        client_info["status"] = "joined"
-        client_info["joined_at"] = time.time()
-        
-        # Save updated round info
-        round_dir = os.path.join(self.rounds_dir, round_id)
-        with open(os.path.join(round_dir, "round_info.json"), "w") as f:
-            json.dump(round_info, f, indent=2)
+        with self._get_round_lock(round_id):
+            if round_info["status"] != "in_progress":
+                logger.error(f"Round {round_id} is not in progress")
+                return {
+                    "status": "error",
+                    "message": f"Round {round_id} is not in progress"
+                }
+            
+            if client_id not in round_info["clients"]:
+                logger.error(f"Client {client_id} not invited to round {round_id}")
+                return {
+                    "status": "error",
+                    "message": f"Client {client_id} not invited to round {round_id}"
+                }
+            
+            client_info = round_info["clients"][client_id]
+            
+            # Update client status (invited -> joined)
+            if not transition_client(client_info, ("invited",), "joined"):
+                logger.error(f"Client {client_id} already joined or completed round {round_id}")
+                return {
+                    "status": "error",
+                    "message": f"Client {client_id} already joined or completed round {round_id}"
+                }
+            
+            client_info["joined_at"] = time.time()
+            
+            # Record the join
+            self.round_journals[round_id].record(
+                round_info,
+                clients={client_id: {"status": client_info["status"], "joined_at": client_info["joined_at"]}}
+            )
         
         logger.info(f"Client {client_id} joined round {round_id}")
         
         # Update last active timestamp for client
-        if client_id in self.registered_clients:
-            self.registered_clients[client_id]["last_active"] = time.time()
+        self.registry.touch_client(client_id)
         
         # Return the global model path for this round
-        global_model_path = os.path.join(round_dir, "global_model", "model.pt")
+        global_model_path = os.path.join(self.rounds_dir, round_id, "global_model", "model.pt")
+        
+        # Tell the client how to encode its update
+        hyperparameters = round_info["hyperparameters"]
+        update_config = {"format": hyperparameters.get("update_format", "full")}
+        if update_config["format"] == "delta":
+            update_config["top_k"] = hyperparameters.get("delta_top_k")
+            update_config["bits"] = hyperparameters.get("delta_bits")
+        
+        # FedProx rounds regularize local training toward the global model
+        training_config = {}
+        proximal_mu = hyperparameters.get("aggregation_params", {}).get("proximal_mu")
+        if proximal_mu:
+            training_config["proximal_mu"] = proximal_mu
         
         return {
             "status": "success",
             "message": f"Client {client_id} joined round {round_id} successfully",
-            "global_model_path": global_model_path
+            "global_model_path": global_model_path,
+            "update_config": update_config,
+            "training_config": training_config
         }
     
-    def upload_client_model(self, round_id: str, client_id: str, model_path: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+    def upload_client_model(
+        self,
+        round_id: str,
+        client_id: str,
+        model_path: str,
+        metrics: Dict[str, Any],
+        move: bool = False,
+        update_format: str = "full",
+        content_digest: Optional[str] = None,
+        signature: Optional[bytes] = None
+    ) -> Dict[str, Any]:
         """
         Handle a client uploading their trained model.
         
+        Clients that registered a 'public_key' in their device info must sign
+        the SHA-256 digest of every file they upload (see
+        federated_learning.common.signing); unsigned or badly signed uploads
+        are rejected, as are files that do not load as a state dict (or, for
+        'delta', a delta payload), so that they cannot fail the aggregation.
+        
         Args:
             round_id: ID of the round
             client_id: ID of the client
             model_path: Path to the client's trained model
             metrics: Training metrics from the client
-            
+            move: Whether the server may take ownership of the file at `model_path`
+                instead of copying it
+            update_format: 'full' for a complete state dict, 'delta' for a delta update
+                against the round's global model (see federated_learning.common.delta)
+            content_digest: Hex SHA-256 digest of the file, if it was hashed while being received
+            signature: Client's signature over the digest of the file
+        
         Returns:
             Upload result
         """
-        if round_id not in self.active_rounds:
+        round_info = self.active_rounds.get(round_id)
+        
+        if round_info is None:
             logger.error(f"Round {round_id} not found")
             return {
                 "status": "error",
                 "message": f"Round {round_id} not found"
             }
         
-        round_info = self.active_rounds[round_id]
-        
-        if round_info["status"] != "in_progress":
-            logger.error(f"Round {round_id} is not in progress")
+        if update_format not in ("full", "delta"):
             return {
                 "status": "error",
-                "message": f"Round {round_id} is not in progress"
+                "message": f"Unknown update format: {update_format}"
             }
         
-        if client_id not in round_info["clients"]:
-            logger.error(f"Client {client_id} not part of round {round_id}")
+        if update_format == "delta" and not self._uses_delta_updates(round_info):
+            logger.error(f"Round {round_id} does not accept delta updates")
             return {
                 "status": "error",
-                "message": f"Client {client_id} not part of round {round_id}"
+                "message": f"Round {round_id} does not accept delta updates"
             }
         
-        client_info = round_info["clients"][client_id]
+        with self._get_round_lock(round_id):
+            error = self._check_upload_allowed(round_info, client_id)
         
-        if client_info["status"] != "joined":
-            logger.error(f"Client {client_id} has not joined or already completed round {round_id}")
-            return {
-                "status": "error",
-                "message": f"Client {client_id} has not joined or already completed round {round_id}"
-            }
+        if error:
+            return error
         
-        # Copy model to round directory
-        round_dir = os.path.join(self.rounds_dir, round_id)
-        client_model_dir = os.path.join(round_dir, "client_models")
-        client_model_path = os.path.join(client_model_dir, f"{client_id}_model.pt")
+        if content_digest is None:
+            content_digest = self.model_store.hash_file(model_path)
         
-        os.makedirs(client_model_dir, exist_ok=True)
-        shutil.copy(model_path, client_model_path)
+        error = self._check_upload_signature(client_id, content_digest, signature)
+        if error:
+            return error
         
-        # Update client status
-        client_info["status"] = "completed"
-        client_info["completed_at"] = time.time()
-        client_info["model_path"] = client_model_path
-        client_info["training_metrics"] = metrics
+        # Reject a file the aggregator could not load before it can fail the round
+        error = self._check_upload_payload(client_id, model_path, update_format)
+        if error:
+            return error
         
-        # Update client participation count
-        if client_id in self.registered_clients:
-            self.registered_clients[client_id]["rounds_participated"] += 1
-            self.registered_clients[client_id]["last_active"] = time.time()
+        # Add the model to the store outside the round lock; a rejected upload
+        # leaves an unreferenced blob that garbage collection removes
+        model_digest = self.model_store.put_file(
+            model_path, "move" if move else "copy",
+            digest=content_digest if move else None
+        )
+        
+        round_dir = os.path.join(self.rounds_dir, round_id)
+        client_model_path = os.path.join(round_dir, "client_models", f"{client_id}_model.pt")
+        
+        with self._get_round_lock(round_id):
+            # The round or the client may have moved on while the file was stored
+            error = self._check_upload_allowed(round_info, client_id)
+            if error:
+                return error
+            
+            # Link the blob into the round directory
+            self.model_store.link(model_digest, client_model_path)
+            
+            # Update client status (joined -> completed)
+            client_info = round_info["clients"][client_id]
+            transition_client(client_info, ("joined",), "completed")
+            client_info["completed_at"] = time.time()
+            client_info["model_path"] = client_model_path
+            client_info["model_digest"] = model_digest
+            client_info["update_format"] = update_format
+            client_info["training_metrics"] = metrics
+            client_info["model_signature"] = base64.b64encode(signature).decode("ascii") if signature else None
+            
+            # Record the upload
+            self.round_journals[round_id].record(
+                round_info,
+                clients={client_id: {
+                    "status": client_info["status"],
+                    "completed_at": client_info["completed_at"],
+                    "model_path": client_info["model_path"],
+                    "model_digest": client_info["model_digest"],
+                    "update_format": client_info["update_format"],
+                    "training_metrics": client_info["training_metrics"],
+                    "model_signature": client_info["model_signature"]
+                }}
+            )
+            
+            # Check if all clients have completed
+            all_completed = all(c["status"] == "completed" for c in round_info["clients"].values())
         
-        # Save updated round info
-        with open(os.path.join(round_dir, "round_info.json"), "w") as f:
-            json.dump(round_info, f, indent=2)
+        # Update client participation count
+        self.registry.touch_client(client_id, participated=True)
         
         logger.info(f"Client {client_id} uploaded model for round {round_id}")
         
-        # Check if all clients have completed
-        all_completed = all(c["status"] == "completed" for c in round_info["clients"].values())
+        # Fold the upload into the running aggregate right away for online aggregation
+        if round_info["aggregation_strategy"] == "fedavg_online":
+            self.executor.submit(self._fold_client_model, round_id, client_id)
         
         if all_completed:
             # Submit task to finish the round
@@ -480,33 +660,207 @@ class FederatedLearningServer:
             "message": f"Client {client_id} model uploaded successfully for round {round_id}"
         }
     
-    def get_round_status(self, round_id: str) -> Dict[str, Any]:
+    def _check_upload_signature(
+        self,
+        client_id: str,
+        content_digest: str,
+        signature: Optional[bytes]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Check the signature of an upload against the client's registered public key.
+        
+        Args:
+            client_id: ID of the client
+            content_digest: Hex SHA-256 digest of the uploaded file
+            signature: Signature sent with the upload
+        
+        Returns:
+            Error response, or None if the upload is acceptable
+        """
+        client = self.registered_clients.get(client_id) or {}
+        public_key = client.get("device_info", {}).get("public_key")
+        
+        if public_key is None or self.security is None:
+            return None
+        
+        if signature is None:
+            logger.error(f"Client {client_id} uploaded an unsigned model")
+            return {
+                "status": "error",
+                "message": f"Client {client_id} must sign its uploads"
+            }
+        
+        if not self.security.verify_digest(bytes.fromhex(content_digest), signature, public_key):
+            logger.error(f"Invalid signature on model uploaded by client {client_id}")
+            return {
+                "status": "error",
+                "message": "Invalid model signature"
+            }
+        
+        return None
+    
+    def _check_upload_payload(
+        self,
+        client_id: str,
+        model_path: str,
+        update_format: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Check that an uploaded file loads as the kind of update it claims to be.
+        
+        Args:
+            client_id: ID of the client
+            model_path: Path to the uploaded file
+            update_format: 'full' or 'delta'
+        
+        Returns:
+            Error response, or None if the upload is acceptable
+        """
+        try:
+            update = load_state_dict_file(model_path)
+        except Exception as e:
+            logger.error(f"Client {client_id} uploaded a model that does not load: {str(e)}")
+            update = None
+        
+        if update_format == "delta":
+            valid = is_delta(update)
+        else:
+            valid = (
+                isinstance(update, dict) and bool(update) and not is_delta(update)
+                and all(isinstance(tensor, torch.Tensor) for tensor in update.values())
+            )
+        del update
+        
+        if not valid:
+            logger.error(f"Client {client_id} uploaded an invalid {update_format} model")
+            return {
+                "status": "error",
+                "message": f"Upload is not a valid {update_format} model update"
+            }
+        
+        return None
+    
+    def _reverify_client_models(
+        self,
+        round_info: Dict[str, Any],
+        completed_clients: Dict[str, Tuple[str, float]]
+    ) -> Dict[str, Tuple[str, float]]:
+        """
+        Check the stored files of a round's signed uploads against their signatures again.
+        
+        The files are hashed and verified in parallel by the security manager's
+        worker processes. Unsigned uploads are kept as they are.
+        
+        Args:
+            round_info: Round information
+            completed_clients: client_id -> (model path, aggregation weight)
+        
+        Returns:
+            The completed clients whose uploads still verify
+        """
+        signed = []
+        items = []
+        for client_id, (model_path, _) in completed_clients.items():
+            client_info = round_info["clients"][client_id]
+            public_key = (self.registered_clients.get(client_id) or {}).get("device_info", {}).get("public_key")
+            if public_key is None or not client_info.get("model_signature"):
+                continue
+            
+            signed.append(client_id)
+            items.append({
+                "path": model_path,
+                "digest": client_info.get("model_digest"),
+                "signature": base64.b64decode(client_info["model_signature"]),
+                "public_key": public_key
+            })
+        
+        if not items:
+            return completed_clients
+        
+        start_time = time.time()
+        valid = self.security.verify_batch(items)
+        logger.info(f"Verified {len(items)} signed uploads of round {round_info['id']} in {time.time() - start_time:.2f}s")
+        
+        verified = dict(completed_clients)
+        for client_id, ok in zip(signed, valid):
+            if not ok:
+                logger.error(f"Stored model of client {client_id} no longer matches its signature, excluding it")
+                del verified[client_id]
+        
+        return verified
+    
+    def _check_upload_allowed(self, round_info: Dict[str, Any], client_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Check whether a client may upload a model to a round. Caller holds the round lock.
+        
+        Args:
+            round_info: Round information
+            client_id: ID of the client
+        
+        Returns:
+            Error response, or None if the upload is allowed
+        """
+        round_id = round_info["id"]
+        
+        if round_info["status"] != "in_progress":
+            logger.error(f"Round {round_id} is not in progress")
+            return {
+                "status": "error",
+                "message": f"Round {round_id} is not in progress"
+            }
+        
+        if client_id not in round_info["clients"]:
+            logger.error(f"Client {client_id} not part of round {round_id}")
+            return {
+                "status": "error",
+                "message": f"Client {client_id} not part of round {round_id}"
+            }
+        
+        if round_info["clients"][client_id]["status"] != "joined":
+            logger.error(f"Client {client_id} has not joined or already completed round {round_id}")
+            return {
+                "status": "error",
+                "message": f"Client {client_id} has not joined or already completed round {round_id}"
+            }
+        
+        return None
+    
+    def get_round_status(self, round_id: str, client_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Get the status of a federated learning round.
         
         Args:
             round_id: ID of the round
-            
+            client_id: Optional client to restrict the client summary to, which keeps
+                the response small for polling clients
+        
         Returns:
             Round status information
         """
-        if round_id not in self.active_rounds:
+        round_info = self.registry.get_round(round_id)
+        
+        if round_info is None:
             logger.error(f"Round {round_id} not found")
             return {
                 "status": "error",
                 "message": f"Round {round_id} not found"
             }
         
-        round_info = self.active_rounds[round_id]
-        
-        # Prepare a summary for clients
-        client_summary = {}
-        for client_id, client_info in round_info["clients"].items():
-            client_summary[client_id] = {
-                "status": client_info["status"],
-                "joined_at": client_info["joined_at"],
-                "completed_at": client_info["completed_at"]
-            }
+        with self._get_round_lock(round_id):
+            # Prepare a summary for clients
+            if client_id is None:
+                summarized_clients = round_info["clients"]
+            else:
+                summarized_clients = {client_id: round_info["clients"][client_id]} if client_id in round_info["clients"] else {}
+            
+            client_summary = {}
+            for summary_client_id, client_info in summarized_clients.items():
+                client_summary[summary_client_id] = {
+                    "status": client_info["status"],
+                    "joined_at": client_info["joined_at"],
+                    "completed_at": client_info["completed_at"]
+                }
+            completed_clients = sum(1 for c in round_info["clients"].values() if c["status"] == "completed")
         
         # Create a response with essential information
         response = {
@@ -520,7 +874,7 @@ class FederatedLearningServer:
             "start_time": round_info["start_time"],
             "end_time": round_info["end_time"],
             "client_count": len(round_info["clients"]),
-            "completed_clients": sum(1 for c in round_info["clients"].values() if c["status"] == "completed"),
+            "completed_clients": completed_clients,
             "client_summary": client_summary,
             "results": round_info["results"]
         }
@@ -534,13 +888,16 @@ class FederatedLearningServer:
         Args:
             client_id: ID of the client
             model_type: Optional filter for model type
-            
+        
         Returns:
             List of available rounds
         """
         available_rounds = []
         
-        for round_id, round_info in self.active_rounds.items():
+        # Only the unfinished rounds the client was invited to are considered
+        for round_info in self.registry.invited_rounds(client_id):
+            round_id = round_info["id"]
+            
             # Skip rounds that are not in progress
             if round_info["status"] != "in_progress":
                 continue
@@ -576,27 +933,23 @@ class FederatedLearningServer:
         Args:
             model_type: Type of model
             version: Model version (default: latest)
-            
+        
         Returns:
             Information about the global model
         """
-        # Find the latest round for this model type
-        latest_round_id = None
-        latest_round_number = -1
+        # Find the latest completed round for this model type
+        latest_round = self.registry.latest_completed_round(model_type)
         
-        for round_id, round_info in self.active_rounds.items():
-            if round_info["model_type"] == model_type and round_info["status"] == "completed":
-                if round_info["round_number"] > latest_round_number:
-                    latest_round_number = round_info["round_number"]
-                    latest_round_id = round_id
-        
-        if not latest_round_id:
+        if not latest_round:
             logger.error(f"No completed rounds found for model type {model_type}")
             return {
                 "status": "error",
                 "message": f"No completed rounds found for model type {model_type}"
             }
         
+        latest_round_id = latest_round["id"]
+        latest_round_number = latest_round["round_number"]
+        
         # Get the global model path
         round_dir = os.path.join(self.rounds_dir, latest_round_id)
         global_model_path = os.path.join(round_dir, "global_model", "aggregated.pt")
@@ -616,6 +969,36 @@ class FederatedLearningServer:
             "global_model_path": global_model_path
         }
     
+    def collect_model_garbage(self, min_age: float = 3600.0) -> int:
+        """
+        Remove model blobs that no round refers to, and abandoned chunked uploads.
+        
+        Args:
+            min_age: Minimum age in seconds of a blob before it can be removed
+        
+        Returns:
+            Number of removed blobs
+        """
+        with self.registry.lock:
+            round_infos = list(self.registry.rounds.values()) + list(self.registry.archived_rounds.values())
+        
+        # Client entries change under the round locks; holders of those take the registry lock, so read them after releasing it
+        referenced = set()
+        for round_info in round_infos:
+            with self._get_round_lock(round_info["id"]):
+                referenced.add(round_info.get("global_model_digest"))
+                referenced.add(round_info.get("aggregated_model_digest"))
+                for client_info in round_info["clients"].values():
+                    referenced.add(client_info.get("model_digest"))
+        referenced.discard(None)
+        
+        try:
+            self.upload_sessions.expire()
+            return self.model_store.gc(referenced, min_age=min_age)
+        except Exception as e:
+            logger.error(f"Error collecting model garbage: {str(e)}")
+            return 0
+    
     def shutdown(self) -> None:
         """Shutdown the server gracefully."""
         logger.info("Shutting down Federated Learning Server...")
@@ -623,6 +1006,12 @@ class FederatedLearningServer:
         # Signal worker threads to stop
         self.stop_event.set()
         
+        # Release clients waiting for round events
+        self.round_events.close()
+        
+        # Drop pending round timeouts
+        self.scheduler.stop()
+        
         # Wait for worker threads to finish
         for worker in self.workers:
             worker.join(timeout=5.0)
@@ -630,8 +1019,67 @@ class FederatedLearningServer:
         # Shutdown thread pool
         self.executor.shutdown(wait=False)
         
+        # Drop queued evaluations and stop the evaluation workers
+        self.evaluator.shutdown(wait=False)
+        
+        # Stop the signature verification workers
+        if self.security is not None:
+            self.security.close()
+        
+        # Close round journals
+        for journal in self.round_journals.values():
+            journal.close()
+        
         logger.info("Federated Learning Server shut down")
     
+    def _recover_rounds(self) -> None:
+        """Replay the journals of persisted rounds into the in-memory state."""
+        recovered = 0
+        
+        for round_id in os.listdir(self.rounds_dir):
+            round_dir = os.path.join(self.rounds_dir, round_id)
+            if not os.path.isdir(round_dir):
+                continue
+            
+            try:
+                replayed = RoundJournal.replay(round_dir, snapshot_interval=self.snapshot_interval)
+            except Exception as e:
+                logger.error(f"Error recovering round {round_id}: {str(e)}")
+                continue
+            
+            if replayed is None:
+                continue
+            
+            journal, round_info = replayed
+            
+            # Finished rounds go straight to the archive and need no journal
+            self.registry.add_round(round_info)
+            if round_id not in self.active_rounds:
+                journal.close()
+                
+                # The server stopped before the round's evaluation finished
+                if (round_info["results"] or {}).get("evaluation_status") == "pending":
+                    self._schedule_evaluation(round_id)
+                
+                recovered += 1
+                continue
+            
+            self.round_journals[round_id] = journal
+            
+            # A crash mid-aggregation leaves the round "aggregating"; run it again
+            if round_info["status"] == "aggregating":
+                round_info["status"] = "in_progress"
+                self.executor.submit(self._finish_round, round_id)
+            
+            # Reschedule timeouts for rounds that were still running; overdue ones fire right away
+            elif round_info["status"] == "in_progress":
+                self._schedule_round_timeout(round_id)
+            
+            recovered += 1
+        
+        if recovered:
+            logger.info(f"Recovered {recovered} rounds from {self.rounds_dir}")
+    
     def _worker_loop(self) -> None:
         """Worker thread loop for handling requests."""
         while not self.stop_event.is_set():
@@ -668,9 +1116,13 @@ class FederatedLearningServer:
         """
         Prepare the global model for a round.
         
+        The model is linked from the content-addressed store, so a round that
+        continues from the previous round's aggregate shares its file instead
+        of copying it.
+        
         Args:
             round_id: ID of the round
-            
+        
         Returns:
             Path to the global model
         """
@@ -680,215 +1132,420 @@ class FederatedLearningServer:
         round_number = round_info["round_number"]
         
         round_dir = os.path.join(self.rounds_dir, round_id)
-        global_model_dir = os.path.join(round_dir, "global_model")
-        os.makedirs(global_model_dir, exist_ok=True)
+        global_model_path = os.path.join(round_dir, "global_model", "model.pt")
         
-        global_model_path = os.path.join(global_model_dir, "model.pt")
+        model_digest = None
         
         # If this is the first round, create an initial model
         if round_number == 1:
-            # Create an empty model
-            try:
-                aggregator = ModelAggregator(model_type)
-                model = aggregator.load_empty_model()
-                torch.save(model.state_dict(), global_model_path)
-                logger.info(f"Created initial global model for round {round_id}")
-            except Exception as e:
-                logger.error(f"Error creating initial model: {str(e)}")
-                # Create an empty file as a fallback
-                with open(global_model_path, "wb") as f:
-                    pass
+            model_digest = self._initial_model_digest(model_type)
+            logger.info(f"Created initial global model for round {round_id}")
         else:
             # Find the previous round
-            prev_round_id = None
-            prev_round_number = -1
-            
-            for r_id, r_info in self.active_rounds.items():
-                if r_info["model_id"] == model_id and r_info["status"] == "completed":
-                    if r_info["round_number"] == round_number - 1:
-                        prev_round_id = r_id
-                        prev_round_number = r_info["round_number"]
-                        break
-            
-            if prev_round_id:
-                # Copy the aggregated model from the previous round
-                prev_round_dir = os.path.join(self.rounds_dir, prev_round_id)
-                prev_model_path = os.path.join(prev_round_dir, "global_model", "aggregated.pt")
+            prev_round = self.registry.find_round(model_id, round_number - 1)
+            
+            if prev_round and prev_round["status"] == "completed":
+                model_digest = prev_round.get("aggregated_model_digest")
+                
+                # Rounds persisted before the model store have only the file
+                prev_model_path = os.path.join(self.rounds_dir, prev_round["id"], "global_model", "aggregated.pt")
+                if model_digest is None and os.path.exists(prev_model_path):
+                    model_digest = self.model_store.put_file(prev_model_path, "link")
                 
-                if os.path.exists(prev_model_path):
-                    shutil.copy(prev_model_path, global_model_path)
-                    logger.info(f"Copied global model from round {prev_round_id} for round {round_id}")
+                if model_digest is not None:
+                    logger.info(f"Linked global model from round {prev_round['id']} for round {round_id}")
                 else:
                     logger.error(f"Previous round model not found at {prev_model_path}")
-                    # Create an empty model as a fallback
-                    try:
-                        aggregator = ModelAggregator(model_type)
-                        model = aggregator.load_empty_model()
-                        torch.save(model.state_dict(), global_model_path)
-                    except Exception as e:
-                        logger.error(f"Error creating fallback model: {str(e)}")
-                        # Create an empty file as a last resort
-                        with open(global_model_path, "wb") as f:
-                            pass
             else:
                 logger.warning(f"No previous round found for round {round_id}, creating new model")
-                # Create an empty model
-                try:
-                    aggregator = ModelAggregator(model_type)
-                    model = aggregator.load_empty_model()
-                    torch.save(model.state_dict(), global_model_path)
-                except Exception as e:
-                    logger.error(f"Error creating new model: {str(e)}")
-                    # Create an empty file as a fallback
-                    with open(global_model_path, "wb") as f:
-                        pass
+            
+            if model_digest is None:
+                model_digest = self._initial_model_digest(model_type)
+        
+        self.model_store.link(model_digest, global_model_path)
+        round_info["global_model_digest"] = model_digest
         
         return global_model_path
     
+    def _initial_model_digest(self, model_type: str) -> str:
+        """
+        Store a freshly initialized model of a type.
+        
+        Args:
+            model_type: Type of model
+        
+        Returns:
+            Digest of the stored model, or of an empty file if the model cannot be created
+        """
+        try:
+            aggregator = ModelAggregator(model_type)
+            model = aggregator.load_empty_model()
+            
+            tmp_path = self.model_store.tmp_path(".pt")
+            save_flat(model.state_dict(), tmp_path)
+            return self.model_store.put_file(tmp_path, "move")
+        except Exception as e:
+            logger.error(f"Error creating initial model: {str(e)}")
+            # Use an empty file as a fallback
+            return self.model_store.put_bytes(b"")
+    
     def _finish_round(self, round_id: str) -> None:
         """
         Finish a federated learning round by aggregating models and updating the global model.
         
+        Uploads, timeouts and recovery may all ask for a round to be finished;
+        the first caller moves the round to "aggregating" under the round lock
+        and every later caller returns, so a round is aggregated exactly once.
+        
         Args:
             round_id: ID of the round
         """
-        if round_id not in self.active_rounds:
+        round_info = self.active_rounds.get(round_id)
+        
+        if round_info is None:
             logger.error(f"Round {round_id} not found")
             return
         
-        round_info = self.active_rounds[round_id]
-        
-        if round_info["status"] != "in_progress":
-            logger.error(f"Round {round_id} is not in progress")
-            return
+        with self._get_round_lock(round_id):
+            if round_info["status"] != "in_progress":
+                logger.info(f"Round {round_id} is already being finished")
+                return
+            
+            # Claim the round; folds and uploads stop once it leaves "in_progress"
+            round_info["status"] = "aggregating"
+            self.round_journals[round_id].record(round_info, round_fields={"status": round_info["status"]})
+            
+            # The round no longer needs its timeout
+            self.scheduler.cancel(round_id)
+            
+            # Get model paths from completed clients
+            completed_clients = {}
+            for client_id, client_info in round_info["clients"].items():
+                if client_info["status"] == "completed" and client_info["model_path"]:
+                    completed_clients[client_id] = (client_info["model_path"], self._client_weight(client_info))
         
         logger.info(f"Finishing round {round_id}")
         
-        # Get model paths from completed clients
-        client_model_paths = []
-        client_weights = []
+        # Online rounds have already folded every upload in, so there is nothing left to exclude
+        if self.reverify_uploads and self.security is not None and round_info["aggregation_strategy"] != "fedavg_online":
+            completed_clients = self._reverify_client_models(round_info, completed_clients)
         
-        for client_id, client_info in round_info["clients"].items():
-            if client_info["status"] == "completed" and client_info["model_path"]:
-                client_model_paths.append(client_info["model_path"])
-                
-                # Use training data size as weight if available
-                if client_info["training_metrics"] and "data_size" in client_info["training_metrics"]:
-                    weight = client_info["training_metrics"]["data_size"]
-                else:
-                    weight = 1.0
-                
-                client_weights.append(weight)
+        results = None
         
-        if not client_model_paths:
+        if not completed_clients:
             logger.error(f"No completed client models found for round {round_id}")
-            
-            # Mark round as failed
-            round_info["status"] = "failed"
+        else:
+            # Aggregate client models without holding the round lock
+            try:
+                results = self._aggregate_round(round_id, round_info, completed_clients)
+            except Exception as e:
+                logger.error(f"Error aggregating models for round {round_id}: {str(e)}")
+        
+        with self._get_round_lock(round_id):
+            # Mark round as completed or failed
+            if results is None:
+                round_info["status"] = "failed"
+            else:
+                round_info["status"] = "completed"
+                round_info["results"] = results
             round_info["end_time"] = time.time()
             
-            # Save updated round info
-            round_dir = os.path.join(self.rounds_dir, round_id)
-            with open(os.path.join(round_dir, "round_info.json"), "w") as f:
-                json.dump(round_info, f, indent=2)
-            
-            return
+            # Compact the journal now that the round has reached a final state
+            self.round_journals[round_id].snapshot(round_info)
+            self._archive_round(round_id)
         
-        # Aggregate client models
-        try:
-            model_type = round_info["model_type"]
-            aggregation_strategy = round_info["aggregation_strategy"]
-            
-            aggregator = ModelAggregator(model_type)
-            aggregated_path = aggregator.aggregate_models(
-                model_paths=client_model_paths,
-                weights=client_weights,
-                strategy=aggregation_strategy
-            )
-            
-            # Copy aggregated model to round directory
-            round_dir = os.path.join(self.rounds_dir, round_id)
-            global_model_dir = os.path.join(round_dir, "global_model")
-            aggregated_model_path = os.path.join(global_model_dir, "aggregated.pt")
+        if results is not None:
+            logger.info(f"Round {round_id} completed successfully")
             
-            shutil.copy(aggregated_path, aggregated_model_path)
+            # Metrics land in the round's results when the evaluation finishes
+            if results.get("evaluation_status") == "pending":
+                self._schedule_evaluation(round_id)
+        
+        # Drop model blobs that no round refers to anymore
+        self.executor.submit(self.collect_model_garbage)
+    
+    def _aggregate_round(
+        self,
+        round_id: str,
+        round_info: Dict[str, Any],
+        completed_clients: Dict[str, Tuple[str, float]]
+    ) -> Dict[str, Any]:
+        """
+        Aggregate the completed client models of a round.
+        
+        The aggregated model is evaluated later, by `_schedule_evaluation`.
+        
+        Args:
+            round_id: ID of the round
+            round_info: Round information
+            completed_clients: client_id -> (model path, aggregation weight)
+        
+        Returns:
+            Results for the round, with 'evaluation_status' "pending" if the model will be evaluated
+        """
+        model_type = round_info["model_type"]
+        aggregation_strategy = round_info["aggregation_strategy"]
+        
+        round_dir = os.path.join(self.rounds_dir, round_id)
+        global_model_dir = os.path.join(round_dir, "global_model")
+        aggregated_model_path = os.path.join(global_model_dir, "aggregated.pt")
+        
+        aggregator = ModelAggregator(model_type, num_workers=self.aggregation_workers)
+        
+        if aggregation_strategy == "fedavg_online":
+            # Contributions were folded in as they arrived, only normalize and save.
+            # No fold starts once the round is "aggregating"; one already running finishes first.
+            with self._get_round_lock(round_id):
+                online_aggregator = self._get_online_aggregator(round_id)
             
-            # Evaluate the aggregated model if a test dataset is available
-            test_data_path = os.path.join("data", "test", model_type)
-            if os.path.exists(test_data_path):
-                metrics = aggregator.evaluate_aggregated_model(
-                    model_path=aggregated_model_path,
-                    test_data_path=test_data_path
-                )
-                
-                # Save metrics
-                metrics_path = os.path.join(global_model_dir, "metrics.json")
-                with open(metrics_path, "w") as f:
-                    json.dump(metrics, f, indent=2)
+            with online_aggregator.lock:
+                # Fold any uploads whose fold task has not run yet
+                for client_id, (model_path, weight) in completed_clients.items():
+                    online_aggregator.add(client_id, model_path, weight)
                 
-                # Store results in round info
-                round_info["results"] = metrics
-            else:
-                logger.warning(f"Test data not found at {test_data_path}, skipping evaluation")
-                round_info["results"] = {"message": "No test data available for evaluation"}
+                online_aggregator.finalize(aggregated_model_path)
             
-            # Mark round as completed
-            round_info["status"] = "completed"
-            round_info["end_time"] = time.time()
-            
-            # Save updated round info
-            with open(os.path.join(round_dir, "round_info.json"), "w") as f:
-                json.dump(round_info, f, indent=2)
+            # The running aggregate is no longer needed once the round is finalized
+            self.online_aggregators.pop(round_id, None)
+            if os.path.exists(online_aggregator.state_path):
+                os.remove(online_aggregator.state_path)
+        else:
+            model_paths = [model_path for model_path, _ in completed_clients.values()]
+            weights = [weight for _, weight in completed_clients.values()]
             
-            logger.info(f"Round {round_id} completed successfully")
+            # Delta updates and server optimizers work against the model the round started from
+            base_path = None
+            if self._uses_delta_updates(round_info) or self._get_strategy(round_info).requires_base:
+                base_path = os.path.join(global_model_dir, "model.pt")
             
+            # Write the aggregated model straight into the round directory.
+            # Strategies with state between rounds (server optimizers) keep it per model type.
+            aggregator.aggregate_models(
+                model_paths=model_paths,
+                weights=weights,
+                strategy=aggregation_strategy,
+                output_path=aggregated_model_path,
+                base_path=base_path,
+                strategy_params=round_info["hyperparameters"].get("aggregation_params"),
+                state_path=os.path.join(self.models_dir, model_type, f"{aggregation_strategy.lower()}_state.pt")
+            )
+        
+        # The aggregated model becomes a blob that the next round links to
+        aggregated_digest = self.model_store.put_file(aggregated_model_path, "link")
+        with self._get_round_lock(round_id):
+            round_info["aggregated_model_digest"] = aggregated_digest
+        
+        # Evaluate the aggregated model if a test dataset is available
+        test_data_path = os.path.join("data", "test", model_type)
+        if os.path.exists(test_data_path):
+            return {"evaluation_status": "pending"}
+        
+        logger.warning(f"Test data not found at {test_data_path}, skipping evaluation")
+        return {"message": "No test data available for evaluation"}
+    
+    def _schedule_evaluation(self, round_id: str) -> None:
+        """
+        Queue the evaluation of a completed round's aggregated model.
+        
+        Args:
+            round_id: ID of the round
+        """
+        round_info = self.registry.get_round(round_id)
+        model_type = round_info["model_type"]
+        
+        aggregator = ModelAggregator(model_type, evaluator=self.evaluator)
+        future = self.evaluator.submit(
+            aggregator.evaluate_aggregated_model,
+            model_path=os.path.join(self.rounds_dir, round_id, "global_model", "aggregated.pt"),
+            test_data_path=os.path.join("data", "test", model_type)
+        )
+        future.add_done_callback(lambda done: self._record_evaluation(round_id, done))
+    
+    def _record_evaluation(self, round_id: str, future: Any) -> None:
+        """
+        Store the metrics of a finished evaluation as the round's results.
+        
+        Args:
+            round_id: ID of the round
+            future: Future of the evaluation
+        """
+        if future.cancelled():
+            return
+        
+        try:
+            metrics = future.result()
         except Exception as e:
-            logger.error(f"Error aggregating models for round {round_id}: {str(e)}")
+            logger.error(f"Error evaluating round {round_id}: {str(e)}")
+            metrics = {"error": str(e)}
+        
+        round_info = self.registry.get_round(round_id)
+        round_dir = os.path.join(self.rounds_dir, round_id)
+        
+        try:
+            # Save metrics
+            metrics_path = os.path.join(round_dir, "global_model", "metrics.json")
+            with open(metrics_path, "w") as f:
+                json.dump(metrics, f, indent=2)
             
-            # Mark round as failed
-            round_info["status"] = "failed"
-            round_info["end_time"] = time.time()
+            with self._get_round_lock(round_id):
+                round_info["results"] = metrics
+                
+                # The round's journal was closed when it was archived; reopen it to persist the results
+                replayed = RoundJournal.replay(round_dir, snapshot_interval=self.snapshot_interval)
+                if replayed is not None:
+                    journal, _ = replayed
+                    journal.snapshot(round_info)
+                    journal.close()
             
-            # Save updated round info
-            round_dir = os.path.join(self.rounds_dir, round_id)
-            with open(os.path.join(round_dir, "round_info.json"), "w") as f:
-                json.dump(round_info, f, indent=2)
+            logger.info(f"Recorded evaluation metrics for round {round_id}")
+        except Exception as e:
+            logger.error(f"Error recording evaluation of round {round_id}: {str(e)}")
     
-    def _monitor_round_timeout(self, round_id: str) -> None:
+    def _archive_round(self, round_id: str) -> None:
         """
-        Monitor a round for timeout.
+        Move a finished round out of the hot set and release its per-round resources.
         
         Args:
             round_id: ID of the round
         """
-        if round_id not in self.active_rounds:
-            return
+        self.registry.update_round_status(round_id)
         
-        round_info = self.active_rounds[round_id]
+        journal = self.round_journals.pop(round_id, None)
+        if journal is not None:
+            journal.close()
         
-        if round_info["status"] != "in_progress":
+        self.online_aggregators.pop(round_id, None)
+    
+    def _fold_client_model(self, round_id: str, client_id: str) -> None:
+        """
+        Fold an uploaded client model into the round's running aggregate.
+        
+        Args:
+            round_id: ID of the round
+            client_id: ID of the client
+        """
+        round_info = self.active_rounds.get(round_id)
+        if not round_info:
+            logger.error(f"Round {round_id} not found")
             return
         
-        # Calculate time until timeout
-        start_time = round_info["start_time"]
-        timeout = round_info["round_timeout"]
-        time_remaining = (start_time + timeout) - time.time()
+        client_info = round_info["clients"][client_id]
+        
+        try:
+            with self._get_round_lock(round_id):
+                # Once the round is being finished, finalization folds this upload itself
+                if round_info["status"] != "in_progress":
+                    return
+                
+                online_aggregator = self._get_online_aggregator(round_id)
+            
+            # Loading the upload and persisting the sum are disk I/O; only this round's folds wait for them
+            with online_aggregator.lock:
+                # Finalization folded this upload already if it got the aggregate first
+                if online_aggregator.finalized:
+                    return
+                
+                if online_aggregator.add(client_id, client_info["model_path"], self._client_weight(client_info)):
+                    online_aggregator.save()
+        except Exception as e:
+            logger.error(f"Error folding model from client {client_id} into round {round_id}: {str(e)}")
+    
+    def _get_online_aggregator(self, round_id: str) -> IncrementalAggregator:
+        """
+        Get the running aggregate for a round, resuming it from disk if it was persisted.
+        
+        Must be called with the round lock held.
+        
+        Args:
+            round_id: ID of the round
+        
+        Returns:
+            Incremental aggregator for the round
+        """
+        if round_id not in self.online_aggregators:
+            global_model_dir = os.path.join(self.rounds_dir, round_id, "global_model")
+            state_path = os.path.join(global_model_dir, "running_aggregate.pt")
+            
+            # Rounds with delta updates fold everything relative to the round's global model
+            base_path = None
+            if self._uses_delta_updates(self.active_rounds[round_id]):
+                base_path = os.path.join(global_model_dir, "model.pt")
+            
+            self.online_aggregators[round_id] = IncrementalAggregator(state_path, base_path=base_path)
+        
+        return self.online_aggregators[round_id]
+    
+    def _get_round_lock(self, round_id: str) -> threading.RLock:
+        """Get the lock guarding a round's state."""
+        return self.round_locks.lock_for(round_id)
+    
+    def _get_strategy(self, round_info: Dict[str, Any]) -> AggregationStrategy:
+        """Create the aggregation strategy of a round with its parameters."""
+        return get_strategy(
+            round_info["aggregation_strategy"],
+            **round_info["hyperparameters"].get("aggregation_params", {})
+        )
+    
+    def _uses_delta_updates(self, round_info: Dict[str, Any]) -> bool:
+        """Check whether a round accepts delta updates against its global model."""
+        return round_info["hyperparameters"].get("update_format") == "delta"
+    
+    def _client_weight(self, client_info: Dict[str, Any]) -> float:
+        """
+        Get the aggregation weight of a client's contribution.
+        
+        Args:
+            client_info: Client status within the round
+        
+        Returns:
+            Training data size if reported, otherwise 1.0
+        """
+        # Use training data size as weight if available
+        if client_info["training_metrics"] and "data_size" in client_info["training_metrics"]:
+            return float(client_info["training_metrics"]["data_size"])
+        return 1.0
+    
+    def _schedule_round_timeout(self, round_id: str) -> None:
+        """
+        Schedule the timeout of a started round.
+        
+        Args:
+            round_id: ID of the round
+        """
+        round_info = self.active_rounds[round_id]
+        deadline = round_info["start_time"] + round_info["round_timeout"]
+        self.scheduler.schedule(round_id, deadline, self._handle_round_timeout, round_id)
+    
+    def _handle_round_timeout(self, round_id: str) -> None:
+        """
+        Time out a round whose deadline is due.
+        
+        Args:
+            round_id: ID of the round
+        """
+        round_info = self.active_rounds.get(round_id)
         
-        if time_remaining > 0:
-            # Sleep until timeout
-            time.sleep(time_remaining)
+        if round_info is None:
+            return
         
-        # Check if round is still in progress
-        if round_id in self.active_rounds and self.active_rounds[round_id]["status"] == "in_progress":
+        with self._get_round_lock(round_id):
+            # Check if round is still in progress
+            if round_info["status"] != "in_progress":
+                return
+            
             logger.warning(f"Round {round_id} timed out")
             
             # Mark clients that didn't complete as timed out
+            timed_out = {}
             for client_id, client_info in round_info["clients"].items():
-                if client_info["status"] != "completed":
-                    client_info["status"] = "timed_out"
+                if transition_client(client_info, ("invited", "joined"), "timed_out"):
+                    timed_out[client_id] = {"status": "timed_out"}
             
-            # Finish the round with available models
-            self._finish_round(round_id)
+            if timed_out:
+                self.round_journals[round_id].record(round_info, clients=timed_out)
+        
+        # Finish the round with available models
+        self._finish_round(round_id)
     
     def _calculate_client_score(self, client_info: Dict[str, Any]) -> float:
         """
@@ -896,7 +1553,7 @@ class FederatedLearningServer:
         
         Args:
             client_info: Client information
-            
+        
         Returns:
             Resource score
         """
@@ -929,6 +1586,12 @@ def run_server():
     parser.add_argument("--rounds-dir", type=str, default="rounds", help="Directory for rounds")
     parser.add_argument("--no-security", action="store_true", help="Disable security")
     parser.add_argument("--workers", type=int, default=5, help="Number of worker threads")
+    parser.add_argument("--aggregation-workers", type=int, help="Number of processes for parallel aggregation")
+    parser.add_argument("--evaluation-workers", type=int, help="Number of processes for evaluating aggregated models")
+    parser.add_argument("--evaluation-precision", type=str, default="auto", choices=["auto", "float32", "bfloat16", "int8"], help="Inference precision for evaluating aggregated models")
+    parser.add_argument("--reverify-uploads", action="store_true", help="Check signed uploads against their signatures again before aggregation")
+    parser.add_argument("--max-upload-size", type=int, default=MAX_UPLOAD_SIZE, help="Largest client model upload in bytes")
+    parser.add_argument("--io-threads", type=int, default=32, help="Number of threads for blocking API calls")
     
     args = parser.parse_args()
     
@@ -937,18 +1600,30 @@ def run_server():
         models_dir=args.models_dir,
         rounds_dir=args.rounds_dir,
         init_security=not args.no_security,
-        worker_threads=args.workers
+        worker_threads=args.workers,
+        aggregation_workers=args.aggregation_workers,
+        evaluation_workers=args.evaluation_workers,
+        evaluation_precision=args.evaluation_precision,
+        reverify_uploads=args.reverify_uploads,
+        max_upload_size=args.max_upload_size
     )
     
     try:
-        # Here you would normally start a web server to handle API requests
-        # For simplicity, we'll just sleep in this example
+        import uvicorn
+        from federated_learning.server.api import create_app
+        
         logger.info(f"Server running on {args.host}:{args.port}")
         logger.info("Press Ctrl+C to stop")
         
-        import time
-        while True:
-            time.sleep(1)
+        # Serve the HTTP API on an asyncio event loop until interrupted; open event streams
+        # would otherwise hold up the shutdown for their full duration
+        uvicorn.run(
+            create_app(server, io_threads=args.io_threads),
+            host=args.host,
+            port=args.port,
+            log_level="warning",
+            timeout_graceful_shutdown=5
+        )
     
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received, shutting down")
@@ -0,0 +1,357 @@
+import logging
+import functools
+from typing import Dict, List, Any, Optional, Type, Tuple, FrozenSet
+
+import torch
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Strategies")
+
+# Registered strategy classes by name
+STRATEGIES: Dict[str, Type["AggregationStrategy"]] = {}
+
+# Up to this many clients, order statistics use an in-place sorting network over the rows
+MAX_NETWORK_CLIENTS = 64
+
+
+def register_strategy(*names: str):
+    """
+    Class decorator registering an aggregation strategy under one or more names.
+    
+    Args:
+        *names: Names the strategy is selected by (the round's `aggregation_strategy`)
+    """
+    def decorator(cls: Type["AggregationStrategy"]) -> Type["AggregationStrategy"]:
+        for name in names:
+            STRATEGIES[name] = cls
+        cls.name = names[0]
+        return cls
+    return decorator
+
+
+def available_strategies() -> List[str]:
+    """Get the names of all registered aggregation strategies."""
+    return sorted(STRATEGIES)
+
+
+def get_strategy(name: str, **params: Any) -> "AggregationStrategy":
+    """
+    Create an aggregation strategy by name.
+    
+    Args:
+        name: Registered strategy name (case-insensitive)
+        **params: Strategy parameters, e.g. `trim_ratio` for 'trimmed_mean'
+    
+    Returns:
+        Strategy instance
+    
+    Raises:
+        ValueError: If the strategy is unknown or a parameter is not accepted
+    """
+    cls = STRATEGIES.get(name.lower())
+    if cls is None:
+        raise ValueError(f"Unknown aggregation strategy: {name} (available: {', '.join(available_strategies())})")
+    
+    try:
+        return cls(**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for aggregation strategy {name}: {str(e)}")
+
+
+@functools.lru_cache(maxsize=None)
+def _sorting_network(n: int, outputs: FrozenSet[int]) -> Tuple[Tuple[int, int], ...]:
+    """
+    Comparators of Batcher's odd-even merge sort for `n` rows, pruned to those that affect `outputs`.
+    
+    Args:
+        n: Number of rows
+        outputs: Row positions whose sorted values are needed
+    
+    Returns:
+        (low, high) row pairs to compare-and-swap in order
+    """
+    comparators = []
+    p = 1
+    while p < n:
+        k = p
+        while k >= 1:
+            for j in range(k % p, n - k, 2 * k):
+                for i in range(min(k, n - j - k)):
+                    if (i + j) // (2 * p) == (i + j + k) // (2 * p):
+                        comparators.append((i + j, i + j + k))
+            k //= 2
+        p *= 2
+    
+    # Walk backwards keeping only comparators that feed a needed position
+    needed = set(outputs)
+    pruned = []
+    for low, high in reversed(comparators):
+        if low in needed or high in needed:
+            pruned.append((low, high))
+            needed.update((low, high))
+    
+    return tuple(reversed(pruned))
+
+
+def sort_rows_(stacked: torch.Tensor, outputs: Optional[List[int]] = None) -> torch.Tensor:
+    """
+    Sort each column of a `[n, chunk]` tensor in place, so row i holds the i-th smallest values.
+    
+    For up to MAX_NETWORK_CLIENTS rows this runs a sorting network of
+    elementwise min/max over whole rows, which vectorizes far better than
+    sorting millions of short columns and needs only one row of scratch.
+    
+    Args:
+        stacked: `[n, chunk]` tensor, overwritten
+        outputs: Rows that must end up correct (default: all); others may be left partially sorted
+    
+    Returns:
+        `stacked`
+    """
+    n = stacked.shape[0]
+    if n > MAX_NETWORK_CLIENTS:
+        stacked.copy_(torch.sort(stacked, dim=0).values)
+        return stacked
+    
+    scratch = torch.empty_like(stacked[0])
+    for low, high in _sorting_network(n, frozenset(range(n) if outputs is None else outputs)):
+        torch.minimum(stacked[low], stacked[high], out=scratch)
+        torch.maximum(stacked[low], stacked[high], out=stacked[high])
+        stacked[low].copy_(scratch)
+    
+    return stacked
+
+
+class AggregationStrategy:
+    """
+    Base class for aggregation strategies.
+    
+    Strategies are kernels over a stacked `[num_clients, chunk]` float32 buffer
+    holding one contiguous slice of every client's flattened averaged
+    parameters. Rows are client updates relative to the round's global model
+    when it is known, otherwise the client models themselves. The aggregator
+    walks the model in chunks, so a strategy must be coordinate-wise in
+    `reduce` and `apply`; strategies that compare whole clients (Krum) do so
+    in `select` from pairwise distances accumulated over all chunks.
+    """
+    
+    name = "base"
+    
+    # Weighted means can be folded one client at a time instead of stacked
+    streaming = False
+    
+    # Whether `select` needs the pairwise squared distances between clients
+    needs_distances = False
+    
+    # Whether rows must be updates relative to the round's global model
+    requires_base = False
+    
+    def select(self, distances: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        """
+        Re-weight clients before reduction.
+        
+        Args:
+            distances: `[n, n]` pairwise squared Euclidean distances (only if `needs_distances`)
+            weights: `[n]` normalized client weights
+        
+        Returns:
+            `[n]` weights to reduce with
+        """
+        return weights
+    
+    def reduce(self, stacked: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        """
+        Combine one chunk of all clients into one chunk of the aggregate.
+        
+        Args:
+            stacked: `[n, chunk]` client rows; scratch space that may be overwritten
+            weights: `[n]` weights from `select`
+        
+        Returns:
+            `[chunk]` aggregate
+        """
+        raise NotImplementedError
+    
+    def init_state(self, numel: int) -> Dict[str, torch.Tensor]:
+        """Create the state kept between rounds for a model with `numel` averaged parameters."""
+        return {}
+    
+    def apply(self, aggregate: torch.Tensor, base: Optional[torch.Tensor], state: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """
+        Turn one chunk of the aggregate into one chunk of the new global model.
+        
+        Args:
+            aggregate: `[chunk]` output of `reduce`
+            base: `[chunk]` of the round's global model, or None if rows are models
+            state: Slices of the persistent state for this chunk, updated in place
+        
+        Returns:
+            `[chunk]` of the new global model
+        """
+        return aggregate if base is None else base + aggregate
+
+
+@register_strategy("fedavg", "fedprox", "fedavg_online", "fedavg_parallel")
+class WeightedMean(AggregationStrategy):
+    """
+    Weighted average of client models (FedAvg).
+    
+    FedProx only changes local training (clients add a proximal term pulling
+    their weights toward the global model), so its server step is this same
+    average; 'fedprox' rounds hand `proximal_mu` to clients when they join.
+    """
+    
+    streaming = True
+    
+    def __init__(self, proximal_mu: float = 0.0):
+        if proximal_mu < 0:
+            raise ValueError(f"proximal_mu must be non-negative, got {proximal_mu}")
+        self.proximal_mu = proximal_mu
+    
+    def reduce(self, stacked: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        return weights @ stacked
+
+
+@register_strategy("median")
+class CoordinateMedian(AggregationStrategy):
+    """
+    Coordinate-wise median of client models.
+    
+    Robust to up to half of the clients sending arbitrary values. Client
+    weights are ignored. With an even number of clients the two middle values
+    are averaged.
+    """
+    
+    def reduce(self, stacked: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        n = stacked.shape[0]
+        middle = [(n - 1) // 2, n // 2]
+        
+        sort_rows_(stacked, middle)
+        if n % 2:
+            return stacked[n // 2].clone()
+        return (stacked[middle[0]] + stacked[middle[1]]) / 2
+
+
+@register_strategy("trimmed_mean")
+class TrimmedMean(AggregationStrategy):
+    """
+    Coordinate-wise trimmed mean.
+    
+    For every parameter the `trim_ratio` fraction of largest and smallest
+    client values is dropped and the rest is averaged. Client weights are
+    ignored.
+    """
+    
+    def __init__(self, trim_ratio: float = 0.1):
+        if not 0 <= trim_ratio < 0.5:
+            raise ValueError(f"trim_ratio must be in [0, 0.5), got {trim_ratio}")
+        self.trim_ratio = trim_ratio
+    
+    def reduce(self, stacked: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        n = stacked.shape[0]
+        k = min(int(self.trim_ratio * n), (n - 1) // 2)
+        
+        if k > 0:
+            sort_rows_(stacked, list(range(k, n - k)))
+        
+        return stacked[k:n - k].mean(dim=0)
+
+
+@register_strategy("krum")
+class Krum(AggregationStrategy):
+    """
+    (Multi-)Krum: keep the clients closest to their neighbours.
+    
+    Each client is scored by the summed squared distance to its
+    `n - num_byzantine - 2` nearest other clients; the `num_selected` clients
+    with the lowest scores are averaged with their weights. `num_selected=1`
+    is classic Krum.
+    """
+    
+    needs_distances = True
+    
+    def __init__(self, num_byzantine: Optional[int] = None, num_selected: int = 1):
+        if num_selected < 1:
+            raise ValueError(f"num_selected must be at least 1, got {num_selected}")
+        self.num_byzantine = num_byzantine
+        self.num_selected = num_selected
+    
+    def select(self, distances: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        n = distances.shape[0]
+        if n <= 2:
+            return weights
+        
+        # Krum tolerates f Byzantine clients as long as n >= 2f + 3
+        num_byzantine = self.num_byzantine if self.num_byzantine is not None else (n - 3) // 2
+        num_neighbours = min(max(n - num_byzantine - 2, 1), n - 1)
+        
+        # The smallest entry of each row is the distance to itself
+        nearest = torch.topk(distances, num_neighbours + 1, dim=1, largest=False).values[:, 1:]
+        scores = nearest.sum(dim=1)
+        
+        selected = torch.topk(scores, min(self.num_selected, n), largest=False).indices
+        mask = torch.zeros_like(weights)
+        mask[selected] = 1.0
+        
+        logger.info(f"Krum selected clients {sorted(selected.tolist())} of {n}")
+        
+        selected_weights = weights * mask
+        return selected_weights / selected_weights.sum()
+    
+    def reduce(self, stacked: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        return weights @ stacked
+
+
+class ServerOptimizer(AggregationStrategy):
+    """
+    Adaptive server optimizer over the averaged client update (Reddi et al., "Adaptive Federated Optimization").
+    
+    The weighted mean of the client updates is treated as a pseudo-gradient.
+    First and second moments are kept per parameter between rounds.
+    """
+    
+    requires_base = True
+    
+    def __init__(self, lr: float = 0.01, beta1: float = 0.9, beta2: float = 0.99, tau: float = 1e-3):
+        self.lr = lr
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.tau = tau
+    
+    def reduce(self, stacked: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+        return weights @ stacked
+    
+    def init_state(self, numel: int) -> Dict[str, torch.Tensor]:
+        return {
+            "m": torch.zeros(numel, dtype=torch.float32),
+            "v": torch.full((numel,), self.tau ** 2, dtype=torch.float32)
+        }
+    
+    def apply(self, aggregate: torch.Tensor, base: Optional[torch.Tensor], state: Dict[str, torch.Tensor]) -> torch.Tensor:
+        m, v = state["m"], state["v"]
+        m.mul_(self.beta1).add_(aggregate, alpha=1 - self.beta1)
+        self._update_second_moment(v, aggregate * aggregate)
+        return base + self.lr * m / (v.sqrt() + self.tau)
+    
+    def _update_second_moment(self, v: torch.Tensor, squared: torch.Tensor) -> None:
+        raise NotImplementedError
+
+
+@register_strategy("fedadam")
+class FedAdam(ServerOptimizer):
+    """FedAdam: exponential moving average of the squared update."""
+    
+    def _update_second_moment(self, v: torch.Tensor, squared: torch.Tensor) -> None:
+        v.mul_(self.beta2).add_(squared, alpha=1 - self.beta2)
+
+
+@register_strategy("fedyogi")
+class FedYogi(ServerOptimizer):
+    """FedYogi: additive second-moment update that grows the effective learning rate more slowly than Adam."""
+    
+    def _update_second_moment(self, v: torch.Tensor, squared: torch.Tensor) -> None:
+        v.sub_(torch.sign(v - squared).mul_(squared), alpha=1 - self.beta2)
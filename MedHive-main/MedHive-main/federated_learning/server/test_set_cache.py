@@ -0,0 +1,398 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import importlib
+import threading
+from typing import Dict, Tuple, Any, Optional
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_TestSetCache")
+
+# Marker identifying the layout of a cache directory
+CACHE_FORMAT = "medhive-testset/2"
+
+META_FILENAME = "meta.json"
+INPUTS_FILENAME = "inputs.npy"
+TARGETS_FILENAME = "targets.npy"
+
+# Per model type: relative path -> [size, mtime_ns, sha256] of the files hashed last time
+INDEX_FILENAME = "index.json"
+
+# Samples decoded per batch while the cache is built
+BUILD_BATCH_SIZE = 64
+
+# Elements checked or converted at a time when compacting decoded arrays
+COMPACT_CHUNK_ELEMENTS = 16 * 1024 * 1024
+
+# Bytes read at a time when hashing test files
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Storage precisions: "auto" stores floats that are not exactly uint8 as float16, "lossless" keeps them
+PRECISIONS = ("auto", "lossless")
+
+
+def load_test_dataset(model_type: str, test_data_path: str) -> Dataset:
+    """
+    Create the test split of a model type's dataset.
+    
+    Args:
+        model_type: Type of model
+        test_data_path: Path to test data
+    
+    Returns:
+        The model type's `CustomDataset` with `train=False`
+    """
+    module_path = f"federated_learning.models.{model_type}.dataset"
+    dataset_module = importlib.import_module(module_path)
+    dataset_class = getattr(dataset_module, "CustomDataset")
+    return dataset_class(test_data_path, train=False)
+
+
+def _hash_file(path: str) -> str:
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(path: str, index_path: Optional[str] = None) -> str:
+    """
+    Hash the content of a test data directory.
+    
+    With an index, files whose size and modification time match the index are
+    not read again, so checking an unchanged test set costs one `stat` per file.
+    
+    Args:
+        path: Directory (or single file) holding the test data
+        index_path: Optional JSON file remembering the hash of every file, updated in place
+    
+    Returns:
+        Hex digest over the relative path and content hash of every file
+    """
+    if os.path.isfile(path):
+        files = {os.path.basename(path): path}
+    else:
+        files = {
+            os.path.relpath(os.path.join(root, name), path): os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+        }
+    
+    index = {}
+    if index_path is not None and os.path.exists(index_path):
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except ValueError:
+            index = {}
+    
+    digest = hashlib.sha256()
+    updated = {}
+    
+    for relative in sorted(files):
+        stat = os.stat(files[relative])
+        known = index.get(relative)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            file_hash = known[2]
+        else:
+            file_hash = _hash_file(files[relative])
+        
+        updated[relative] = [stat.st_size, stat.st_mtime_ns, file_hash]
+        digest.update(f"{relative}\0{file_hash}\n".encode("utf-8"))
+    
+    if index_path is not None and updated != index:
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        tmp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(updated, f)
+        os.replace(tmp_path, index_path)
+    
+    return digest.hexdigest()
+
+
+def _integer_dtype(low: int, high: int) -> np.dtype:
+    """Smallest integer dtype holding values from `low` to `high`."""
+    for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _choose_encoding(raw: np.ndarray, precision: str) -> Dict[str, Any]:
+    """
+    Pick the most compact storage for a decoded array.
+    
+    Floats that are exactly integers in [0, 255], or exactly `k / 255` (what
+    image transforms such as `ToTensor` produce), are stored as uint8. Other
+    floats are stored as float16 with precision "auto" when they fit its range.
+    Integers use the smallest integer dtype that holds their range.
+    
+    Args:
+        raw: Decoded array
+        precision: "auto" or "lossless"
+    
+    Returns:
+        Encoding with the stored 'dtype', the 'source_dtype' and the 'divisor' applied on read
+    """
+    source = raw.dtype
+    flat = raw.reshape(-1)
+    
+    if np.issubdtype(source, np.bool_):
+        return {"dtype": "uint8", "source_dtype": str(source), "divisor": 1}
+    
+    if np.issubdtype(source, np.integer):
+        low = min((int(flat[i:i + COMPACT_CHUNK_ELEMENTS].min()) for i in range(0, flat.size, COMPACT_CHUNK_ELEMENTS)), default=0)
+        high = max((int(flat[i:i + COMPACT_CHUNK_ELEMENTS].max()) for i in range(0, flat.size, COMPACT_CHUNK_ELEMENTS)), default=0)
+        return {"dtype": str(_integer_dtype(low, high)), "source_dtype": str(source), "divisor": 1}
+    
+    # Candidate divisors whose uint8 round trip reproduces the values bit for bit
+    divisors = [1, 255]
+    max_abs = 0.0
+    
+    for start in range(0, flat.size, COMPACT_CHUNK_ELEMENTS):
+        chunk = flat[start:start + COMPACT_CHUNK_ELEMENTS]
+        if not np.all(np.isfinite(chunk)):
+            return {"dtype": str(source), "source_dtype": str(source), "divisor": 1}
+        max_abs = max(max_abs, float(np.abs(chunk).max()))
+        
+        for divisor in list(divisors):
+            quantized = np.round(chunk * divisor)
+            if quantized.min() < 0 or quantized.max() > 255 or not np.array_equal(
+                quantized.astype(source) / source.type(divisor), chunk
+            ):
+                divisors.remove(divisor)
+    
+    if divisors:
+        return {"dtype": "uint8", "source_dtype": str(source), "divisor": divisors[0]}
+    
+    if precision == "auto" and source.itemsize > 2 and max_abs < np.finfo(np.float16).max:
+        return {"dtype": "float16", "source_dtype": str(source), "divisor": 1}
+    
+    return {"dtype": str(source), "source_dtype": str(source), "divisor": 1}
+
+
+def _encode(raw: np.ndarray, encoding: Dict[str, Any], path: str) -> None:
+    """Write a decoded array in its chosen storage to a new `.npy` file, a chunk at a time."""
+    stored = np.lib.format.open_memmap(path, mode="w+", dtype=np.dtype(encoding["dtype"]), shape=raw.shape)
+    
+    flat_raw = raw.reshape(-1)
+    flat_stored = stored.reshape(-1)
+    for start in range(0, flat_raw.size, COMPACT_CHUNK_ELEMENTS):
+        chunk = flat_raw[start:start + COMPACT_CHUNK_ELEMENTS]
+        if encoding["divisor"] != 1:
+            chunk = np.round(chunk * encoding["divisor"])
+        flat_stored[start:start + COMPACT_CHUNK_ELEMENTS] = chunk
+    
+    stored.flush()
+    del stored
+
+
+def _decode(stored: np.ndarray, encoding: Dict[str, Any]) -> np.ndarray:
+    """Turn a slice of a stored array back into the values the dataset produced."""
+    source = np.dtype(encoding["source_dtype"])
+    if encoding["divisor"] != 1:
+        return stored.astype(source) / source.type(encoding["divisor"])
+    return stored.astype(source)
+
+
+class CachedTestSet:
+    """
+    A preprocessed test set stored as memory-mapped arrays.
+    
+    Inputs and targets are `.npy` files in their compact storage dtype (see
+    `_choose_encoding`), mapped read-only, so opening the cache in another
+    process costs no decoding and every process shares the same page cache.
+    `batch` only casts the mapped slice back to the dataset's dtype.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open a cache directory written by `TestSetCache`.
+        
+        Args:
+            path: Cache directory
+        """
+        self.path = path
+        
+        with open(os.path.join(path, META_FILENAME), "r") as f:
+            self.meta = json.load(f)
+        
+        if self.meta.get("format") != CACHE_FORMAT:
+            raise ValueError(f"Unsupported test set cache format in {path}: {self.meta.get('format')}")
+        
+        self.inputs = np.load(os.path.join(path, INPUTS_FILENAME), mmap_mode="r")
+        self.targets = np.load(os.path.join(path, TARGETS_FILENAME), mmap_mode="r")
+    
+    def __len__(self) -> int:
+        return self.meta["num_samples"]
+    
+    def batch(self, start: int, end: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Get samples `start` to `end` as tensors.
+        
+        Args:
+            start: First sample
+            end: One past the last sample
+        
+        Returns:
+            Tuple of (inputs, targets) in the dtypes the dataset produced
+        """
+        inputs = torch.from_numpy(_decode(self.inputs[start:end], self.meta["inputs"]))
+        targets = torch.from_numpy(_decode(self.targets[start:end], self.meta["targets"]))
+        return inputs, targets
+
+
+class TestSetCache:
+    """
+    Preprocesses the test split of each model type once and keeps it on disk.
+    
+    The test set does not change between rounds, so after the first
+    evaluation every round reads compact tensors from a memory map instead of
+    decoding images or signals. Each model type has one cache directory named
+    after the content hash of its test data; a changed hash builds a new
+    directory and removes the stale one. Hashes of unchanged files are reused
+    from an index, so checking the cache does not read the test set again.
+    """
+    
+    def __init__(self, cache_dir: str = os.path.join("data", "cache", "test"), precision: str = "auto"):
+        """
+        Initialize the test set cache.
+        
+        Args:
+            cache_dir: Directory holding one subdirectory per model type
+            precision: "auto" to store inputs that are not exactly uint8 as float16,
+                "lossless" to keep them in their decoded dtype
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision}, expected one of {', '.join(PRECISIONS)}")
+        
+        self.cache_dir = cache_dir
+        self.precision = precision
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+    
+    def get(self, model_type: str, test_data_path: str, dataset: Optional[Dataset] = None) -> str:
+        """
+        Get the cache directory of a test set, building it if it is missing or stale.
+        
+        Args:
+            model_type: Type of model
+            test_data_path: Path to test data
+            dataset: Dataset to preprocess if the cache must be built
+                (default: the model type's `CustomDataset`)
+        
+        Returns:
+            Cache directory, to be opened with `CachedTestSet`
+        """
+        model_cache_dir = os.path.join(self.cache_dir, model_type)
+        
+        with self._lock_for(model_type):
+            # The precision is part of the key, so switching it does not reuse the other's arrays
+            digest = content_hash(test_data_path, os.path.join(model_cache_dir, INDEX_FILENAME))
+            name = f"{digest}-{self.precision}"
+            path = os.path.join(model_cache_dir, name)
+            
+            if os.path.exists(os.path.join(path, META_FILENAME)):
+                return path
+            
+            if dataset is None:
+                dataset = load_test_dataset(model_type, test_data_path)
+            self._build(model_type, test_data_path, dataset, path)
+            
+            # Drop caches of earlier versions of the test data
+            for entry in os.listdir(model_cache_dir):
+                if entry not in (name, INDEX_FILENAME):
+                    shutil.rmtree(os.path.join(model_cache_dir, entry), ignore_errors=True)
+        
+        return path
+    
+    def _lock_for(self, model_type: str) -> threading.Lock:
+        """Get the lock serializing cache builds of a model type."""
+        with self._locks_lock:
+            return self._locks.setdefault(model_type, threading.Lock())
+    
+    def _build(self, model_type: str, test_data_path: str, dataset: Dataset, path: str) -> None:
+        """Decode a test set into a new cache directory, published atomically by rename."""
+        num_samples = len(dataset)
+        if num_samples == 0:
+            raise ValueError(f"Test dataset at {test_data_path} is empty")
+        
+        logger.info(f"Building test set cache for {model_type} ({num_samples} samples)")
+        
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_path)
+        
+        try:
+            # Decode once into full-precision scratch arrays, then compact them
+            raw_inputs_path = os.path.join(tmp_path, f"raw_{INPUTS_FILENAME}")
+            raw_targets_path = os.path.join(tmp_path, f"raw_{TARGETS_FILENAME}")
+            
+            loader = DataLoader(dataset, batch_size=BUILD_BATCH_SIZE, shuffle=False)
+            inputs = None
+            targets = None
+            position = 0
+            
+            for batch_inputs, batch_targets in loader:
+                batch_inputs = torch.as_tensor(batch_inputs)
+                batch_targets = torch.as_tensor(batch_targets)
+                
+                # The first batch fixes the shapes and dtypes of the arrays
+                if inputs is None:
+                    inputs = np.lib.format.open_memmap(
+                        raw_inputs_path, mode="w+",
+                        dtype=batch_inputs.numpy().dtype, shape=(num_samples,) + tuple(batch_inputs.shape[1:])
+                    )
+                    targets = np.lib.format.open_memmap(
+                        raw_targets_path, mode="w+",
+                        dtype=batch_targets.numpy().dtype, shape=(num_samples,) + tuple(batch_targets.shape[1:])
+                    )
+                
+                end = position + batch_inputs.shape[0]
+                inputs[position:end] = batch_inputs.numpy()
+                targets[position:end] = batch_targets.numpy()
+                position = end
+            
+            inputs.flush()
+            targets.flush()
+            
+            meta: Dict[str, Any] = {
+                "format": CACHE_FORMAT,
+                "model_type": model_type,
+                "source": os.path.abspath(test_data_path),
+                "num_samples": num_samples,
+                "inputs": _choose_encoding(inputs, self.precision),
+                "targets": _choose_encoding(targets, "lossless")
+            }
+            
+            _encode(inputs, meta["inputs"], os.path.join(tmp_path, INPUTS_FILENAME))
+            _encode(targets, meta["targets"], os.path.join(tmp_path, TARGETS_FILENAME))
+            del inputs, targets
+            os.remove(raw_inputs_path)
+            os.remove(raw_targets_path)
+            
+            with open(os.path.join(tmp_path, META_FILENAME), "w") as f:
+                json.dump(meta, f, indent=2)
+            
+            os.replace(tmp_path, path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        
+        logger.info(
+            f"Cached test set for {model_type} at {path} "
+            f"(inputs as {meta['inputs']['dtype']}, targets as {meta['targets']['dtype']})"
+        )
@@ -0,0 +1,405 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("FL_Uploads")
+
+# Chunk size used when the client does not ask for one, and the accepted range
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Largest model file a client may upload, in bytes
+MAX_UPLOAD_SIZE = 2 * 1024 ** 3
+
+# Seconds after its last chunk before an unfinished upload is removed
+SESSION_TTL = 24 * 3600
+
+# Size of the chunks a reassembled upload is hashed in
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadSessions:
+    """
+    Resumable, chunked uploads of model files.
+    
+    A client opens a session with the size and SHA-256 digest of the file,
+    then sends fixed-size chunks in any order and over any number of
+    connections, each with its own SHA-256 digest. Chunks are written at
+    their offset into a preallocated file, so reassembly needs no copying.
+    Every session lives in its own directory with the session metadata and
+    a log of the chunks received so far, so a client whose connection drops
+    (or a server that restarts) continues where the upload stopped.
+    """
+    
+    def __init__(self, root: str, max_size: int = MAX_UPLOAD_SIZE):
+        """
+        Initialize the upload sessions.
+        
+        Args:
+            root: Directory of the sessions; must be on the model store's
+                filesystem so finished uploads can be moved into it
+            max_size: Largest file a session may be opened for, in bytes
+        """
+        self.root = root
+        self.max_size = max_size
+        self._sessions = {}  # upload_id -> session dict, loaded lazily
+        self._lock = threading.Lock()
+        
+        os.makedirs(self.root, exist_ok=True)
+    
+    def create(
+        self,
+        round_id: str,
+        client_id: str,
+        size: int,
+        digest: str,
+        chunk_size: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Open an upload session.
+        
+        Args:
+            round_id: Round the upload belongs to
+            client_id: Uploading client
+            size: Size of the file in bytes
+            digest: Hex SHA-256 digest of the whole file
+            chunk_size: Requested chunk size; clamped to the accepted range
+            metadata: Upload fields handed back by `finish` (metrics, format, signature)
+        
+        Returns:
+            Session status
+        """
+        if size < 0:
+            return {"status": "error", "message": f"Invalid upload size {size}"}
+        
+        # The file is preallocated at this size, so it must be bounded before touching the disk
+        if size > self.max_size:
+            return {"status": "error", "message": f"Upload of {size} bytes exceeds the limit of {self.max_size} bytes"}
+        
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            return {"status": "error", "message": "Upload digest must be a hex SHA-256 digest"}
+        
+        chunk_size = min(max(chunk_size or DEFAULT_CHUNK_SIZE, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+        upload_id = uuid.uuid4().hex
+        session_dir = os.path.join(self.root, upload_id)
+        os.makedirs(session_dir)
+        
+        session = {
+            "upload_id": upload_id,
+            "round_id": round_id,
+            "client_id": client_id,
+            "size": size,
+            "digest": digest,
+            "chunk_size": chunk_size,
+            "num_chunks": max(1, -(-size // chunk_size)),
+            "metadata": metadata or {},
+            "created_at": time.time(),
+            "received": set(),
+            "lock": threading.Lock()
+        }
+        
+        # Preallocate the file so chunks can be written at their offsets in any order
+        with open(self._data_path(upload_id), "wb") as f:
+            f.truncate(size)
+        open(self._chunks_path(upload_id), "w").close()
+        
+        with open(os.path.join(session_dir, "session.json"), "w") as f:
+            json.dump({k: v for k, v in session.items() if k not in ("received", "lock")}, f)
+        
+        with self._lock:
+            self._sessions[upload_id] = session
+        
+        logger.info(f"Opened upload {upload_id} of {size} bytes in {session['num_chunks']} chunks for client {client_id}")
+        return self._status(session)
+    
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """
+        Get the status of a session, including the chunks received so far.
+        
+        Args:
+            upload_id: Session ID
+        
+        Returns:
+            Session status
+        """
+        session = self._get(upload_id)
+        if session is None:
+            return {"status": "error", "message": f"Upload {upload_id} not found"}
+        
+        return self._status(session)
+    
+    def owner(self, upload_id: str) -> Optional[str]:
+        """
+        Get the client that opened a session.
+        
+        Args:
+            upload_id: Session ID
+        
+        Returns:
+            Client ID, or None if there is no such session
+        """
+        session = self._get(upload_id)
+        return session["client_id"] if session is not None else None
+    
+    def write_chunk(self, upload_id: str, index: int, data: bytes, chunk_digest: Optional[str]) -> Dict[str, Any]:
+        """
+        Store one chunk of an upload.
+        
+        Writing a chunk that was already received is harmless, so clients can
+        simply resend chunks whose response they did not see.
+        
+        Args:
+            upload_id: Session ID
+            index: Index of the chunk
+            data: Contents of the chunk
+            chunk_digest: Hex SHA-256 digest of the chunk as sent by the client
+        
+        Returns:
+            Chunk result
+        """
+        session = self._get(upload_id)
+        if session is None:
+            return {"status": "error", "message": f"Upload {upload_id} not found"}
+        
+        if "result" in session or session.get("finishing"):
+            return {"status": "error", "message": f"Upload {upload_id} is already finished"}
+        
+        if not 0 <= index < session["num_chunks"]:
+            return {"status": "error", "message": f"Chunk {index} is out of range"}
+        
+        offset = index * session["chunk_size"]
+        expected_length = min(session["chunk_size"], session["size"] - offset)
+        if len(data) != expected_length:
+            return {"status": "error", "message": f"Chunk {index} has {len(data)} bytes, expected {expected_length}"}
+        
+        if chunk_digest is None or hashlib.sha256(data).hexdigest() != chunk_digest:
+            return {"status": "error", "message": f"Chunk {index} does not match its digest"}
+        
+        fd = os.open(self._data_path(upload_id), os.O_WRONLY)
+        try:
+            written = 0
+            while written < len(data):
+                written += os.pwrite(fd, data[written:], offset + written)
+        finally:
+            os.close(fd)
+        
+        # Log the chunk only once it is on disk
+        with session["lock"]:
+            if index not in session["received"]:
+                with open(self._chunks_path(upload_id), "a") as f:
+                    f.write(f"{index}\n")
+                session["received"].add(index)
+        
+        return {"status": "success", "upload_id": upload_id, "index": index, "received": len(session["received"])}
+    
+    def finish(self, upload_id: str) -> Dict[str, Any]:
+        """
+        Check that all chunks arrived and that the reassembled file matches its digest.
+        
+        On success the caller owns the file at `path` (e.g. moves it into the
+        model store) and must hand the outcome to `record_result`, or call
+        `release` if it fails before it has one; until then, other calls for
+        the session are turned away. If the upload was finished before, the
+        recorded outcome is returned under `result` instead, so a client that
+        lost the response can ask again.
+        
+        Args:
+            upload_id: Session ID
+        
+        Returns:
+            Result with the session's round_id, client_id, metadata, digest and the file's path
+        """
+        session = self._get(upload_id)
+        if session is None:
+            return {"status": "error", "message": f"Upload {upload_id} not found"}
+        
+        with session["lock"]:
+            if "result" in session:
+                return {"status": "success", "upload_id": upload_id, "result": session["result"]}
+            if session.get("finishing"):
+                return {"status": "error", "message": f"Upload {upload_id} is already being finished", "in_progress": True}
+            session["finishing"] = True
+        
+        # The caller keeps the session until it records a result; only a failed check hands it back now
+        finished = None
+        try:
+            finished = self._finish(session)
+            return finished
+        finally:
+            if finished is None or finished["status"] != "success":
+                self.release(upload_id)
+    
+    def release(self, upload_id: str) -> None:
+        """
+        Hand back a session `finish` succeeded on without recording a result, so it can be finished again.
+        
+        Args:
+            upload_id: Session ID
+        """
+        session = self._get(upload_id)
+        if session is None:
+            return
+        
+        with session["lock"]:
+            session["finishing"] = False
+    
+    def _finish(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Check a session whose chunks nobody else is finishing."""
+        upload_id = session["upload_id"]
+        
+        missing = self._missing(session)
+        if missing:
+            return {"status": "error", "message": f"Upload {upload_id} is missing {len(missing)} chunk(s)", "missing": missing[:100]}
+        
+        sha256 = hashlib.sha256()
+        with open(self._data_path(upload_id), "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        
+        if sha256.hexdigest() != session["digest"]:
+            # Every chunk matched its own digest, so the client declared the wrong file digest
+            self.discard(upload_id)
+            return {"status": "error", "message": f"Upload {upload_id} does not match its digest"}
+        
+        return {
+            "status": "success",
+            "upload_id": upload_id,
+            "round_id": session["round_id"],
+            "client_id": session["client_id"],
+            "digest": session["digest"],
+            "metadata": session["metadata"],
+            "path": self._data_path(upload_id)
+        }
+    
+    def record_result(self, upload_id: str, result: Dict[str, Any]) -> None:
+        """
+        Record the outcome of a finished upload and drop its file if the caller left it behind.
+        
+        The session is kept, without data, until it expires.
+        
+        Args:
+            upload_id: Session ID
+            result: Result returned to the client
+        """
+        session = self._get(upload_id)
+        if session is None:
+            return
+        
+        with open(os.path.join(self.root, upload_id, "result.json"), "w") as f:
+            json.dump(result, f)
+        
+        with session["lock"]:
+            session["result"] = result
+            session["finishing"] = False
+        
+        if os.path.exists(self._data_path(upload_id)):
+            os.remove(self._data_path(upload_id))
+    
+    def discard(self, upload_id: str) -> None:
+        """Remove a session and whatever is left of its file."""
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        shutil.rmtree(os.path.join(self.root, upload_id), ignore_errors=True)
+    
+    def expire(self, max_age: float = SESSION_TTL) -> int:
+        """
+        Remove sessions that received nothing for `max_age` seconds.
+        
+        Args:
+            max_age: Idle time in seconds after which a session is abandoned
+        
+        Returns:
+            Number of removed sessions
+        """
+        cutoff = time.time() - max_age
+        removed = 0
+        
+        for upload_id in os.listdir(self.root):
+            try:
+                if os.stat(os.path.join(self.root, upload_id, "chunks")).st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                pass
+            
+            self.discard(upload_id)
+            removed += 1
+        
+        if removed:
+            logger.info(f"Removed {removed} abandoned upload(s)")
+        return removed
+    
+    def _get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session, loading it from disk if it was opened before a restart."""
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is not None:
+                return session
+            
+            # Upload IDs are generated hex strings; anything else is not a session directory
+            if len(upload_id) != 32 or any(c not in "0123456789abcdef" for c in upload_id):
+                return None
+            
+            try:
+                with open(os.path.join(self.root, upload_id, "session.json"), "r") as f:
+                    session = json.load(f)
+                with open(self._chunks_path(upload_id), "r") as f:
+                    session["received"] = {int(line) for line in f if line.strip()}
+            except (FileNotFoundError, ValueError):
+                return None
+            
+            result_path = os.path.join(self.root, upload_id, "result.json")
+            if os.path.exists(result_path):
+                with open(result_path, "r") as f:
+                    session["result"] = json.load(f)
+            
+            session["lock"] = threading.Lock()
+            self._sessions[upload_id] = session
+            return session
+    
+    def _status(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Describe a session to the client."""
+        with session["lock"]:
+            received = sorted(session["received"])
+            result = session.get("result")
+        
+        status = {
+            "status": "success",
+            "upload_id": session["upload_id"],
+            "size": session["size"],
+            "digest": session["digest"],
+            "chunk_size": session["chunk_size"],
+            "num_chunks": session["num_chunks"],
+            "received": received
+        }
+        
+        # Outcome of a finished upload, for clients that did not see the response
+        if result is not None:
+            status["result"] = result
+        return status
+    
+    @staticmethod
+    def _missing(session: Dict[str, Any]) -> List[int]:
+        """Indices of the chunks not received yet."""
+        with session["lock"]:
+            return [i for i in range(session["num_chunks"]) if i not in session["received"]]
+    
+    def _data_path(self, upload_id: str) -> str:
+        """Path of the file an upload is reassembled in."""
+        return os.path.join(self.root, upload_id, "data")
+    
+    def _chunks_path(self, upload_id: str) -> str:
+        """Path of the log of received chunk indices."""
+        return os.path.join(self.root, upload_id, "chunks")